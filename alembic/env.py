@@ -31,6 +31,7 @@ from src.core.database import Base
 import src.auth.models  # noqa: F401
 import src.companies.models  # noqa: F401
 import src.funds.models  # noqa: F401
+import src.ai_conversation.db_models  # noqa: F401
 
 settings = get_settings()
 # Override the SQLAlchemy URL in Alembic configuration
@@ -0,0 +1,61 @@
+"""add openai_threads and openai_thread_messages
+
+Revision ID: 2b3c02cf114d
+Revises: 9ff1d0d618db
+Create Date: 2026-10-19 00:52:07.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '2b3c02cf114d'
+down_revision: Union[str, None] = '9ff1d0d618db'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(name: str) -> bool:
+    # Offline (--sql) mode cannot inspect the database: emit the DDL
+    if context.is_offline_mode():
+        return False
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not _has_table('openai_threads'):
+        op.create_table(
+            'openai_threads',
+            sa.Column('thread_id', sa.String(length=64), nullable=False),
+            sa.Column('last_message_id', sa.String(length=64), nullable=True),
+            sa.Column('message_count', sa.Integer(), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.Column('synced_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.PrimaryKeyConstraint('thread_id'),
+        )
+
+    if not _has_table('openai_thread_messages'):
+        op.create_table(
+            'openai_thread_messages',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('thread_id', sa.String(length=64), nullable=False),
+            sa.Column('seq', sa.Integer(), nullable=False),
+            sa.Column('message_id', sa.String(length=64), nullable=True),
+            sa.Column('role', sa.String(length=20), nullable=False),
+            sa.Column('content', sa.Text(), nullable=False),
+            sa.Column('content_hash', sa.String(length=64), nullable=False),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('thread_id', 'seq', name='uq_openai_thread_messages_thread_seq'),
+        )
+        op.create_index('ix_openai_thread_messages_thread_id', 'openai_thread_messages', ['thread_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_openai_thread_messages_thread_id', table_name='openai_thread_messages')
+    op.drop_table('openai_thread_messages')
+    op.drop_table('openai_threads')
@@ -0,0 +1,50 @@
+"""add company_enrichment
+
+Revision ID: 4f22609111ef
+Revises: 
+Create Date: 2026-10-19 00:48:02.000000
+
+The users, companies and fund_profiles tables predate migrations (they are
+created by init_database), so the revisions start with the tables added
+since. init_database also runs create_all on startup: a table it already
+created is left as is.
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '4f22609111ef'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(name: str) -> bool:
+    # Offline (--sql) mode cannot inspect the database: emit the DDL
+    if context.is_offline_mode():
+        return False
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if _has_table('company_enrichment'):
+        return
+    op.create_table(
+        'company_enrichment',
+        sa.Column('company_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('provider', sa.String(length=50), nullable=False),
+        sa.Column('data', sa.JSON(), nullable=True),
+        sa.Column('fetched_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('company_id', 'provider'),
+    )
+    op.create_index('ix_company_enrichment_fetched_at', 'company_enrichment', ['fetched_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_company_enrichment_fetched_at', table_name='company_enrichment')
+    op.drop_table('company_enrichment')
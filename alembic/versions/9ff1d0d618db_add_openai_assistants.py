@@ -0,0 +1,43 @@
+"""add openai_assistants
+
+Revision ID: 9ff1d0d618db
+Revises: 4f22609111ef
+Create Date: 2026-10-19 00:48:44.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '9ff1d0d618db'
+down_revision: Union[str, None] = '4f22609111ef'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(name: str) -> bool:
+    # Offline (--sql) mode cannot inspect the database: emit the DDL
+    if context.is_offline_mode():
+        return False
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if _has_table('openai_assistants'):
+        return
+    op.create_table(
+        'openai_assistants',
+        sa.Column('config_hash', sa.String(length=64), nullable=False),
+        sa.Column('assistant_id', sa.String(length=64), nullable=False),
+        sa.Column('model', sa.String(length=50), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('config_hash'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('openai_assistants')
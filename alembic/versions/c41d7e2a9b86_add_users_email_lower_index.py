@@ -0,0 +1,53 @@
+"""add users lower(email) unique index
+
+Revision ID: c41d7e2a9b86
+Revises: e18b61cd75e9
+Create Date: 2026-10-19 03:12:40.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41d7e2a9b86'
+down_revision: Union[str, None] = 'e18b61cd75e9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_index(table: str, name: str) -> bool:
+    # Offline (--sql) mode cannot inspect the database: emit the DDL
+    if context.is_offline_mode():
+        return False
+    return name in {i['name'] for i in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def _check_duplicate_emails() -> None:
+    # A case-duplicate would make the index build fail with an opaque error
+    if context.is_offline_mode():
+        return
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT lower(email), count(*) FROM users GROUP BY lower(email) HAVING count(*) > 1 LIMIT 20"
+    )).fetchall()
+    if duplicates:
+        listing = ", ".join(f"{email} ({count} accounts)" for email, count in duplicates)
+        raise RuntimeError(
+            f"Cannot create the unique lower(email) index: {len(duplicates)} email(s) "
+            f"are used by several accounts differing only in case, merge or rename them: {listing}"
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Logins and registration look users up by lower(email)
+    if _has_index('users', 'ux_users_email_lower'):
+        return
+    _check_duplicate_emails()
+    op.create_index('ux_users_email_lower', 'users', [sa.text('lower(email)')], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ux_users_email_lower', table_name='users')
@@ -0,0 +1,36 @@
+"""add conversation_messages.cleared_at
+
+Revision ID: e18b61cd75e9
+Revises: e707f7c5ac59
+Create Date: 2026-10-19 01:33:56.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e18b61cd75e9'
+down_revision: Union[str, None] = 'e707f7c5ac59'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_column(table: str, column: str) -> bool:
+    # Offline (--sql) mode cannot inspect the database: emit the DDL
+    if context.is_offline_mode():
+        return False
+    return column in {c['name'] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Resets mark messages cleared instead of deleting them, so seq never restarts
+    if not _has_column('conversation_messages', 'cleared_at'):
+        op.add_column('conversation_messages', sa.Column('cleared_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('conversation_messages', 'cleared_at')
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Chat pipeline benchmark
+
+Drives handle_conversation_turn (traditional), handle_conversation_with_context
+(assistant) or handle_conversation_with_completions (completions) with concurrent
+simulated conversations and reports latency percentiles, throughput and the
+in-process metrics. Several modes run one after another on the same
+conversation script, e.g. ``--mode assistant completions`` compares the two
+assistant engines. Point OPENAI_BASE_URL at
+loadtest/fake_openai_server.py to run it without network or OpenAI quota;
+company searches still go to DATABASE_URL.
+
+Usage:
+    python loadtest/fake_openai_server.py --port 8100 &
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=fake \\
+        python loadtest/chat_benchmark.py --mode traditional --conversations 50 --concurrency 10
+    python loadtest/chat_benchmark.py --mode assistant completions --conversations 20
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.core.database import SessionLocal  # noqa: E402
+from src.core.metrics import metrics  # noqa: E402
+from src.ai_conversation.service import ai_service  # noqa: E402
+from src.ai_conversation.assistant_creator import handle_conversation_with_context  # noqa: E402
+from src.ai_conversation.function_calling import handle_conversation_with_completions  # noqa: E402
+
+
+# Each conversation is a first search followed by continuation requests
+SEARCHES = [
+    "Найди 10 IT компаний в Алматы",
+    "Покажи 5 строительных компаний в Астане",
+    "Find 10 construction companies in Shymkent",
+    "Нужны транспортные компании в Караганде",
+    "Подбери 10 торговых компаний в Актобе",
+    "Найди компании в Атырау",
+]
+CONTINUATIONS = ["дай еще", "еще 5", "покажи следующие", "give me more"]
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def conversation_script(turns: int) -> List[str]:
+    """User messages of one simulated conversation"""
+    return [random.choice(SEARCHES)] + [random.choice(CONTINUATIONS) for _ in range(turns - 1)]
+
+
+async def run_conversation(mode: str, messages: List[str], latencies: List[float], errors: List[str]) -> None:
+    """One simulated conversation, each turn with its own DB session"""
+    history: List[Dict[str, str]] = []
+    search_state = None
+
+    for message in messages:
+        db = SessionLocal()
+        started = time.perf_counter()
+        try:
+            if mode == "completions":
+                response = await handle_conversation_with_completions(
+                    user_input=message,
+                    conversation_history=history
+                )
+            elif mode == "assistant":
+                response = await handle_conversation_with_context(
+                    user_input=message,
+                    conversation_history=history,
+                    db=db
+                )
+            else:
+                response = await ai_service.handle_conversation_turn(
+                    user_input=message,
+                    history=history,
+                    db=db,
+                    search_state=search_state
+                )
+                search_state = response.get("search_state")
+            latencies.append(time.perf_counter() - started)
+            history = response.get("updated_history", history)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+        finally:
+            db.close()
+
+
+async def run_mode(mode: str, scripts: List[List[str]], concurrency: int) -> Dict[str, Any]:
+    """Run all conversation scripts in one mode and build its report"""
+    metrics.reset()
+    latencies: List[float] = []
+    errors: List[str] = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited(messages: List[str]) -> None:
+        async with semaphore:
+            await run_conversation(mode, messages, latencies, errors)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[limited(messages) for messages in scripts])
+    elapsed = time.perf_counter() - started
+
+    return {
+        "mode": mode,
+        "openai_base_url": os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1",
+        "turns": len(latencies),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "elapsed_seconds": round(elapsed, 3),
+        "turns_per_second": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p95": round(percentile(latencies, 95) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+        },
+        "counters": metrics.snapshot(),
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"\n📊 {report['mode']} benchmark against {report['openai_base_url']}")
+    print(f"   Turns: {report['turns']} ({report['errors']} errors) in {report['elapsed_seconds']}s "
+          f"-> {report['turns_per_second']} turns/s")
+    latency = report["latency_ms"]
+    print(f"   Latency ms: mean={latency['mean']} p50={latency['p50']} p95={latency['p95']} p99={latency['p99']}")
+    for name, value in sorted(report["counters"].items()):
+        print(f"   {name}: {value}")
+    for error in report["error_samples"]:
+        print(f"   ❌ {error}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the chat pipeline")
+    parser.add_argument("--mode", nargs="+", choices=["traditional", "assistant", "completions"], default=["traditional"],
+                        help="One or more modes, run one after another on the same conversations")
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=3, help="Turns per conversation")
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    scripts = [conversation_script(args.turns) for _ in range(args.conversations)]
+    reports = [await run_mode(mode, scripts, args.concurrency) for mode in args.mode]
+
+    if args.json:
+        print(json.dumps(reports[0] if len(reports) == 1 else reports, ensure_ascii=False, indent=2))
+        return
+
+    for report in reports:
+        print_report(report)
+    if len(reports) > 1:
+        print("\n⚖️  Comparison (p50 / p95 ms):")
+        for report in reports:
+            print(f"   {report['mode']:<12} {report['latency_ms']['p50']:>9} / {report['latency_ms']['p95']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
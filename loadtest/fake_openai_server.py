@@ -0,0 +1,481 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible stand-in server for offline load testing
+
+Implements the subset of the OpenAI API used by the chat pipeline:
+
+- POST /v1/chat/completions (JSON mode intent parses, function calling and plain text summaries)
+- POST/DELETE /v1/assistants
+- POST /v1/threads, POST/GET /v1/threads/{thread_id}/messages
+- POST /v1/threads/{thread_id}/runs, GET .../runs/{run_id},
+  POST .../runs/{run_id}/submit_tool_outputs (JSON, or server-sent events with "stream": true)
+
+Latency and completion token counts are drawn from log-normal distributions,
+and x-ratelimit-* headers (plus 429s when a limit is configured) are emitted
+so the LLM gateway's pacing and retry paths are exercised too.
+
+Usage:
+    python loadtest/fake_openai_server.py --port 8100 --latency-ms 800
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=fake python run.py
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+import uuid
+from collections import deque
+from typing import Optional, Dict, Any, List
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Reuse the rule-based parser so intent parses look like real ones
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from src.ai_conversation.intent_parser import intent_parser  # noqa: E402
+
+
+class FakeConfig:
+    """Latency, token and rate-limit distribution parameters"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.latency_ms = args.latency_ms
+        self.latency_sigma = args.latency_sigma
+        self.run_step_ms = args.run_step_ms
+        self.completion_tokens = args.completion_tokens
+        self.tokens_sigma = args.tokens_sigma
+        self.rpm_limit = args.rpm_limit
+        self.tpm_limit = args.tpm_limit
+        self.error_rate = args.error_rate
+        self.seed = args.seed
+
+    def latency(self, median_ms: Optional[float] = None) -> float:
+        """Seconds, log-normal around the median"""
+        median = median_ms if median_ms is not None else self.latency_ms
+        return random.lognormvariate(math.log(max(median, 1.0)), self.latency_sigma) / 1000
+
+    def tokens(self) -> int:
+        return max(1, int(random.lognormvariate(math.log(max(self.completion_tokens, 1)), self.tokens_sigma)))
+
+
+class RateLimiter:
+    """Sliding one-minute window of requests and tokens"""
+
+    def __init__(self, rpm_limit: int, tpm_limit: int):
+        self.rpm_limit = rpm_limit
+        self.tpm_limit = tpm_limit
+        self._requests: deque = deque()
+        self._tokens: deque = deque()
+
+    def _trim(self, now: float) -> None:
+        while self._requests and self._requests[0] <= now - 60:
+            self._requests.popleft()
+        while self._tokens and self._tokens[0][0] <= now - 60:
+            self._tokens.popleft()
+
+    def admit(self, tokens: int) -> bool:
+        """Record a request; False when it exceeds a configured limit"""
+        now = time.time()
+        self._trim(now)
+        used_tokens = sum(count for _, count in self._tokens)
+        if self.rpm_limit and len(self._requests) >= self.rpm_limit:
+            return False
+        if self.tpm_limit and used_tokens + tokens > self.tpm_limit:
+            return False
+        self._requests.append(now)
+        self._tokens.append((now, tokens))
+        return True
+
+    def headers(self) -> Dict[str, str]:
+        now = time.time()
+        self._trim(now)
+        headers = {}
+        for kind, limit, window, used in (
+            ("requests", self.rpm_limit, self._requests, len(self._requests)),
+            ("tokens", self.tpm_limit, [t for t, _ in self._tokens], sum(c for _, c in self._tokens)),
+        ):
+            if not limit:
+                continue
+            reset = max(0.0, window[0] + 60 - now) if window else 0.0
+            headers[f"x-ratelimit-limit-{kind}"] = str(limit)
+            headers[f"x-ratelimit-remaining-{kind}"] = str(max(limit - used, 0))
+            headers[f"x-ratelimit-reset-{kind}"] = f"{reset:.3f}s"
+        return headers
+
+
+def _new_id(prefix: str) -> str:
+    return f"{prefix}_{uuid.uuid4().hex[:24]}"
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 3 + 1
+
+
+def _intent_json(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Intent parse in the format of the gpt-4o prompt"""
+    history = [
+        {"role": m.get("role", ""), "content": m.get("content") or ""}
+        for m in messages if m.get("role") in ("user", "assistant")
+    ]
+    parsed = intent_parser.parse(history)
+    if parsed:
+        parsed.pop("confidence", None)
+        parsed.pop("source", None)
+        parsed.pop("offset", None)
+        parsed["reasoning"] = "Fake server: rule-based parse"
+        return parsed
+    return {
+        "intent": "general_question",
+        "location": None,
+        "activity_keywords": None,
+        "quantity": None,
+        "page_number": 1,
+        "reasoning": "Fake server: no search parameters recognized",
+        "preliminary_response": "Я помогу вам найти компании-спонсоров. Уточните, пожалуйста, город и отрасль."
+    }
+
+
+def _search_tool_call(parsed: Dict[str, Any]) -> Dict[str, Any]:
+    """search_companies tool call for a rule-based parse"""
+    return {
+        "id": _new_id("call"),
+        "type": "function",
+        "function": {
+            "name": "search_companies",
+            "arguments": json.dumps({
+                "location": parsed["location"],
+                "activity_keywords": parsed.get("activity_keywords"),
+                "limit": parsed.get("quantity") or 10,
+                "page": parsed.get("page_number") or 1,
+            }, ensure_ascii=False),
+        },
+    }
+
+
+def _tool_summary(outputs: List[str]) -> str:
+    """Assistant reply after the tool outputs were received"""
+    found = 0
+    for output in outputs:
+        try:
+            found += int(json.loads(output or "{}").get("total_found", 0))
+        except (ValueError, AttributeError):
+            pass
+    return f"Я нашел {found} компаний по вашему запросу. Хотите увидеть еще?"
+
+
+def _text_value(content: Any) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return ""
+
+
+def create_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI API")
+    limiter = RateLimiter(config.rpm_limit, config.tpm_limit)
+    assistants: Dict[str, Dict[str, Any]] = {}
+    threads: Dict[str, List[Dict[str, Any]]] = {}
+    runs: Dict[str, Dict[str, Any]] = {}
+
+    def respond(body: Dict[str, Any], status_code: int = 200) -> JSONResponse:
+        return JSONResponse(body, status_code=status_code, headers=limiter.headers())
+
+    async def gate(tokens: int = 1) -> Optional[JSONResponse]:
+        """Rate limit and random 500s, applied to every endpoint"""
+        if not limiter.admit(tokens):
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached (fake)", "type": "requests", "code": "rate_limit_exceeded"}},
+                status_code=429,
+                headers={**limiter.headers(), "retry-after-ms": str(int(config.latency() * 1000))}
+            )
+        if config.error_rate and random.random() < config.error_rate:
+            return JSONResponse(
+                {"error": {"message": "Internal error (fake)", "type": "server_error", "code": None}},
+                status_code=500
+            )
+        return None
+
+    def message_object(thread_id: str, role: str, text: str, run_id: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "id": _new_id("msg"),
+            "object": "thread.message",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "role": role,
+            "content": [{"type": "text", "text": {"value": text, "annotations": []}}],
+            "assistant_id": None,
+            "run_id": run_id,
+            "attachments": [],
+            "metadata": {},
+            "status": "completed",
+        }
+
+    def advance_run(run: Dict[str, Any]) -> None:
+        """Move a run to its next status once its simulated step has finished"""
+        if run["status"] not in ("queued", "in_progress") or time.time() < run["_ready_at"]:
+            return
+        thread = threads[run["thread_id"]]
+        if run["_phase"] == "thinking":
+            history = [{"role": m["role"], "content": m["content"][0]["text"]["value"]} for m in thread]
+            parsed = intent_parser.parse(history)
+            if parsed and parsed.get("intent") == "find_companies":
+                run["status"] = "requires_action"
+                run["required_action"] = {
+                    "type": "submit_tool_outputs",
+                    "submit_tool_outputs": {"tool_calls": [_search_tool_call(parsed)]},
+                }
+                return
+        tool_summary = run.get("_tool_summary")
+        text = tool_summary or "Я помогу вам найти компании-спонсоров в Казахстане. Уточните город и отрасль."
+        thread.append(message_object(run["thread_id"], "assistant", text, run["id"]))
+        run["status"] = "completed"
+        run["completed_at"] = int(time.time())
+        run["required_action"] = None
+
+    def public_run(run: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in run.items() if not key.startswith("_")}
+
+    def run_event(event: str, data: Any) -> str:
+        payload = data if isinstance(data, str) else json.dumps(data, ensure_ascii=False)
+        return f"event: {event}\ndata: {payload}\n\n"
+
+    async def stream_run(run: Dict[str, Any]):
+        """Server-sent events of a run up to requires_action or completion"""
+        if run["status"] == "queued":
+            yield run_event("thread.run.created", public_run(run))
+            run["status"] = "in_progress"
+        yield run_event("thread.run.in_progress", public_run(run))
+        await asyncio.sleep(max(0.0, run["_ready_at"] - time.time()))
+        advance_run(run)
+        if run["status"] == "requires_action":
+            yield run_event("thread.run.requires_action", public_run(run))
+        else:
+            yield run_event("thread.message.completed", threads[run["thread_id"]][-1])
+            yield run_event("thread.run.completed", public_run(run))
+        yield run_event("done", "[DONE]")
+
+    def run_response(run: Dict[str, Any], stream: bool):
+        if stream:
+            return StreamingResponse(stream_run(run), media_type="text/event-stream", headers=limiter.headers())
+        return respond(public_run(run))
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        prompt_tokens = sum(_estimate_tokens(_text_value(m.get("content"))) for m in messages)
+        rejected = await gate(prompt_tokens)
+        if rejected:
+            return rejected
+
+        await asyncio.sleep(config.latency())
+
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+        tool_calls = None
+        if body.get("tools"):
+            # Function calling: search first, then answer from the tool outputs
+            tool_messages = []
+            for m in reversed(messages):
+                if m.get("role") != "tool":
+                    break
+                tool_messages.append(m.get("content"))
+            if tool_messages:
+                content = _tool_summary(tool_messages)
+            else:
+                parsed = _intent_json(messages)
+                if parsed.get("intent") == "find_companies" and parsed.get("location"):
+                    tool_calls = [_search_tool_call(parsed)]
+                    content = None
+                else:
+                    content = parsed.get("preliminary_response") or "Я помогу вам найти компании-спонсоров в Казахстане. Уточните город и отрасль."
+            completion_tokens = _estimate_tokens(content or json.dumps(tool_calls, ensure_ascii=False))
+        elif json_mode:
+            content = json.dumps(_intent_json(messages), ensure_ascii=False)
+            completion_tokens = _estimate_tokens(content)
+        else:
+            completion_tokens = min(config.tokens(), body.get("max_tokens") or 4096)
+            content = " ".join(["Краткое содержание диалога."] * max(1, completion_tokens // 6))
+
+        return respond({
+            "id": _new_id("chatcmpl"),
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content, "tool_calls": tool_calls},
+                "finish_reason": "tool_calls" if tool_calls else "stop",
+                "logprobs": None,
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+
+    @app.post("/v1/assistants")
+    async def create_assistant(request: Request):
+        rejected = await gate()
+        if rejected:
+            return rejected
+        body = await request.json()
+        assistant = {
+            "id": _new_id("asst"),
+            "object": "assistant",
+            "created_at": int(time.time()),
+            "name": body.get("name"),
+            "description": body.get("description"),
+            "model": body.get("model", "gpt-4o"),
+            "instructions": body.get("instructions"),
+            "tools": body.get("tools", []),
+            "metadata": body.get("metadata") or {},
+        }
+        assistants[assistant["id"]] = assistant
+        return respond(assistant)
+
+    @app.get("/v1/assistants/{assistant_id}")
+    async def retrieve_assistant(assistant_id: str):
+        if assistant_id not in assistants:
+            return respond({"error": {"message": "No assistant found", "type": "invalid_request_error"}}, 404)
+        return respond(assistants[assistant_id])
+
+    @app.delete("/v1/assistants/{assistant_id}")
+    async def delete_assistant(assistant_id: str):
+        assistants.pop(assistant_id, None)
+        return respond({"id": assistant_id, "object": "assistant.deleted", "deleted": True})
+
+    @app.post("/v1/threads")
+    async def create_thread():
+        rejected = await gate()
+        if rejected:
+            return rejected
+        thread_id = _new_id("thread")
+        threads[thread_id] = []
+        return respond({"id": thread_id, "object": "thread", "created_at": int(time.time()), "metadata": {}})
+
+    @app.post("/v1/threads/{thread_id}/messages")
+    async def create_message(thread_id: str, request: Request):
+        rejected = await gate()
+        if rejected:
+            return rejected
+        if thread_id not in threads:
+            return respond({"error": {"message": "No thread found", "type": "invalid_request_error"}}, 404)
+        body = await request.json()
+        message = message_object(thread_id, body.get("role", "user"), _text_value(body.get("content")))
+        threads[thread_id].append(message)
+        return respond(message)
+
+    @app.get("/v1/threads/{thread_id}/messages")
+    async def list_messages(thread_id: str, order: str = "desc", limit: int = 20, after: Optional[str] = None):
+        rejected = await gate()
+        if rejected:
+            return rejected
+        if thread_id not in threads:
+            return respond({"error": {"message": "No thread found", "type": "invalid_request_error"}}, 404)
+        messages = list(threads[thread_id])
+        if order == "desc":
+            messages.reverse()
+        if after:
+            ids = [m["id"] for m in messages]
+            messages = messages[ids.index(after) + 1:] if after in ids else []
+        page = messages[:limit]
+        return respond({
+            "object": "list",
+            "data": page,
+            "first_id": page[0]["id"] if page else None,
+            "last_id": page[-1]["id"] if page else None,
+            "has_more": len(messages) > limit,
+        })
+
+    @app.post("/v1/threads/{thread_id}/runs")
+    async def create_run(thread_id: str, request: Request):
+        rejected = await gate()
+        if rejected:
+            return rejected
+        if thread_id not in threads:
+            return respond({"error": {"message": "No thread found", "type": "invalid_request_error"}}, 404)
+        body = await request.json()
+        run = {
+            "id": _new_id("run"),
+            "object": "thread.run",
+            "created_at": int(time.time()),
+            "thread_id": thread_id,
+            "assistant_id": body.get("assistant_id"),
+            "status": "queued",
+            "required_action": None,
+            "last_error": None,
+            "model": "gpt-4o",
+            "instructions": body.get("instructions") or "",
+            "tools": [],
+            "metadata": {},
+            "completed_at": None,
+            "_phase": "thinking",
+            "_ready_at": time.time() + config.latency(config.run_step_ms),
+        }
+        runs[run["id"]] = run
+        return run_response(run, bool(body.get("stream")))
+
+    @app.get("/v1/threads/{thread_id}/runs/{run_id}")
+    async def retrieve_run(thread_id: str, run_id: str):
+        rejected = await gate()
+        if rejected:
+            return rejected
+        run = runs.get(run_id)
+        if run is None or run["thread_id"] != thread_id:
+            return respond({"error": {"message": "No run found", "type": "invalid_request_error"}}, 404)
+        if run["status"] == "queued":
+            run["status"] = "in_progress"
+        advance_run(run)
+        return respond(public_run(run))
+
+    @app.post("/v1/threads/{thread_id}/runs/{run_id}/submit_tool_outputs")
+    async def submit_tool_outputs(thread_id: str, run_id: str, request: Request):
+        rejected = await gate()
+        if rejected:
+            return rejected
+        run = runs.get(run_id)
+        if run is None or run["status"] != "requires_action":
+            return respond({"error": {"message": "Run is not waiting for tool outputs", "type": "invalid_request_error"}}, 400)
+        body = await request.json()
+        run["_tool_summary"] = _tool_summary([output.get("output") for output in body.get("tool_outputs", [])])
+        run["_phase"] = "answering"
+        run["_ready_at"] = time.time() + config.latency(config.run_step_ms)
+        run["status"] = "in_progress"
+        run["required_action"] = None
+        return run_response(run, bool(body.get("stream")))
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Fake OpenAI API for offline load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="Median chat completion latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.4, help="Log-normal sigma of latencies")
+    parser.add_argument("--run-step-ms", type=float, default=1500.0, help="Median duration of an assistant run step")
+    parser.add_argument("--completion-tokens", type=int, default=150, help="Median completion tokens of text replies")
+    parser.add_argument("--tokens-sigma", type=float, default=0.5, help="Log-normal sigma of completion tokens")
+    parser.add_argument("--rpm-limit", type=int, default=0, help="Requests per minute before 429 (0 = unlimited)")
+    parser.add_argument("--tpm-limit", type=int, default=0, help="Prompt tokens per minute before 429 (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with HTTP 500")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = FakeConfig(args)
+    if config.seed is not None:
+        random.seed(config.seed)
+
+    print(f"🧪 Fake OpenAI API on http://{args.host}:{args.port}/v1 (median latency {args.latency_ms}ms)")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
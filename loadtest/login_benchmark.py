@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Login password-check benchmark
+
+Runs concurrent bcrypt verifications the way the login endpoints do and
+reports login throughput together with the event-loop lag seen by everything
+else on the worker, measured by a 10 ms ticker running alongside:
+
+- ``inline``: verification called directly in the coroutine (the old handlers)
+- ``thread`` / ``process``: verification on the PasswordHasher pool
+
+Only the password check is exercised (no database or HTTP), which is the
+part of a login that blocks.
+
+Usage:
+    python loadtest/login_benchmark.py --mode inline thread process --logins 200 --concurrency 20
+    python loadtest/login_benchmark.py --mode thread --rounds 10 12 --workers 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.auth.passwords import PasswordHasher  # noqa: E402
+
+
+PASSWORD = "correct horse battery staple"
+TICK_SECONDS = 0.01
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def measure_lag(stop: asyncio.Event, lags: List[float]) -> None:
+    """Record how late a 10 ms timer fires while the logins run"""
+    while not stop.is_set():
+        scheduled = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append(max(0.0, time.perf_counter() - scheduled - TICK_SECONDS))
+
+
+async def run_mode(mode: str, rounds: int, logins: int, concurrency: int, workers: int) -> Dict[str, Any]:
+    """Run ``logins`` verifications with at most ``concurrency`` in flight"""
+    hasher = PasswordHasher(rounds=rounds, max_workers=workers, executor="process" if mode == "process" else "thread")
+    hashed = hasher.hash_sync(PASSWORD)
+    if mode != "inline":
+        # Start the pool before timing
+        await hasher.verify_and_update(PASSWORD, hashed)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    lags: List[float] = []
+
+    async def login() -> None:
+        async with semaphore:
+            started = time.perf_counter()
+            if mode == "inline":
+                valid = hasher.verify_sync(PASSWORD, hashed)
+            else:
+                valid, _ = await hasher.verify_and_update(PASSWORD, hashed)
+            assert valid
+            latencies.append(time.perf_counter() - started)
+
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop, lags))
+    started = time.perf_counter()
+    await asyncio.gather(*[login() for _ in range(logins)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await ticker
+    hasher.shutdown()
+
+    return {
+        "mode": mode,
+        "rounds": rounds,
+        "workers": workers if mode != "inline" else None,
+        "logins": len(latencies),
+        "elapsed_seconds": round(elapsed, 3),
+        "logins_per_second": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "login_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p95": round(percentile(latencies, 95) * 1000, 1),
+        },
+        "loop_lag_ms": {
+            "p50": round(percentile(lags, 50) * 1000, 1),
+            "p95": round(percentile(lags, 95) * 1000, 1),
+            "max": round(max(lags) * 1000, 1) if lags else 0.0,
+        },
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    workers = f", {report['workers']} workers" if report["workers"] else ""
+    print(f"\n🔐 {report['mode']} (bcrypt rounds={report['rounds']}{workers})")
+    print(f"   Logins: {report['logins']} in {report['elapsed_seconds']}s -> {report['logins_per_second']} logins/s")
+    login = report["login_ms"]
+    print(f"   Login ms: mean={login['mean']} p50={login['p50']} p95={login['p95']}")
+    lag = report["loop_lag_ms"]
+    print(f"   Event loop lag ms: p50={lag['p50']} p95={lag['p95']} max={lag['max']}")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark login password checks")
+    parser.add_argument("--mode", nargs="+", choices=["inline", "thread", "process"], default=["inline", "thread"],
+                        help="One or more modes, run one after another")
+    parser.add_argument("--rounds", nargs="+", type=int, default=[12], help="bcrypt cost(s) to compare")
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Pool size")
+    parser.add_argument("--json", action="store_true", help="Print the reports as JSON")
+    args = parser.parse_args()
+
+    reports = [
+        await run_mode(mode, rounds, args.logins, args.concurrency, args.workers)
+        for rounds in args.rounds
+        for mode in args.mode
+    ]
+
+    if args.json:
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+        return
+
+    for report in reports:
+        print_report(report)
+    if len(reports) > 1:
+        print("\n⚖️  Comparison (logins/s, loop lag p95 ms):")
+        for report in reports:
+            print(f"   {report['mode']:<8} rounds={report['rounds']:<3} {report['logins_per_second']:>9} / {report['loop_lag_ms']['p95']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -6,15 +6,151 @@ discover potential corporate sponsors in Kazakhstan. This assistant integrates w
 the database to provide company information and maintains conversation history.
 """
 
+import logging
 import json
 import asyncio
+import hashlib
+import time
 from typing import Dict, List, Optional, Any
-from openai import AsyncOpenAI
+
+import openai
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from ..core.config import get_settings
-from ..companies.service import CompanyService
+from ..core.database import SessionLocal
+from ..core.metrics import metrics
+from ..core.telemetry import llm_telemetry
+from ..core.llm_gateway import create_openai_client, get_llm_gateway
 from .models import ChatResponse, CompanyData
+from .db_models import AssistantRecord
+from .thread_mirror import thread_mirror, missing_messages
+from .tool_executor import get_tool_executor
+
+
+logger = logging.getLogger(__name__)
+
+
+ASSISTANT_NAME = "Charity Fund Discovery Assistant"
+ASSISTANT_MODEL = "gpt-4o"
+
+# Function tools of the assistant; part of the registry key together with the instructions
+ASSISTANT_TOOLS: List[Dict[str, Any]] = [
+    {
+        "type": "function",
+        "function": {
+            "name": "search_companies",
+            "description": "Search for companies in Kazakhstan based on location, industry, or other criteria",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "location": {
+                        "type": "string",
+                        "description": "City or region to search in (e.g., 'Алматы', 'Астана')"
+                    },
+                    "activity_keywords": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Keywords related to company activities or industries"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": "Maximum number of companies to return (default: 10)",
+                        "default": 10
+                    },
+                    "page": {
+                        "type": "integer",
+                        "description": "Page number for pagination (default: 1)",
+                        "default": 1
+                    }
+                },
+                "required": []
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_company_details",
+            "description": "Get detailed information about a specific company",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "company_id": {
+                        "type": "string",
+                        "description": "The unique ID of the company"
+                    }
+                },
+                "required": ["company_id"]
+            }
+        }
+    }
+]
+
+
+# Messages per page when downloading a thread (API maximum)
+THREAD_PAGE_SIZE = 100
+
+# Run stream events after which the run is finished
+RUN_TERMINAL_EVENTS = {
+    "thread.run.completed",
+    "thread.run.failed",
+    "thread.run.cancelled",
+    "thread.run.expired",
+    "thread.run.incomplete",
+}
+
+
+class StreamingUnavailable(Exception):
+    """The SDK or endpoint does not support streaming runs"""
+
+
+def is_streaming_unsupported(error: openai.BadRequestError) -> bool:
+    """Whether a 400 rejects the ``stream`` argument itself (any other 400 is a real error)"""
+    if getattr(error, "param", None) == "stream":
+        return True
+    message = str(getattr(error, "message", "") or error).lower()
+    return "stream" in message and ("unrecognized" in message or "not supported" in message or "unsupported" in message)
+
+
+class RunTimer:
+    """
+    Wall-clock timing of the phases of an assistant run
+    
+    Consecutive marks of the same phase are summed, e.g. "model" covers every
+    stretch the model spent thinking across tool-call rounds.
+    """
+
+    def __init__(self):
+        self._started = time.perf_counter()
+        self._last = self._started
+        self.phases: Dict[str, float] = {}
+        self.tool_rounds = 0
+        self.polls = 0
+
+    def mark(self, phase: str) -> None:
+        """Attribute the time since the previous mark to ``phase``"""
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + (now - self._last) * 1000
+        self._last = now
+        if phase == "tools":
+            self.tool_rounds += 1
+
+    def finish(self) -> Dict[str, Any]:
+        """Timings in milliseconds; also recorded in the metrics registry"""
+        total_ms = (time.perf_counter() - self._started) * 1000
+        metrics.increment("assistant.runs")
+        metrics.increment("assistant.run.total_ms", total_ms)
+        metrics.increment("assistant.run.tool_rounds", self.tool_rounds)
+        metrics.increment("assistant.run.polls", self.polls)
+        for phase, value in self.phases.items():
+            metrics.increment(f"assistant.run.{phase}_ms", value)
+        return {
+            "total_ms": round(total_ms, 1),
+            "phases_ms": {phase: round(value, 1) for phase, value in self.phases.items()},
+            "tool_rounds": self.tool_rounds,
+            "polls": self.polls,
+        }
 
 
 class CharityFundAssistant:
@@ -25,7 +161,12 @@ class CharityFundAssistant:
     
     def __init__(self):
         self.settings = get_settings()
-        self.client = AsyncOpenAI(api_key=self.settings.openai_api_key)
+        self.client = create_openai_client()
+        self.llm_gateway = get_llm_gateway()
+        
+        # Registered assistant of the current configuration (see ensure_assistant)
+        self._assistant_id: Optional[str] = None
+        self._registry_lock = asyncio.Lock()
         
         # Assistant configuration for charity fund discovery
         self.system_instructions = """
@@ -61,81 +202,131 @@ class CharityFundAssistant:
         Returns the assistant ID.
         """
         try:
-            assistant = await self.client.beta.assistants.create(
-                name="Charity Fund Discovery Assistant",
+            assistant = await self.llm_gateway.call(
+                self.client.beta.assistants, "create",
+                name=ASSISTANT_NAME,
                 instructions=self.system_instructions,
-                model="gpt-4o",
-                tools=[
-                    {
-                        "type": "function",
-                        "function": {
-                            "name": "search_companies",
-                            "description": "Search for companies in Kazakhstan based on location, industry, or other criteria",
-                            "parameters": {
-                                "type": "object",
-                                "properties": {
-                                    "location": {
-                                        "type": "string",
-                                        "description": "City or region to search in (e.g., 'Алматы', 'Астана')"
-                                    },
-                                    "activity_keywords": {
-                                        "type": "array",
-                                        "items": {"type": "string"},
-                                        "description": "Keywords related to company activities or industries"
-                                    },
-                                    "limit": {
-                                        "type": "integer",
-                                        "description": "Maximum number of companies to return (default: 10)",
-                                        "default": 10
-                                    },
-                                    "page": {
-                                        "type": "integer",
-                                        "description": "Page number for pagination (default: 1)",
-                                        "default": 1
-                                    }
-                                },
-                                "required": []
-                            }
-                        }
-                    },
-                    {
-                        "type": "function",
-                        "function": {
-                            "name": "get_company_details",
-                            "description": "Get detailed information about a specific company",
-                            "parameters": {
-                                "type": "object",
-                                "properties": {
-                                    "company_id": {
-                                        "type": "string",
-                                        "description": "The unique ID of the company"
-                                    }
-                                },
-                                "required": ["company_id"]
-                            }
-                        }
-                    }
-                ]
+                model=ASSISTANT_MODEL,
+                tools=ASSISTANT_TOOLS
             )
             
-            print(f"✅ Created assistant: {assistant.id}")
+            logger.info("✅ Created assistant: %s", assistant.id)
             return assistant.id
             
         except Exception as e:
-            print(f"❌ Error creating assistant: {str(e)}")
+            logger.error("❌ Error creating assistant: %s", str(e))
             raise
 
+    def config_hash(self) -> str:
+        """Registry key: hash of the instructions, tool schema, model and name"""
+        payload = json.dumps(
+            {
+                "name": ASSISTANT_NAME,
+                "model": ASSISTANT_MODEL,
+                "instructions": self.system_instructions,
+                "tools": ASSISTANT_TOOLS,
+            },
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def ensure_assistant(self, verify: bool = False) -> str:
+        """
+        ID of the shared assistant for the current configuration.
+        
+        Looks the assistant up in the openai_assistants table and creates (and registers) it
+        only when no worker has done so yet, so all requests and workers reuse one assistant.
+        
+        Args:
+            verify: Check that the registered assistant still exists on OpenAI (used at startup)
+        """
+        if self._assistant_id and not verify:
+            return self._assistant_id
+
+        async with self._registry_lock:
+            if self._assistant_id and not verify:
+                return self._assistant_id
+
+            config_hash = self.config_hash()
+            assistant_id = await asyncio.to_thread(self._lookup_registered_assistant, config_hash)
+
+            if assistant_id and verify:
+                try:
+                    await self.llm_gateway.call(self.client.beta.assistants, "retrieve", assistant_id=assistant_id)
+                except openai.NotFoundError:
+                    logger.warning("⚠️ Registered assistant %s no longer exists, creating a new one", assistant_id)
+                    await asyncio.to_thread(self._forget_registered_assistant, assistant_id)
+                    assistant_id = None
+
+            if not assistant_id:
+                created_id = await self.create_assistant()
+                assistant_id = await asyncio.to_thread(self._register_assistant, config_hash, created_id)
+                if assistant_id != created_id:
+                    # Another worker registered its assistant first: drop ours
+                    await self.cleanup_assistant(created_id)
+
+            logger.info("🔑 Using registered assistant: %s", assistant_id)
+            self._assistant_id = assistant_id
+            return assistant_id
+
+    @staticmethod
+    def _lookup_registered_assistant(config_hash: str) -> Optional[str]:
+        db = SessionLocal()
+        try:
+            record = db.query(AssistantRecord).filter(AssistantRecord.config_hash == config_hash).first()
+            return record.assistant_id if record else None
+        finally:
+            db.close()
+
+    @staticmethod
+    def _register_assistant(config_hash: str, assistant_id: str) -> str:
+        """Store the assistant for the configuration; returns the winning ID on a concurrent insert"""
+        db = SessionLocal()
+        try:
+            db.add(AssistantRecord(config_hash=config_hash, assistant_id=assistant_id, model=ASSISTANT_MODEL))
+            db.commit()
+            return assistant_id
+        except IntegrityError:
+            db.rollback()
+            record = db.query(AssistantRecord).filter(AssistantRecord.config_hash == config_hash).first()
+            return record.assistant_id if record else assistant_id
+        finally:
+            db.close()
+
+    @staticmethod
+    def _is_registered_assistant(assistant_id: str) -> bool:
+        db = SessionLocal()
+        try:
+            return db.query(AssistantRecord.config_hash).filter(AssistantRecord.assistant_id == assistant_id).first() is not None
+        finally:
+            db.close()
+
+    async def is_registered_assistant(self, assistant_id: str) -> bool:
+        """Whether the ID is the shared assistant of some configuration (used by every worker)"""
+        return await asyncio.to_thread(self._is_registered_assistant, assistant_id)
+
+    @staticmethod
+    def _forget_registered_assistant(assistant_id: str) -> None:
+        db = SessionLocal()
+        try:
+            db.query(AssistantRecord).filter(AssistantRecord.assistant_id == assistant_id).delete()
+            db.commit()
+        finally:
+            db.close()
+
     async def create_conversation_thread(self) -> str:
         """
         Create a new conversation thread for maintaining history.
         Returns the thread ID.
         """
         try:
-            thread = await self.client.beta.threads.create()
-            print(f"✅ Created conversation thread: {thread.id}")
+            thread = await self.llm_gateway.call(self.client.beta.threads, "create")
+            await asyncio.to_thread(thread_mirror.register, thread.id)
+            logger.info("✅ Created conversation thread: %s", thread.id)
             return thread.id
         except Exception as e:
-            print(f"❌ Error creating thread: {str(e)}")
+            logger.error("❌ Error creating thread: %s", str(e))
             raise
 
     async def add_message_to_thread(self, thread_id: str, message: str, role: str = "user") -> str:
@@ -143,16 +334,53 @@ class CharityFundAssistant:
         Add a message to an existing conversation thread.
         Returns the message ID.
         """
+        message_ids = await self.add_messages_to_thread(thread_id, [{"role": role, "content": message}])
+        return message_ids[0]
+
+    async def add_messages_to_thread(self, thread_id: str, messages: List[Dict[str, str]]) -> List[str]:
+        """
+        Add messages to a thread in order and record them in the thread mirror.
+        Returns the message IDs.
+        """
+        added = []
         try:
-            message_obj = await self.client.beta.threads.messages.create(
-                thread_id=thread_id,
-                role=role,
-                content=message
-            )
-            return message_obj.id
+            for message in messages:
+                message_obj = await self.llm_gateway.call(
+                    self.client.beta.threads.messages, "create",
+                    thread_id=thread_id,
+                    role=message["role"],
+                    content=message["content"]
+                )
+                added.append({"message_id": message_obj.id, "role": message["role"], "content": message["content"]})
+            return [message["message_id"] for message in added]
         except Exception as e:
-            print(f"❌ Error adding message to thread: {str(e)}")
+            logger.error("❌ Error adding message to thread: %s", str(e))
             raise
+        finally:
+            if added:
+                await asyncio.to_thread(thread_mirror.append, thread_id, added)
+
+    async def record_run_reply(self, thread_id: str, response: Dict[str, Any]) -> None:
+        """
+        Record the messages a run added to the thread in the thread mirror.
+        
+        Falls back to fetching only the messages after the last synced id when the
+        run's reply was not captured (e.g. the run failed or was cut short).
+        """
+        if response.get("status") == "completed" and response.get("reply_messages"):
+            await asyncio.to_thread(thread_mirror.append, thread_id, response["reply_messages"])
+            return
+        
+        after = await asyncio.to_thread(thread_mirror.last_message_id, thread_id)
+        if after is None:
+            await asyncio.to_thread(thread_mirror.invalidate, thread_id)
+            return
+        try:
+            new_messages = await self._fetch_thread_messages(thread_id, after=after)
+            await asyncio.to_thread(thread_mirror.append, thread_id, new_messages)
+        except Exception as e:
+            logger.warning("⚠️ Could not catch up thread mirror, dropping it: %s", str(e))
+            await asyncio.to_thread(thread_mirror.invalidate, thread_id)
 
     async def run_assistant_with_tools(
         self, 
@@ -165,204 +393,303 @@ class CharityFundAssistant:
         Run the assistant with function calling capabilities.
         Handles company search and data retrieval from the database.
         Now tracks companies data for context preservation.
+        
+        Uses the streaming runs API so requires_action and completion are handled as soon
+        as they happen; falls back to adaptive polling when streaming is unavailable.
+        Per-run step timings are returned under "timings". Tool calls run
+        concurrently on their own sessions, so ``db`` is not used by the run itself.
+        
+        When the assistant no longer exists on OpenAI, the registered assistant is
+        re-verified (re-created if needed) and the run retried once with it; the ID
+        used is returned under "assistant_id".
         """
         companies_found = []  # Track all companies found during this run
+        timer = RunTimer()
+        instructions = instructions or "Help the user find potential corporate sponsors for their charity fund. Use the provided functions to search for companies and provide detailed information."
         
         try:
-            # Create a run with the assistant
-            run = await self.client.beta.threads.runs.create(
-                thread_id=thread_id,
-                assistant_id=assistant_id,
-                instructions=instructions or "Help the user find potential corporate sponsors for their charity fund. Use the provided functions to search for companies and provide detailed information."
-            )
+            try:
+                result = await self._run(assistant_id, thread_id, instructions, companies_found, timer)
+            except openai.NotFoundError:
+                # Deleted since this worker loaded the ID; a missing thread raises here too
+                current_id = await self.ensure_assistant(verify=True)
+                if current_id == assistant_id:
+                    raise
+                logger.warning("⚠️ Assistant %s not found, retrying the run with %s", assistant_id, current_id)
+                metrics.increment("assistant.run.assistant_replaced")
+                assistant_id = current_id
+                result = await self._run(assistant_id, thread_id, instructions, companies_found, timer)
+            run_status, run_id, reply_messages = result
+            assistant_response = reply_messages[-1]["content"] if reply_messages else ""
             
-            # Poll for completion and handle function calls
-            while run.status in ["queued", "in_progress", "requires_action"]:
-                await asyncio.sleep(1)
-                run = await self.client.beta.threads.runs.retrieve(
-                    thread_id=thread_id,
-                    run_id=run.id
-                )
-                
-                # Handle function calls
-                if run.status == "requires_action":
-                    tool_calls = run.required_action.submit_tool_outputs.tool_calls
-                    tool_outputs = []
-                    
-                    for tool_call in tool_calls:
-                        function_name = tool_call.function.name
-                        function_args = json.loads(tool_call.function.arguments)
-                        
-                        print(f"🔧 Executing function: {function_name} with args: {function_args}")
-                        
-                        # Handle company search
-                        if function_name == "search_companies":
-                            try:
-                                # Create company service with database session
-                                company_service = CompanyService(db)
-                                
-                                # Calculate offset for pagination
-                                page = function_args.get("page", 1)
-                                limit = function_args.get("limit", 10)
-                                offset = (page - 1) * limit
-                                
-                                companies = await company_service.search_companies(
-                                    location=function_args.get("location"),
-                                    activity_keywords=function_args.get("activity_keywords"),
-                                    limit=limit,
-                                    offset=offset
-                                )
-                                
-                                # The search_companies method already returns dictionaries
-                                companies_data = []
-                                for company_dict in companies:
-                                    formatted_company = {
-                                        "id": company_dict.get("id"),
-                                        "name": company_dict.get("Company"),
-                                        "bin": company_dict.get("BIN"),
-                                        "activity": company_dict.get("Activity"),
-                                        "location": company_dict.get("Locality"),
-                                        "oked": company_dict.get("OKED"),
-                                        "size": company_dict.get("Size")
-                                    }
-                                    companies_data.append(formatted_company)
-                                    companies_found.append(formatted_company)  # Track for context
-                                
-                                result = {
-                                    "companies": companies_data,
-                                    "total_found": len(companies_data),
-                                    "search_criteria": function_args,
-                                    "page": page,
-                                    "limit": limit,
-                                    "context": f"Found {len(companies_data)} companies matching your criteria"
-                                }
-                                
-                                tool_outputs.append({
-                                    "tool_call_id": tool_call.id,
-                                    "output": json.dumps(result, ensure_ascii=False)
-                                })
-                                
-                                print(f"✅ Search completed: {len(companies_data)} companies found")
-                                
-                            except Exception as e:
-                                print(f"❌ Error in search_companies: {str(e)}")
-                                error_msg = f"Error searching companies: {str(e)}. Please try with different search criteria."
-                                tool_outputs.append({
-                                    "tool_call_id": tool_call.id,
-                                    "output": error_msg
-                                })
-                        
-                        # Handle company details
-                        elif function_name == "get_company_details":
-                            try:
-                                # Create company service with database session
-                                company_service = CompanyService(db)
-                                
-                                company_id = function_args.get("company_id")
-                                company_dict = await company_service.get_company_by_id(company_id)
-                                
-                                if company_dict:
-                                    company_details = {
-                                        "id": company_dict.get("id"),
-                                        "name": company_dict.get("Company"),
-                                        "bin": company_dict.get("BIN"),
-                                        "activity": company_dict.get("Activity"),
-                                        "location": company_dict.get("Locality"),
-                                        "oked": company_dict.get("OKED"),
-                                        "kato": company_dict.get("KATO"),
-                                        "krp": company_dict.get("KRP"),
-                                        "size": company_dict.get("Size"),
-                                        "context": "Detailed company information retrieved"
-                                    }
-                                    
-                                    companies_found.append(company_details)  # Track for context
-                                    
-                                    tool_outputs.append({
-                                        "tool_call_id": tool_call.id,
-                                        "output": json.dumps(company_details, ensure_ascii=False)
-                                    })
-                                    
-                                    print(f"✅ Company details retrieved for: {company_details.get('name')}")
-                                else:
-                                    tool_outputs.append({
-                                        "tool_call_id": tool_call.id,
-                                        "output": "Company not found. Please check the company ID and try again."
-                                    })
-                                    
-                            except Exception as e:
-                                print(f"❌ Error in get_company_details: {str(e)}")
-                                error_msg = f"Error getting company details: {str(e)}. Please verify the company ID."
-                                tool_outputs.append({
-                                    "tool_call_id": tool_call.id,
-                                    "output": error_msg
-                                })
-                    
-                    # Submit tool outputs
-                    run = await self.client.beta.threads.runs.submit_tool_outputs(
-                        thread_id=thread_id,
-                        run_id=run.id,
-                        tool_outputs=tool_outputs
-                    )
-            
-            # Get the assistant's response
-            messages = await self.client.beta.threads.messages.list(thread_id=thread_id)
-            latest_message = messages.data[0]
-            
-            assistant_response = latest_message.content[0].text.value if latest_message.content else ""
-            
-            print(f"🤖 Assistant completed with status: {run.status}")
-            print(f"📊 Companies processed in this turn: {len(companies_found)}")
+            timings = timer.finish()
+            logger.debug("🤖 Assistant completed with status: %s", run_status)
+            logger.info("⏱️ Run timings: %s", timings)
+            logger.debug("📊 Companies processed in this turn: %s", len(companies_found))
             
             return {
-                "status": run.status,
+                "status": run_status,
                 "message": assistant_response,
                 "companies_data": companies_found,  # Include companies data
-                "run_id": run.id,
-                "companies_found": len(companies_found)
+                "run_id": run_id,
+                "assistant_id": assistant_id,
+                "companies_found": len(companies_found),
+                "reply_messages": reply_messages,
+                "timings": timings
             }
             
         except Exception as e:
-            print(f"❌ Error running assistant: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("❌ Error running assistant: %s", str(e))
             
             return {
                 "status": "error",
                 "message": f"Извините, произошла ошибка при обработке запроса: {str(e)}",
                 "companies_data": companies_found,  # Preserve any companies found before error
                 "run_id": None,
-                "companies_found": len(companies_found)
+                "assistant_id": assistant_id,
+                "companies_found": len(companies_found),
+                "reply_messages": [],
+                "timings": timer.finish()
             }
 
-    async def get_conversation_history(self, thread_id: str) -> List[Dict[str, str]]:
+    async def _run(
+        self,
+        assistant_id: str,
+        thread_id: str,
+        instructions: str,
+        companies_found: List[Dict[str, Any]],
+        timer: "RunTimer"
+    ):
+        """Run over the streaming API, or by polling when streaming is off or unavailable"""
+        if self.settings.assistant_run_streaming:
+            try:
+                return await self._run_streaming(assistant_id, thread_id, instructions, companies_found, timer)
+            except StreamingUnavailable as e:
+                logger.warning("⚠️ Run streaming unavailable, falling back to polling: %s", e)
+        return await self._run_polling(assistant_id, thread_id, instructions, companies_found, timer)
+
+    async def _run_streaming(
+        self,
+        assistant_id: str,
+        thread_id: str,
+        instructions: str,
+        companies_found: List[Dict[str, Any]],
+        timer: "RunTimer"
+    ):
         """
-        Retrieve the conversation history from a thread.
-        Returns a list of messages with role and content.
+        Drive the run over the streaming API
+        
+        Returns:
+            (run status, run id, reply messages as {message_id, role, content})
         """
         try:
-            messages = await self.client.beta.threads.messages.list(
+            stream = await self.llm_gateway.call(
+                self.client.beta.threads.runs, "create",
                 thread_id=thread_id,
-                order="asc"
+                assistant_id=assistant_id,
+                instructions=instructions,
+                stream=True
             )
+        except (TypeError, AttributeError) as e:
+            # SDK without run streaming
+            raise StreamingUnavailable(str(e))
+        except openai.BadRequestError as e:
+            # Endpoint without run streaming; other 400s (e.g. a run already active) are raised
+            if not is_streaming_unsupported(e):
+                raise
+            raise StreamingUnavailable(str(e))
+        timer.mark("create")
+        
+        run_status, run_id, reply_messages = "unknown", None, []
+        while stream is not None:
+            required_run = None
+            async for event in stream:
+                if event.event == "thread.run.in_progress":
+                    timer.mark("queued")
+                elif event.event == "thread.run.requires_action":
+                    required_run = event.data
+                    timer.mark("model")
+                elif event.event == "thread.message.completed":
+                    content = event.data.content
+                    reply_messages.append({
+                        "message_id": event.data.id,
+                        "role": event.data.role,
+                        "content": content[0].text.value if content else ""
+                    })
+                elif event.event in RUN_TERMINAL_EVENTS:
+                    run_status, run_id = event.data.status, event.data.id
+                    timer.mark("model")
+                    llm_telemetry.record_call("assistant.run", None, usage=event.data.usage, model=ASSISTANT_MODEL)
+                elif event.event == "error":
+                    raise RuntimeError(f"Run stream error: {event.data}")
             
-            history = []
-            for message in messages.data:
-                role = message.role
-                content = message.content[0].text.value if message.content else ""
-                history.append({"role": role, "content": content})
+            stream = None
+            if required_run is not None:
+                run_id = required_run.id
+                tool_outputs = await self._execute_tool_calls(
+                    required_run.required_action.submit_tool_outputs.tool_calls, companies_found
+                )
+                timer.mark("tools")
+                stream = await self.llm_gateway.call(
+                    self.client.beta.threads.runs, "submit_tool_outputs",
+                    thread_id=thread_id,
+                    run_id=required_run.id,
+                    tool_outputs=tool_outputs,
+                    stream=True
+                )
+                timer.mark("submit")
+        
+        return run_status, run_id, reply_messages
+
+    async def _run_polling(
+        self,
+        assistant_id: str,
+        thread_id: str,
+        instructions: str,
+        companies_found: List[Dict[str, Any]],
+        timer: "RunTimer"
+    ):
+        """
+        Drive the run by polling runs.retrieve with adaptive backoff
+        
+        The delay starts at ASSISTANT_POLL_INITIAL_MS and grows by ASSISTANT_POLL_BACKOFF
+        up to ASSISTANT_POLL_MAX_MS; it starts over after every tool-call round.
+        
+        Returns:
+            (run status, run id, reply messages as {message_id, role, content})
+        """
+        initial_delay = self.settings.assistant_poll_initial_ms / 1000
+        max_delay = self.settings.assistant_poll_max_ms / 1000
+        backoff = self.settings.assistant_poll_backoff
+        
+        # Create a run with the assistant
+        run = await self.llm_gateway.call(
+            self.client.beta.threads.runs, "create",
+            thread_id=thread_id,
+            assistant_id=assistant_id,
+            instructions=instructions
+        )
+        timer.mark("create")
+        
+        # Poll for completion and handle function calls
+        delay = initial_delay
+        while run.status in ["queued", "in_progress", "requires_action"]:
+            if run.status != "requires_action":
+                await asyncio.sleep(delay)
+                delay = min(delay * backoff, max_delay)
+                run = await self.llm_gateway.call(
+                    self.client.beta.threads.runs, "retrieve",
+                    thread_id=thread_id,
+                    run_id=run.id
+                )
+                timer.polls += 1
             
-            print(f"📚 Retrieved {len(history)} messages from thread {thread_id}")
+            # Handle function calls
+            if run.status == "requires_action":
+                timer.mark("model")
+                tool_outputs = await self._execute_tool_calls(
+                    run.required_action.submit_tool_outputs.tool_calls, companies_found
+                )
+                timer.mark("tools")
+                
+                # Submit tool outputs
+                run = await self.llm_gateway.call(
+                    self.client.beta.threads.runs, "submit_tool_outputs",
+                    thread_id=thread_id,
+                    run_id=run.id,
+                    tool_outputs=tool_outputs
+                )
+                timer.mark("submit")
+                delay = initial_delay
+        timer.mark("model")
+        llm_telemetry.record_call("assistant.run", None, usage=getattr(run, "usage", None), model=ASSISTANT_MODEL)
+        
+        # Get every message the run added, oldest first (a run can add several)
+        messages = await self.llm_gateway.call(
+            self.client.beta.threads.messages, "list",
+            thread_id=thread_id, run_id=run.id, order="asc", limit=100
+        )
+        timer.mark("fetch_message")
+        
+        reply_messages = [
+            {
+                "message_id": message.id,
+                "role": message.role,
+                "content": message.content[0].text.value if message.content else ""
+            }
+            for message in messages.data
+            if message.role == "assistant"
+        ]
+        return run.status, run.id, reply_messages
+
+    async def _execute_tool_calls(
+        self,
+        tool_calls: List[Any],
+        companies_found: List[Dict[str, Any]]
+    ) -> List[Dict[str, str]]:
+        """Run the requested functions concurrently and build the tool outputs to submit together"""
+        tool_outputs, companies = await get_tool_executor().execute([
+            {"id": tool_call.id, "name": tool_call.function.name, "arguments": tool_call.function.arguments}
+            for tool_call in tool_calls
+        ])
+        companies_found.extend(companies)  # Track for context
+        return tool_outputs
+
+    async def get_conversation_history(self, thread_id: str) -> List[Dict[str, str]]:
+        """
+        Retrieve the conversation history from a thread.
+        Returns a list of messages with role and content.
+        
+        Served from the thread mirror; a thread that is not mirrored yet is
+        downloaded (all pages) once and mirrored.
+        """
+        try:
+            mirrored = await self._load_mirrored_thread(thread_id)
+            history = [{"role": message["role"], "content": message["content"]} for message in mirrored]
+            logger.info("📚 Retrieved %s messages from thread %s", len(history), thread_id)
             return history
             
         except Exception as e:
-            print(f"❌ Error getting conversation history: {str(e)}")
+            logger.error("❌ Error getting conversation history: %s", str(e))
             return []
 
+    async def _load_mirrored_thread(self, thread_id: str) -> List[Dict[str, Any]]:
+        """Mirrored thread messages, downloading and mirroring the thread on a miss"""
+        mirrored = await asyncio.to_thread(thread_mirror.load, thread_id)
+        if mirrored is not None:
+            return mirrored
+        
+        messages = await self._fetch_thread_messages(thread_id)
+        await asyncio.to_thread(thread_mirror.replace, thread_id, messages)
+        logger.info("🪞 Mirrored thread %s (%s messages)", thread_id, len(messages))
+        return await asyncio.to_thread(thread_mirror.load, thread_id) or []
+
+    async def _fetch_thread_messages(self, thread_id: str, after: Optional[str] = None) -> List[Dict[str, str]]:
+        """Download thread messages in thread order, following pagination"""
+        messages = []
+        while True:
+            params = {"thread_id": thread_id, "order": "asc", "limit": THREAD_PAGE_SIZE}
+            if after:
+                params["after"] = after
+            page = await self.llm_gateway.call(self.client.beta.threads.messages, "list", **params)
+            for message in page.data:
+                messages.append({
+                    "message_id": message.id,
+                    "role": message.role,
+                    "content": message.content[0].text.value if message.content else ""
+                })
+            if not page.has_more or not page.data:
+                return messages
+            after = page.data[-1].id
+
     async def sync_history_with_thread(self, thread_id: str, external_history: List[Dict[str, str]]) -> str:
         """
         Synchronize external conversation history with the OpenAI thread.
         This ensures context is preserved when switching between systems.
         
+        The history is diffed against the thread mirror by content hash and
+        only the missing messages are added.
+        
         Args:
             thread_id: The OpenAI thread ID
             external_history: History from the external system
@@ -371,48 +698,36 @@ class CharityFundAssistant:
             Updated thread ID (same as input)
         """
         try:
-            # Get current thread history
-            current_history = await self.get_conversation_history(thread_id)
+            mirrored = await self._load_mirrored_thread(thread_id)
+            delta = missing_messages(mirrored, external_history)
             
-            # Find messages that exist in external_history but not in thread
-            missing_messages = []
-            for ext_msg in external_history:
-                # Check if this message exists in current thread history
-                found = False
-                for curr_msg in current_history:
-                    if (curr_msg.get("role") == ext_msg.get("role") and 
-                        curr_msg.get("content") == ext_msg.get("content")):
-                        found = True
-                        break
-                
-                if not found:
-                    missing_messages.append(ext_msg)
-            
-            # Add missing messages to thread
-            for msg in missing_messages:
-                role = msg.get("role", "user")
-                content = msg.get("content", "")
-                
-                if role and content:
-                    await self.add_message_to_thread(thread_id, content, role)
-                    print(f"🔄 Added missing message to thread: {role} - {content[:50]}...")
+            if delta:
+                await self.add_messages_to_thread(thread_id, delta)
+                for msg in delta:
+                    logger.debug("🔄 Added missing message to thread: %s - %s...", msg['role'], msg['content'][:50])
             
-            print(f"✅ Synchronized {len(missing_messages)} missing messages with thread")
+            logger.info("✅ Synchronized %s missing messages with thread", len(delta))
             return thread_id
             
         except Exception as e:
-            print(f"❌ Error synchronizing history with thread: {str(e)}")
+            logger.error("❌ Error synchronizing history with thread: %s", str(e))
             return thread_id
 
     async def cleanup_assistant(self, assistant_id: str):
         """
         Delete an assistant when no longer needed.
+        
+        Its registry row is always dropped, so no worker looks the deleted ID up again;
+        workers that already loaded it recover on the next run (see run_assistant_with_tools).
         """
         try:
-            await self.client.beta.assistants.delete(assistant_id)
-            print(f"✅ Deleted assistant: {assistant_id}")
+            await self.llm_gateway.call(self.client.beta.assistants, "delete", assistant_id=assistant_id)
+            logger.info("✅ Deleted assistant: %s", assistant_id)
+            await asyncio.to_thread(self._forget_registered_assistant, assistant_id)
+            if assistant_id == self._assistant_id:
+                self._assistant_id = None
         except Exception as e:
-            print(f"❌ Error deleting assistant: {str(e)}")
+            logger.error("❌ Error deleting assistant: %s", str(e))
 
 
 # Global assistant instance
@@ -421,10 +736,10 @@ charity_assistant = CharityFundAssistant()
 
 async def create_charity_fund_assistant() -> str:
     """
-    Convenience function to create a new charity fund discovery assistant.
-    Returns the assistant ID.
+    Convenience function to get the charity fund discovery assistant.
+    Returns the ID of the registered assistant, creating it only if none exists yet.
     """
-    return await charity_assistant.create_assistant()
+    return await charity_assistant.ensure_assistant()
 
 
 async def start_conversation(assistant_id: str, initial_message: str, db: Session) -> Dict[str, Any]:
@@ -445,6 +760,7 @@ async def start_conversation(assistant_id: str, initial_message: str, db: Sessio
             thread_id=thread_id,
             db=db
         )
+        await charity_assistant.record_run_reply(thread_id, response)
         
         return {
             "thread_id": thread_id,
@@ -453,7 +769,7 @@ async def start_conversation(assistant_id: str, initial_message: str, db: Sessio
         }
         
     except Exception as e:
-        print(f"❌ Error starting conversation: {str(e)}")
+        logger.error("❌ Error starting conversation: %s", str(e))
         return {
             "thread_id": None,
             "response": f"Error starting conversation: {str(e)}",
@@ -497,7 +813,8 @@ async def continue_conversation(
             db=db
         )
         
-        # Get updated conversation history
+        # Updated conversation history from the thread mirror
+        await charity_assistant.record_run_reply(thread_id, response)
         updated_history = await charity_assistant.get_conversation_history(thread_id)
         
         return {
@@ -508,9 +825,7 @@ async def continue_conversation(
         }
         
     except Exception as e:
-        print(f"❌ Error continuing conversation: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Error continuing conversation: %s", str(e))
         
         # Fallback: preserve context even on error
         fallback_history = external_history.copy() if external_history else []
@@ -547,33 +862,32 @@ async def handle_conversation_with_context(
         Complete conversation response with preserved context
     """
     try:
-        print(f"🎯 Starting context-aware conversation with {len(conversation_history)} history items")
+        logger.info("🎯 Starting context-aware conversation with %s history items", len(conversation_history))
         
-        # Create assistant if not provided
+        # Use the registered assistant if none was provided
         if not assistant_id:
-            print("📝 Creating new assistant...")
-            assistant_id = await charity_assistant.create_assistant()
+            assistant_id = await charity_assistant.ensure_assistant()
         
         # Create or use existing thread
         if not thread_id:
-            print("🧵 Creating new conversation thread...")
+            logger.info("🧵 Creating new conversation thread...")
             thread_id = await charity_assistant.create_conversation_thread()
             
             # Add all history to the new thread
             if conversation_history:
-                print(f"📚 Adding {len(conversation_history)} history items to thread...")
-                for msg in conversation_history:
-                    role = msg.get("role", "user")
-                    content = msg.get("content", "")
-                    if role and content:
-                        await charity_assistant.add_message_to_thread(thread_id, content, role)
+                logger.info("📚 Adding %s history items to thread...", len(conversation_history))
+                await charity_assistant.add_messages_to_thread(thread_id, [
+                    {"role": msg.get("role"), "content": msg.get("content")}
+                    for msg in conversation_history
+                    if msg.get("role") and msg.get("content")
+                ])
         else:
             # Sync existing thread with provided history
-            print(f"🔄 Syncing existing thread with {len(conversation_history)} history items...")
+            logger.info("🔄 Syncing existing thread with %s history items...", len(conversation_history))
             await charity_assistant.sync_history_with_thread(thread_id, conversation_history)
         
         # Add new user message and run assistant
-        print("💬 Processing new user message...")
+        logger.debug("💬 Processing new user message...")
         await charity_assistant.add_message_to_thread(thread_id, user_input, "user")
         
         response = await charity_assistant.run_assistant_with_tools(
@@ -582,8 +896,10 @@ async def handle_conversation_with_context(
             db=db,
             instructions=f"Previous conversation context: {len(conversation_history)} messages. Continue the conversation naturally."
         )
+        assistant_id = response.get("assistant_id", assistant_id)
         
-        # Get complete updated history
+        # Complete updated history from the thread mirror (no re-download)
+        await charity_assistant.record_run_reply(thread_id, response)
         updated_history = await charity_assistant.get_conversation_history(thread_id)
         
         # Extract companies data from the response if any
@@ -592,7 +908,7 @@ async def handle_conversation_with_context(
             # This could be enhanced to parse actual company data from function calls
             pass
         
-        print(f"✅ Context-aware conversation completed with {len(updated_history)} total history items")
+        logger.info("✅ Context-aware conversation completed with %s total history items", len(updated_history))
         
         return {
             "message": response["message"],
@@ -607,9 +923,7 @@ async def handle_conversation_with_context(
         }
         
     except Exception as e:
-        print(f"❌ Error in context-aware conversation: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Error in context-aware conversation: %s", str(e))
         
         # Preserve context even on error
         error_history = conversation_history.copy()
@@ -0,0 +1,67 @@
+"""
+SQLAlchemy models for AI conversation infrastructure
+
+Defines the database schema for OpenAI resources shared by all workers.
+"""
+
+from sqlalchemy import Column, String, DateTime, Integer, Text, UniqueConstraint
+from sqlalchemy.sql import func
+
+from ..core.database import Base
+
+
+class AssistantRecord(Base):
+    """OpenAI assistant created for a given configuration (instructions, tools, model)"""
+    
+    __tablename__ = "openai_assistants"
+    
+    # sha256 of the assistant configuration; a changed prompt or tool schema gets a new assistant
+    config_hash = Column(String(64), primary_key=True)
+    assistant_id = Column(String(64), nullable=False)
+    model = Column(String(50))
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<AssistantRecord(assistant_id='{self.assistant_id}', config_hash='{self.config_hash[:12]}')>"
+
+
+class ThreadRecord(Base):
+    """Sync state of a locally mirrored OpenAI thread"""
+    
+    __tablename__ = "openai_threads"
+    
+    thread_id = Column(String(64), primary_key=True)
+    # Newest thread message known to the mirror; later messages are fetched with ``after``
+    last_message_id = Column(String(64))
+    message_count = Column(Integer, nullable=False, default=0)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    synced_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    
+    def __repr__(self):
+        return f"<ThreadRecord(thread_id='{self.thread_id}', messages={self.message_count})>"
+
+
+class ThreadMessageRecord(Base):
+    """Message of a mirrored OpenAI thread, in thread order"""
+    
+    __tablename__ = "openai_thread_messages"
+    __table_args__ = (UniqueConstraint("thread_id", "seq", name="uq_openai_thread_messages_thread_seq"),)
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    thread_id = Column(String(64), nullable=False, index=True)
+    seq = Column(Integer, nullable=False)
+    message_id = Column(String(64))
+    role = Column(String(20), nullable=False)
+    content = Column(Text, nullable=False)
+    # sha256 of role + content, used to diff external histories against the thread
+    content_hash = Column(String(64), nullable=False)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    
+    def __repr__(self):
+        return f"<ThreadMessageRecord(thread_id='{self.thread_id}', seq={self.seq}, role='{self.role}')>"
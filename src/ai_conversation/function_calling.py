@@ -0,0 +1,189 @@
+"""
+Chat-completions function-calling engine
+
+Alternative to the Assistants API engine behind the same ChatResponse
+contract. The conversation history stays with the client (or the funds
+conversation store) instead of an OpenAI thread, so a turn is one
+chat.completions call per model step plus the tool calls in between,
+instead of thread create, message adds, run create/poll, tool submit and
+message/history downloads.
+
+Uses the assistant's instructions and tool schema, the shared history
+compactor and the concurrent tool executor.
+"""
+
+import logging
+import json
+import time
+from typing import Optional, Dict, Any, List
+
+from ..core.config import get_settings
+from ..core.llm_gateway import get_llm_gateway
+from ..core.metrics import metrics
+from .assistant_creator import charity_assistant, ASSISTANT_MODEL, ASSISTANT_TOOLS
+from .service import ai_service
+from .tool_executor import get_tool_executor
+
+
+logger = logging.getLogger(__name__)
+
+
+ERROR_MESSAGE = "Извините, произошла техническая ошибка. Ваш контекст разговора сохранен, попробуйте переформулировать вопрос."
+TOOL_ROUNDS_EXCEEDED_MESSAGE = "Извините, не удалось завершить поиск. Попробуйте уточнить запрос."
+
+
+def to_company_data(company: Dict[str, Any]) -> Dict[str, Any]:
+    """Tool-call company dict in the CompanyData shape"""
+    company_id = company.get("id")
+    return {
+        "id": str(company_id) if company_id is not None else None,
+        "name": company.get("name") or "",
+        "bin": company.get("bin"),
+        "activity": company.get("activity"),
+        "locality": company.get("location"),
+        "oked": company.get("oked"),
+        "kato": company.get("kato"),
+        "krp": company.get("krp"),
+        "size": company.get("size"),
+    }
+
+
+class FunctionCallingEngine:
+    """
+    search_companies / get_company_details tool loop over chat.completions
+
+    Example:
+        >>> response = await get_function_calling_engine().handle_turn("Найди IT компании в Алматы", history=[])
+        >>> response["companies_found"]
+        10
+    """
+
+    def __init__(self, model: str = ASSISTANT_MODEL, max_tool_rounds: int = 4):
+        self.model = model
+        self.max_tool_rounds = max_tool_rounds
+        self.client = ai_service.client
+        self.llm_gateway = get_llm_gateway()
+
+    async def handle_turn(self, user_input: str, history: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Handle one conversation turn
+
+        Args:
+            user_input: The user's message
+            history: Previous conversation history (role/content)
+
+        Returns:
+            Response dict with the same keys as handle_conversation_with_context
+        """
+        started = time.perf_counter()
+        updated_history = history + [{"role": "user", "content": user_input}]
+        companies: List[Dict[str, Any]] = []
+        has_more = False
+
+        try:
+            system_prompt = charity_assistant.system_instructions
+            window, _ = await ai_service.history_compactor.compact(updated_history, system_prompt)
+            messages: List[Dict[str, Any]] = [{"role": "system", "content": system_prompt}] + window
+
+            message = None
+            for _ in range(self.max_tool_rounds + 1):
+                completion = await self.llm_gateway.call(
+                    self.client.chat.completions, "create",
+                    label="completions_engine",
+                    model=self.model,
+                    messages=messages,
+                    tools=ASSISTANT_TOOLS,
+                    tool_choice="auto",
+                    temperature=0.3
+                )
+                message = completion.choices[0].message
+                if not message.tool_calls:
+                    break
+
+                messages.append({
+                    "role": "assistant",
+                    "content": message.content,
+                    "tool_calls": [
+                        {
+                            "id": call.id,
+                            "type": "function",
+                            "function": {"name": call.function.name, "arguments": call.function.arguments},
+                        }
+                        for call in message.tool_calls
+                    ],
+                })
+                tool_outputs, found = await get_tool_executor().execute([
+                    {"id": call.id, "name": call.function.name, "arguments": call.function.arguments}
+                    for call in message.tool_calls
+                ])
+                companies.extend(found)
+                has_more = has_more or self._has_more_results(tool_outputs)
+                messages.extend(
+                    {"role": "tool", "tool_call_id": output["tool_call_id"], "content": output["output"]}
+                    for output in tool_outputs
+                )
+            else:
+                logger.warning("⚠️ [COMPLETIONS_ENGINE] Tool loop stopped after %s rounds", self.max_tool_rounds)
+                message = None
+
+            reply = (message.content if message is not None else None) or TOOL_ROUNDS_EXCEEDED_MESSAGE
+            status = "completed"
+
+        except Exception as e:
+            logger.exception("❌ [COMPLETIONS_ENGINE] Error handling turn: %s", str(e))
+            reply = ERROR_MESSAGE
+            status = "error"
+
+        updated_history.append({"role": "assistant", "content": reply})
+        companies_data = [to_company_data(company) for company in companies]
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        metrics.increment("completions_engine.turns")
+        metrics.increment("completions_engine.turn_ms", elapsed_ms)
+        logger.info("✅ [COMPLETIONS_ENGINE] Turn completed in %.0fms with %s companies", elapsed_ms, len(companies_data))
+
+        return {
+            "message": reply,
+            "updated_history": updated_history,
+            "companies_data": companies_data,
+            "intent": "error" if status == "error" else ("find_companies" if companies_data else "general_question"),
+            "assistant_id": None,
+            "thread_id": None,
+            "status": status,
+            "companies_found": len(companies_data),
+            "has_more_companies": has_more
+        }
+
+    @staticmethod
+    def _has_more_results(tool_outputs: List[Dict[str, str]]) -> bool:
+        """Whether a search returned a full page, i.e. more results are likely"""
+        for output in tool_outputs:
+            try:
+                result = json.loads(output["output"])
+            except (ValueError, TypeError):
+                continue
+            if isinstance(result, dict) and "companies" in result and result.get("total_found", 0) >= result.get("limit", 0) > 0:
+                return True
+        return False
+
+
+_engine: Optional[FunctionCallingEngine] = None
+
+
+def get_function_calling_engine() -> FunctionCallingEngine:
+    """Process-wide engine built from settings"""
+    global _engine
+    if _engine is None:
+        _engine = FunctionCallingEngine(max_tool_rounds=get_settings().completions_max_tool_rounds)
+    return _engine
+
+
+async def handle_conversation_with_completions(
+    user_input: str,
+    conversation_history: List[Dict[str, str]]
+) -> Dict[str, Any]:
+    """
+    Handle a conversation turn with the chat-completions engine.
+    Counterpart of handle_conversation_with_context without an OpenAI thread.
+    """
+    return await get_function_calling_engine().handle_turn(user_input, conversation_history)
@@ -0,0 +1,260 @@
+"""
+Token-budgeted history windowing for LLM calls
+
+Keeps the last K conversation turns verbatim, folds everything older into a
+rolling summary and enforces a token budget on the messages sent to OpenAI,
+so per-turn cost stays flat instead of growing with conversation length.
+
+Older turns are folded in chunks of HISTORY_SUMMARY_CHUNK_TURNS: the folded
+prefix only changes every N turns, and the turns in between stay verbatim,
+so a summary call runs once per chunk instead of before every intent parse.
+Summaries are cached by a hash of the folded prefix, in memory and in the
+shared summary cache when given, so other workers reuse them; a new
+chunk is summarized on top of the cached summary of the shorter prefix.
+"""
+
+import logging
+import hashlib
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
+
+from ..core.llm_gateway import get_llm_gateway
+from .intent_cache import IntentParseCache
+
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:
+    # tiktoken is optional; fall back to a character-based estimate
+    _ENCODING = None
+
+
+# Fixed per-message overhead of the chat format (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = """
+Ты сжимаешь историю диалога ассистента по поиску компаний-спонсоров в Казахстане.
+Перескажи диалог кратко (не более 120 слов) на русском языке.
+ОБЯЗАТЕЛЬНО сохрани последние параметры поиска пользователя: город, отрасль (ключевые слова),
+количество компаний и сколько раз пользователь просил "еще". Не добавляй ничего от себя.
+"""
+
+
+def estimate_tokens(text: str) -> int:
+    """Token count of ``text`` (exact with tiktoken, estimated otherwise)"""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    # Cyrillic text averages ~3 characters per token
+    return len(text) // 3 + 1
+
+
+def estimate_messages_tokens(messages: List[Dict[str, str]]) -> int:
+    """Token count of a chat messages list including per-message overhead"""
+    return sum(estimate_tokens(m.get("content", "")) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+class HistoryCompactor:
+    """
+    Builds the message window sent to the LLM for a conversation history.
+
+    Example:
+        >>> compactor = HistoryCompactor(client, keep_last_turns=6, token_budget=6000)
+        >>> messages, stats = await compactor.compact(history, system_prompt)
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        keep_last_turns: int = 6,
+        token_budget: int = 6000,
+        summary_model: str = "gpt-4o-mini",
+        max_assistant_chars: int = 400,
+        cache_size: int = 512,
+        summary_chunk_turns: int = 4,
+        shared_cache: Optional[IntentParseCache] = None
+    ):
+        self.client = client
+        self.keep_last_turns = keep_last_turns
+        self.summary_chunk_turns = max(summary_chunk_turns, 1)
+        self.shared_cache = shared_cache
+        self.token_budget = token_budget
+        self.summary_model = summary_model
+        self.max_assistant_chars = max_assistant_chars
+        self.cache_size = cache_size
+        self._summary_cache: "OrderedDict[str, str]" = OrderedDict()
+
+    async def compact(
+        self,
+        history: List[Dict[str, str]],
+        system_prompt: str = ""
+    ) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """
+        Compact ``history`` (ending with the current user message)
+
+        Returns:
+            (messages to send after the system prompt, stats) where stats holds
+            the token counts before and after compaction
+        """
+        original_tokens = estimate_tokens(system_prompt) + estimate_messages_tokens(history)
+        stats = {
+            "original_messages": len(history),
+            "original_tokens": original_tokens,
+            "summarized_messages": 0,
+            "summary_cache_hit": None,
+        }
+
+        split_index = self._window_start(history)
+        older, recent = history[:split_index], list(history[split_index:])
+
+        messages: List[Dict[str, str]] = []
+        if older:
+            summary, cache_hit = await self._rolling_summary(older)
+            stats["summarized_messages"] = len(older)
+            stats["summary_cache_hit"] = cache_hit
+            messages.append({
+                "role": "system",
+                "content": f"Краткое содержание предыдущей части диалога: {summary}"
+            })
+
+        messages.extend(recent)
+        messages = self._enforce_budget(messages, estimate_tokens(system_prompt))
+
+        stats["messages"] = len(messages)
+        stats["tokens"] = estimate_tokens(system_prompt) + estimate_messages_tokens(messages)
+        return messages, stats
+
+    def _window_start(self, history: List[Dict[str, str]]) -> int:
+        """
+        Index of the first verbatim message: at least the last ``keep_last_turns``
+        user turns are kept, and older turns are folded in whole chunks of
+        ``summary_chunk_turns``
+        """
+        user_indexes = [index for index, message in enumerate(history) if message.get("role") == "user"]
+        foldable_turns = len(user_indexes) - self.keep_last_turns
+        if foldable_turns <= 0:
+            return 0
+        folded_turns = foldable_turns - foldable_turns % self.summary_chunk_turns
+        return user_indexes[folded_turns] if folded_turns else 0
+
+    def _enforce_budget(self, messages: List[Dict[str, str]], system_tokens: int) -> List[Dict[str, str]]:
+        """Shorten long assistant replies, then drop the oldest messages until under budget"""
+        if system_tokens + estimate_messages_tokens(messages) <= self.token_budget:
+            return messages
+
+        # Assistant replies are mostly company listings that carry no search parameters
+        messages = [
+            {**m, "content": m["content"][:self.max_assistant_chars] + "..."}
+            if m.get("role") == "assistant" and len(m.get("content", "")) > self.max_assistant_chars
+            else m
+            for m in messages
+        ]
+
+        # Always keep the current user message (last) and the summary (first, if any)
+        keep_head = 1 if messages and messages[0].get("role") == "system" else 0
+        while (
+            system_tokens + estimate_messages_tokens(messages) > self.token_budget
+            and len(messages) > keep_head + 1
+        ):
+            del messages[keep_head]
+        return messages
+
+    async def _rolling_summary(self, older: List[Dict[str, str]]) -> Tuple[str, bool]:
+        """
+        Summary of ``older``, reusing the cached summary of its longest known prefix
+
+        Returns:
+            (summary text, whether the full prefix was already cached)
+        """
+        prefix_hashes = self._prefix_hashes(older)
+        full_key = prefix_hashes[-1]
+        if full_key in self._summary_cache:
+            self._summary_cache.move_to_end(full_key)
+            return self._summary_cache[full_key], True
+        if self.shared_cache is not None:
+            shared = await self.shared_cache.get(self._shared_key(full_key))
+            if shared and shared.get("summary"):
+                self._remember(full_key, shared["summary"])
+                return shared["summary"], True
+
+        previous_summary = ""
+        start = 0
+        for length in range(len(older) - 1, 0, -1):
+            cached = self._summary_cache.get(prefix_hashes[length - 1])
+            if cached is not None:
+                previous_summary, start = cached, length
+                break
+
+        summary = await self._summarize(previous_summary, older[start:])
+        self._remember(full_key, summary)
+        if self.shared_cache is not None:
+            await self.shared_cache.set(self._shared_key(full_key), {"summary": summary})
+        return summary, False
+
+    def _remember(self, key: str, summary: str) -> None:
+        self._summary_cache[key] = summary
+        self._summary_cache.move_to_end(key)
+        while len(self._summary_cache) > self.cache_size:
+            self._summary_cache.popitem(last=False)
+
+    @staticmethod
+    def _shared_key(prefix_hash: str) -> str:
+        """Key in the shared cache, apart from the intent parse keys"""
+        return f"history_summary:{prefix_hash}"
+
+    @staticmethod
+    def _prefix_hashes(messages: List[Dict[str, str]]) -> List[str]:
+        """Chained hash for every prefix length (index i covers messages[:i + 1])"""
+        hashes = []
+        running = hashlib.sha256()
+        for message in messages:
+            running.update(message.get("role", "").encode("utf-8") + b"\x00")
+            running.update(message.get("content", "").encode("utf-8") + b"\x01")
+            hashes.append(running.copy().hexdigest())
+        return hashes
+
+    async def _summarize(self, previous_summary: str, messages: List[Dict[str, str]]) -> str:
+        """Fold ``messages`` into ``previous_summary`` with a small model"""
+        transcript = "\n".join(
+            f"{m.get('role')}: {m.get('content', '')[:self.max_assistant_chars]}" for m in messages
+        )
+        if previous_summary:
+            transcript = f"Предыдущее краткое содержание: {previous_summary}\n\nНовые сообщения:\n{transcript}"
+
+        try:
+            response = await get_llm_gateway().call(
+                self.client.chat.completions,
+                "create",
+                label="history_summary",
+                coalesce=True,
+                model=self.summary_model,
+                messages=[
+                    {"role": "system", "content": SUMMARY_PROMPT},
+                    {"role": "user", "content": transcript}
+                ],
+                temperature=0.0,
+                max_tokens=300
+            )
+            usage = getattr(response, "usage", None)
+            if usage:
+                logger.debug(
+                    "🧮 [HISTORY] Summary call tokens: prompt=%s, completion=%s",
+                    usage.prompt_tokens, usage.completion_tokens
+                )
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            logger.warning("⚠️ [HISTORY] Summarization failed, using extractive summary: %s", e)
+            return self._extractive_summary(previous_summary, messages)
+
+    @staticmethod
+    def _extractive_summary(previous_summary: str, messages: List[Dict[str, str]]) -> str:
+        """LLM-free fallback: keep the user's requests, which hold the search parameters"""
+        requests = [m.get("content", "")[:200] for m in messages if m.get("role") == "user"]
+        parts = [previous_summary] if previous_summary else []
+        if requests:
+            parts.append("Запросы пользователя: " + " | ".join(requests[-8:]))
+        return " ".join(parts)
@@ -0,0 +1,182 @@
+"""
+Persistent cache for LLM intent parses
+
+The intent parse runs at temperature 0, so identical message windows yield
+identical results. This cache sits in front of the OpenAI call, keyed on a
+hash of the normalized history window, with an in-process LRU layer backed
+by a SQLite file shared by all workers on the host.
+
+Other shared results (history summaries) use their own instance with a
+separate ``table`` and ``metric_prefix``, so they neither take the intent
+parses' room nor count towards their hit rate.
+"""
+
+import logging
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List, Tuple
+
+from ..core.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+class IntentParseCache:
+    """
+    Two-level (memory + SQLite) TTL cache for intent parse results
+
+    Example:
+        >>> key = IntentParseCache.make_key(messages, model="gpt-4o", prompt=system_prompt)
+        >>> cached = await intent_cache.get(key)
+    """
+
+    _TABLE_NAME = re.compile(r"^[a-z_]+$")
+
+    # Prune the disk table every N writes
+    PRUNE_INTERVAL = 100
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_seconds: int = 86400,
+        max_entries: int = 2048,
+        max_disk_entries: int = 50000,
+        table: str = "intent_cache",
+        metric_prefix: str = "intent.cache"
+    ):
+        if not self._TABLE_NAME.match(table):
+            raise ValueError(f"Invalid cache table name: {table}")
+        self.path = path
+        self.table = table
+        self.metric_prefix = metric_prefix
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._writes = 0
+
+        if self.path:
+            try:
+                self._init_disk()
+            except Exception as e:
+                logger.warning("⚠️ [INTENT_CACHE] Disk cache disabled, could not open %s: %s", self.path, e)
+                self.path = None
+
+    @staticmethod
+    def make_key(messages: List[Dict[str, str]], model: str, prompt: str = "") -> str:
+        """
+        Hash of the normalized message window, model and system prompt
+
+        Case and whitespace differences in message content map to the same key.
+        """
+        normalized = [
+            [m.get("role", ""), _WHITESPACE.sub(" ", m.get("content", "")).strip().lower()]
+            for m in messages
+        ]
+        payload = json.dumps(
+            [model, hashlib.sha256(prompt.encode("utf-8")).hexdigest(), normalized],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached result for ``key`` or None; counts memory/disk hits and misses"""
+        now = time.time()
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                metrics.increment(f"{self.metric_prefix}.memory_hits")
+                return dict(value)
+            del self._memory[key]
+
+        if self.path:
+            try:
+                row = await asyncio.to_thread(self._disk_get, key, now)
+            except Exception as e:
+                logger.warning("⚠️ [INTENT_CACHE] Disk read failed: %s", e)
+                row = None
+            if row is not None:
+                expires_at, value = row
+                self._remember(key, value, expires_at)
+                metrics.increment(f"{self.metric_prefix}.disk_hits")
+                return dict(value)
+
+        metrics.increment(f"{self.metric_prefix}.misses")
+        return None
+
+    async def set(self, key: str, value: Dict[str, Any]) -> None:
+        """Store ``value`` in memory and on disk for ``ttl_seconds``"""
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(key, value, expires_at)
+
+        if self.path:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_INTERVAL == 0
+            try:
+                await asyncio.to_thread(self._disk_set, key, value, expires_at, prune)
+            except Exception as e:
+                logger.warning("⚠️ [INTENT_CACHE] Disk write failed: %s", e)
+
+    def clear(self) -> None:
+        """Drop the in-process layer (the disk layer expires on its own)"""
+        self._memory.clear()
+
+    def _remember(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        """Insert into the LRU memory layer, evicting the oldest entries"""
+        self._memory[key] = (expires_at, dict(value))
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _init_disk(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            connection.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_{self.table}_expires_at ON {self.table} (expires_at)"
+            )
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[float, Dict[str, Any]]]:
+        with self._connect() as connection:
+            row = connection.execute(
+                f"SELECT value, expires_at FROM {self.table} WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[1], json.loads(row[0])
+
+    def _disk_set(self, key: str, value: Dict[str, Any], expires_at: float, prune: bool) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), expires_at)
+            )
+            if prune:
+                connection.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),))
+                connection.execute(
+                    f"DELETE FROM {self.table} WHERE key IN ("
+                    f"SELECT key FROM {self.table} ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,)
+                )
@@ -0,0 +1,325 @@
+"""
+Rule-based intent parser for common search requests
+
+Deterministic local parser for the request shapes that make up most of the
+chat traffic ("Найди 10 IT компаний в Алматы", "дай еще 15", "Find 20
+construction companies in Astana", "give me more"). It produces the same JSON
+structure as the gpt-4o intent parser plus a confidence score, so the LLM is
+only called for inputs the rules cannot handle with certainty.
+"""
+
+import re
+from typing import Optional, Dict, Any, List, Tuple
+
+from ..core.translation_service import CityTranslationService
+from .search_state import SearchState
+
+
+# Words that introduce a search request
+SEARCH_VERBS = {
+    "найди", "найти", "найдите", "покажи", "покажите", "подбери", "подберите",
+    "ищи", "поищи", "дай", "дайте", "выведи", "нужны", "нужно", "хочу",
+    "find", "show", "search", "list", "get", "give", "need", "want",
+}
+
+# Prepositions after which a place name is expected
+LOCATION_PREPOSITIONS = {"в", "во", "из", "по", "in", "from", "at", "around", "near"}
+
+# Filler words that carry no search parameters
+STOP_WORDS = {
+    "мне", "нам", "пожалуйста", "плиз", "please", "me", "us", "some", "the",
+    "all", "any", "for", "of", "a", "an", "и", "and", "с", "со", "город",
+    "городе", "г", "city", "список", "топ", "top", "штук", "шт", "сфере",
+    "сферы", "области", "отрасли", "industry", "sector", "field", "которые",
+    "that", "are", "based", "located", "находятся", "работают",
+}
+
+_TOKEN = re.compile(r"[a-zа-яәғқңөұүһі0-9]+(?:-[a-zа-яәғқңөұүһі0-9]+)*")
+_NUMBER = re.compile(r"^\d{1,3}$")
+_COMPANY_NOUN = re.compile(
+    r"^(компани\w*|фирм\w*|организаци\w*|предприяти\w*|"
+    r"compan(y|ies)|firms?|business(es)?|organi[sz]ations?)$"
+)
+_CONTINUATION_TOKEN = re.compile(
+    r"^(еще|ещё|дальше|следующ\w*|продолж\w*|больше|дополнительн\w*|"
+    r"more|another|next|additional|further|continue)$"
+)
+
+# Token stem -> activity keywords passed to CompanyService.search_companies
+INDUSTRY_KEYWORDS: List[Tuple[re.Pattern, List[str]]] = [
+    (re.compile(r"^(it|ит|айти)$"), ["IT"]),
+    (re.compile(r"^(технолог|technolog|tech$)"), ["технологии"]),
+    (re.compile(r"^(строител|строй|construct)"), ["строительство"]),
+    (re.compile(r"^(торгов|trade|trading|retail)"), ["торговля"]),
+    (re.compile(r"^(транспорт|transport|логист|logistic)"), ["транспорт"]),
+    (re.compile(r"^(нефт|oil|petrol)"), ["нефт"]),
+    (re.compile(r"^(газов|gas$)"), ["газ"]),
+    (re.compile(r"^(медицин|medic|здравоохран|health|клиник|clinic)"), ["медицин"]),
+    (re.compile(r"^(образоват|образован|educat|школ|school)"), ["образован"]),
+    (re.compile(r"^(сельск|агро|agri|farm)"), ["сельск"]),
+    (re.compile(r"^(финанс|financ)"), ["финанс"]),
+    (re.compile(r"^(банк|bank)"), ["банк"]),
+    (re.compile(r"^(страхов|insur)"), ["страхов"]),
+    (re.compile(r"^(фармац|pharma)"), ["фармацевт"]),
+    (re.compile(r"^(гостини|hotel)"), ["гостиниц"]),
+    (re.compile(r"^(ресторан|restaurant)"), ["ресторан"]),
+    (re.compile(r"^(горнодоб|добыва|mining)"), ["добыча"]),
+    (re.compile(r"^(телеком|telecom|связ)"), ["связь"]),
+    (re.compile(r"^(энергет|energy)"), ["энерг"]),
+    (re.compile(r"^(химич|chemic)"), ["химическ"]),
+    (re.compile(r"^(мебел|furnitur)"), ["мебел"]),
+]
+
+DEFAULT_QUANTITY = 10
+
+
+class RuleBasedIntentParser:
+    """
+    Fast-path intent parser built on precompiled patterns and the
+    location/industry dictionaries.
+
+    Returns intent dictionaries with the same keys as the LLM parser plus
+    ``confidence`` (0..1) and ``source`` ("rules").
+    """
+
+    def parse(
+        self,
+        history: List[Dict[str, str]],
+        search_state: Optional[SearchState] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Parse the latest user message of ``history``
+
+        Args:
+            history: Conversation history ending with the current user message
+            search_state: Stored state of the active search; when present,
+                continuations are resolved from it without scanning history
+
+        Returns:
+            Intent dictionary, or None when the message has none of the
+            supported shapes
+
+        Example:
+            >>> RuleBasedIntentParser().parse([{"role": "user", "content": "Найди 10 IT компаний в Алматы"}])["location"]
+            'Алматы'
+        """
+        if not history or history[-1].get("role") != "user":
+            return None
+
+        message = self._parse_message(history[-1].get("content", ""))
+        if message is None:
+            return None
+
+        if message["is_continuation"]:
+            if search_state is not None:
+                result = self._continuation_result(
+                    message,
+                    search_state.location,
+                    search_state.activity_keywords,
+                    search_state.page_size,
+                    search_state.page_number + 1
+                )
+                if result["location"] == search_state.location:
+                    # Continue exactly where the previous page ended
+                    result["offset"] = search_state.cursor
+                return result
+
+            base = self._find_base_search(history[:-1])
+            if base is not None:
+                base_message, previous_continuations, served = base
+                result = self._continuation_result(
+                    message,
+                    base_message["location"],
+                    base_message["activity_keywords"],
+                    base_message["quantity"],
+                    previous_continuations + 2
+                )
+                if result["location"] == base_message["location"]:
+                    # Pages may have had different sizes ("дай еще 5" after pages of 10)
+                    result["offset"] = served
+                return result
+
+        if message["location"] and message["has_search_shape"]:
+            return self._new_search_result(message)
+
+        return None
+
+    def _parse_message(self, content: str) -> Optional[Dict[str, Any]]:
+        """Extract raw search parameters from a single message"""
+        text = content.lower().replace("ё", "е").strip()
+        if not text:
+            return None
+
+        tokens = _TOKEN.findall(text)
+        if not tokens or len(tokens) > 20:
+            return None
+
+        consumed = [False] * len(tokens)
+        quantity = None
+        has_verb = False
+        has_company_noun = False
+        is_continuation = False
+        activity_keywords: List[str] = []
+
+        for i, token in enumerate(tokens):
+            if _NUMBER.match(token):
+                if quantity is None and int(token) > 0:
+                    quantity = int(token)
+                consumed[i] = True
+            elif token in SEARCH_VERBS:
+                has_verb = True
+                consumed[i] = True
+            elif _COMPANY_NOUN.match(token):
+                has_company_noun = True
+                consumed[i] = True
+            elif _CONTINUATION_TOKEN.match(token):
+                is_continuation = True
+                consumed[i] = True
+            elif token in STOP_WORDS or token in LOCATION_PREPOSITIONS:
+                consumed[i] = True
+            else:
+                for pattern, keywords in INDUSTRY_KEYWORDS:
+                    if pattern.match(token):
+                        activity_keywords.extend(k for k in keywords if k not in activity_keywords)
+                        consumed[i] = True
+                        break
+
+        location, location_penalty = self._extract_location(tokens, consumed)
+        unknown_words = [token for token, used in zip(tokens, consumed) if not used]
+
+        return {
+            "quantity": quantity,
+            "location": location,
+            "location_penalty": location_penalty,
+            "activity_keywords": activity_keywords or None,
+            "is_continuation": is_continuation,
+            "has_search_shape": has_company_noun or (has_verb and bool(activity_keywords)),
+            "unknown_words": unknown_words,
+            "is_question": "?" in text,
+        }
+
+    def _extract_location(self, tokens: List[str], consumed: List[bool]) -> Tuple[Optional[str], float]:
+        """
+        Find a place name, preferring words right after a preposition
+
+        Marks the matched tokens as consumed and returns (location, penalty),
+        where the penalty lowers confidence for fuzzy or preposition-less hits.
+        """
+        for i, token in enumerate(tokens):
+            if token not in LOCATION_PREPOSITIONS or i + 1 >= len(tokens):
+                continue
+            start = i + 1
+            if tokens[start] in ("г", "город", "городе", "city") and start + 1 < len(tokens):
+                start += 1
+            for length in (2, 1):
+                candidate = tokens[start:start + length]
+                if len(candidate) < length:
+                    continue
+                match = CityTranslationService.match_location(" ".join(candidate))
+                if match:
+                    for j in range(i, start + length):
+                        consumed[j] = True
+                    return match[0], 0.0 if match[1] == 0 else 0.1
+
+        # No preposition: accept a standalone known place name
+        for i, token in enumerate(tokens):
+            if consumed[i] or len(token) < 4:
+                continue
+            match = CityTranslationService.match_location(token)
+            if match:
+                consumed[i] = True
+                return match[0], 0.15 if match[1] == 0 else 0.25
+
+        return None, 0.0
+
+    def _confidence(self, message: Dict[str, Any]) -> float:
+        """Score how safely the parsed parameters can skip the LLM"""
+        confidence = 1.0 - message["location_penalty"]
+        if message["unknown_words"]:
+            # Unrecognized qualifiers ("кондитерских", "без долгов") need the LLM
+            confidence -= 0.5
+        if message["is_question"]:
+            confidence -= 0.2
+        return round(max(confidence, 0.0), 2)
+
+    def _find_base_search(self, previous: List[Dict[str, str]]) -> Optional[Tuple[Dict[str, Any], int, int]]:
+        """
+        Locate the most recent user message that started a search
+
+        Returns:
+            (parsed base message, number of continuation requests since it,
+             number of results served by the base search and its continuations)
+            or None when the history has no parsable search
+        """
+        continuation_quantities: List[Optional[int]] = []
+        for msg in reversed(previous):
+            if msg.get("role") != "user":
+                continue
+            parsed = self._parse_message(msg.get("content", ""))
+            if parsed is None:
+                return None
+            if parsed["is_continuation"] and not parsed["location"]:
+                continuation_quantities.append(parsed["quantity"])
+                continue
+            if parsed["location"] and parsed["has_search_shape"]:
+                base_quantity = parsed["quantity"] or DEFAULT_QUANTITY
+                served = base_quantity + sum(quantity or base_quantity for quantity in continuation_quantities)
+                return parsed, len(continuation_quantities), served
+            return None
+        return None
+
+    def _continuation_result(
+        self,
+        message: Dict[str, Any],
+        location: str,
+        activity_keywords: Optional[List[str]],
+        base_quantity: Optional[int],
+        page_number: int
+    ) -> Dict[str, Any]:
+        """Build the intent for "дай еще N" using the base search context"""
+        confidence = self._confidence(message)
+
+        if message["location"] and message["location"] != location:
+            # "еще 10 в Астане" after a search in Almaty is a new search
+            result = self._new_search_result(message)
+            result["confidence"] = min(result["confidence"], 0.7)
+            return result
+        if message["activity_keywords"] and message["activity_keywords"] != activity_keywords:
+            confidence = min(confidence, 0.6)
+
+        quantity = message["quantity"] or base_quantity or DEFAULT_QUANTITY
+
+        return {
+            "intent": "find_companies",
+            "location": location,
+            "activity_keywords": activity_keywords,
+            "quantity": quantity,
+            "page_number": page_number,
+            "reasoning": f"Rule-based parser: continuation of search in {location}, page {page_number}",
+            "preliminary_response": f"Конечно! Ищу следующую группу из {quantity} компаний в {location}. Подождите, пожалуйста.",
+            "confidence": confidence,
+            "source": "rules",
+        }
+
+    def _new_search_result(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the intent for a fresh "найди N компаний в <город>" request"""
+        location = message["location"]
+        quantity = message["quantity"] or DEFAULT_QUANTITY
+        activity_keywords = message["activity_keywords"]
+        industry = f" ({', '.join(activity_keywords)})" if activity_keywords else ""
+
+        return {
+            "intent": "find_companies",
+            "location": location,
+            "activity_keywords": activity_keywords,
+            "quantity": quantity,
+            "page_number": 1,
+            "reasoning": f"Rule-based parser: new search in {location}",
+            "preliminary_response": f"Отлично! Ищу для вас {quantity} компаний{industry} в {location}. Один момент...",
+            "confidence": self._confidence(message),
+            "source": "rules",
+        }
+
+
+# Global parser instance
+intent_parser = RuleBasedIntentParser()
@@ -4,11 +4,52 @@ Pydantic models for AI conversation functionality
 Data models for AI conversation requests and responses.
 """
 
+import logging
 from typing import Optional, List, Dict, Any, Union
 from pydantic import BaseModel, Field
 from pydantic import validator
 
 
+logger = logging.getLogger(__name__)
+
+
+# Engines selectable with ChatRequest.engine
+CHAT_ENGINES = ("assistants", "completions")
+
+# Role names accepted in histories and what they are normalized to
+ROLE_ALIASES = {
+    'user': 'user', 'human': 'user', 'participant': 'user',
+    'assistant': 'assistant', 'ai': 'assistant', 'bot': 'assistant', 'system': 'assistant',
+}
+
+
+def clean_history(items: Any, normalize_roles: bool = False, tag: str = "History") -> List[Dict[str, str]]:
+    """
+    Items of a history list that have a non-empty role and content
+
+    Runs on every request and response, so only dropped items are logged.
+    """
+    if not items:
+        return []
+    if not isinstance(items, list):
+        logger.warning("⚠️ [MODELS] %s is not a list: %s, converting to empty list", tag, type(items))
+        return []
+    
+    cleaned = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        role = str(item.get('role') or '').strip()
+        content = str(item.get('content') or '').strip()
+        if role and content:
+            if normalize_roles:
+                role = ROLE_ALIASES.get(role.lower(), role)
+            cleaned.append({'role': role, 'content': content})
+    
+    if len(cleaned) != len(items):
+        logger.warning("⚠️ [MODELS] %s: dropped %s of %s items without role/content", tag, len(items) - len(cleaned), len(items))
+    return cleaned
+
 class ConversationInput(BaseModel):
     """Legacy conversation input model for backwards compatibility"""
     
@@ -48,36 +89,28 @@ class ChatRequest(BaseModel):
         None,
         description="Optional OpenAI Thread ID for persistent conversations"
     )
+    engine: Optional[str] = Field(
+        None,
+        description="Conversation engine of /chat-assistant: 'assistants' (OpenAI threads) or 'completions' (function calling over the sent history); defaults to CHAT_ENGINE_DEFAULT"
+    )
+    history_version: Optional[int] = Field(
+        None,
+        ge=0,
+        description="Delta history protocol (/funds/chat): the history_version of the client's copy. "
+                    "When set, history is not sent; the server uses its stored history and returns only the new messages"
+    )
+    
+    @validator('engine')
+    def validate_engine(cls, v):
+        """Only known engines are accepted"""
+        if v is not None and v not in CHAT_ENGINES:
+            raise ValueError(f"engine must be one of: {', '.join(CHAT_ENGINES)}")
+        return v
     
     @validator('history', pre=True, always=True)
     def validate_request_history(cls, v):
         """Validate and clean incoming history"""
-        if not v:
-            return []
-        
-        if not isinstance(v, list):
-            print(f"⚠️ [MODELS] Request history is not a list: {type(v)}, converting to empty list")
-            return []
-        
-        validated_history = []
-        for i, item in enumerate(v):
-            if isinstance(item, dict):
-                # Be more flexible with the validation - just require some content
-                role = item.get('role', '').strip()
-                content = item.get('content', '').strip()
-                
-                if role and content:
-                    validated_history.append({
-                        'role': role,
-                        'content': content
-                    })
-                else:
-                    print(f"⚠️ [MODELS] Skipping history item {i} with missing role/content: {item}")
-            else:
-                print(f"⚠️ [MODELS] Skipping non-dict history item {i}: {type(item)}")
-        
-        print(f"✅ [MODELS] Request history validated: {len(v)} -> {len(validated_history)} items")
-        return validated_history
+        return clean_history(v, tag="Request history")
     
     class Config:
         json_schema_extra = {
@@ -168,68 +201,41 @@ class ChatResponse(BaseModel):
         None,
         description="OpenAI Thread ID used for this response"
     )
+    history_version: Optional[int] = Field(
+        None,
+        description="Version of the server-side history after this turn (send it back as ChatRequest.history_version)"
+    )
+    history_mode: Optional[str] = Field(
+        None,
+        description="Delta history protocol: 'delta' (history_delta holds every message newer than the client's version) "
+                    "or 'full' (updated_history holds the stored history when the client's copy cannot be patched)"
+    )
+    history_delta: Optional[List[Dict[str, str]]] = Field(
+        None,
+        description="Delta history protocol: messages newer than the client's version ('delta'), or those this turn appended ('full')"
+    )
+    history_truncated: Optional[bool] = Field(
+        None,
+        description="Delta history protocol, 'full' mode: updated_history holds only the last "
+                    "CONVERSATION_HISTORY_LOAD_LIMIT messages and older ones exist; keep the older part of your copy"
+    )
     
     @validator('updated_history', pre=True, always=True)
     def validate_history(cls, v):
         """
-        Validate and clean updated_history with improved error handling.
+        Validate and clean updated_history.
         CRITICAL: This validator must preserve conversation history at all costs.
         """
-        print(f"🔍 [MODELS] Validating updated_history: type={type(v)}, length={len(v) if isinstance(v, list) else 'N/A'}")
-        
         if v is None:
-            print("⚠️ [MODELS] Warning: updated_history was None, setting to empty list")
-            return []
-        
-        if not isinstance(v, list):
-            print(f"⚠️ [MODELS] Warning: updated_history was not a list: {type(v)}, converting to empty list")
+            logger.warning("⚠️ [MODELS] Warning: updated_history was None, setting to empty list")
             return []
-        
-        # More flexible validation - preserve as much history as possible
-        validated_history = []
-        for i, item in enumerate(v):
-            try:
-                if isinstance(item, dict):
-                    # Extract role and content with better error handling
-                    role = str(item.get('role', '')).strip()
-                    content = str(item.get('content', '')).strip()
-                    
-                    # Accept any non-empty role and content
-                    if role and content:
-                        # Normalize role names
-                        if role.lower() in ['user', 'human', 'participant']:
-                            role = 'user'
-                        elif role.lower() in ['assistant', 'ai', 'bot', 'system']:
-                            role = 'assistant'
-                        
-                        validated_history.append({
-                            'role': role,
-                            'content': content
-                        })
-                    else:
-                        print(f"⚠️ [MODELS] History item {i} missing role/content: role='{role}', content='{content[:50]}...'")
-                else:
-                    print(f"⚠️ [MODELS] History item {i} is not a dict: {type(item)} - {str(item)[:100]}...")
-                    
-            except Exception as e:
-                print(f"❌ [MODELS] Error processing history item {i}: {e}")
-                continue
-        
-        original_count = len(v)
-        validated_count = len(validated_history)
-        
-        if validated_count != original_count:
-            print(f"⚠️ [MODELS] History items changed: {original_count} -> {validated_count}")
-        else:
-            print(f"✅ [MODELS] All {validated_count} history items validated successfully")
-        
-        return validated_history
+        return clean_history(v, normalize_roles=True, tag="updated_history")
     
     @validator('message', pre=True, always=True)
     def validate_message(cls, v):
         """Ensure message is always a non-empty string"""
         if not v or not isinstance(v, str):
-            print("⚠️ [MODELS] Invalid message, using fallback")
+            logger.warning("⚠️ [MODELS] Invalid message, using fallback")
             return "Произошла ошибка при обработке запроса."
         return v.strip()
     
@@ -237,7 +243,7 @@ class ChatResponse(BaseModel):
     def validate_companies_data(cls, v):
         """Ensure companies_data is always a list"""
         if not isinstance(v, list):
-            print(f"⚠️ [MODELS] companies_data is not a list: {type(v)}, converting to empty list")
+            logger.warning("⚠️ [MODELS] companies_data is not a list: %s, converting to empty list", type(v))
             return []
         return v
     
@@ -278,7 +284,7 @@ class CompanyData(BaseModel):
     ensuring it correctly consumes the data from the service layer.
     """
     
-    id: str = Field(..., description="Company UUID")
+    id: Optional[str] = Field(..., description="Company UUID (null when the source had none)")
     
     bin: Optional[str] = Field(None, description="Business Identification Number")
     name: str = Field(..., description="Company name")
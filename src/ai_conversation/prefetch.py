@@ -0,0 +1,125 @@
+"""
+Background prefetch of the next result page
+
+After a chat search serves a page, the next page of the same result set is
+fetched in the background into a short-lived per-conversation buffer, so a
+following "дай еще" / "give me more" turn is answered without waiting for the
+DB. The buffer is in-process (per worker), holds at most one page per
+conversation and a bounded number of conversations, and entries expire.
+"""
+
+import logging
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List
+
+from ..companies.service import CompanyService
+from ..core.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+class PrefetchBuffer:
+    """
+    Per-conversation buffer of the next result page
+
+    Example:
+        >>> prefetch_buffer.schedule("conv-1", state.snapshot_id, "Алматы", ["IT"], limit=10, offset=10)
+        >>> companies = await prefetch_buffer.take("conv-1", state.snapshot_id, limit=10, offset=10)
+    """
+
+    def __init__(self, ttl_seconds: int = 120, max_conversations: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_conversations = max_conversations
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def schedule(
+        self,
+        conversation_id: str,
+        snapshot_id: str,
+        location: str,
+        activity_keywords: Optional[List[str]],
+        limit: int,
+        offset: int
+    ) -> None:
+        """Start fetching the page at ``offset`` for the conversation, replacing its previous entry"""
+        previous = self._entries.pop(conversation_id, None)
+        if previous is not None:
+            self._discard(previous)
+
+        task = asyncio.create_task(CompanyService.search_companies_isolated(
+            location=location,
+            activity_keywords=activity_keywords,
+            limit=limit,
+            offset=offset
+        ))
+        self._entries[conversation_id] = {
+            "snapshot_id": snapshot_id,
+            "limit": limit,
+            "offset": offset,
+            "task": task,
+            "expires_at": time.monotonic() + self.ttl_seconds,
+        }
+        metrics.increment("prefetch.scheduled")
+
+        while len(self._entries) > self.max_conversations:
+            _, evicted = self._entries.popitem(last=False)
+            self._discard(evicted)
+            metrics.increment("prefetch.evicted")
+
+    async def take(
+        self,
+        conversation_id: str,
+        snapshot_id: str,
+        limit: int,
+        offset: int
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Prefetched page for the request, or None when there is no usable one
+
+        A page fetched with a larger limit serves smaller requests. A prefetch
+        still in flight is awaited, which is still faster than starting over.
+        """
+        entry = self._entries.pop(conversation_id, None)
+        if entry is None:
+            metrics.increment("prefetch.misses")
+            return None
+
+        if entry["expires_at"] < time.monotonic():
+            self._discard(entry)
+            metrics.increment("prefetch.expired")
+            return None
+
+        if entry["snapshot_id"] != snapshot_id or entry["offset"] != offset or entry["limit"] < limit:
+            self._discard(entry)
+            metrics.increment("prefetch.misses")
+            return None
+
+        try:
+            companies = await entry["task"]
+        except Exception as e:
+            metrics.increment("prefetch.errors")
+            logger.warning("⚠️ [PREFETCH] Prefetched search failed: %s", e)
+            return None
+
+        metrics.increment("prefetch.hits")
+        logger.info("⚡ [PREFETCH] Serving %s prefetched companies (offset %s)", min(len(companies), limit), offset)
+        return companies[:limit]
+
+    def invalidate(self, conversation_id: str) -> None:
+        """Drop the buffered page of a conversation (e.g. after a reset)"""
+        entry = self._entries.pop(conversation_id, None)
+        if entry is not None:
+            self._discard(entry)
+
+    @staticmethod
+    def _discard(entry: Dict[str, Any]) -> None:
+        task = entry["task"]
+        if task.done():
+            if not task.cancelled():
+                task.exception()  # mark a failure as retrieved
+        else:
+            # The query finishes in its worker thread and closes its own session
+            task.cancel()
@@ -1,6 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Response
 from sqlalchemy.orm import Session
-import traceback
 from .models import ChatRequest, ChatResponse, APIResponse, ConversationInput, ConversationResponse
 from .service import ai_service
 from .assistant_creator import (
@@ -8,9 +8,21 @@ from .assistant_creator import (
     create_charity_fund_assistant,
     charity_assistant
 )
-from ..core.database import get_db
+from ..core.database import get_db, SessionLocal
+from ..auth.models import User
+from ..auth.router import get_optional_user
+from ..core.metrics import metrics
+from ..core.telemetry import llm_telemetry
+from ..core.idempotency import idempotent, IDEMPOTENCY_HEADER, REPLAYED_HEADER
+from ..core.internal_access import require_internal_access
+from .function_calling import handle_conversation_with_completions
+from .streaming import sse_response, session_scoped, llm_turn_scoped, stream_assistant_turn, stream_hybrid_turn
+from ..core.config import get_settings
 from typing import Optional
 
+
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/ai", tags=["AI Conversation"])
 
 
@@ -25,14 +37,17 @@ async def handle_chat_with_assistant(request: ChatRequest, db: Session = Depends
     - Database function tools integration
     - Enhanced context awareness
     - Persistent conversation threads
+    
+    Set ``engine="completions"`` to run the same tools with chat.completions
+    function calling over the sent history instead of an OpenAI thread.
     """
     if not request.user_input.strip():
         raise HTTPException(status_code=400, detail="User input cannot be empty")
     
     # Validate and log history for debugging
     history = request.history if request.history else []
-    print(f"🎯 [ASSISTANT-ROUTER] Received request with history length: {len(history)}")
-    print(f"📝 [ASSISTANT-ROUTER] User input: {request.user_input[:100]}...")
+    logger.info("🎯 [ASSISTANT-ROUTER] Received request with history length: %s", len(history))
+    logger.debug("📝 [ASSISTANT-ROUTER] User input: %s...", request.user_input[:100])
     
     # Validate history format
     validated_history = []
@@ -40,72 +55,83 @@ async def handle_chat_with_assistant(request: ChatRequest, db: Session = Depends
         if isinstance(item, dict) and 'role' in item and 'content' in item:
             validated_history.append(item)
         else:
-            print(f"⚠️ [ASSISTANT-ROUTER] Invalid history item at index {i}: {item}")
+            logger.debug("⚠️ [ASSISTANT-ROUTER] Invalid history item at index %s: %s", i, item)
     
-    print(f"✅ [ASSISTANT-ROUTER] Validated history length: {len(validated_history)}")
+    logger.info("✅ [ASSISTANT-ROUTER] Validated history length: %s", len(validated_history))
 
     try:
         # Use the enhanced context-aware assistant
-        print(f"🤖 [ASSISTANT-ROUTER] Calling enhanced assistant...")
+        logger.debug("🤖 [ASSISTANT-ROUTER] Calling enhanced assistant...")
         
         # Extract assistant and thread IDs from request if provided
         existing_assistant_id = getattr(request, 'assistant_id', None)
         existing_thread_id = getattr(request, 'thread_id', None)
         
         if existing_assistant_id and existing_thread_id:
-            print(f"🔑 [ASSISTANT-ROUTER] Using existing assistant: {existing_assistant_id[:20]}...")
-            print(f"🧵 [ASSISTANT-ROUTER] Using existing thread: {existing_thread_id[:20]}...")
-        
-        response_data = await handle_conversation_with_context(
-            user_input=request.user_input,
-            conversation_history=validated_history,
-            db=db,
-            assistant_id=existing_assistant_id,
-            thread_id=existing_thread_id
-        )
+            logger.info("🔑 [ASSISTANT-ROUTER] Using existing assistant: %s...", existing_assistant_id[:20])
+            logger.info("🧵 [ASSISTANT-ROUTER] Using existing thread: %s...", existing_thread_id[:20])
+        
+        engine = request.engine or get_settings().chat_engine_default
+        with llm_telemetry.turn(f"/ai/chat-assistant[{engine}]"):
+            if engine == "completions":
+                logger.info("⚡ [ASSISTANT-ROUTER] Using chat-completions engine")
+                response_data = await handle_conversation_with_completions(
+                    user_input=request.user_input,
+                    conversation_history=validated_history
+                )
+            else:
+                response_data = await handle_conversation_with_context(
+                    user_input=request.user_input,
+                    conversation_history=validated_history,
+                    db=db,
+                    assistant_id=existing_assistant_id,
+                    thread_id=existing_thread_id
+                )
         
         # Validate response data structure
         if not isinstance(response_data, dict):
-            print(f"❌ [ASSISTANT-ROUTER] Invalid response_data type: {type(response_data)}")
+            logger.error("❌ [ASSISTANT-ROUTER] Invalid response_data type: %s", type(response_data))
             raise ValueError("Invalid response format from assistant")
         
         # Ensure required fields exist
         required_fields = ['message', 'companies_data', 'updated_history']
         for field in required_fields:
             if field not in response_data:
-                print(f"❌ [ASSISTANT-ROUTER] Missing required field: {field}")
+                logger.error("❌ [ASSISTANT-ROUTER] Missing required field: %s", field)
                 response_data[field] = [] if field.endswith('_data') or field.endswith('_history') else ""
         
         # Log response for debugging
         returned_history_length = len(response_data.get('updated_history', []))
-        print(f"✅ [ASSISTANT-ROUTER] Assistant returned response with history length: {returned_history_length}")
-        print(f"💬 [ASSISTANT-ROUTER] Response message: {response_data.get('message', '')[:100]}...")
+        logger.info("✅ [ASSISTANT-ROUTER] Assistant returned response with history length: %s", returned_history_length)
+        logger.debug("💬 [ASSISTANT-ROUTER] Response message: %s...", response_data.get('message', '')[:100])
         
         # Store assistant and thread IDs for future use (could be saved to session/database)
         assistant_id = response_data.get('assistant_id')
         thread_id = response_data.get('thread_id')
         if assistant_id and thread_id:
-            print(f"🔑 [ASSISTANT-ROUTER] Assistant ID: {assistant_id[:20]}...")
-            print(f"🧵 [ASSISTANT-ROUTER] Thread ID: {thread_id[:20]}...")
+            logger.info("🔑 [ASSISTANT-ROUTER] Assistant ID: %s...", assistant_id[:20])
+            logger.info("🧵 [ASSISTANT-ROUTER] Thread ID: %s...", thread_id[:20])
         
         # Create and return ChatResponse
         chat_response = ChatResponse(**response_data)
-        print(f"✅ [ASSISTANT-ROUTER] Successfully created ChatResponse with {len(chat_response.updated_history)} history items")
+        logger.info(
+            "✅ [ASSISTANT-ROUTER] Successfully created ChatResponse with %s history items",
+            len(chat_response.updated_history)
+        )
         return chat_response
         
     except Exception as e:
-        print(f"❌ [ASSISTANT-ROUTER] Error in assistant endpoint: {str(e)}")
-        print(f"🔍 [ASSISTANT-ROUTER] Exception type: {type(e)}")
-        traceback.print_exc()
+        logger.exception("❌ [ASSISTANT-ROUTER] Error in assistant endpoint: %s", str(e))
+        logger.debug("🔍 [ASSISTANT-ROUTER] Exception type: %s", type(e))
         
         # Return a safe response that preserves history
-        print(f"🛡️ [ASSISTANT-ROUTER] Creating fallback response...")
+        logger.info("🛡️ [ASSISTANT-ROUTER] Creating fallback response...")
         fallback_history = validated_history + [
             {"role": "user", "content": request.user_input},
             {"role": "assistant", "content": "Извините, произошла ошибка при обработке вашего запроса. Пожалуйста, попробуйте еще раз."}
         ]
         
-        print(f"🛡️ [ASSISTANT-ROUTER] Fallback history length: {len(fallback_history)}")
+        logger.info("🛡️ [ASSISTANT-ROUTER] Fallback history length: %s", len(fallback_history))
         
         fallback_response = ChatResponse(
             message="Извините, произошла ошибка при обработке вашего запроса. Пожалуйста, попробуйте еще раз.",
@@ -116,12 +142,20 @@ async def handle_chat_with_assistant(request: ChatRequest, db: Session = Depends
             has_more_companies=False
         )
         
-        print(f"✅ [ASSISTANT-ROUTER] Created fallback response with {len(fallback_response.updated_history)} history items")
+        logger.info(
+            "✅ [ASSISTANT-ROUTER] Created fallback response with %s history items",
+            len(fallback_response.updated_history)
+        )
         return fallback_response
 
 
 @router.post("/chat-hybrid", response_model=ChatResponse)
-async def handle_chat_hybrid(request: ChatRequest, db: Session = Depends(get_db)):
+async def handle_chat_hybrid(
+    request: ChatRequest,
+    response: Response,
+    current_user: Optional[User] = Depends(get_optional_user),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)
+):
     """
     Handle AI conversation using hybrid approach: Enhanced assistant with fallback.
     
@@ -130,14 +164,41 @@ async def handle_chat_hybrid(request: ChatRequest, db: Session = Depends(get_db)
     - Fallback: Traditional OpenAI service if assistant fails
     - Full conversation history preservation in both modes
     - Robust error handling and context preservation
+    - Idempotency-Key (authenticated callers): a retry waits for or replays the original response
+    
+    The endpoint is public, so keys are scoped per user and ignored for
+    anonymous callers: two clients sending the same key must not share a response.
     """
     if not request.user_input.strip():
         raise HTTPException(status_code=400, detail="User input cannot be empty")
     
+    if current_user is None and idempotency_key:
+        logger.debug("🔁 [HYBRID-ROUTER] Ignoring %s of an anonymous caller", IDEMPOTENCY_HEADER)
+    scope = f"/ai/chat-hybrid:{current_user.id}" if current_user is not None else "/ai/chat-hybrid"
+    
+    async def run_turn() -> dict:
+        # The turn outlives a disconnected client for its retry, so it has its own session
+        db = SessionLocal()
+        try:
+            return await _chat_hybrid_turn(request, db)
+        finally:
+            db.close()
+    
+    response_data, replayed = await idempotent(
+        scope, idempotency_key if current_user is not None else None,
+        request.model_dump(mode="json"), run_turn
+    )
+    if replayed:
+        response.headers[REPLAYED_HEADER] = "true"
+    return ChatResponse(**response_data)
+
+
+async def _chat_hybrid_turn(request: ChatRequest, db: Session) -> dict:
+    """One /chat-hybrid turn as a ChatResponse dict"""
     # Validate and log history for debugging
     history = request.history if request.history else []
-    print(f"🔗 [HYBRID-ROUTER] Received request with history length: {len(history)}")
-    print(f"📝 [HYBRID-ROUTER] User input: {request.user_input[:100]}...")
+    logger.info("🔗 [HYBRID-ROUTER] Received request with history length: %s", len(history))
+    logger.debug("📝 [HYBRID-ROUTER] User input: %s...", request.user_input[:100])
     
     # Validate history format
     validated_history = []
@@ -145,54 +206,57 @@ async def handle_chat_hybrid(request: ChatRequest, db: Session = Depends(get_db)
         if isinstance(item, dict) and 'role' in item and 'content' in item:
             validated_history.append(item)
         else:
-            print(f"⚠️ [HYBRID-ROUTER] Invalid history item at index {i}: {item}")
+            logger.debug("⚠️ [HYBRID-ROUTER] Invalid history item at index %s: %s", i, item)
     
-    print(f"✅ [HYBRID-ROUTER] Validated history length: {len(validated_history)}")
+    logger.info("✅ [HYBRID-ROUTER] Validated history length: %s", len(validated_history))
 
     try:
         # Use the hybrid service with fallback
-        print(f"🔗 [HYBRID-ROUTER] Calling hybrid service...")
-        response_data = await ai_service.handle_conversation_with_assistant_fallback(
-            user_input=request.user_input,
-            history=validated_history,
-            db=db
-        )
+        logger.info("🔗 [HYBRID-ROUTER] Calling hybrid service...")
+        with llm_telemetry.turn("/ai/chat-hybrid"):
+            response_data = await ai_service.handle_conversation_with_assistant_fallback(
+                user_input=request.user_input,
+                history=validated_history,
+                db=db
+            )
         
         # Validate response data structure
         if not isinstance(response_data, dict):
-            print(f"❌ [HYBRID-ROUTER] Invalid response_data type: {type(response_data)}")
+            logger.error("❌ [HYBRID-ROUTER] Invalid response_data type: %s", type(response_data))
             raise ValueError("Invalid response format from hybrid service")
         
         # Ensure required fields exist
         required_fields = ['message', 'companies_data', 'updated_history']
         for field in required_fields:
             if field not in response_data:
-                print(f"❌ [HYBRID-ROUTER] Missing required field: {field}")
+                logger.error("❌ [HYBRID-ROUTER] Missing required field: %s", field)
                 response_data[field] = [] if field.endswith('_data') or field.endswith('_history') else ""
         
         # Log response for debugging
         returned_history_length = len(response_data.get('updated_history', []))
-        print(f"✅ [HYBRID-ROUTER] Hybrid service returned response with history length: {returned_history_length}")
-        print(f"💬 [HYBRID-ROUTER] Response message: {response_data.get('message', '')[:100]}...")
+        logger.info("✅ [HYBRID-ROUTER] Hybrid service returned response with history length: %s", returned_history_length)
+        logger.debug("💬 [HYBRID-ROUTER] Response message: %s...", response_data.get('message', '')[:100])
         
         # Create and return ChatResponse
         chat_response = ChatResponse(**response_data)
-        print(f"✅ [HYBRID-ROUTER] Successfully created ChatResponse with {len(chat_response.updated_history)} history items")
-        return chat_response
+        logger.info(
+            "✅ [HYBRID-ROUTER] Successfully created ChatResponse with %s history items",
+            len(chat_response.updated_history)
+        )
+        return chat_response.model_dump(mode="json")
         
     except Exception as e:
-        print(f"❌ [HYBRID-ROUTER] Error in hybrid endpoint: {str(e)}")
-        print(f"🔍 [HYBRID-ROUTER] Exception type: {type(e)}")
-        traceback.print_exc()
+        logger.exception("❌ [HYBRID-ROUTER] Error in hybrid endpoint: %s", str(e))
+        logger.debug("🔍 [HYBRID-ROUTER] Exception type: %s", type(e))
         
         # Return a safe response that preserves history
-        print(f"🛡️ [HYBRID-ROUTER] Creating emergency fallback response...")
+        logger.info("🛡️ [HYBRID-ROUTER] Creating emergency fallback response...")
         fallback_history = validated_history + [
             {"role": "user", "content": request.user_input},
             {"role": "assistant", "content": "Извините, произошла критическая ошибка в системе. Ваша история разговора сохранена. Попробуйте позже."}
         ]
         
-        print(f"🛡️ [HYBRID-ROUTER] Emergency fallback history length: {len(fallback_history)}")
+        logger.info("🛡️ [HYBRID-ROUTER] Emergency fallback history length: %s", len(fallback_history))
         
         fallback_response = ChatResponse(
             message="Извините, произошла критическая ошибка в системе. Ваша история разговора сохранена. Попробуйте позже.",
@@ -203,15 +267,73 @@ async def handle_chat_hybrid(request: ChatRequest, db: Session = Depends(get_db)
             has_more_companies=False
         )
         
-        print(f"✅ [HYBRID-ROUTER] Created emergency fallback response with {len(fallback_response.updated_history)} history items")
-        return fallback_response
+        logger.info(
+            "✅ [HYBRID-ROUTER] Created emergency fallback response with %s history items",
+            len(fallback_response.updated_history)
+        )
+        return fallback_response.model_dump(mode="json")
+
+
+def _validated_stream_history(request: ChatRequest, tag: str) -> list:
+    """History items of a streaming request that have role and content"""
+    history = request.history if request.history else []
+    validated_history = [
+        item for item in history
+        if isinstance(item, dict) and 'role' in item and 'content' in item
+    ]
+    logger.info("✅ [%s] Validated history length: %s", tag, len(validated_history))
+    return validated_history
+
+
+@router.post("/chat-assistant/stream")
+async def handle_chat_with_assistant_stream(request: ChatRequest):
+    """
+    Streaming (SSE) variant of /chat-assistant.
+    
+    Events: preliminary -> companies (batches) -> final (message, metadata, history_delta).
+    """
+    if not request.user_input.strip():
+        raise HTTPException(status_code=400, detail="User input cannot be empty")
+    
+    validated_history = _validated_stream_history(request, "ASSISTANT-STREAM")
+    engine = request.engine or get_settings().chat_engine_default
+    events = session_scoped(lambda db: stream_assistant_turn(
+        user_input=request.user_input,
+        history=validated_history,
+        db=db,
+        assistant_id=request.assistant_id,
+        thread_id=request.thread_id,
+        engine=engine
+    ))
+    events = llm_turn_scoped(events, f"/ai/chat-assistant/stream[{engine}]")
+    return sse_response(events, history_length=len(validated_history))
+
+
+@router.post("/chat-hybrid/stream")
+async def handle_chat_hybrid_stream(request: ChatRequest):
+    """
+    Streaming (SSE) variant of /chat-hybrid.
+    
+    Events: preliminary -> companies (batches) -> final (message, metadata, history_delta).
+    """
+    if not request.user_input.strip():
+        raise HTTPException(status_code=400, detail="User input cannot be empty")
+    
+    validated_history = _validated_stream_history(request, "HYBRID-STREAM")
+    events = session_scoped(lambda db: stream_hybrid_turn(
+        user_input=request.user_input,
+        history=validated_history,
+        db=db
+    ))
+    events = llm_turn_scoped(events, "/ai/chat-hybrid/stream")
+    return sse_response(events, history_length=len(validated_history))
 
 
 @router.post("/assistant/create")
 async def create_assistant():
     """
-    Create a new charity fund discovery assistant.
-    Returns the assistant ID that can be used for future conversations.
+    Get the charity fund discovery assistant.
+    Returns the ID of the shared registered assistant (created only if none exists yet).
     """
     try:
         assistant_id = await create_charity_fund_assistant()
@@ -223,7 +345,7 @@ async def create_assistant():
             }
         }
     except Exception as e:
-        print(f"❌ Error creating assistant: {str(e)}")
+        logger.error("❌ Error creating assistant: %s", str(e))
         raise HTTPException(status_code=500, detail=f"Failed to create assistant: {str(e)}")
 
 
@@ -244,7 +366,7 @@ async def get_conversation_history(assistant_id: str, thread_id: str):
             }
         }
     except Exception as e:
-        print(f"❌ Error getting conversation history: {str(e)}")
+        logger.error("❌ Error getting conversation history: %s", str(e))
         raise HTTPException(status_code=500, detail=f"Failed to get conversation history: {str(e)}")
 
 
@@ -252,7 +374,14 @@ async def get_conversation_history(assistant_id: str, thread_id: str):
 async def cleanup_assistant(assistant_id: str):
     """
     Clean up an assistant when no longer needed.
+    
+    The shared registered assistant is used by every worker and cannot be deleted here.
     """
+    if await charity_assistant.is_registered_assistant(assistant_id):
+        raise HTTPException(
+            status_code=409,
+            detail="The shared registered assistant cannot be deleted"
+        )
     try:
         await charity_assistant.cleanup_assistant(assistant_id)
         return {
@@ -263,7 +392,7 @@ async def cleanup_assistant(assistant_id: str):
             }
         }
     except Exception as e:
-        print(f"❌ Error cleaning up assistant: {str(e)}")
+        logger.error("❌ Error cleaning up assistant: %s", str(e))
         raise HTTPException(status_code=500, detail=f"Failed to cleanup assistant: {str(e)}")
 
 
@@ -279,7 +408,7 @@ async def handle_conversation(request: ConversationInput, db: Session = Depends(
     if not request.user_input.strip():
         raise HTTPException(status_code=400, detail="User input cannot be empty")
     
-    print(f"📍 [ROUTER] Legacy conversation endpoint called with input: {request.user_input[:100]}...")
+    logger.info("📍 [ROUTER] Legacy conversation endpoint called with input: %s...", request.user_input[:100])
     
     try:
         # Handle conversation turn with empty history for legacy support
@@ -303,8 +432,7 @@ async def handle_conversation(request: ConversationInput, db: Session = Depends(
         )
         
     except Exception as e:
-        print(f"❌ [ROUTER] Error in legacy conversation endpoint: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ [ROUTER] Error in legacy conversation endpoint: %s", str(e))
         
         # Return error response
         conversation_response = ConversationResponse(
@@ -331,7 +459,7 @@ async def handle_simple_conversation(request: ConversationInput, db: Session = D
     if not request.user_input.strip():
         raise HTTPException(status_code=400, detail="User input cannot be empty")
     
-    print(f"📍 [ROUTER] Simple conversation endpoint called with input: {request.user_input[:100]}...")
+    logger.info("📍 [ROUTER] Simple conversation endpoint called with input: %s...", request.user_input[:100])
     
     try:
         # For simple conversation, use empty history
@@ -358,8 +486,7 @@ async def handle_simple_conversation(request: ConversationInput, db: Session = D
         )
         
     except Exception as e:
-        print(f"❌ [ROUTER] Error in simple conversation endpoint: {str(e)}")
-        traceback.print_exc()
+        logger.exception("❌ [ROUTER] Error in simple conversation endpoint: %s", str(e))
         
         # Return error response
         conversation_response = ConversationResponse(
@@ -388,10 +515,82 @@ async def ai_health_check():
         else:
             raise HTTPException(status_code=503, detail="AI service configuration missing")
     except Exception as e:
-        print(f"❌ [ROUTER] Health check failed: {str(e)}")
+        logger.error("❌ [ROUTER] Health check failed: %s", str(e))
         raise HTTPException(status_code=503, detail="AI service unavailable")
 
 
+@router.get("/chat/metrics", dependencies=[Depends(require_internal_access)])
+async def get_chat_metrics():
+    """
+    Internal: in-process counters for the chat pipeline.
+    Includes the intent fast-path hit rate (share of parses answered without OpenAI).
+    Requires the X-Internal-Token header.
+    """
+    return APIResponse(
+        status="success",
+        data={
+            "counters": metrics.snapshot(),
+            "intent_fast_path_hit_rate": metrics.ratio(
+                "intent.fast_path.hits", "intent.fast_path.hits", "intent.fast_path.misses"
+            ),
+            "intent_cache_hit_rate": metrics.ratio(
+                "intent.cache.memory_hits",
+                "intent.cache.memory_hits", "intent.cache.disk_hits", "intent.cache.misses"
+            ),
+            "intent_cache_disk_hit_rate": metrics.ratio(
+                "intent.cache.disk_hits",
+                "intent.cache.memory_hits", "intent.cache.disk_hits", "intent.cache.misses"
+            ),
+            "history_summary_cache_hit_rate": metrics.ratio(
+                "history.summary_cache.memory_hits",
+                "history.summary_cache.memory_hits",
+                "history.summary_cache.disk_hits",
+                "history.summary_cache.misses"
+            ),
+            "speculative_search_hit_rate": metrics.ratio(
+                "search.speculative.hits", "search.speculative.hits", "search.speculative.misses"
+            ),
+            "speculative_search_avg_saved_ms": metrics.ratio(
+                "search.speculative.saved_ms", "search.speculative.hits"
+            ),
+            "prefetch_hit_rate": metrics.ratio(
+                "prefetch.hits", "prefetch.hits", "prefetch.misses", "prefetch.expired"
+            ),
+            "prefetch_use_rate": metrics.ratio("prefetch.hits", "prefetch.scheduled"),
+            "llm_retry_rate": metrics.ratio("llm.retries", "llm.calls"),
+            "llm_coalesced_rate": metrics.ratio("llm.coalesced", "llm.calls", "llm.coalesced"),
+            "assistant_run_avg_ms": metrics.ratio("assistant.run.total_ms", "assistant.runs"),
+            "assistant_run_avg_polls": metrics.ratio("assistant.run.polls", "assistant.runs"),
+            "completions_engine_avg_turn_ms": metrics.ratio("completions_engine.turn_ms", "completions_engine.turns"),
+        },
+        message="Chat metrics retrieved successfully"
+    )
+
+
+@router.get("/chat/telemetry", dependencies=[Depends(require_internal_access)])
+async def get_llm_telemetry(recent: int = Query(20, ge=0, le=200, description="Number of recent turns to include")):
+    """
+    Internal: LLM latency and token accounting per endpoint and operation.
+    
+    Includes latency histograms of each OpenAI operation and of whole turns,
+    each operation's share of the turn latency, token totals, tokens per turn
+    and the most recent turns with their per-call breakdown (user and
+    conversation ids pseudonymized). Requires the X-Internal-Token header.
+    """
+    return APIResponse(
+        status="success",
+        data=llm_telemetry.snapshot(recent=recent),
+        message="LLM telemetry retrieved successfully"
+    )
+
+
+@router.delete("/chat/telemetry", dependencies=[Depends(require_internal_access)])
+async def reset_llm_telemetry():
+    """Internal: drop the in-process LLM telemetry aggregates (the JSONL file is kept). Requires the X-Internal-Token header."""
+    llm_telemetry.reset()
+    return APIResponse(status="success", data={}, message="LLM telemetry reset")
+
+
 @router.get("/chat/test-pagination")
 async def test_pagination(
     location: str = Query(..., description="Location to search"),
@@ -405,11 +604,11 @@ async def test_pagination(
     This endpoint helps debug pagination issues by bypassing the OpenAI intent parsing
     """
     try:
-        print(f"🧪 [TEST_PAGINATION] Testing pagination:")
-        print(f"   location: {location}")
-        print(f"   page: {page}")
-        print(f"   limit: {limit}")
-        print(f"   activity_keywords: {activity_keywords}")
+        logger.debug("🧪 [TEST_PAGINATION] Testing pagination:")
+        logger.debug("   location: %s", location)
+        logger.debug("   page: %s", page)
+        logger.debug("   limit: %s", limit)
+        logger.debug("   activity_keywords: %s", activity_keywords)
         
         # Parse activity keywords
         parsed_keywords = None
@@ -418,7 +617,7 @@ async def test_pagination(
         
         # Calculate offset
         offset = (page - 1) * limit
-        print(f"   calculated offset: {offset}")
+        logger.debug("   calculated offset: %s", offset)
         
         # Search companies
         from ..companies.service import CompanyService
@@ -461,7 +660,7 @@ async def test_pagination(
         )
         
     except Exception as e:
-        print(f"❌ [TEST_PAGINATION] Error: {str(e)}")
+        logger.error("❌ [TEST_PAGINATION] Error: %s", str(e))
         raise HTTPException(
             status_code=500,
             detail=f"Pagination test failed: {str(e)}"
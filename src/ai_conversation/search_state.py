@@ -0,0 +1,92 @@
+"""
+Per-conversation search state
+
+Structured record of the active company search (filters, page size, cursor
+and result snapshot id). It is updated incrementally after every turn and
+stored in ``FundProfile.conversation_state['search_state']``, so continuation
+requests ("дай еще") are resolved without an LLM call or a history scan.
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass, asdict
+from typing import Optional, List, Dict, Any
+
+
+@dataclass
+class SearchState:
+    """Filters and pagination cursor of the last company search"""
+
+    location: Optional[str] = None
+    activity_keywords: Optional[List[str]] = None
+    page_size: int = 10
+    # Offset of the first result that has not been shown yet
+    cursor: int = 0
+    # Number of pages served for the current filters
+    page_number: int = 0
+    # Identifies the ordered result set (filters); a cursor is only valid for it
+    snapshot_id: Optional[str] = None
+    exhausted: bool = False
+
+    @staticmethod
+    def compute_snapshot_id(location: Optional[str], activity_keywords: Optional[List[str]]) -> str:
+        """Stable id of the result set produced by the given filters"""
+        payload = json.dumps(
+            [location or "", sorted(activity_keywords or [])],
+            ensure_ascii=False
+        )
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> Optional["SearchState"]:
+        """Restore a state saved with to_dict(); returns None for empty/invalid data"""
+        if not isinstance(data, dict) or not data.get("location"):
+            return None
+        try:
+            return cls(
+                location=data.get("location"),
+                activity_keywords=data.get("activity_keywords"),
+                page_size=int(data.get("page_size") or 10),
+                cursor=int(data.get("cursor") or 0),
+                page_number=int(data.get("page_number") or 0),
+                snapshot_id=data.get("snapshot_id") or cls.compute_snapshot_id(
+                    data.get("location"), data.get("activity_keywords")
+                ),
+                exhausted=bool(data.get("exhausted", False)),
+            )
+        except (TypeError, ValueError):
+            return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-serializable representation for conversation_state"""
+        return asdict(self)
+
+    def matches(self, location: Optional[str], activity_keywords: Optional[List[str]]) -> bool:
+        """Whether the given filters address the same result set"""
+        return self.snapshot_id == self.compute_snapshot_id(location, activity_keywords)
+
+    def record_page(
+        self,
+        location: str,
+        activity_keywords: Optional[List[str]],
+        page_size: int,
+        offset: int,
+        returned: int
+    ) -> None:
+        """
+        Apply the outcome of a served page
+
+        Starts over when the filters changed, otherwise advances the cursor
+        past the rows that were just returned.
+        """
+        snapshot_id = self.compute_snapshot_id(location, activity_keywords)
+        if snapshot_id != self.snapshot_id:
+            self.location = location
+            self.activity_keywords = activity_keywords
+            self.snapshot_id = snapshot_id
+            self.page_number = 0
+
+        self.page_size = page_size
+        self.cursor = offset + returned
+        self.page_number += 1
+        self.exhausted = returned < page_size
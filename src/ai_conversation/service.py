@@ -4,11 +4,12 @@ OpenAI service for AI conversation functionality
 Handles communication with OpenAI API for charity sponsorship matching.
 """
 
+import logging
 import asyncio
 import json
 import re
-import traceback
-from typing import Optional, Dict, Any, List
+import time
+from typing import Optional, Dict, Any, List, AsyncIterator, Tuple
 
 import openai
 from fastapi import HTTPException
@@ -20,7 +21,19 @@ from sqlalchemy.orm import Session
 # from ..core.browser import browse # Assuming you have a browser tool
 
 from ..core.config import get_settings
+from ..core.metrics import metrics
+from ..core.llm_gateway import create_openai_client, get_llm_gateway
 from ..companies.service import CompanyService
+from ..companies.enrichment import enrichment_pipeline
+from ..core.translation_service import CityTranslationService
+from .intent_parser import intent_parser
+from .search_state import SearchState
+from .history_compactor import HistoryCompactor
+from .intent_cache import IntentParseCache
+from .prefetch import PrefetchBuffer
+
+
+logger = logging.getLogger(__name__)
 
 
 class OpenAIService:
@@ -29,34 +42,79 @@ class OpenAIService:
     def __init__(self):
         self.settings = get_settings()
         openai.api_key = self.settings.openai_api_key
-        self.client = openai.AsyncOpenAI(api_key=self.settings.openai_api_key)
-
-    async def _parse_user_intent_with_history(self, history: List[Dict[str, str]]) -> Dict[str, Any]:
+        self.client = create_openai_client()
+        self.llm_gateway = get_llm_gateway()
+        self.intent_cache = IntentParseCache(
+            path=self.settings.intent_cache_path or None,
+            ttl_seconds=self.settings.intent_cache_ttl_seconds,
+            max_entries=self.settings.intent_cache_max_entries,
+            max_disk_entries=self.settings.intent_cache_max_disk_entries
+        ) if self.settings.intent_cache_enabled else None
+        # History summaries are shared between workers through their own table of the
+        # same file, apart from the intent parses (own size bound and hit rate metrics)
+        self.summary_cache = IntentParseCache(
+            path=self.settings.intent_cache_path or None,
+            ttl_seconds=self.settings.intent_cache_ttl_seconds,
+            max_entries=self.settings.intent_cache_max_entries,
+            max_disk_entries=self.settings.intent_cache_max_disk_entries,
+            table="history_summary_cache",
+            metric_prefix="history.summary_cache"
+        ) if self.settings.intent_cache_enabled else None
+        self.history_compactor = HistoryCompactor(
+            self.client,
+            keep_last_turns=self.settings.history_keep_last_turns,
+            token_budget=self.settings.history_token_budget,
+            summary_model=self.settings.history_summary_model,
+            summary_chunk_turns=self.settings.history_summary_chunk_turns,
+            shared_cache=self.summary_cache
+        )
+        self.prefetch_buffer = PrefetchBuffer(
+            ttl_seconds=self.settings.prefetch_ttl_seconds,
+            max_conversations=self.settings.prefetch_max_conversations
+        ) if self.settings.prefetch_enabled else None
+
+    async def _parse_user_intent_with_history(
+        self,
+        history: List[Dict[str, str]],
+        search_state: Optional[SearchState] = None,
+        local_parse: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
         """
         Uses OpenAI to parse the latest user message in Russian, using the full conversation history for context.
+        local_parse is the rule-based parse of the turn (made once by the caller, with the stored
+        search state); when confident enough it is returned without calling OpenAI.
         """
         
+        # --- FAST PATH: Deterministic rule-based parsing for common request shapes ---
+        if self.settings.intent_fast_path_enabled:
+            fast_path_result = local_parse
+            if fast_path_result and fast_path_result["confidence"] >= self.settings.intent_fast_path_min_confidence:
+                metrics.increment("intent.fast_path.hits")
+                logger.info("⚡ [INTENT_PARSER] Fast path hit (confidence %s), skipping OpenAI", fast_path_result['confidence'])
+                return fast_path_result
+            metrics.increment("intent.fast_path.misses")
+        
         # --- DEBUG: Add extensive logging for pagination troubleshooting ---
-        print(f"🔍 [INTENT_PARSER] Analyzing history length: {len(history)}")
-        if history:
-            print(f"🔍 [INTENT_PARSER] Last user message: {history[-1].get('content', 'N/A')[:100]}...")
+        logger.debug("🔍 [INTENT_PARSER] Analyzing history length: %s", len(history))
+        if history and search_state is None:
+            logger.debug("🔍 [INTENT_PARSER] Last user message: %s...", history[-1].get('content', 'N/A')[:100])
             
             # Find the most recent search context for debugging
             user_messages = [msg for msg in history if msg.get('role') == 'user']
-            print(f"🔍 [INTENT_PARSER] Total user messages in history: {len(user_messages)}")
+            logger.debug("🔍 [INTENT_PARSER] Total user messages in history: %s", len(user_messages))
             
             # Look for previous search requests
             search_keywords = ['найди', 'find', 'компани', 'companies', 'поиск']
             for i, msg in enumerate(reversed(user_messages)):
                 content = msg.get('content', '').lower()
                 if any(keyword in content for keyword in search_keywords):
-                    print(f"🔍 [INTENT_PARSER] Found previous search at position -{i}: {content[:100]}...")
+                    logger.debug("🔍 [INTENT_PARSER] Found previous search at position -%s: %s...", i, content[:100])
                     break
         
         # --- FALLBACK LOGIC: Pattern-based continuation detection ---
         fallback_result = self._detect_continuation_fallback(history)
         if fallback_result:
-            print(f"🔄 [INTENT_PARSER] Fallback detection succeeded, using fallback result")
+            logger.info("🔄 [INTENT_PARSER] Fallback detection succeeded, using fallback result")
             return fallback_result
         
         # --- PROMPT FIX FOR MAXIMUM CONTEXT RELIABILITY ---
@@ -136,42 +194,70 @@ class OpenAIService:
         """
         # --- PROMPT FIX ENDS HERE ---
         
-        messages_with_context = [{"role": "system", "content": system_prompt}] + history
-
         try:
-            print(f"🤖 [INTENT_PARSER] Calling OpenAI with {len(messages_with_context)} messages...")
-            response = await self.client.chat.completions.create(
+            # Keep the last turns verbatim and fold older ones into a cached summary
+            compacted_history, history_stats = await self.history_compactor.compact(history, system_prompt)
+            messages_with_context = [{"role": "system", "content": system_prompt}] + compacted_history
+            logger.debug(
+                "🧮 [INTENT_PARSER] History window: %s -> %s messages, ~%s -> ~%s tokens",
+                history_stats['original_messages'], history_stats['messages'], history_stats['original_tokens'], history_stats['tokens']
+            )
+            
+            # Temperature is 0, so an identical window always parses the same way
+            cache_key = None
+            if self.intent_cache is not None:
+                cache_key = IntentParseCache.make_key(compacted_history, model="gpt-4o", prompt=system_prompt)
+                cached_result = await self.intent_cache.get(cache_key)
+                if cached_result is not None:
+                    logger.info("⚡ [INTENT_PARSER] Cache hit, skipping OpenAI")
+                    return cached_result
+            
+            logger.debug("🤖 [INTENT_PARSER] Calling OpenAI with %s messages...", len(messages_with_context))
+            metrics.increment("intent.llm_calls")
+            response = await self.llm_gateway.call(
+                self.client.chat.completions,
+                "create",
+                label="intent_parse",
+                coalesce=True,  # temperature 0: identical windows give identical parses
                 model="gpt-4o",
                 messages=messages_with_context,
                 response_format={"type": "json_object"},
                 temperature=0.0 # Устанавливаем 0 для максимальной предсказуемости
             )
             
+            if response.usage:
+                logger.debug(
+                    "🧮 [INTENT_PARSER] Token usage: prompt=%s, completion=%s, total=%s",
+                    response.usage.prompt_tokens, response.usage.completion_tokens, response.usage.total_tokens
+                )
+            
             result = json.loads(response.choices[0].message.content)
             
+            if cache_key and isinstance(result, dict) and result.get("intent"):
+                await self.intent_cache.set(cache_key, result)
+            
             # --- DEBUG: Log the parsed result ---
-            print(f"✅ [INTENT_PARSER] OpenAI response:")
-            print(f"   Intent: {result.get('intent')}")
-            print(f"   Location: {result.get('location')}")
-            print(f"   Activity Keywords: {result.get('activity_keywords')}")
-            print(f"   Quantity: {result.get('quantity')}")
-            print(f"   Page Number: {result.get('page_number')}")
-            print(f"   Reasoning: {result.get('reasoning', '')[:100]}...")
+            logger.info("✅ [INTENT_PARSER] OpenAI response:")
+            logger.debug("   Intent: %s", result.get('intent'))
+            logger.debug("   Location: %s", result.get('location'))
+            logger.debug("   Activity Keywords: %s", result.get('activity_keywords'))
+            logger.debug("   Quantity: %s", result.get('quantity'))
+            logger.debug("   Page Number: %s", result.get('page_number'))
+            logger.debug("   Reasoning: %s...", result.get('reasoning', '')[:100])
             
             return result
             
         except Exception as e:
             # Enhanced error logging
-            print(f"❌ Error during OpenAI intent parsing: {e}")
-            print(f"🔍 History length: {len(history)}")
-            print(f"🔍 Last user message: {history[-1].get('content', 'N/A') if history else 'No history'}")
-            traceback.print_exc()
+            logger.exception("❌ Error during OpenAI intent parsing: %s", e)
+            logger.debug("🔍 History length: %s", len(history))
+            logger.debug("🔍 Last user message: %s", history[-1].get('content', 'N/A') if history else 'No history')
             
             # Try fallback again if OpenAI fails completely
-            print(f"🔄 [INTENT_PARSER] Trying fallback detection after OpenAI failure...")
+            logger.info("🔄 [INTENT_PARSER] Trying fallback detection after OpenAI failure...")
             fallback_after_error = self._detect_continuation_fallback(history)
             if fallback_after_error:
-                print(f"✅ [INTENT_PARSER] Fallback succeeded after OpenAI error")
+                logger.info("✅ [INTENT_PARSER] Fallback succeeded after OpenAI error")
                 return fallback_after_error
             
             return {
@@ -193,7 +279,7 @@ class OpenAIService:
             return None
             
         current_message = history[-1].get('content', '').lower().strip()
-        print(f"🔄 [FALLBACK] Analyzing current message: {current_message}")
+        logger.debug("🔄 [FALLBACK] Analyzing current message: %s", current_message)
         
         # Continuation patterns
         continuation_patterns = [
@@ -215,10 +301,10 @@ class OpenAIService:
         is_continuation = any(re.search(pattern, current_message) for pattern in continuation_patterns)
         
         if not is_continuation:
-            print(f"🔄 [FALLBACK] Not a continuation request")
+            logger.debug("🔄 [FALLBACK] Not a continuation request")
             return None
             
-        print(f"🔄 [FALLBACK] Detected continuation request")
+        logger.debug("🔄 [FALLBACK] Detected continuation request")
         
         # Extract quantity from current message
         quantity_match = re.search(r'\b(\d+)\b', current_message)
@@ -286,7 +372,7 @@ class OpenAIService:
                 break
         
         if not location:
-            print(f"🔄 [FALLBACK] No location found in history")
+            logger.debug("🔄 [FALLBACK] No location found in history")
             return None
             
         # Count previous continuation requests to determine page number
@@ -300,11 +386,11 @@ class OpenAIService:
                 
         page_number = 2 + continuation_count
         
-        print(f"🔄 [FALLBACK] Detected context:")
-        print(f"   location: {location}")
-        print(f"   activity_keywords: {activity_keywords}")
-        print(f"   quantity: {quantity}")
-        print(f"   page_number: {page_number}")
+        logger.debug("🔄 [FALLBACK] Detected context:")
+        logger.debug("   location: %s", location)
+        logger.debug("   activity_keywords: %s", activity_keywords)
+        logger.debug("   quantity: %s", quantity)
+        logger.debug("   page_number: %s", page_number)
         
         return {
             "intent": "find_companies",
@@ -316,54 +402,181 @@ class OpenAIService:
             "preliminary_response": f"Конечно! Ищу следующую группу из {quantity} компаний в {location}. Подождите, пожалуйста."
         }
 
-    async def _enrich_companies_with_web_search(self, companies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def _search_window(self, intent_data: Dict[str, Any], state: Optional[SearchState]) -> Tuple[int, int]:
         """
-        Enriches company data with information from web searches (website, contacts, tax info).
+        LIMIT and OFFSET of the DB search for a parsed intent
+        
+        The quantity is capped at 200; continuations of the stored result set resume at its cursor.
         """
-        async def search_for_company(company: Dict[str, Any]):
-            company['website'] = "Не найден"
-            company['contacts'] = "Не найдены"
-            company['tax_info'] = "Информация не найдена"
-            
-            # 1. Search for official website and contacts on Google
-            try:
-                search_query = f"{company['name']} {company.get('locality', '')} официальный сайт контакты"
-                # This is a placeholder for your actual browse tool call
-                # search_results = await browse(urls=[f"https://www.google.com/search?q={search_query}"])
-                #
-                # TODO: Parse the HTML content of search_results[0].content 
-                # to find the official website URL and contact details (phone, email).
-                # Example (conceptual):
-                # company['website'] = find_website_in_html(search_results[0].content)
-                # company['contacts'] = find_contacts_in_html(search_results[0].content)
-                pass # Remove this once you implement the parsing logic
-            except Exception:
-                pass # Ignore errors during search
-
-            # 2. Search for tax information using BIN
-            if company.get('bin'):
-                try:
-                    tax_url = f"https://kgd.gov.kz/ru/services/taxpayer_search/legal_entity?bin={company['bin']}"
-                    # tax_results = await browse(urls=[tax_url])
-                    #
-                    # TODO: Parse the HTML of tax_results[0].content to find tax debt status.
-                    # This requires inspecting the page structure of the tax portal.
-                    # Example (conceptual):
-                    # company['tax_info'] = find_tax_status_in_html(tax_results[0].content)
-                    pass # Remove this once you implement the parsing logic
-                except Exception:
-                    pass
-
-            return company
+        raw_quantity = intent_data.get("quantity")
+        default_limit = 10
+        max_limit = 200
+        search_limit = default_limit
 
         try:
-            enriched_companies = await asyncio.gather(*(search_for_company(c) for c in companies))
-            return enriched_companies
+            parsed_quantity = int(raw_quantity) if raw_quantity else default_limit
+            if parsed_quantity > 0:
+                search_limit = min(parsed_quantity, max_limit)
+        except (ValueError, TypeError):
+            logger.warning("⚠️ Could not parse quantity '%s'. Using default limit of %s.", raw_quantity, default_limit)
+            search_limit = default_limit
+
+        page = intent_data.get("page_number") or 1
+        if intent_data.get("offset") is not None:
+            # Resolved from the stored search state by the fast path
+            offset = int(intent_data["offset"])
+        elif state and page > 1 and state.matches(intent_data.get("location"), intent_data.get("activity_keywords")):
+            # Same result set as the previous page: continue from the cursor
+            offset = state.cursor
+        else:
+            offset = (page - 1) * search_limit
+        return search_limit, offset
+
+    def _start_speculative_search(
+        self,
+        guess: Optional[Dict[str, Any]],
+        state: Optional[SearchState]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Launch the DB search from the rule-based parse while the LLM parses the intent.
+        
+        Returns None when there is no LLM latency to hide (the fast path will answer on its own)
+        or the local parse has no usable search parameters.
+        """
+        if not self.settings.speculative_search_enabled:
+            return None
+        if not guess or guess.get("intent") != "find_companies" or not guess.get("location"):
+            return None
+        if (
+            self.settings.intent_fast_path_enabled
+            and guess["confidence"] >= self.settings.intent_fast_path_min_confidence
+        ):
+            return None
+        if guess["confidence"] < self.settings.speculative_search_min_confidence:
+            return None
+
+        limit, offset = self._search_window(guess, state)
+        speculation: Dict[str, Any] = {
+            "location": guess["location"],
+            "activity_keywords": guess.get("activity_keywords"),
+            "limit": limit,
+            "offset": offset,
+            "started_at": time.perf_counter(),
+            "finished_at": None,
+        }
+
+        async def run_search() -> List[Dict[str, Any]]:
+            companies = await CompanyService.search_companies_isolated(
+                location=speculation["location"],
+                activity_keywords=speculation["activity_keywords"],
+                limit=limit,
+                offset=offset
+            )
+            speculation["finished_at"] = time.perf_counter()
+            return companies
+
+        speculation["task"] = asyncio.create_task(run_search())
+        metrics.increment("search.speculative.started")
+        logger.info(
+            "🔮 [SPECULATIVE] Started search: %s, %s, limit=%s, offset=%s",
+            guess['location'], guess.get('activity_keywords'), limit, offset
+        )
+        return speculation
+
+    async def _resolve_speculative_search(
+        self,
+        speculation: Optional[Dict[str, Any]],
+        location: Optional[str],
+        activity_keywords: Optional[List[str]],
+        limit: int,
+        offset: int,
+        parse_finished_at: float
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Results of the speculative search if it ran with the parameters the LLM chose
+        
+        Returns None (after cancelling it) on a mismatch, so the caller runs the real search.
+        """
+        if speculation is None:
+            return None
+
+        def normalize(place: Optional[str], keywords: Optional[List[str]]):
+            place = CityTranslationService.translate_city_name(place) if place else None
+            return place, sorted(k.lower() for k in keywords or [])
+
+        same_query = (
+            normalize(speculation["location"], speculation["activity_keywords"])
+            == normalize(location, activity_keywords)
+            and speculation["limit"] == limit
+            and speculation["offset"] == offset
+        )
+        if not same_query:
+            self._cancel_speculative_search(speculation)
+            metrics.increment("search.speculative.misses")
+            logger.info("🔮 [SPECULATIVE] Miss: LLM chose different search parameters")
+            return None
+
+        try:
+            companies = await speculation["task"]
         except Exception as e:
-            print(f"⚠️ Warning: Failed to enrich companies with web search: {e}")
+            metrics.increment("search.speculative.errors")
+            logger.warning("⚠️ [SPECULATIVE] Speculative search failed, running the regular search: %s", e)
+            return None
+
+        # The regular search would have started when the parse finished
+        search_seconds = speculation["finished_at"] - speculation["started_at"]
+        saved_seconds = max(0.0, min(search_seconds, parse_finished_at - speculation["started_at"]))
+        metrics.increment("search.speculative.hits")
+        metrics.increment("search.speculative.saved_ms", saved_seconds * 1000)
+        logger.info("🔮 [SPECULATIVE] Hit: reused %s companies, saved ~%.0fms", len(companies), saved_seconds * 1000)
+        return companies
+
+    @staticmethod
+    def _cancel_speculative_search(speculation: Optional[Dict[str, Any]]) -> None:
+        """Stop waiting for an unused speculative search (its thread closes its own session)"""
+        if speculation is None:
+            return
+        task = speculation["task"]
+        if task.done():
+            if not task.cancelled():
+                task.exception()  # mark a failure as retrieved
+            return
+        task.cancel()
+        metrics.increment("search.speculative.cancelled")
+
+    async def _enrich_companies_with_web_search(self, companies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Enriches company data with website, contacts and tax info.
+        Delegates to the enrichment pipeline (cached, bounded per provider).
+        """
+        try:
+            return await enrichment_pipeline.enrich(companies)
+        except Exception as e:
+            logger.warning("⚠️ Warning: Failed to enrich companies: %s", e)
             # Return original companies if enrichment fails
             return companies
 
+    async def _enrich_in_batches(
+        self,
+        companies: List[Dict[str, Any]],
+        batch_size: int
+    ) -> AsyncIterator[Tuple[int, List[Dict[str, Any]]]]:
+        """
+        Enrich all batches concurrently, yielding (start index, enriched batch)
+        as each one completes (not necessarily in order)
+        """
+        async def enrich(start: int) -> Tuple[int, List[Dict[str, Any]]]:
+            return start, await self._enrich_companies_with_web_search(companies[start:start + batch_size])
+
+        tasks = [asyncio.create_task(enrich(start)) for start in range(0, len(companies), batch_size)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The consumer went away (e.g. the client disconnected)
+            for task in tasks:
+                task.cancel()
+
     async def _generate_summary_response(self, history: List[Dict[str, str]], companies_data: List[Dict[str, Any]]) -> str:
         """
         Generates a final, natural language response in Russian with structured formatting.
@@ -439,26 +652,64 @@ class OpenAIService:
         user_input: str,
         history: List[Dict[str, str]],
         db: Session,
-        conversation_id: Optional[str] = None # Added for persistence
+        conversation_id: Optional[str] = None, # Added for persistence
+        search_state: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """
         The main logic loop for a single turn of conversation with persistence.
         CRITICAL FIX: Robust error handling to ensure conversation history is ALWAYS maintained.
+        
+        search_state is the stored SearchState dict of the conversation; the updated
+        state is returned under 'search_state' for the caller to persist.
+        """
+        response_data: Dict[str, Any] = {}
+        # Nothing consumes the intermediate events: enrich the whole page in one batch
+        async for event in self.stream_conversation_turn(
+            user_input=user_input,
+            history=history,
+            db=db,
+            conversation_id=conversation_id,
+            search_state=search_state,
+            stream_batches=False
+        ):
+            if event["event"] == "final":
+                response_data = event["data"]
+        return response_data
+
+    async def stream_conversation_turn(
+        self,
+        user_input: str,
+        history: List[Dict[str, str]],
+        db: Session,
+        conversation_id: Optional[str] = None,
+        search_state: Optional[Dict[str, Any]] = None,
+        stream_batches: bool = True
+    ) -> AsyncIterator[Dict[str, Any]]:
         """
+        Same turn as handle_conversation_turn, emitted as events as soon as each part is ready:
         
-        print(f"🚀 Starting conversation turn with history length: {len(history) if history else 0}")
-        print(f"💬 User input: {user_input[:100]}...")
+        - {"event": "preliminary", "data": {...}} right after intent parsing
+        - {"event": "companies", "data": {"companies": [...], "offset": n}} per enriched batch
+        - {"event": "final", "data": response_data} with the full response dict
+        
+        With stream_batches, the page is enriched in STREAM_BATCH_SIZE batches that run
+        concurrently and are emitted as they complete (offsets may arrive out of order);
+        otherwise as one batch.
+        """
+        
+        logger.info("🚀 Starting conversation turn with history length: %s", len(history) if history else 0)
+        logger.debug("💬 User input: %s...", user_input[:100])
         
         # CRITICAL: Initialize conversation history properly
         if not isinstance(history, list):
-            print("⚠️ Warning: History is not a list, initializing empty")
+            logger.warning("⚠️ Warning: History is not a list, initializing empty")
             history = []
         
         conversation_history = history.copy()
 
         # CRITICAL: Always add user message to history first
         conversation_history.append({"role": "user", "content": user_input})
-        print(f"📝 Added user message, history now has {len(conversation_history)} items")
+        logger.debug("📝 Added user message, history now has %s items", len(conversation_history))
 
         # Initialize default response values
         intent = "unclear"
@@ -469,11 +720,22 @@ class OpenAIService:
         page = 1
         final_message = preliminary_response
         companies_data = []
+        state = SearchState.from_dict(search_state)
+        search_limit = 10
+        intent_data: Dict[str, Any] = {}
+
+        # One rule-based parse feeds both the fast path and the speculative search
+        local_parse = intent_parser.parse(conversation_history, search_state=state)
+        # Start the DB search from the local parse while the LLM parse is in flight
+        speculation = self._start_speculative_search(local_parse, state)
 
         try:
             # 2. Parse the user's intent
-            print("🔍 Parsing user intent...")
-            intent_data = await self._parse_user_intent_with_history(conversation_history)
+            logger.debug("🔍 Parsing user intent...")
+            intent_data = await self._parse_user_intent_with_history(
+                conversation_history, search_state=state, local_parse=local_parse
+            )
+            parse_finished_at = time.perf_counter()
             
             # Extract intent data safely
             intent = intent_data.get("intent", "unclear")
@@ -483,109 +745,147 @@ class OpenAIService:
             preliminary_response = intent_data.get("preliminary_response", "Обрабатываю ваш запрос...")
             page = intent_data.get("page_number", 1)
             
-            print(f"🎯 Intent parsed: {intent}, location: {location}, keywords: {activity_keywords}")
+            logger.info("🎯 Intent parsed: %s, location: %s, keywords: %s", intent, location, activity_keywords)
             
             # Calculate search parameters
             raw_quantity = intent_data.get("quantity") 
-            default_limit = 10
-            max_limit = 200
-            search_limit = default_limit
-
-            try:
-                parsed_quantity = int(raw_quantity) if raw_quantity else default_limit
-                if parsed_quantity > 0:
-                    search_limit = min(parsed_quantity, max_limit)
-            except (ValueError, TypeError):
-                print(f"⚠️ Could not parse quantity '{raw_quantity}'. Using default limit of {default_limit}.")
-                search_limit = default_limit
-
-            offset = (page - 1) * search_limit
-            print(f"📊 Search params: limit={search_limit}, offset={offset}, page={page}")
+            search_limit, offset = self._search_window(intent_data, state)
+            logger.debug("📊 Search params: limit=%s, offset=%s, page=%s", search_limit, offset, page)
             
             # --- DEBUG: Add detailed pagination debugging ---
-            print(f"🔢 [PAGINATION] Detailed calculation:")
-            print(f"   Raw quantity from OpenAI: {raw_quantity}")
-            print(f"   Parsed search_limit: {search_limit}")  
-            print(f"   Page number from OpenAI: {page}")
-            print(f"   Calculated offset: {offset} = ({page} - 1) * {search_limit}")
-            print(f"   Final query will be: LIMIT {search_limit} OFFSET {offset}")
+            logger.debug("🔢 [PAGINATION] Detailed calculation:")
+            logger.debug("   Raw quantity from OpenAI: %s", raw_quantity)
+            logger.debug("   Parsed search_limit: %s", search_limit)
+            logger.debug("   Page number from OpenAI: %s", page)
+            logger.debug("   Calculated offset: %s = (%s - 1) * %s", offset, page, search_limit)
+            logger.debug("   Final query will be: LIMIT %s OFFSET %s", search_limit, offset)
             
             final_message = preliminary_response
+            
+            yield {
+                "event": "preliminary",
+                "data": {
+                    "message": preliminary_response,
+                    "intent": intent,
+                    "location_detected": location,
+                    "activity_keywords": activity_keywords,
+                    "quantity_requested": search_limit
+                }
+            }
 
             # 3. If intent is to find companies, fetch data from DB
             if intent == "find_companies" and location:
-                print(f"🏢 Searching for companies in {location}...")
-                print(f"🔍 [DATABASE] Query parameters:")
-                print(f"   location: {location}")
-                print(f"   activity_keywords: {activity_keywords}")
-                print(f"   limit: {search_limit}")
-                print(f"   offset: {offset}")
+                logger.debug("🏢 Searching for companies in %s...", location)
+                logger.debug("🔍 [DATABASE] Query parameters:")
+                logger.debug("   location: %s", location)
+                logger.debug("   activity_keywords: %s", activity_keywords)
+                logger.debug("   limit: %s", search_limit)
+                logger.debug("   offset: %s", offset)
                 
                 try:
-                    company_service = CompanyService(db)
-                    db_companies = await company_service.search_companies(
-                        location=location,
-                        activity_keywords=activity_keywords,
-                        limit=search_limit,
-                        offset=offset
-                    )
+                    db_companies = None
+                    if (
+                        self.prefetch_buffer is not None and conversation_id
+                        and state and state.matches(location, activity_keywords) and offset == state.cursor
+                    ):
+                        # Continuation of the previous page: the next page may already be buffered
+                        db_companies = await self.prefetch_buffer.take(
+                            conversation_id, state.snapshot_id, limit=search_limit, offset=offset
+                        )
+                    if db_companies is None:
+                        db_companies = await self._resolve_speculative_search(
+                            speculation, location, activity_keywords, search_limit, offset, parse_finished_at
+                        )
+                        speculation = None
+                    if db_companies is None:
+                        company_service = CompanyService(db)
+                        db_companies = await company_service.search_companies(
+                            location=location,
+                            activity_keywords=activity_keywords,
+                            limit=search_limit,
+                            offset=offset
+                        )
                     
-                    print(f"📈 Found {len(db_companies) if db_companies else 0} companies in database")
-                    print(f"🔍 [DATABASE] Query returned {len(db_companies) if db_companies else 0} results")
+                    logger.info("📈 Found %s companies in database", len(db_companies) if db_companies else 0)
+                    
+                    # Advance the per-conversation search state
+                    state = state or SearchState()
+                    state.record_page(location, activity_keywords, search_limit, offset, len(db_companies or []))
+                    if self.prefetch_buffer is not None and conversation_id and not state.exhausted:
+                        # "Дай еще" is the most common follow-up: fetch the next page in the background
+                        self.prefetch_buffer.schedule(
+                            conversation_id, state.snapshot_id, location, activity_keywords,
+                            limit=search_limit, offset=state.cursor
+                        )
+                    logger.debug("🔍 [DATABASE] Query returned %s results", len(db_companies) if db_companies else 0)
                     
                     # --- DEBUG: Log first few company names for verification ---
                     if db_companies:
-                        print(f"🏢 [DATABASE] First few companies returned:")
+                        logger.debug("🏢 [DATABASE] First few companies returned:")
                         for i, company in enumerate(db_companies[:3]):
-                            print(f"   {i+1}. {company.get('name', 'N/A')} (ID: {company.get('id', 'N/A')[:8]}...)")
+                            logger.debug("   %s. %s (ID: %s...)", i+1, company.get('name', 'N/A'), company.get('id', 'N/A')[:8])
                         if len(db_companies) > 3:
-                            print(f"   ... and {len(db_companies) - 3} more companies")
+                            logger.debug("   ... and %s more companies", len(db_companies) - 3)
                     else:
-                        print(f"⚠️ [DATABASE] No companies returned - this might indicate:")
-                        print(f"   - End of results reached (no more companies match criteria)")
-                        print(f"   - Query parameters don't match any records")
-                        print(f"   - Database connectivity issue")
+                        logger.info("⚠️ [DATABASE] No companies returned - this might indicate:")
+                        logger.debug("   - End of results reached (no more companies match criteria)")
+                        logger.debug("   - Query parameters don't match any records")
+                        logger.debug("   - Database connectivity issue")
                     
                     if db_companies:
-                        # 4. Enrich DB data with web search results
-                        print("🌐 Enriching companies with web search...")
-                        enriched_companies = await self._enrich_companies_with_web_search(db_companies)
-                        companies_data = enriched_companies
+                        # 4. Enrich DB data with web search results; streaming clients
+                        # receive each batch as soon as it is ready
+                        logger.info("🌐 Enriching companies with web search...")
+                        if stream_batches:
+                            batch_size = max(self.settings.stream_batch_size, 1)
+                        else:
+                            batch_size = len(db_companies)
+                        enriched_batches: Dict[int, List[Dict[str, Any]]] = {}
+                        async for start, enriched_batch in self._enrich_in_batches(db_companies, batch_size):
+                            enriched_batches[start] = enriched_batch
+                            yield {
+                                "event": "companies",
+                                "data": {"companies": enriched_batch, "offset": offset + start}
+                            }
+                        # Keep the database order in the response
+                        for start in sorted(enriched_batches):
+                            companies_data.extend(enriched_batches[start])
                         
                         # 5. Generate a final summary response with all data
-                        print("✍️ Generating summary response...")
+                        logger.info("✍️ Generating summary response...")
                         final_message = await self._generate_summary_response(conversation_history, companies_data)
                     else:
                         final_message = f"Я искал компании в {location}, но не смог найти больше результатов, соответствующих вашему запросу. Может, попробуем другой город или изменим ключевые слова?"
                         
                 except Exception as e:
-                    print(f"❌ Error during company search: {e}")
+                    logger.exception("❌ Error during company search: %s", e)
                     # Roll back the current database transaction so the session can continue
                     try:
                         if db:
                             db.rollback()
                     except Exception as rollback_error:
-                        print(f"⚠️ Could not rollback session after error: {rollback_error}")
-                    traceback.print_exc()
+                        logger.warning("⚠️ Could not rollback session after error: %s", rollback_error)
                     final_message = f"Произошла ошибка при поиске компаний. Пожалуйста, попробуйте еще раз."
             
             elif intent == "find_companies" and not location:
                 final_message = "Чтобы найти компании, мне нужно знать, в каком городе или регионе вы хотите искать. Пожалуйста, укажите местоположение."
                 
         except Exception as e:
-            print(f"❌ Critical error during conversation processing: {e}")
+            logger.exception("❌ Critical error during conversation processing: %s", e)
             # Roll back in case the session is in a failed state so that outer callers can continue safely
             try:
                 if db:
                     db.rollback()
             except Exception as rollback_error:
-                print(f"⚠️ Could not rollback session after critical error: {rollback_error}")
-            traceback.print_exc()
+                logger.warning("⚠️ Could not rollback session after critical error: %s", rollback_error)
             final_message = "Извините, произошла техническая ошибка. Попробуйте переформулировать ваш вопрос."
+        finally:
+            # The LLM chose not to search (or the turn failed): drop the speculative query
+            self._cancel_speculative_search(speculation)
 
         # CRITICAL: Always append the final AI response to history
         conversation_history.append({"role": "assistant", "content": final_message})
-        print(f"✅ Added AI response, final history length: {len(conversation_history)}")
+        logger.info("✅ Added AI response, final history length: %s", len(conversation_history))
 
         # 7. Save updated history to the database (if implementation exists)
         # if conversation_id and db: ...
@@ -604,12 +904,13 @@ class OpenAIService:
             'quantity_requested': search_limit,
             'companies_found': companies_found_count,
             'has_more_companies': has_more,
-            'reasoning': intent_data.get('reasoning') if 'intent_data' in locals() else None,
+            'reasoning': intent_data.get('reasoning'),
+            'search_state': state.to_dict() if state else None,
             # 'conversation_id': conversation_id
         }
         
-        print(f"📤 Returning response with {len(response_data['updated_history'])} history items")
-        return response_data
+        logger.info("📤 Returning response with %s history items", len(response_data['updated_history']))
+        yield {"event": "final", "data": response_data}
 
     async def handle_conversation_with_assistant_fallback(
         self,
@@ -625,7 +926,7 @@ class OpenAIService:
         """
         try:
             # First, try using the enhanced assistant
-            print("🤖 [SERVICE] Attempting to use enhanced assistant...")
+            logger.debug("🤖 [SERVICE] Attempting to use enhanced assistant...")
             from .assistant_creator import handle_conversation_with_context
             
             response_data = await handle_conversation_with_context(
@@ -634,12 +935,12 @@ class OpenAIService:
                 db=db
             )
             
-            print("✅ [SERVICE] Enhanced assistant succeeded")
+            logger.info("✅ [SERVICE] Enhanced assistant succeeded")
             return response_data
             
         except Exception as assistant_error:
-            print(f"⚠️ [SERVICE] Enhanced assistant failed: {str(assistant_error)}")
-            print("🔄 [SERVICE] Falling back to traditional OpenAI service...")
+            logger.warning("⚠️ [SERVICE] Enhanced assistant failed: %s", str(assistant_error))
+            logger.info("🔄 [SERVICE] Falling back to traditional OpenAI service...")
             
             try:
                 # Fallback to traditional service
@@ -654,13 +955,13 @@ class OpenAIService:
                 original_message = response_data.get('message', '')
                 response_data['message'] = f"{original_message}\n\n(Обработано с использованием базового сервиса)"
                 
-                print("✅ [SERVICE] Traditional service fallback succeeded")
+                logger.info("✅ [SERVICE] Traditional service fallback succeeded")
                 return response_data
                 
             except Exception as fallback_error:
-                print(f"❌ [SERVICE] Both assistant and traditional service failed")
-                print(f"   Assistant error: {str(assistant_error)}")
-                print(f"   Fallback error: {str(fallback_error)}")
+                logger.error("❌ [SERVICE] Both assistant and traditional service failed")
+                logger.debug("   Assistant error: %s", str(assistant_error))
+                logger.debug("   Fallback error: %s", str(fallback_error))
                 
                 # Last resort: preserve history and return error
                 error_history = history.copy()
@@ -0,0 +1,269 @@
+"""
+Server-sent events streaming for the chat endpoints
+
+The blocking chat endpoints only answer once intent parsing, the DB search,
+enrichment and the summary are all done. The streaming variants emit the
+same turn as SSE events in order:
+
+- ``preliminary``: preliminary text, available right after intent parsing
+- ``companies``: company batches as soon as they are enriched; on the
+  assistant and completions engines, as soon as a tool call returns them
+- ``final``: final message and metadata plus the history delta
+- ``error``: the turn failed; the client keeps its history
+"""
+
+import logging
+import asyncio
+import json
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, List, Optional
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from ..core.config import get_settings
+from ..core.database import SessionLocal
+from ..core.telemetry import llm_telemetry
+from .intent_parser import intent_parser
+from .service import ai_service
+from .tool_executor import companies_listener
+
+
+logger = logging.getLogger(__name__)
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    # Disable proxy buffering (nginx) so events reach mobile clients immediately
+    "X-Accel-Buffering": "no",
+}
+
+DEFAULT_PRELIMINARY_MESSAGE = "Обрабатываю ваш запрос, подождите немного..."
+ERROR_MESSAGE = "Извините, произошла ошибка при обработке вашего запроса. Пожалуйста, попробуйте еще раз."
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Encode one SSE frame"""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+def final_event_data(response_data: Dict[str, Any], history_length: int) -> Dict[str, Any]:
+    """
+    Payload of the ``final`` event
+
+    Companies were already sent in ``companies`` events and the client holds
+    the history it sent, so only the new history items are included. Turns of
+    the delta history protocol already carry their ``history_mode``.
+    """
+    updated_history = response_data.get("updated_history") or []
+    data = {
+        key: value for key, value in response_data.items()
+        if key not in ("updated_history", "companies_data")
+    }
+    if data.get("history_mode") == "delta":
+        return data
+    if data.get("history_mode") == "full":
+        data["history_delta"] = updated_history
+        data["history_reset"] = True
+    elif len(updated_history) >= history_length:
+        data["history_delta"] = updated_history[history_length:]
+    else:
+        # History was rewritten server-side, the client has to replace it
+        data["history_delta"] = updated_history
+        data["history_reset"] = True
+    data["history_length"] = len(updated_history)
+    return data
+
+
+def companies_events(
+    companies: List[Dict[str, Any]],
+    batch_size: Optional[int] = None,
+    offset: int = 0
+) -> List[Dict[str, Any]]:
+    """Split an already complete company list into ``companies`` events"""
+    batch_size = max(batch_size or get_settings().stream_batch_size, 1)
+    return [
+        {"event": "companies", "data": {"companies": companies[start:start + batch_size], "offset": offset + start}}
+        for start in range(0, len(companies), batch_size)
+    ]
+
+
+async def engine_turn_events(
+    run_turn: Callable[[], Awaitable[Dict[str, Any]]]
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run an assistant/completions engine turn, emitting the companies of each
+    tool step as ``companies`` events while the model is still working, then
+    the ``final`` event with the turn's response
+    """
+    from .function_calling import to_company_data
+
+    found: asyncio.Queue = asyncio.Queue()
+    # The task copies the context, listener included
+    with companies_listener(found.put_nowait):
+        task = asyncio.create_task(run_turn())
+    task.add_done_callback(lambda _: found.put_nowait(None))
+
+    emitted = 0
+    try:
+        while True:
+            companies = await found.get()
+            if companies is None:
+                break
+            for event in companies_events([to_company_data(company) for company in companies], offset=emitted):
+                yield event
+            emitted += len(companies)
+        response_data = await task
+    finally:
+        # The consumer went away (e.g. the client disconnected)
+        if not task.done():
+            task.cancel()
+
+    yield {"event": "final", "data": response_data}
+
+
+def preliminary_message(user_input: str, history: List[Dict[str, str]]) -> str:
+    """
+    Preliminary text for the assistant endpoints, which have no intent parse
+    step of their own; uses the local rule-based parser when it understands the request
+    """
+    try:
+        parsed = intent_parser.parse(history + [{"role": "user", "content": user_input}])
+    except Exception as e:
+        logger.warning("⚠️ [STREAM] Rule-based preliminary failed: %s", e)
+        parsed = None
+    if parsed and parsed.get("preliminary_response"):
+        return parsed["preliminary_response"]
+    return DEFAULT_PRELIMINARY_MESSAGE
+
+
+async def stream_assistant_turn(
+    user_input: str,
+    history: List[Dict[str, str]],
+    db: Session,
+    assistant_id: Optional[str] = None,
+    thread_id: Optional[str] = None,
+    engine: str = "assistants"
+) -> AsyncIterator[Dict[str, Any]]:
+    """Streaming variant of /ai/chat-assistant"""
+    from .assistant_creator import handle_conversation_with_context
+    from .function_calling import handle_conversation_with_completions
+
+    yield {"event": "preliminary", "data": {"message": preliminary_message(user_input, history)}}
+
+    if engine == "completions":
+        def run_turn():
+            return handle_conversation_with_completions(
+                user_input=user_input,
+                conversation_history=history
+            )
+    else:
+        def run_turn():
+            return handle_conversation_with_context(
+                user_input=user_input,
+                conversation_history=history,
+                db=db,
+                assistant_id=assistant_id,
+                thread_id=thread_id
+            )
+    async for event in engine_turn_events(run_turn):
+        yield event
+
+
+async def stream_hybrid_turn(
+    user_input: str,
+    history: List[Dict[str, str]],
+    db: Session
+) -> AsyncIterator[Dict[str, Any]]:
+    """Streaming variant of /ai/chat-hybrid: assistant first, traditional turn as fallback"""
+    from .assistant_creator import handle_conversation_with_context
+
+    yield {"event": "preliminary", "data": {"message": preliminary_message(user_input, history)}}
+
+    emitted_companies = False
+    try:
+        logger.debug("🤖 [STREAM] Attempting to use enhanced assistant...")
+        async for event in engine_turn_events(lambda: handle_conversation_with_context(
+            user_input=user_input,
+            conversation_history=history,
+            db=db
+        )):
+            emitted_companies = emitted_companies or event["event"] == "companies"
+            yield event
+        return
+    except Exception as assistant_error:
+        if emitted_companies:
+            # The client already has part of the assistant's results
+            raise
+        logger.warning("⚠️ [STREAM] Enhanced assistant failed: %s", str(assistant_error))
+        logger.info("🔄 [STREAM] Falling back to traditional OpenAI service...")
+        async for event in ai_service.stream_conversation_turn(
+            user_input=user_input,
+            history=history,
+            db=db
+        ):
+            yield event
+
+
+async def session_scoped(
+    make_events: Callable[[Session], AsyncIterator[Dict[str, Any]]]
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run a stream with its own DB session
+
+    The request-scoped get_db session may already be closed when the body of
+    a StreamingResponse runs, so streams never use it.
+    """
+    db = SessionLocal()
+    try:
+        async for event in make_events(db):
+            yield event
+    finally:
+        db.close()
+
+
+async def llm_turn_scoped(
+    events: AsyncIterator[Dict[str, Any]],
+    endpoint: str,
+    user_id: Optional[str] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Attribute the LLM calls made while producing ``events`` to one turn of ``endpoint``"""
+    with llm_telemetry.turn(endpoint, user_id=user_id):
+        async for event in events:
+            yield event
+
+
+async def encode_events(
+    events: AsyncIterator[Dict[str, Any]],
+    history_length: int
+) -> AsyncIterator[str]:
+    """Turn service events into SSE frames; failures become an ``error`` event"""
+    try:
+        async for event in events:
+            data = event["data"]
+            if event["event"] == "final":
+                data = final_event_data(data, history_length)
+            yield format_sse(event["event"], data)
+    except Exception as e:
+        logger.error("❌ [STREAM] Error while streaming chat turn: %s", str(e))
+        yield format_sse("error", {"message": ERROR_MESSAGE})
+
+
+def sse_response(events: AsyncIterator[Dict[str, Any]], history_length: int) -> StreamingResponse:
+    """
+    StreamingResponse for a chat turn
+
+    Args:
+        events: Event iterator such as ai_service.stream_conversation_turn(...)
+        history_length: Length of the history the turn started from; the
+            final event carries only the items added after it
+
+    Example:
+        >>> return sse_response(stream_hybrid_turn(user_input, history, db), len(history))
+    """
+    return StreamingResponse(
+        encode_events(events, history_length),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
@@ -0,0 +1,195 @@
+"""
+Local mirror of OpenAI Assistants threads
+
+Every message the application writes to a thread, and every assistant reply
+it receives from a run, is also stored in the database with a content hash.
+History syncs then diff the client's history against the mirror instead of
+downloading the thread, only the missing messages are sent to OpenAI, and
+the updated history after a run is read locally. When a run's reply was
+not captured, only the messages after the last synced message id are fetched.
+
+A thread without a mirror (created before the mirror existed, or dropped
+after a conflicting write) is downloaded once, page by page, and mirrored.
+
+Methods are synchronous and open their own session; call them with
+``asyncio.to_thread`` from async code.
+"""
+
+import logging
+import hashlib
+from collections import Counter
+from typing import Optional, Dict, Any, List
+
+from sqlalchemy.exc import IntegrityError
+
+from ..core.database import SessionLocal
+from ..core.metrics import metrics
+from .db_models import ThreadRecord, ThreadMessageRecord
+
+
+logger = logging.getLogger(__name__)
+
+
+def message_hash(role: str, content: str) -> str:
+    """
+    Content hash of a thread message
+
+    Example:
+        >>> len(message_hash("user", "Найди IT компании в Алматы"))
+        64
+    """
+    return hashlib.sha256(f"{role}\n{content}".encode("utf-8")).hexdigest()
+
+
+def missing_messages(mirrored: List[Dict[str, Any]], external_history: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """
+    Messages of ``external_history`` that are not in the thread yet
+
+    Messages are matched by hash with multiplicity, so a repeated message
+    ("дай еще") is only considered present as many times as the thread has it.
+    Runs in O(n + m).
+    """
+    available = Counter(message["hash"] for message in mirrored)
+    missing = []
+    for message in external_history:
+        role = message.get("role", "user")
+        content = message.get("content", "")
+        if not role or not content:
+            continue
+        digest = message_hash(role, content)
+        if available[digest] > 0:
+            available[digest] -= 1
+        else:
+            missing.append({"role": role, "content": content})
+    return missing
+
+
+class ThreadMirror:
+    """
+    Database-backed copy of thread messages with the last synced message id
+
+    Example:
+        >>> thread_mirror.register("thread_abc")
+        >>> thread_mirror.append("thread_abc", [{"role": "user", "content": "Привет", "message_id": "msg_1"}])
+        >>> thread_mirror.load("thread_abc")[0]["content"]
+        'Привет'
+    """
+
+    def load(self, thread_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Mirrored messages in thread order, or None when the thread is not mirrored"""
+        db = SessionLocal()
+        try:
+            if db.query(ThreadRecord.thread_id).filter(ThreadRecord.thread_id == thread_id).first() is None:
+                metrics.increment("thread_mirror.misses")
+                return None
+            rows = (
+                db.query(ThreadMessageRecord)
+                .filter(ThreadMessageRecord.thread_id == thread_id)
+                .order_by(ThreadMessageRecord.seq)
+                .all()
+            )
+            metrics.increment("thread_mirror.hits")
+            return [self._as_dict(row) for row in rows]
+        finally:
+            db.close()
+
+    def last_message_id(self, thread_id: str) -> Optional[str]:
+        """Id of the newest mirrored message that has one, or None"""
+        db = SessionLocal()
+        try:
+            record = db.query(ThreadRecord).filter(ThreadRecord.thread_id == thread_id).first()
+            return record.last_message_id if record is not None else None
+        finally:
+            db.close()
+
+    def register(self, thread_id: str) -> None:
+        """Start mirroring a thread that was just created empty"""
+        self.replace(thread_id, [])
+
+    def replace(self, thread_id: str, messages: List[Dict[str, Any]]) -> None:
+        """Mirror a downloaded thread, replacing whatever was stored for it"""
+        db = SessionLocal()
+        try:
+            db.query(ThreadMessageRecord).filter(ThreadMessageRecord.thread_id == thread_id).delete()
+            db.query(ThreadRecord).filter(ThreadRecord.thread_id == thread_id).delete()
+            record = ThreadRecord(thread_id=thread_id, message_count=0)
+            db.add(record)
+            self._add_rows(db, record, messages)
+            db.commit()
+        except IntegrityError:
+            # Another worker mirrored the thread at the same time; its copy is as good
+            db.rollback()
+        finally:
+            db.close()
+
+    def append(self, thread_id: str, messages: List[Dict[str, Any]]) -> bool:
+        """
+        Append messages written to or received from the thread
+
+        Returns:
+            False when the thread is not mirrored (nothing to keep in sync) or
+            the mirror was dropped after a conflicting concurrent append
+        """
+        if not messages:
+            return True
+        db = SessionLocal()
+        try:
+            record = db.query(ThreadRecord).filter(ThreadRecord.thread_id == thread_id).first()
+            if record is None:
+                return False
+            self._add_rows(db, record, messages)
+            db.commit()
+            return True
+        except IntegrityError:
+            # Two turns wrote to the thread at once; the interleaving is unknown, so re-download next time
+            db.rollback()
+            metrics.increment("thread_mirror.conflicts")
+            logger.warning("⚠️ [THREAD_MIRROR] Conflicting append to %s, dropping the mirror", thread_id)
+            self._drop(db, thread_id)
+            return False
+        finally:
+            db.close()
+
+    def invalidate(self, thread_id: str) -> None:
+        """Forget the mirror of a thread so it is downloaded again on next use"""
+        db = SessionLocal()
+        try:
+            self._drop(db, thread_id)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _add_rows(db, record: ThreadRecord, messages: List[Dict[str, Any]]) -> None:
+        seq = record.message_count or 0
+        for message in messages:
+            db.add(ThreadMessageRecord(
+                thread_id=record.thread_id,
+                seq=seq,
+                message_id=message.get("message_id"),
+                role=message["role"],
+                content=message["content"],
+                content_hash=message_hash(message["role"], message["content"])
+            ))
+            seq += 1
+            if message.get("message_id"):
+                record.last_message_id = message["message_id"]
+        record.message_count = seq
+
+    @staticmethod
+    def _drop(db, thread_id: str) -> None:
+        db.query(ThreadMessageRecord).filter(ThreadMessageRecord.thread_id == thread_id).delete()
+        db.query(ThreadRecord).filter(ThreadRecord.thread_id == thread_id).delete()
+        db.commit()
+
+    @staticmethod
+    def _as_dict(row: ThreadMessageRecord) -> Dict[str, Any]:
+        return {
+            "role": row.role,
+            "content": row.content,
+            "hash": row.content_hash,
+            "message_id": row.message_id,
+        }
+
+
+# Global mirror instance
+thread_mirror = ThreadMirror()
@@ -0,0 +1,184 @@
+"""
+Execution of the assistant's function calls
+
+The tool calls of one model step are independent, so they run concurrently,
+each on its own database session and under a per-call timeout; a failed or
+timed-out call yields an error output instead of failing the step. Outputs
+keep the order of the calls so they can be submitted together.
+
+A streamed turn can register a companies listener (see companies_listener)
+to receive the companies of each step as soon as it finishes, before the
+model has written its answer.
+"""
+
+import logging
+import asyncio
+import contextvars
+import json
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Tuple, Callable, Iterator
+
+from ..companies.service import CompanyService
+from ..core.config import get_settings
+from ..core.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+# Receives the companies found by each tool step of the current turn
+_companies_listener: contextvars.ContextVar[Optional[Callable[[List[Dict[str, Any]]], None]]] = contextvars.ContextVar(
+    "tool_companies_listener", default=None
+)
+
+
+@contextmanager
+def companies_listener(callback: Callable[[List[Dict[str, Any]]], None]) -> Iterator[None]:
+    """Call ``callback`` with the companies of every tool step run inside the block (and tasks created in it)"""
+    token = _companies_listener.set(callback)
+    try:
+        yield
+    finally:
+        _companies_listener.reset(token)
+
+
+def format_company(company_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """Company as returned to the model by search_companies"""
+    return {
+        "id": company_dict.get("id"),
+        "name": company_dict.get("Company"),
+        "bin": company_dict.get("BIN"),
+        "activity": company_dict.get("Activity"),
+        "location": company_dict.get("Locality"),
+        "oked": company_dict.get("OKED"),
+        "size": company_dict.get("Size")
+    }
+
+
+class ToolExecutor:
+    """
+    Concurrent executor for search_companies / get_company_details calls
+
+    Example:
+        >>> outputs, companies = await tool_executor.execute([
+        ...     {"id": "call_1", "name": "search_companies", "arguments": '{"location": "Алматы"}'},
+        ...     {"id": "call_2", "name": "get_company_details", "arguments": '{"company_id": "..."}'},
+        ... ])
+    """
+
+    def __init__(self, timeout_seconds: float = 15.0):
+        self.timeout_seconds = timeout_seconds
+
+    async def execute(self, tool_calls: List[Dict[str, str]]) -> Tuple[List[Dict[str, str]], List[Dict[str, Any]]]:
+        """
+        Run all tool calls of a step concurrently
+
+        Args:
+            tool_calls: Calls as {"id", "name", "arguments"} with JSON-encoded arguments
+
+        Returns:
+            (tool outputs as {"tool_call_id", "output"} in call order,
+             companies returned by the calls, for context tracking)
+        """
+        started = time.perf_counter()
+        results = await asyncio.gather(*[self._execute_one(call) for call in tool_calls])
+
+        tool_outputs = []
+        companies_found = []
+        for call, (output, companies) in zip(tool_calls, results):
+            tool_outputs.append({"tool_call_id": call["id"], "output": output})
+            companies_found.extend(companies)
+
+        listener = _companies_listener.get()
+        if listener is not None and companies_found:
+            listener(companies_found)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        metrics.increment("tools.steps")
+        metrics.increment("tools.calls", len(tool_calls))
+        metrics.increment("tools.step_ms", elapsed_ms)
+        if len(tool_calls) > 1:
+            logger.info("🔧 Executed %s tool calls concurrently in %.0fms", len(tool_calls), elapsed_ms)
+        return tool_outputs, companies_found
+
+    async def _execute_one(self, call: Dict[str, str]) -> Tuple[str, List[Dict[str, Any]]]:
+        function_name = call["name"]
+        try:
+            function_args = json.loads(call.get("arguments") or "{}")
+        except json.JSONDecodeError as e:
+            return f"Invalid arguments for {function_name}: {str(e)}", []
+
+        logger.debug("🔧 Executing function: %s with args: %s", function_name, function_args)
+
+        try:
+            if function_name == "search_companies":
+                handler = self._search_companies(function_args)
+            elif function_name == "get_company_details":
+                handler = self._get_company_details(function_args)
+            else:
+                return f"Unknown function: {function_name}", []
+            return await asyncio.wait_for(handler, timeout=self.timeout_seconds)
+
+        except asyncio.TimeoutError:
+            # The query finishes in its worker thread and closes its own session
+            metrics.increment("tools.timeouts")
+            logger.warning("⏱️ %s timed out after %ss", function_name, self.timeout_seconds)
+            return f"{function_name} timed out. Please try a narrower request.", []
+        except Exception as e:
+            metrics.increment("tools.errors")
+            logger.error("❌ Error in %s: %s", function_name, str(e))
+            if function_name == "search_companies":
+                return f"Error searching companies: {str(e)}. Please try with different search criteria.", []
+            return f"Error getting company details: {str(e)}. Please verify the company ID.", []
+
+    @staticmethod
+    async def _search_companies(function_args: Dict[str, Any]) -> Tuple[str, List[Dict[str, Any]]]:
+        # Calculate offset for pagination
+        page = function_args.get("page", 1)
+        limit = function_args.get("limit", 10)
+        offset = (page - 1) * limit
+
+        companies = await CompanyService.search_companies_isolated(
+            location=function_args.get("location"),
+            activity_keywords=function_args.get("activity_keywords"),
+            limit=limit,
+            offset=offset
+        )
+        companies_data = [format_company(company_dict) for company_dict in companies]
+
+        result = {
+            "companies": companies_data,
+            "total_found": len(companies_data),
+            "search_criteria": function_args,
+            "page": page,
+            "limit": limit,
+            "context": f"Found {len(companies_data)} companies matching your criteria"
+        }
+        logger.info("✅ Search completed: %s companies found", len(companies_data))
+        return json.dumps(result, ensure_ascii=False), companies_data
+
+    @staticmethod
+    async def _get_company_details(function_args: Dict[str, Any]) -> Tuple[str, List[Dict[str, Any]]]:
+        company_dict = await CompanyService.get_company_by_id_isolated(function_args.get("company_id"))
+        if not company_dict:
+            return "Company not found. Please check the company ID and try again.", []
+
+        company_details = {
+            **format_company(company_dict),
+            "kato": company_dict.get("KATO"),
+            "krp": company_dict.get("KRP"),
+            "context": "Detailed company information retrieved"
+        }
+        logger.info("✅ Company details retrieved for: %s", company_details.get('name'))
+        return json.dumps(company_details, ensure_ascii=False), [company_details]
+
+
+_tool_executor: Optional[ToolExecutor] = None
+
+
+def get_tool_executor() -> ToolExecutor:
+    """Process-wide tool executor built from settings"""
+    global _tool_executor
+    if _tool_executor is None:
+        _tool_executor = ToolExecutor(timeout_seconds=get_settings().tool_call_timeout_seconds)
+    return _tool_executor
@@ -0,0 +1,115 @@
+"""
+Write-behind ``last_login`` updates
+
+Logins used to commit ``users.last_login`` before answering. The timestamp is
+informational, so logins now only record it in memory; a background task
+started with the application writes the pending timestamps every
+``LAST_LOGIN_FLUSH_SECONDS`` as one batched UPDATE, and flushes what is left
+on shutdown. Repeated logins of a user between flushes collapse into one row.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any
+
+from sqlalchemy import update
+
+from ..core.config import get_settings
+from ..core.database import SessionLocal
+from ..core.metrics import metrics
+from .models import User
+
+
+logger = logging.getLogger(__name__)
+
+
+class LastLoginWriter:
+    """
+    Batches last_login timestamps and writes them periodically
+
+    Example:
+        >>> last_login_writer.record(user.id)   # in the login handler
+        >>> last_login_writer.start()           # application startup
+        >>> await last_login_writer.stop()      # application shutdown, flushes
+    """
+
+    def __init__(self, flush_seconds: float = 5.0, max_pending: int = 10000):
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self._pending: Dict[Any, datetime] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def record(self, user_id) -> None:
+        """Remember a login; written by the next flush"""
+        self._pending[user_id] = datetime.now(timezone.utc)
+        if len(self._pending) >= self.max_pending and (self._flush_task is None or self._flush_task.done()):
+            # Do not let a login burst grow the buffer without bound; one early flush at a time
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+
+    def start(self) -> None:
+        """Start the periodic flush on the running loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the periodic flush and write what is pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._flush_task is not None:
+            await self._flush_task
+            self._flush_task = None
+        await self.flush()
+
+    async def flush(self) -> int:
+        """Write the pending timestamps in one batched UPDATE; returns the number of users written"""
+        if not self._pending:
+            return 0
+        pending, self._pending = self._pending, {}
+        rows = [{"id": user_id, "last_login": logged_in_at} for user_id, logged_in_at in pending.items()]
+        try:
+            await asyncio.to_thread(self._write, rows)
+        except Exception as e:
+            # Keep the timestamps for the next flush unless newer ones arrived meanwhile
+            for user_id, logged_in_at in pending.items():
+                self._pending.setdefault(user_id, logged_in_at)
+            metrics.increment("auth.last_login.flush_errors")
+            logger.warning("⚠️ [LAST_LOGIN] Could not write %s last_login updates: %s", len(rows), e)
+            return 0
+        metrics.increment("auth.last_login.flushes")
+        metrics.increment("auth.last_login.rows", len(rows))
+        return len(rows)
+
+    @staticmethod
+    def _write(rows) -> None:
+        db = SessionLocal()
+        try:
+            # ORM bulk UPDATE by primary key: one executemany statement
+            db.execute(update(User), rows)
+            db.commit()
+        finally:
+            db.close()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+
+
+def build_last_login_writer() -> LastLoginWriter:
+    """last_login writer configured from settings"""
+    settings = get_settings()
+    return LastLoginWriter(
+        flush_seconds=settings.last_login_flush_seconds,
+        max_pending=settings.last_login_max_pending
+    )
+
+
+# Global last_login writer instance
+last_login_writer = build_last_login_writer()
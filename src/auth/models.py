@@ -4,7 +4,7 @@ SQLAlchemy models for user authentication
 Defines the database schema for user accounts and authentication.
 """
 
-from sqlalchemy import Column, String, DateTime, Boolean
+from sqlalchemy import Column, String, DateTime, Boolean, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -39,5 +39,11 @@ class User(Base):
     # Relationships
     fund_profile = relationship("FundProfile", back_populates="user", uselist=False)
     
+    # Case-insensitive lookups (func.lower(User.email) == email) use this index;
+    # existing databases get it from init_database
+    __table_args__ = (
+        Index("ux_users_email_lower", func.lower(email), unique=True),
+    )
+    
     def __repr__(self):
         return f"<User(id={self.id}, email='{self.email}', full_name='{self.full_name}')>" 
\ No newline at end of file
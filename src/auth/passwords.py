@@ -0,0 +1,134 @@
+"""
+Password hashing off the event loop
+
+bcrypt is deliberately slow (~100-300 ms per hash or verify at the default
+cost), so calling it inside an ``async def`` handler stalls every other
+request on the worker. Hashing and verification run on a dedicated, bounded
+pool instead: threads by default (the bcrypt backend releases the GIL), or
+processes with ``PASSWORD_HASH_EXECUTOR=process``.
+
+The cost is configurable with ``PASSWORD_BCRYPT_ROUNDS``. A successful login
+whose stored hash was made with other parameters gets a new hash, so changing
+the cost migrates users as they log in.
+"""
+
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from ..core.config import get_settings
+from ..core.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _context(rounds: int) -> CryptContext:
+    """CryptContext for a bcrypt cost; built once per process (pool processes included)"""
+    # min/max pin the cost, so verify_and_update flags hashes made at any other cost
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds
+    )
+
+
+def _hash(password: str, rounds: int) -> str:
+    return _context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return _context(rounds).verify_and_update(password, hashed_password)
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing and verification on a bounded executor
+
+    Example:
+        >>> hashed = await password_hasher.hash("secret")
+        >>> valid, new_hash = await password_hasher.verify_and_update("secret", hashed)
+        >>> valid, new_hash
+        (True, None)
+    """
+
+    def __init__(self, rounds: int = 12, max_workers: int = 4, executor: str = "thread"):
+        self.rounds = rounds
+        self.max_workers = max(max_workers, 1)
+        self.executor_kind = executor
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def _run(self, operation: str, function, *args):
+        started = time.perf_counter()
+        result = await asyncio.get_running_loop().run_in_executor(self._get_executor(), function, *args)
+        metrics.increment(f"passwords.{operation}")
+        metrics.increment(f"passwords.{operation}_ms", (time.perf_counter() - started) * 1000)
+        return result
+
+    async def hash(self, password: str) -> str:
+        """bcrypt hash of a new password at the configured cost"""
+        return await self._run("hash", _hash, password, self.rounds)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Check a password against its stored hash
+
+        Returns:
+            (valid, new_hash) where new_hash is set when the password is valid
+            but the stored hash uses outdated parameters and should be replaced
+        """
+        if not hashed_password:
+            return False, None
+        try:
+            valid, new_hash = await self._run("verify", _verify_and_update, password, hashed_password, self.rounds)
+        except ValueError:
+            # Not a hash this context understands
+            logger.warning("⚠️ [PASSWORDS] Stored password hash has an unknown format")
+            return False, None
+        if new_hash:
+            metrics.increment("passwords.rehashed")
+        return valid, new_hash
+
+    def hash_sync(self, password: str) -> str:
+        """Blocking hash for scripts and synchronous helpers (not for request handlers)"""
+        return _hash(password, self.rounds)
+
+    def verify_sync(self, password: str, hashed_password: str) -> bool:
+        """Blocking verification for scripts and synchronous helpers (not for request handlers)"""
+        return _verify_and_update(password, hashed_password, self.rounds)[0]
+
+    def shutdown(self) -> None:
+        """Stop the pool (called on application shutdown)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def build_password_hasher() -> PasswordHasher:
+    """Password hasher configured from settings"""
+    settings = get_settings()
+    return PasswordHasher(
+        rounds=settings.password_bcrypt_rounds,
+        max_workers=settings.password_hash_workers,
+        executor=settings.password_hash_executor
+    )
+
+
+# Global password hasher instance
+password_hasher = build_password_hasher()
@@ -0,0 +1,173 @@
+"""
+Short-lived cache of authenticated principals
+
+Every authenticated request decodes its JWT and loads the user, and the
+fund endpoints then load the user's fund profile. This cache maps a bearer
+token to a snapshot of the user's columns and fund profile id for
+``PRINCIPAL_CACHE_TTL_SECONDS`` (never past the token's own expiry), so a
+repeated request skips both the decode and the query: the snapshot is
+attached to the request's session with ``merge(load=False)``.
+
+On a miss, the user and the fund profile are loaded with one joined query,
+which also puts the profile in the session's identity map.
+
+The cache is per process. A commit that changes a user's ``is_active``,
+``email`` or password (or deletes the user) drops the user's entries in the
+process that made it. Other workers are not told: they keep accepting the
+user's cached tokens until their entries expire, so a deactivation or a
+password reset takes effect everywhere within ``PRINCIPAL_CACHE_TTL_SECONDS``
+(30 s by default; 0 disables the cache).
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from ..core.config import get_settings
+from ..core.metrics import metrics
+from .models import User
+
+
+# Columns not kept in the snapshot; loaded from the database if ever accessed
+_EXCLUDED_COLUMNS = {"hashed_password"}
+
+# Columns whose change ends the cached authentications of a user
+_REVOKING_COLUMNS = ("is_active", "email", "hashed_password")
+
+# Session.info key of the users to invalidate once the transaction commits
+_REVOKED_KEY = "principal_cache_revoked_users"
+
+
+class PrincipalCache:
+    """
+    Token -> (user snapshot, fund profile id) LRU cache with TTL
+
+    Example:
+        >>> user = principal_cache.get(token, db)
+        >>> if user is None:
+        ...     user, fund_profile = db.query(User, FundProfile).outerjoin(...).first()
+        ...     principal_cache.set(token, user, fund_profile.id if fund_profile else None, payload["exp"])
+    """
+
+    def __init__(self, ttl_seconds: float = 30.0, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._fund_profile_ids: "OrderedDict[Any, Any]" = OrderedDict()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str, db: Session) -> Optional[User]:
+        """User of a cached token attached to ``db`` without a query, or None"""
+        if self.ttl_seconds <= 0:
+            return None
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.time():
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            metrics.increment("auth.principal_cache.misses")
+            return None
+        metrics.increment("auth.principal_cache.hits")
+
+        user = User(**entry[1])
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+
+    def set(self, token: str, user: User, fund_profile_id: Any = None, token_expires_at: Optional[float] = None) -> None:
+        """Remember the user (and fund profile id) of a freshly validated token"""
+        if self.ttl_seconds <= 0:
+            return
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        snapshot = {
+            column.key: getattr(user, column.key)
+            for column in inspect(User).column_attrs
+            if column.key not in _EXCLUDED_COLUMNS
+        }
+        with self._lock:
+            key = self._key(token)
+            self._entries[key] = (expires_at, snapshot)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        self.set_fund_profile_id(user.id, fund_profile_id)
+
+    def fund_profile_id(self, user_id) -> Optional[Any]:
+        """Known fund profile id of a user, or None when unknown or the user has none"""
+        with self._lock:
+            return self._fund_profile_ids.get(user_id)
+
+    def set_fund_profile_id(self, user_id, fund_profile_id: Any) -> None:
+        """Record a created (id) or deleted (None) fund profile"""
+        with self._lock:
+            if fund_profile_id is not None:
+                self._fund_profile_ids[user_id] = fund_profile_id
+                self._fund_profile_ids.move_to_end(user_id)
+                while len(self._fund_profile_ids) > self.max_entries:
+                    self._fund_profile_ids.popitem(last=False)
+            else:
+                self._fund_profile_ids.pop(user_id, None)
+
+    def invalidate_user(self, user_id) -> int:
+        """Drop every cached token of a user (password reset, deactivation); returns the number dropped"""
+        with self._lock:
+            keys = [key for key, (_, snapshot) in self._entries.items() if snapshot.get("id") == user_id]
+            for key in keys:
+                del self._entries[key]
+            self._fund_profile_ids.pop(user_id, None)
+        return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._fund_profile_ids.clear()
+
+
+def build_principal_cache() -> PrincipalCache:
+    """Principal cache configured from settings"""
+    settings = get_settings()
+    return PrincipalCache(
+        ttl_seconds=settings.principal_cache_ttl_seconds,
+        max_entries=settings.principal_cache_max_entries
+    )
+
+
+# Global principal cache instance
+principal_cache = build_principal_cache()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_revoked_users(session: Session, flush_context) -> None:
+    """Remember users whose revoking columns changed (or who were deleted) in this flush"""
+    for obj in list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        if obj in session.deleted or any(state.attrs[column].history.has_changes() for column in _REVOKING_COLUMNS):
+            session.info.setdefault(_REVOKED_KEY, set()).add(obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_revoked_users(session: Session) -> None:
+    # After the commit, so a concurrent request cannot re-cache the old row
+    for user_id in session.info.pop(_REVOKED_KEY, ()):
+        principal_cache.invalidate_user(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_revoked_users(session: Session) -> None:
+    session.info.pop(_REVOKED_KEY, None)
@@ -4,29 +4,36 @@ Authentication Router
 Handles user authentication, registration, and token management endpoints.
 """
 
+import logging
 from datetime import datetime, timedelta
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from pydantic import BaseModel, EmailStr, Field
 
 from ..core.database import get_db
 from ..core.config import get_settings
 from .models import User
+from .passwords import password_hasher
+from .principal_cache import principal_cache
+from .last_login import last_login_writer
+from ..funds.models import FundProfile
+
+
+logger = logging.getLogger(__name__)
 
 # Initialize settings
 settings = get_settings()
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/token")
+# Same scheme for public endpoints that also accept anonymous callers
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/token", auto_error=False)
 
 # Router
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -82,13 +89,13 @@ class PasswordReset(BaseModel):
 
 # Utility functions
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    """Verify a password against its hash (blocking; handlers use password_hasher)"""
+    return password_hasher.verify_sync(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    """Hash a password"""
-    return pwd_context.hash(password)
+    """Hash a password (blocking; handlers use password_hasher)"""
+    return password_hasher.hash_sync(password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -104,44 +111,89 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-def authenticate_user(db: Session, email: str, password: str):
-    """Authenticate user with email and password (case-insensitive)."""
+async def authenticate_user(db: Session, email: str, password: str):
+    """
+    Authenticate user with email and password (case-insensitive).
+    
+    The bcrypt check runs on the password pool. A hash made with outdated
+    parameters is replaced and committed.
+    """
     normalized_email = email.lower()
     user = (
         db.query(User)
-        .filter(User.email.ilike(normalized_email))  # case-insensitive comparison
+        .filter(func.lower(User.email) == normalized_email)  # uses ux_users_email_lower
         .first()
     )
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not valid:
         return False
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
+        logger.info("🔐 Rehashed password of user %s with current parameters", user.id)
     return user
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Get current authenticated user"""
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def user_from_token(token: str, db: Session) -> Optional[User]:
+    """
+    User of a bearer token, or None when the token is invalid or the user is gone
+    
+    Tokens seen in the last PRINCIPAL_CACHE_TTL_SECONDS are served from the
+    principal cache without decoding or querying.
+    """
+    user = principal_cache.get(token, db)
+    if user is not None:
+        return user
     
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
         email: str = payload.get("sub")
         if email is None:
-            raise credentials_exception
+            return None
         token_data = TokenData(email=email)
     except JWTError:
-        raise credentials_exception
+        return None
     
-    user = db.query(User).filter(User.email == token_data.email).first()
+    # User and fund profile in one query; the profile also lands in the session's identity map
+    row = (
+        db.query(User, FundProfile)
+        .outerjoin(FundProfile, FundProfile.user_id == User.id)
+        .filter(func.lower(User.email) == token_data.email.lower())
+        .first()
+    )
+    if row is None:
+        return None
+    user, fund_profile = row
+    principal_cache.set(token, user, fund_profile.id if fund_profile else None, payload.get("exp"))
+    return user
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """Get current authenticated user"""
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    
+    user = user_from_token(token, db)
     if user is None:
         raise credentials_exception
     return user
 
 
+async def get_optional_user(
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    db: Session = Depends(get_db)
+) -> Optional[User]:
+    """User of a valid bearer token, or None for anonymous callers (public endpoints)"""
+    if not token:
+        return None
+    return user_from_token(token, db)
+
+
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
     """Get current active user"""
     if not current_user.is_active:
@@ -153,7 +205,7 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
 @router.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """Login and get access token (OAuth2 compatible)"""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -161,9 +213,8 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Update last login
-    user.last_login = datetime.utcnow()
-    db.commit()
+    # Update last login (written in the background)
+    last_login_writer.record(user.id)
     
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
@@ -193,7 +244,7 @@ async def login(request: Request, db: Session = Depends(get_db)):
         username = form.get("username") or form.get("email") or ""
         password = form.get("password") or ""
 
-    user = authenticate_user(db, username, password)
+    user = await authenticate_user(db, username, password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -201,9 +252,8 @@ async def login(request: Request, db: Session = Depends(get_db)):
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Update last login timestamp
-    user.last_login = datetime.utcnow()
-    db.commit()
+    # Update last login timestamp (written in the background)
+    last_login_writer.record(user.id)
 
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
     access_token = create_access_token(
@@ -230,7 +280,7 @@ async def login(request: Request, db: Session = Depends(get_db)):
 async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     """Register a new user"""
     normalized_email = user_data.email.lower()
-    existing_user = db.query(User).filter(User.email.ilike(normalized_email)).first()
+    existing_user = db.query(User.id).filter(func.lower(User.email) == normalized_email).first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -239,10 +289,10 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     
     # --- START of an important debugging step ---
     # Print incoming user data for debugging purposes.
-    print(f"Attempting to register user with data: {user_data.dict()}")
+    logger.debug("Attempting to register user with data: %s", user_data.dict())
     # --- END of debugging step ---
 
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
 
     db_user = User(
         email=normalized_email,
@@ -259,7 +309,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     except IntegrityError as e:
         # Roll back transaction and surface a conflict error if the email is already used
         db.rollback()
-        print(f"DATABASE INTEGRITY ERROR: {e}")
+        logger.error("DATABASE INTEGRITY ERROR: %s", e)
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="An error occurred. This email might already be in use or data is invalid."
@@ -267,7 +317,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     except Exception as e:
         # Catch-all for unexpected errors
         db.rollback()
-        print(f"UNEXPECTED ERROR DURING REGISTRATION: {e}")
+        logger.error("UNEXPECTED ERROR DURING REGISTRATION: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Could not create user account."
@@ -298,7 +348,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
 @router.post("/password-reset-request")
 async def request_password_reset(request: PasswordResetRequest, db: Session = Depends(get_db)):
     """Request password reset"""
-    user = db.query(User).filter(User.email == request.email).first()
+    user = db.query(User).filter(func.lower(User.email) == request.email.lower()).first()
     if not user:
         # Don't reveal if email exists
         return {"message": "If the email exists, a reset link has been sent"}
@@ -335,7 +385,7 @@ async def reset_password(reset_data: PasswordReset, db: Session = Depends(get_db
             detail="Invalid reset token"
         )
     
-    user = db.query(User).filter(User.email == email).first()
+    user = db.query(User).filter(func.lower(User.email) == email.lower()).first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -343,7 +393,8 @@ async def reset_password(reset_data: PasswordReset, db: Session = Depends(get_db
         )
     
     # Update password
-    user.hashed_password = get_password_hash(reset_data.new_password)
+    user.hashed_password = await password_hasher.hash(reset_data.new_password)
+    # The commit also drops the user's cached tokens (see principal_cache)
     db.commit()
     
     return {"message": "Password reset successful"}
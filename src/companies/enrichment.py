@@ -0,0 +1,392 @@
+"""
+Company enrichment pipeline
+
+Adds data that is not part of the search result to companies shown in the
+chat: tax payments written to the ``companies`` table by ``KGDDataImporter``
+and website/contacts from a pluggable contacts provider.
+
+Each provider has its own concurrency limit and per-company timeout. Results
+of remote providers are cached in the ``company_enrichment`` table with a
+freshness TTL, so repeat companies are enriched with a single cache query.
+"""
+
+import abc
+import logging
+import asyncio
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, Any, List
+from uuid import UUID
+
+from sqlalchemy import text, bindparam
+
+from .models import CompanyEnrichment
+from ..core.config import get_settings
+from ..core.database import SessionLocal
+from ..core.metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_FIELDS = {
+    "website": "Не найден",
+    "contacts": "Не найдены",
+    "tax_info": "Информация не найдена",
+}
+
+TAX_YEARS = (2020, 2021, 2022, 2023, 2024, 2025)
+
+# Marks a failed/timed out fetch, which is not cached
+_FAILED = object()
+
+
+class EnrichmentProvider(abc.ABC):
+    """
+    Base class of enrichment providers
+
+    Subclasses implement ``fetch`` (one company) and may override ``fetch_many``
+    (batch). ``cache_ttl_seconds = 0`` disables caching for the provider.
+    Providers holding connections release them in ``close``.
+    """
+
+    name = "base"
+    cache_ttl_seconds = 0
+
+    def __init__(self, max_concurrency: int = 4, timeout_seconds: float = 3.0):
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @abc.abstractmethod
+    async def fetch(self, company: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Fields to add to ``company``, or None when nothing was found"""
+
+    async def close(self) -> None:
+        """Release connections held by the provider"""
+
+    async def fetch_many(self, companies: List[Dict[str, Any]]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Fetch companies concurrently within the provider's limits
+
+        Returns:
+            company id -> fields (None when nothing was found). Companies that
+            timed out or failed are left out so they are retried next time.
+        """
+        async def fetch_one(company: Dict[str, Any]):
+            async with self._semaphore:
+                try:
+                    return company["id"], await asyncio.wait_for(self.fetch(company), self.timeout_seconds)
+                except asyncio.TimeoutError:
+                    metrics.increment(f"enrichment.{self.name}.timeouts")
+                except Exception as e:
+                    metrics.increment(f"enrichment.{self.name}.errors")
+                    logger.warning("⚠️ [ENRICHMENT] %s failed for %s: %s", self.name, company.get('name'), e)
+                return company["id"], _FAILED
+
+        results = await asyncio.gather(*(fetch_one(c) for c in companies))
+        return {company_id: fields for company_id, fields in results if fields is not _FAILED}
+
+
+class KGDTaxProvider(EnrichmentProvider):
+    """
+    Tax payments from the columns written by KGDDataImporter
+
+    The columns are not part of the Company model (they only exist in
+    migrated databases), so they are read with one raw query per batch.
+    """
+
+    name = "kgd_tax"
+
+    def __init__(self, timeout_seconds: float = 3.0):
+        super().__init__(max_concurrency=1, timeout_seconds=timeout_seconds)
+        self.available = True
+
+    async def fetch(self, company: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return (await self.fetch_many([company])).get(company["id"])
+
+    async def fetch_many(self, companies: List[Dict[str, Any]]) -> Dict[str, Optional[Dict[str, Any]]]:
+        if not self.available or not companies:
+            return {}
+        try:
+            async with self._semaphore:
+                rows = await asyncio.wait_for(
+                    asyncio.to_thread(self._query, [c["id"] for c in companies]),
+                    self.timeout_seconds
+                )
+        except asyncio.TimeoutError:
+            metrics.increment(f"enrichment.{self.name}.timeouts")
+            return {}
+        except Exception as e:
+            if "tax_20" in str(e) or "annual_tax_paid" in str(e):
+                # Database was not migrated by KGDDataImporter: stop asking
+                logger.warning("⚠️ [ENRICHMENT] Tax columns are missing, disabling %s: %s", self.name, e)
+                self.available = False
+            else:
+                metrics.increment(f"enrichment.{self.name}.errors")
+                logger.warning("⚠️ [ENRICHMENT] %s query failed: %s", self.name, e)
+            return {}
+
+        return {company_id: self._to_fields(row) for company_id, row in rows.items()}
+
+    @staticmethod
+    def _query(company_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        columns = ", ".join(f"tax_{year}" for year in TAX_YEARS)
+        query = text(
+            f"SELECT id, annual_tax_paid, {columns}, last_tax_update FROM companies WHERE id IN :ids"
+        ).bindparams(bindparam("ids", expanding=True))
+        db = SessionLocal()
+        try:
+            result = db.execute(query, {"ids": [UUID(str(company_id)) for company_id in company_ids]})
+            return {str(row._mapping["id"]): dict(row._mapping) for row in result}
+        finally:
+            db.close()
+
+    @staticmethod
+    def _to_fields(row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        fields = {f"tax_{year}": row.get(f"tax_{year}") for year in TAX_YEARS}
+        fields["annual_tax_paid"] = row.get("annual_tax_paid")
+        last_update = row.get("last_tax_update")
+        fields["last_tax_update"] = last_update.isoformat() if last_update else None
+
+        if fields["annual_tax_paid"] is None and not any(fields[f"tax_{year}"] for year in TAX_YEARS):
+            return None
+        if fields["annual_tax_paid"] is not None:
+            fields["tax_info"] = f"Уплачено налогов (последний год): {fields['annual_tax_paid']:,.0f} ₸"
+            if fields["last_tax_update"]:
+                fields["tax_info"] += f", обновлено {fields['last_tax_update']}"
+        return fields
+
+
+class ContactsProvider(EnrichmentProvider):
+    """
+    Interface of website/contacts providers
+
+    ``fetch`` returns {"website": ..., "contacts": ...} (either may be missing).
+    """
+
+    name = "contacts"
+    cache_ttl_seconds = 7 * 24 * 3600
+
+
+class HTTPContactsProvider(ContactsProvider):
+    """
+    Contacts lookup service reachable over HTTP
+
+    Calls ``GET {url}?bin=<BIN>&name=<name>&locality=<locality>`` and expects
+    a JSON object with optional ``website`` and ``contacts`` keys (404 = not found).
+    """
+
+    name = "contacts_http"
+
+    def __init__(self, url: str, max_concurrency: int = 4, timeout_seconds: float = 3.0):
+        super().__init__(max_concurrency=max_concurrency, timeout_seconds=timeout_seconds)
+        self.url = url
+        self._session = None
+
+    async def fetch(self, company: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        import aiohttp
+
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        params = {
+            "bin": company.get("bin") or "",
+            "name": company.get("name") or "",
+            "locality": company.get("locality") or "",
+        }
+        async with self._session.get(self.url, params=params) as response:
+            if response.status == 404:
+                return None
+            response.raise_for_status()
+            payload = await response.json()
+        fields = {key: payload[key] for key in ("website", "contacts") if payload.get(key)}
+        return fields or None
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+class StubContactsProvider(ContactsProvider):
+    """
+    Deterministic local contacts provider for development and tests
+
+    Produces a fake website/phone from the BIN after a configurable delay;
+    companies whose BIN hash is divisible by ``miss_every`` are "not found".
+    """
+
+    name = "contacts_stub"
+
+    def __init__(self, latency_seconds: float = 0.05, miss_every: int = 4, **kwargs):
+        super().__init__(**kwargs)
+        self.latency_seconds = latency_seconds
+        self.miss_every = miss_every
+
+    async def fetch(self, company: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        await asyncio.sleep(self.latency_seconds)
+        key = company.get("bin") or company.get("id", "")
+        digest = int(hashlib.sha1(key.encode("utf-8")).hexdigest(), 16)
+        if self.miss_every and digest % self.miss_every == 0:
+            return None
+        return {
+            "website": f"https://company-{key}.kz",
+            "contacts": f"+7 (727) {digest % 1000:03d}-{digest % 100:02d}-{digest // 100 % 100:02d}",
+        }
+
+
+class EnrichmentPipeline:
+    """
+    Runs the providers for a list of companies with a shared result cache
+
+    Example:
+        >>> companies = await enrichment_pipeline.enrich(companies)
+    """
+
+    def __init__(self, providers: List[EnrichmentProvider], cache_enabled: bool = True):
+        self.providers = providers
+        self.cache_enabled = cache_enabled
+
+    async def enrich(self, companies: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Fill default fields, then merge cached and freshly fetched provider results"""
+        for company in companies:
+            for field, default in DEFAULT_FIELDS.items():
+                company.setdefault(field, default)
+
+        enrichable = [c for c in companies if c.get("id")]
+        if not enrichable or not self.providers:
+            return companies
+
+        started = time.perf_counter()
+        cached = await self._load_cached(enrichable)
+
+        results: Dict[str, Dict[str, Optional[Dict[str, Any]]]] = {}
+        pending = []
+        for provider in self.providers:
+            provider_cache = cached.get(provider.name, {})
+            results[provider.name] = dict(provider_cache)
+            missing = [c for c in enrichable if c["id"] not in provider_cache]
+            if provider.cache_ttl_seconds > 0:
+                metrics.increment("enrichment.cache.hits", len(enrichable) - len(missing))
+                metrics.increment("enrichment.cache.misses", len(missing))
+            if missing:
+                pending.append((provider, provider.fetch_many(missing)))
+
+        fetched = await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
+        to_store = []
+        for (provider, _), provider_results in zip(pending, fetched):
+            if isinstance(provider_results, Exception):
+                logger.warning("⚠️ [ENRICHMENT] Provider %s failed: %s", provider.name, provider_results)
+                continue
+            results[provider.name].update(provider_results)
+            if provider.cache_ttl_seconds > 0:
+                to_store.extend((provider.name, company_id, fields) for company_id, fields in provider_results.items())
+
+        for provider in self.providers:
+            for company in enrichable:
+                fields = results[provider.name].get(company["id"])
+                if fields:
+                    company.update({key: value for key, value in fields.items() if value is not None})
+
+        if to_store:
+            await self._store(to_store)
+
+        metrics.increment("enrichment.batches")
+        metrics.increment("enrichment.duration_ms", (time.perf_counter() - started) * 1000)
+        return companies
+
+    async def close(self) -> None:
+        """Close the providers (application shutdown)"""
+        for provider in self.providers:
+            try:
+                await provider.close()
+            except Exception as e:
+                logger.warning("⚠️ [ENRICHMENT] Could not close %s: %s", provider.name, e)
+
+    async def _load_cached(self, companies: List[Dict[str, Any]]) -> Dict[str, Dict[str, Optional[Dict[str, Any]]]]:
+        """provider -> company id -> cached fields, for fresh entries of cacheable providers"""
+        cacheable = {p.name: p.cache_ttl_seconds for p in self.providers if p.cache_ttl_seconds > 0}
+        if not self.cache_enabled or not cacheable:
+            return {}
+        try:
+            return await asyncio.to_thread(self._load_cached_sync, [c["id"] for c in companies], cacheable)
+        except Exception as e:
+            logger.warning("⚠️ [ENRICHMENT] Cache read failed: %s", e)
+            return {}
+
+    @staticmethod
+    def _load_cached_sync(company_ids: List[str], ttl_by_provider: Dict[str, int]) -> Dict[str, Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            rows = db.query(CompanyEnrichment).filter(
+                CompanyEnrichment.company_id.in_([UUID(str(company_id)) for company_id in company_ids]),
+                CompanyEnrichment.provider.in_(list(ttl_by_provider))
+            ).all()
+        finally:
+            db.close()
+
+        cached: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            fetched_at = row.fetched_at
+            if fetched_at is not None and fetched_at.tzinfo is None:
+                fetched_at = fetched_at.replace(tzinfo=timezone.utc)
+            if fetched_at is None or now - fetched_at > timedelta(seconds=ttl_by_provider[row.provider]):
+                continue
+            # Empty data is a cached "not found"
+            cached.setdefault(row.provider, {})[str(row.company_id)] = row.data or None
+        return cached
+
+    async def _store(self, entries: List[tuple]) -> None:
+        if not self.cache_enabled:
+            return
+        try:
+            await asyncio.to_thread(self._store_sync, entries)
+        except Exception as e:
+            logger.warning("⚠️ [ENRICHMENT] Cache write failed: %s", e)
+
+    @staticmethod
+    def _store_sync(entries: List[tuple]) -> None:
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            for provider, company_id, fields in entries:
+                db.merge(CompanyEnrichment(
+                    company_id=UUID(str(company_id)),
+                    provider=provider,
+                    data=fields or {},
+                    fetched_at=now
+                ))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+def build_enrichment_pipeline() -> EnrichmentPipeline:
+    """Pipeline configured from settings (ENRICHMENT_* variables)"""
+    settings = get_settings()
+    timeout = settings.enrichment_timeout_seconds
+    concurrency = settings.enrichment_max_concurrency
+
+    providers: List[EnrichmentProvider] = [KGDTaxProvider(timeout_seconds=timeout)]
+    contacts_provider = settings.enrichment_contacts_provider
+    if contacts_provider == "http" and settings.enrichment_contacts_url:
+        providers.append(HTTPContactsProvider(
+            settings.enrichment_contacts_url, max_concurrency=concurrency, timeout_seconds=timeout
+        ))
+    elif contacts_provider == "stub":
+        providers.append(StubContactsProvider(max_concurrency=concurrency, timeout_seconds=timeout))
+
+    for provider in providers:
+        if isinstance(provider, ContactsProvider):
+            provider.cache_ttl_seconds = settings.enrichment_cache_ttl_seconds
+
+    return EnrichmentPipeline(providers, cache_enabled=settings.enrichment_cache_enabled)
+
+
+# Global pipeline instance
+enrichment_pipeline = build_enrichment_pipeline()
@@ -4,7 +4,7 @@ SQLAlchemy models for companies
 Defines the database schema for company data.
 """
 
-from sqlalchemy import Column, String, Integer, Float, Date
+from sqlalchemy import Column, String, Integer, Float, Date, DateTime, JSON
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
@@ -34,4 +34,23 @@ class Company(Base):
     # If / when the database is migrated to include налоговые поля, these columns can be re-enabled.
     
     def __repr__(self):
-        return f"<Company(id={self.id}, Company='{self.Company}', BIN='{self.BIN}')>" 
\ No newline at end of file
+        return f"<Company(id={self.id}, Company='{self.Company}', BIN='{self.BIN}')>"
+
+
+class CompanyEnrichment(Base):
+    """Cached result of one enrichment provider for one company"""
+    
+    __tablename__ = "company_enrichment"
+    
+    # Composite primary key: one row per company and provider
+    company_id = Column(UUID(as_uuid=True), primary_key=True)
+    provider = Column(String(50), primary_key=True)
+    
+    # Fields the provider contributed (empty when it found nothing)
+    data = Column(JSON, default=dict)
+    
+    # Freshness is checked against the provider TTL
+    fetched_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    
+    def __repr__(self):
+        return f"<CompanyEnrichment(company_id={self.company_id}, provider='{self.provider}')>"
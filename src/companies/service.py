@@ -4,6 +4,7 @@ Service layer for company operations
 Business logic for company data retrieval and processing.
 """
 
+import logging
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
 from sqlalchemy import or_, and_
@@ -11,9 +12,13 @@ from uuid import UUID
 import asyncio
 
 from .models import Company
+from ..core.database import SessionLocal
 from ..core.translation_service import CityTranslationService
 
 
+logger = logging.getLogger(__name__)
+
+
 class CompanyService:
     """Service class for company operations"""
     
@@ -42,6 +47,43 @@ class CompanyService:
             offset
         )
 
+    @staticmethod
+    async def search_companies_isolated(
+        location: Optional[str] = None,
+        company_name: Optional[str] = None,
+        activity_keywords: Optional[List[str]] = None,
+        limit: int = 10,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Same as search_companies, on a dedicated session opened and closed in the worker thread.
+        
+        Safe to run concurrently with other queries of the request and to cancel midway:
+        the query still finishes in its thread and closes its own session.
+        """
+        return await asyncio.to_thread(
+            CompanyService._search_with_own_session,
+            location,
+            company_name,
+            activity_keywords,
+            limit,
+            offset
+        )
+
+    @staticmethod
+    def _search_with_own_session(
+        location: Optional[str],
+        company_name: Optional[str],
+        activity_keywords: Optional[List[str]],
+        limit: int,
+        offset: int
+    ) -> List[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            return CompanyService(db)._execute_search_query(location, company_name, activity_keywords, limit, offset)
+        finally:
+            db.close()
+
     def _execute_search_query(
         self,
         location: Optional[str],
@@ -51,28 +93,31 @@ class CompanyService:
         offset: int
     ) -> List[Dict[str, Any]]:
         
-        print(f"🗃️ [DB_SERVICE] Executing search query:")
-        print(f"   location: {location}")
-        print(f"   company_name: {company_name}")
-        print(f"   activity_keywords: {activity_keywords}")
-        print(f"   limit: {limit}")
-        print(f"   offset: {offset}")
+        logger.debug("🗃️ [DB_SERVICE] Executing search query:")
+        logger.debug("   location: %s", location)
+        logger.debug("   company_name: %s", company_name)
+        logger.debug("   activity_keywords: %s", activity_keywords)
+        logger.debug("   limit: %s", limit)
+        logger.debug("   offset: %s", offset)
         
         query = self.db.query(Company)
         filters = []
 
         # 1. Add location filter if provided
         if location:
+            # Resolve English, transliterated or misspelled names ("Chimkent",
+            # "Almati") to the Russian spelling stored in Locality
+            location = CityTranslationService.translate_city_name(location)
             # Use ilike for case-insensitive search
             location_filter = Company.Locality.ilike(f"%{location}%")
             filters.append(location_filter)
-            print(f"🔍 [DB_SERVICE] Added location filter: Locality ILIKE '%{location}%'")
+            logger.debug("🔍 [DB_SERVICE] Added location filter: Locality ILIKE '%%%s%%'", location)
 
         # 2. Add company name filter if provided
         if company_name:
             name_filter = Company.Company.ilike(f"%{company_name}%")
             filters.append(name_filter)
-            print(f"🔍 [DB_SERVICE] Added name filter: Company ILIKE '%{company_name}%'")
+            logger.debug("🔍 [DB_SERVICE] Added name filter: Company ILIKE '%%%s%%'", company_name)
 
         # 3. Add activity filter if provided
         if activity_keywords and len(activity_keywords) > 0:
@@ -82,42 +127,42 @@ class CompanyService:
                 activity_filters.append(Company.Activity.ilike(f"%{keyword}%"))
             # Combine keyword filters with OR (e.g., "строительство" OR "ремонт")
             filters.append(or_(*activity_filters))
-            print(f"🔍 [DB_SERVICE] Added activity filters for keywords: {activity_keywords}")
+            logger.debug("🔍 [DB_SERVICE] Added activity filters for keywords: %s", activity_keywords)
 
         # If we have any filters, apply them with AND
         if filters:
             query = query.filter(and_(*filters))
-            print(f"🔍 [DB_SERVICE] Applied {len(filters)} filters with AND")
+            logger.debug("🔍 [DB_SERVICE] Applied %s filters with AND", len(filters))
         else:
-            print(f"⚠️ [DB_SERVICE] No filters applied - will return all companies")
+            logger.warning("⚠️ [DB_SERVICE] No filters applied - will return all companies")
 
         # --- 4. CRITICAL PAGINATION LOGIC ---
         # A consistent order is REQUIRED for pagination (OFFSET) to work reliably.
         # We order by company name to ensure the same query always returns results
         # in the same sequence. Your model uses 'Company' for the name column.
         query = query.order_by(Company.Company)
-        print(f"🔄 [DB_SERVICE] Applied ORDER BY Company (company name)")
+        logger.debug("🔄 [DB_SERVICE] Applied ORDER BY Company (company name)")
 
         # Apply the offset to skip previous pages' results, then apply the limit.
         results = query.offset(offset).limit(limit).all()
-        print(f"📊 [DB_SERVICE] Applied OFFSET {offset} LIMIT {limit}")
-        print(f"✅ [DB_SERVICE] Query executed, returned {len(results)} results")
+        logger.debug("📊 [DB_SERVICE] Applied OFFSET %s LIMIT %s", offset, limit)
+        logger.info("✅ [DB_SERVICE] Query executed, returned %s results", len(results))
         
         # --- DEBUG: Log first few results for verification ---
         if results:
-            print(f"🏢 [DB_SERVICE] First few results:")
+            logger.debug("🏢 [DB_SERVICE] First few results:")
             for i, result in enumerate(results[:3]):
-                print(f"   {i+1}. {result.Company} (BIN: {result.BIN})")
+                logger.debug("   %s. %s (BIN: %s)", i+1, result.Company, result.BIN)
             if len(results) > 3:
-                print(f"   ... and {len(results) - 3} more")
+                logger.debug("   ... and %s more", len(results) - 3)
         else:
-            print(f"⚠️ [DB_SERVICE] No results returned from database")
+            logger.info("⚠️ [DB_SERVICE] No results returned from database")
         
         # --- END OF PAGINATION LOGIC ---
 
         # Convert SQLAlchemy objects to dictionaries for the AI service
         converted_results = [self._company_to_dict(c) for c in results]
-        print(f"🔄 [DB_SERVICE] Converted {len(converted_results)} results to dictionaries")
+        logger.debug("🔄 [DB_SERVICE] Converted %s results to dictionaries", len(converted_results))
         return converted_results
 
     async def get_companies_by_location(
@@ -160,6 +205,19 @@ class CompanyService:
         """
         return await asyncio.to_thread(self._get_company_by_id_sync, company_id)
 
+    @staticmethod
+    async def get_company_by_id_isolated(company_id: str) -> Optional[Dict[str, Any]]:
+        """Same as get_company_by_id, on a dedicated session opened and closed in the worker thread."""
+        return await asyncio.to_thread(CompanyService._get_company_with_own_session, company_id)
+
+    @staticmethod
+    def _get_company_with_own_session(company_id: str) -> Optional[Dict[str, Any]]:
+        db = SessionLocal()
+        try:
+            return CompanyService(db)._get_company_by_id_sync(company_id)
+        finally:
+            db.close()
+
     def _get_company_by_id_sync(self, company_id: str) -> Optional[Dict[str, Any]]:
         """Get company by ID synchronously"""
         try:
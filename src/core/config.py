@@ -29,6 +29,106 @@ class Settings:
             print("Warning: OPENAI_API_KEY environment variable is not set")
             print("Please set it using: export OPENAI_API_KEY=your_key_here")
             # Don't raise error immediately, allow app to start for testing
+        # Alternative OpenAI-compatible endpoint, e.g. loadtest/fake_openai_server.py for offline load tests
+        self.openai_base_url: str = os.getenv("OPENAI_BASE_URL", "")
+        
+        # Intent parsing fast path: skip the LLM when the rule-based parser is confident
+        self.intent_fast_path_enabled: bool = os.getenv("INTENT_FAST_PATH_ENABLED", "true").lower() == "true"
+        self.intent_fast_path_min_confidence: float = float(os.getenv("INTENT_FAST_PATH_MIN_CONFIDENCE", "0.8"))
+        
+        # LLM history windowing: last K turns verbatim, older turns folded into a summary
+        self.history_keep_last_turns: int = int(os.getenv("HISTORY_KEEP_LAST_TURNS", "6"))
+        self.history_token_budget: int = int(os.getenv("HISTORY_TOKEN_BUDGET", "6000"))
+        self.history_summary_model: str = os.getenv("HISTORY_SUMMARY_MODEL", "gpt-4o-mini")
+        # Older turns are summarized in chunks of this many turns (one summary call per chunk)
+        self.history_summary_chunk_turns: int = int(os.getenv("HISTORY_SUMMARY_CHUNK_TURNS", "4"))
+        
+        # Intent parse cache (in-process LRU + SQLite file shared by workers); empty path disables disk
+        self.intent_cache_enabled: bool = os.getenv("INTENT_CACHE_ENABLED", "true").lower() == "true"
+        self.intent_cache_path: str = os.getenv("INTENT_CACHE_PATH", ".cache/intent_cache.sqlite3")
+        self.intent_cache_ttl_seconds: int = int(os.getenv("INTENT_CACHE_TTL_SECONDS", "86400"))
+        self.intent_cache_max_entries: int = int(os.getenv("INTENT_CACHE_MAX_ENTRIES", "2048"))
+        self.intent_cache_max_disk_entries: int = int(os.getenv("INTENT_CACHE_MAX_DISK_ENTRIES", "50000"))
+        
+        # Speculative DB search from the local parse while the LLM parses the intent
+        self.speculative_search_enabled: bool = os.getenv("SPECULATIVE_SEARCH_ENABLED", "true").lower() == "true"
+        self.speculative_search_min_confidence: float = float(os.getenv("SPECULATIVE_SEARCH_MIN_CONFIDENCE", "0.4"))
+        
+        # Background prefetch of the next result page per conversation (in-process buffer)
+        self.prefetch_enabled: bool = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+        self.prefetch_ttl_seconds: int = int(os.getenv("PREFETCH_TTL_SECONDS", "120"))
+        self.prefetch_max_conversations: int = int(os.getenv("PREFETCH_MAX_CONVERSATIONS", "1000"))
+        
+        # Company enrichment: tax data from KGD columns + contacts provider ("none", "stub" or "http")
+        self.enrichment_contacts_provider: str = os.getenv("ENRICHMENT_CONTACTS_PROVIDER", "none").lower()
+        self.enrichment_contacts_url: str = os.getenv("ENRICHMENT_CONTACTS_URL", "")
+        self.enrichment_max_concurrency: int = int(os.getenv("ENRICHMENT_MAX_CONCURRENCY", "4"))
+        self.enrichment_timeout_seconds: float = float(os.getenv("ENRICHMENT_TIMEOUT_SECONDS", "3"))
+        self.enrichment_cache_enabled: bool = os.getenv("ENRICHMENT_CACHE_ENABLED", "true").lower() == "true"
+        self.enrichment_cache_ttl_seconds: int = int(os.getenv("ENRICHMENT_CACHE_TTL_SECONDS", "604800"))
+        
+        # Assistant runs: streaming API, or polling with adaptive backoff when streaming is unavailable
+        self.assistant_run_streaming: bool = os.getenv("ASSISTANT_RUN_STREAMING", "true").lower() == "true"
+        self.assistant_poll_initial_ms: float = float(os.getenv("ASSISTANT_POLL_INITIAL_MS", "50"))
+        self.assistant_poll_max_ms: float = float(os.getenv("ASSISTANT_POLL_MAX_MS", "1000"))
+        self.assistant_poll_backoff: float = float(os.getenv("ASSISTANT_POLL_BACKOFF", "1.5"))
+        
+        # Default engine of /ai/chat-assistant: "assistants" (OpenAI threads) or "completions" (function calling)
+        self.chat_engine_default: str = os.getenv("CHAT_ENGINE_DEFAULT", "assistants")
+        self.completions_max_tool_rounds: int = int(os.getenv("COMPLETIONS_MAX_TOOL_ROUNDS", "4"))
+        
+        # Assistant tool calls run concurrently, each limited to this many seconds
+        self.tool_call_timeout_seconds: float = float(os.getenv("TOOL_CALL_TIMEOUT_SECONDS", "15"))
+        
+        # Fund conversations: messages loaded per turn from conversation_messages
+        self.conversation_history_load_limit: int = int(os.getenv("CONVERSATION_HISTORY_LOAD_LIMIT", "50"))
+        
+        # LLM telemetry: per-call latency/usage attributed to endpoint, user and turn; optional JSONL file
+        self.llm_telemetry_enabled: bool = os.getenv("LLM_TELEMETRY_ENABLED", "true").lower() == "true"
+        self.llm_telemetry_path: str = os.getenv("LLM_TELEMETRY_PATH", "")
+        self.llm_telemetry_recent_turns: int = int(os.getenv("LLM_TELEMETRY_RECENT_TURNS", "200"))
+        
+        # Logging: root level, per-module overrides ("src.companies.service=DEBUG,..."), text or json,
+        # share of DEBUG records kept, and capacity of the queue drained by the writer thread
+        self.log_level: str = os.getenv("LOG_LEVEL", "INFO").upper()
+        self.log_levels: str = os.getenv("LOG_LEVELS", "")
+        self.log_format: str = os.getenv("LOG_FORMAT", "text").lower()
+        self.log_debug_sample_rate: float = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))
+        self.log_queue_size: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+        
+        # Idempotency-Key of the chat endpoints: how long responses are replayed, how long a retry waits for
+        # the original, and the SQLite file shared by workers (empty path keeps it in-process)
+        self.idempotency_ttl_seconds: int = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", "300"))
+        self.idempotency_wait_seconds: float = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "60"))
+        self.idempotency_max_entries: int = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "1000"))
+        self.idempotency_path: str = os.getenv("IDEMPOTENCY_PATH", ".cache/idempotency.sqlite3")
+        
+        # Password hashing: bcrypt cost (stored hashes are upgraded on login when it changes),
+        # size of the hashing pool and its kind ("thread" or "process")
+        self.password_bcrypt_rounds: int = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", "12"))
+        self.password_hash_workers: int = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+        self.password_hash_executor: str = os.getenv("PASSWORD_HASH_EXECUTOR", "thread").lower()
+        
+        # Authenticated principal cache (token -> user and fund profile id, per process); 0 disables
+        self.principal_cache_ttl_seconds: float = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+        self.principal_cache_max_entries: int = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", "10000"))
+        
+        # Write-behind of users.last_login: flush interval and pending logins that force an early flush
+        self.last_login_flush_seconds: float = float(os.getenv("LAST_LOGIN_FLUSH_SECONDS", "5"))
+        self.last_login_max_pending: int = int(os.getenv("LAST_LOGIN_MAX_PENDING", "10000"))
+        
+        # Token for the internal metrics/telemetry endpoints (X-Internal-Token); empty disables them
+        self.internal_api_token: str = os.getenv("INTERNAL_API_TOKEN", "")
+        
+        # LLM gateway: concurrency cap and retry policy shared by all OpenAI calls
+        self.llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+        self.llm_max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "4"))
+        self.llm_retry_base_delay: float = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+        self.llm_retry_max_delay: float = float(os.getenv("LLM_RETRY_MAX_DELAY", "20"))
+        self.llm_request_timeout_seconds: float = float(os.getenv("LLM_REQUEST_TIMEOUT_SECONDS", "60"))
+        
+        # SSE chat streaming: companies are enriched and emitted in batches of this size
+        self.stream_batch_size: int = int(os.getenv("STREAM_BATCH_SIZE", "5"))
         
         # FastAPI Configuration  
         self.host: str = os.getenv("HOST", "0.0.0.0")  # Allow external connections
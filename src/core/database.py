@@ -74,18 +74,62 @@ def init_database():
     """
     try:
         # Import all models to register them with Base
-        from ..companies.models import Company
+        from ..companies.models import Company, CompanyEnrichment
         from ..auth.models import User
-        from ..funds.models import FundProfile
+        from ..funds.models import FundProfile, ConversationMessage
+        from ..ai_conversation.db_models import AssistantRecord, ThreadRecord, ThreadMessageRecord
         
         # Create all tables
         Base.metadata.create_all(bind=engine)
+        _ensure_indexes()
         logging.info("Database tables initialized successfully")
         
     except Exception as e:
         logging.error(f"Failed to initialize database: {e}")
         raise
 
+# Indexes added to tables after they were first created (create_all skips existing tables)
+_INDEX_DDL = [
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_users_email_lower ON users (lower(email))",
+]
+
+
+_DUPLICATE_EMAILS_SQL = (
+    "SELECT lower(email), count(*) FROM users GROUP BY lower(email) HAVING count(*) > 1 LIMIT 20"
+)
+
+
+def _ensure_indexes():
+    """
+    Create missing indexes on existing tables; safe to run on every startup.
+
+    Raises:
+        RuntimeError: users has emails differing only in case, so the unique
+            lower(email) index cannot be built and logins are ambiguous
+    """
+    for ddl in _INDEX_DDL:
+        try:
+            with engine.begin() as connection:
+                connection.execute(text(ddl))
+        except Exception as e:
+            if "ux_users_email_lower" in ddl:
+                _raise_for_duplicate_emails()
+            logging.error(f"Could not create index ({ddl}): {e}")
+
+
+def _raise_for_duplicate_emails():
+    """Report the accounts that block the unique lower(email) index"""
+    with engine.connect() as connection:
+        duplicates = connection.execute(text(_DUPLICATE_EMAILS_SQL)).fetchall()
+    if not duplicates:
+        return
+    listing = ", ".join(f"{email} ({count} accounts)" for email, count in duplicates)
+    logging.error(f"Emails differing only in case, merge or rename these accounts: {listing}")
+    raise RuntimeError(
+        f"Cannot create the unique lower(email) index: {len(duplicates)} email(s) "
+        f"are used by several accounts differing only in case: {listing}"
+    )
+
 def test_database_connection() -> bool:
     """
     Test database connection.
@@ -0,0 +1,357 @@
+"""
+Idempotency-Key support for the chat endpoints
+
+Mobile clients retry a chat request when the connection drops before the
+answer arrives. A request sent with an ``Idempotency-Key`` header is run
+once: a retry that arrives while the original is still running waits for
+it, and a retry after it finished gets the stored response replayed for
+``IDEMPOTENCY_TTL_SECONDS``. The LLM parse, the search and the history write
+are not repeated, so the turn is not appended twice.
+
+Completed responses live in an in-process LRU layer backed by a SQLite file
+shared by all workers on the host (as the intent cache). The file also holds
+a ``pending`` claim while a request runs, so a retry that lands on another
+worker waits for the original instead of running it again. The claim lives
+for ``wait_seconds`` and the owner keeps extending it while the turn runs,
+so a long turn keeps its claim and one left by a crashed worker still expires.
+
+Reusing a key with a different request body is rejected with 422.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple, Callable, Awaitable
+
+from fastapi import HTTPException, status
+
+from .config import get_settings
+from .metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+
+# Seconds between checks of a claim held by another worker
+DISK_POLL_INTERVAL = 0.1
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a request with a different body"""
+
+
+class IdempotencyInProgress(Exception):
+    """The original request is still running after the wait timeout"""
+
+
+def request_fingerprint(payload: Any) -> str:
+    """Hash of a JSON-serializable request body"""
+    data = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Run-once store of responses keyed by idempotency key
+
+    Example:
+        >>> response, replayed = await idempotency_store.run(
+        ...     "/funds/chat:42", key, request_fingerprint(body), compute
+        ... )
+    """
+
+    # Prune the disk table every N writes
+    PRUNE_INTERVAL = 100
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_seconds: int = 300,
+        wait_seconds: float = 60.0,
+        max_entries: int = 1000
+    ):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.wait_seconds = wait_seconds
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[str, Tuple[float, str, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, Tuple[str, asyncio.Task]] = {}
+        self._writes = 0
+
+        if self.path:
+            try:
+                self._init_disk()
+            except Exception as e:
+                logger.warning("⚠️ [IDEMPOTENCY] Shared store disabled, could not open %s: %s", self.path, e)
+                self.path = None
+
+    async def run(
+        self,
+        scope: str,
+        key: str,
+        fingerprint: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Result of ``compute`` for this key, computing it at most once
+
+        Args:
+            scope: Endpoint (and user) the key belongs to
+            key: Client-supplied idempotency key
+            fingerprint: Hash of the request body (see request_fingerprint)
+            compute: Coroutine factory returning a JSON-serializable response
+
+        Returns:
+            (response, replayed) where replayed is True when the response was
+            not computed by this call
+
+        Raises:
+            IdempotencyKeyReused: the key was used with a different body
+            IdempotencyInProgress: the original did not finish within wait_seconds
+        """
+        full_key = f"{scope}:{key}"
+
+        stored = self._memory_get(full_key)
+        if stored is not None:
+            return self._replay(full_key, fingerprint, *stored, source="memory")
+
+        inflight = self._inflight.get(full_key)
+        if inflight is not None:
+            inflight_fingerprint, task = inflight
+            if inflight_fingerprint != fingerprint:
+                raise IdempotencyKeyReused(full_key)
+            metrics.increment("idempotency.joined")
+            logger.info("⏳ [IDEMPOTENCY] Waiting for the original request of %s", full_key)
+            return await asyncio.shield(task), True
+
+        if self.path:
+            stored = await self._claim_or_wait(full_key, fingerprint)
+            if stored is not None:
+                return self._replay(full_key, fingerprint, *stored, source="shared")
+
+        # The computation runs as its own task so that a client that goes away
+        # does not cancel the turn a retry is about to wait for
+        task = asyncio.create_task(self._compute_and_store(full_key, fingerprint, compute))
+        # Retrieve the exception when every waiter is gone, so it is not reported as unhandled
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._inflight[full_key] = (fingerprint, task)
+        metrics.increment("idempotency.computed")
+        return await asyncio.shield(task), False
+
+    async def _compute_and_store(
+        self,
+        full_key: str,
+        fingerprint: str,
+        compute: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        heartbeat = asyncio.create_task(self._keep_claim(full_key)) if self.path else None
+        try:
+            response = await compute()
+        except BaseException:
+            # Let a retry run the request again
+            self._inflight.pop(full_key, None)
+            if self.path:
+                await self._disk_call(self._disk_release, full_key)
+            raise
+        finally:
+            if heartbeat is not None:
+                heartbeat.cancel()
+        expires_at = time.time() + self.ttl_seconds
+        self._remember(full_key, fingerprint, response, expires_at)
+        self._inflight.pop(full_key, None)
+        if self.path:
+            self._writes += 1
+            prune = self._writes % self.PRUNE_INTERVAL == 0
+            await self._disk_call(self._disk_complete, full_key, fingerprint, response, expires_at, prune)
+        return response
+
+    async def _keep_claim(self, full_key: str) -> None:
+        """Extend the pending claim while the owner computes, so it outlives wait_seconds"""
+        interval = max(self.wait_seconds / 3, DISK_POLL_INTERVAL)
+        while True:
+            await asyncio.sleep(interval)
+            await self._disk_call(self._disk_refresh, full_key, time.time() + self.wait_seconds)
+
+    def _replay(
+        self,
+        full_key: str,
+        fingerprint: str,
+        stored_fingerprint: str,
+        response: Dict[str, Any],
+        source: str
+    ) -> Tuple[Dict[str, Any], bool]:
+        if stored_fingerprint != fingerprint:
+            raise IdempotencyKeyReused(full_key)
+        metrics.increment(f"idempotency.replayed.{source}")
+        logger.info("🔁 [IDEMPOTENCY] Replaying stored response of %s", full_key)
+        return dict(response), True
+
+    async def _claim_or_wait(self, full_key: str, fingerprint: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Claim the key in the shared store, or wait for the worker holding it; None when claimed"""
+        deadline = time.monotonic() + self.wait_seconds
+        waited = False
+        while True:
+            row = await self._disk_call(self._disk_claim, full_key, fingerprint, time.time() + self.wait_seconds)
+            if row is None:
+                return None
+            row_status, row_fingerprint, response = row
+            if row_fingerprint != fingerprint:
+                raise IdempotencyKeyReused(full_key)
+            if row_status == "done":
+                return row_fingerprint, response
+            if not waited:
+                waited = True
+                metrics.increment("idempotency.joined")
+                logger.info("⏳ [IDEMPOTENCY] Waiting for another worker running %s", full_key)
+            if time.monotonic() >= deadline:
+                raise IdempotencyInProgress(full_key)
+            await asyncio.sleep(DISK_POLL_INTERVAL)
+
+    def _memory_get(self, full_key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        entry = self._memory.get(full_key)
+        if entry is None:
+            return None
+        expires_at, fingerprint, response = entry
+        if expires_at <= time.time():
+            del self._memory[full_key]
+            return None
+        return fingerprint, response
+
+    def _remember(self, full_key: str, fingerprint: str, response: Dict[str, Any], expires_at: float) -> None:
+        """Insert into the LRU memory layer, evicting the oldest entries"""
+        self._memory[full_key] = (expires_at, fingerprint, response)
+        self._memory.move_to_end(full_key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    async def _disk_call(self, function, *args):
+        """Run a disk operation in a worker thread; the store degrades to in-process on errors"""
+        try:
+            return await asyncio.to_thread(function, *args)
+        except Exception as e:
+            logger.warning("⚠️ [IDEMPOTENCY] Shared store operation failed: %s", e)
+            return None
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _init_disk(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS idempotency_keys ("
+                "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, status TEXT NOT NULL, "
+                "response TEXT, expires_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS ix_idempotency_keys_expires_at ON idempotency_keys (expires_at)"
+            )
+
+    def _disk_claim(self, full_key: str, fingerprint: str, claim_expires_at: float) -> Optional[Tuple[str, str, Optional[Dict[str, Any]]]]:
+        """Insert a pending claim; returns None when claimed, else the existing (status, fingerprint, response)"""
+        with self._connect() as connection:
+            # A claim left by a crashed worker expires after wait_seconds
+            connection.execute("DELETE FROM idempotency_keys WHERE key = ? AND expires_at <= ?", (full_key, time.time()))
+            cursor = connection.execute(
+                "INSERT OR IGNORE INTO idempotency_keys (key, fingerprint, status, expires_at) VALUES (?, ?, 'pending', ?)",
+                (full_key, fingerprint, claim_expires_at)
+            )
+            if cursor.rowcount == 1:
+                return None
+            row = connection.execute(
+                "SELECT status, fingerprint, response FROM idempotency_keys WHERE key = ?", (full_key,)
+            ).fetchone()
+        if row is None:
+            # Released between the insert and the select; treat as still pending
+            return "pending", fingerprint, None
+        return row[0], row[1], json.loads(row[2]) if row[2] else None
+
+    def _disk_refresh(self, full_key: str, claim_expires_at: float) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE idempotency_keys SET expires_at = ? WHERE key = ? AND status = 'pending'",
+                (claim_expires_at, full_key)
+            )
+
+    def _disk_complete(
+        self,
+        full_key: str,
+        fingerprint: str,
+        response: Dict[str, Any],
+        expires_at: float,
+        prune: bool
+    ) -> None:
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, status, response, expires_at) "
+                "VALUES (?, ?, 'done', ?, ?)",
+                (full_key, fingerprint, json.dumps(response, ensure_ascii=False, default=str), expires_at)
+            )
+            if prune:
+                connection.execute("DELETE FROM idempotency_keys WHERE expires_at <= ?", (time.time(),))
+
+    def _disk_release(self, full_key: str) -> None:
+        with self._connect() as connection:
+            connection.execute("DELETE FROM idempotency_keys WHERE key = ? AND status = 'pending'", (full_key,))
+
+
+async def idempotent(
+    scope: str,
+    key: Optional[str],
+    payload: Any,
+    compute: Callable[[], Awaitable[Dict[str, Any]]]
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Run ``compute`` once per ``Idempotency-Key``; without a key it simply runs
+
+    Maps key reuse to 422 and a still running original to 409.
+    """
+    if not key:
+        return await compute(), False
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters"
+        )
+    try:
+        return await get_idempotency_store().run(scope, key, request_fingerprint(payload), compute)
+    except IdempotencyKeyReused:
+        metrics.increment("idempotency.key_reused")
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=f"{IDEMPOTENCY_HEADER} was already used for a different request"
+        )
+    except IdempotencyInProgress:
+        metrics.increment("idempotency.in_progress")
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="The original request with this Idempotency-Key is still being processed, retry later"
+        )
+
+
+_store: Optional[IdempotencyStore] = None
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    """Process-wide store built from settings"""
+    global _store
+    if _store is None:
+        settings = get_settings()
+        _store = IdempotencyStore(
+            path=settings.idempotency_path or None,
+            ttl_seconds=settings.idempotency_ttl_seconds,
+            wait_seconds=settings.idempotency_wait_seconds,
+            max_entries=settings.idempotency_max_entries
+        )
+    return _store
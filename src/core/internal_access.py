@@ -0,0 +1,34 @@
+"""
+Access control for internal endpoints
+
+Metrics and telemetry endpoints expose operational data and can reset
+aggregates, so they are not public: a request must send the
+``INTERNAL_API_TOKEN`` in the ``X-Internal-Token`` header. Without a
+configured token the endpoints answer 404, as if they did not exist.
+"""
+
+import secrets
+from typing import Optional
+
+from fastapi import Header, HTTPException, status
+
+from .config import get_settings
+
+
+INTERNAL_TOKEN_HEADER = "X-Internal-Token"
+
+
+async def require_internal_access(
+    internal_token: Optional[str] = Header(None, alias=INTERNAL_TOKEN_HEADER)
+) -> None:
+    """
+    FastAPI dependency guarding internal endpoints
+
+    Example:
+        >>> @router.get("/chat/metrics", dependencies=[Depends(require_internal_access)])
+    """
+    expected = get_settings().internal_api_token
+    if not expected:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if not internal_token or not secrets.compare_digest(internal_token, expected):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid internal token")
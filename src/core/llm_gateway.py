@@ -0,0 +1,324 @@
+"""
+Shared gateway for OpenAI API calls
+
+Every OpenAI call of the application goes through one ``LLMGateway``, which
+provides:
+
+- a global concurrency limit (semaphore)
+- token-bucket pacing fed by the ``x-ratelimit-*`` response headers
+- jittered exponential retry on 429/5xx/connection errors, honouring ``Retry-After``
+- single-flight coalescing of identical in-flight idempotent requests
+- latency and token usage telemetry per call (see ``telemetry.py``)
+
+OpenAI clients are created with ``max_retries=0`` so retries happen only here.
+"""
+
+import logging
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Optional, Dict, Any
+
+import openai
+
+from .config import get_settings
+from .metrics import metrics
+from .telemetry import llm_telemetry
+
+
+logger = logging.getLogger(__name__)
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+# Errors worth retrying; other API errors (400, 401, 404...) fail immediately
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+# Completion tokens assumed for the token bucket when max_tokens is not given
+DEFAULT_COMPLETION_TOKENS = 512
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds in an OpenAI reset header value
+
+    Example:
+        >>> parse_reset_duration("6m0s")
+        360.0
+        >>> parse_reset_duration("20ms")
+        0.02
+    """
+    if not value:
+        return None
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def create_openai_client() -> openai.AsyncOpenAI:
+    """AsyncOpenAI client configured for use with the gateway (no SDK-level retries)"""
+    settings = get_settings()
+    return openai.AsyncOpenAI(
+        api_key=settings.openai_api_key,
+        base_url=settings.openai_base_url or None,
+        max_retries=0,
+        timeout=settings.llm_request_timeout_seconds
+    )
+
+
+class TokenBucket:
+    """
+    Token bucket whose capacity and state follow the server's rate-limit headers
+
+    Unlimited until the first headers are observed.
+    """
+
+    def __init__(self):
+        self.capacity: Optional[float] = None
+        self.rate: float = 0.0  # tokens per second
+        self.tokens: float = 0.0
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.capacity is not None:
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self, cost: float = 1.0) -> float:
+        """Wait until ``cost`` tokens are available; returns the time waited in seconds"""
+        waited = 0.0
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.capacity is None:
+                    return waited
+                cost = min(cost, self.capacity)
+                if self.tokens >= cost:
+                    self.tokens -= cost
+                    return waited
+                delay = (cost - self.tokens) / self.rate if self.rate > 0 else 1.0
+                await asyncio.sleep(delay)
+                waited += delay
+
+    def observe(self, limit: Optional[float], remaining: Optional[float], reset_seconds: Optional[float]) -> None:
+        """Sync the bucket with ``x-ratelimit-limit/remaining/reset`` values"""
+        if limit is None or remaining is None or limit <= 0:
+            return
+        self._refill()
+        first_observation = self.capacity is None
+        self.capacity = limit
+        if reset_seconds and reset_seconds > 0:
+            # Reset is the time to refill from ``remaining`` to ``limit``
+            self.rate = max((limit - remaining) / reset_seconds, limit / 60.0)
+        else:
+            self.rate = limit / 60.0
+        # The server count lags behind requests still in flight, so never raise the local count
+        self.tokens = remaining if first_observation else min(self.tokens, remaining)
+
+
+class LLMGateway:
+    """
+    Concurrency limit, pacing, retry and coalescing around OpenAI calls
+
+    Calls are made as ``resource`` + method name so the raw response (with
+    rate-limit headers) can be read via ``resource.with_raw_response``.
+
+    Example:
+        >>> response = await llm_gateway.call(
+        ...     client.chat.completions, "create", coalesce=True,
+        ...     model="gpt-4o", messages=messages, temperature=0.0
+        ... )
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        max_retries: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._request_bucket = TokenBucket()
+        self._token_bucket = TokenBucket()
+        self._inflight: Dict[str, "asyncio.Task"] = {}
+
+    async def call(
+        self,
+        resource: Any,
+        method: str,
+        coalesce: bool = False,
+        label: Optional[str] = None,
+        **kwargs
+    ) -> Any:
+        """
+        Call ``resource.<method>(**kwargs)`` through the gateway
+
+        Args:
+            resource: SDK resource, e.g. ``client.chat.completions``
+            method: Method name on the resource, e.g. ``"create"``
+            coalesce: Share one in-flight request between identical calls;
+                only for idempotent calls such as temperature 0 completions
+            label: Operation name for telemetry, e.g. ``"intent_parse"``;
+                defaults to ``<resource type>.<method>``
+            **kwargs: Arguments of the SDK method
+
+        Returns:
+            The parsed SDK response object
+        """
+        operation = label or f"{type(resource).__name__}.{method}"
+        started = time.perf_counter()
+        follower = False
+        try:
+            if not coalesce:
+                response = await self._call_with_retry(resource, method, kwargs)
+            else:
+                key = self._coalesce_key(resource, method, kwargs)
+                task = self._inflight.get(key)
+                if task is not None:
+                    follower = True
+                    metrics.increment("llm.coalesced")
+                else:
+                    task = asyncio.ensure_future(self._call_with_retry(resource, method, kwargs))
+                    self._inflight[key] = task
+                    task.add_done_callback(lambda _: self._inflight.pop(key, None))
+                # A cancelled caller must not cancel the request other callers wait for
+                response = await asyncio.shield(task)
+        except Exception:
+            llm_telemetry.record_call(operation, (time.perf_counter() - started) * 1000, model=kwargs.get("model"), status="error")
+            raise
+
+        # Tokens of a shared response are accounted to the caller that made the request
+        llm_telemetry.record_call(
+            operation,
+            (time.perf_counter() - started) * 1000,
+            usage=None if follower else getattr(response, "usage", None),
+            model=kwargs.get("model"),
+            status="coalesced" if follower else "ok"
+        )
+        return response
+
+    async def _call_with_retry(self, resource: Any, method: str, kwargs: Dict[str, Any]) -> Any:
+        operation = f"{type(resource).__name__}.{method}"
+        attempt = 0
+        while True:
+            try:
+                return await self._call_once(resource, method, kwargs)
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    metrics.increment("llm.errors")
+                    logger.error("❌ [LLM_GATEWAY] %s failed after %s attempts: %s", operation, attempt + 1, e)
+                    raise
+                if isinstance(e, openai.RateLimitError):
+                    metrics.increment("llm.rate_limited")
+                delay = self._retry_delay(e, attempt)
+                attempt += 1
+                metrics.increment("llm.retries")
+                logger.info(
+                    "🔁 [LLM_GATEWAY] %s retry %s/%s in %.2fs: %s",
+                    operation, attempt, self.max_retries, delay, type(e).__name__
+                )
+                await asyncio.sleep(delay)
+            except Exception:
+                metrics.increment("llm.errors")
+                raise
+
+    async def _call_once(self, resource: Any, method: str, kwargs: Dict[str, Any]) -> Any:
+        waited = await self._request_bucket.acquire(1)
+        waited += await self._token_bucket.acquire(self._estimate_tokens(kwargs))
+        if waited:
+            metrics.increment("llm.paced")
+
+        async with self._semaphore:
+            metrics.increment("llm.calls")
+            raw_resource = getattr(resource, "with_raw_response", None)
+            if raw_resource is None:
+                return await getattr(resource, method)(**kwargs)
+            raw = await getattr(raw_resource, method)(**kwargs)
+            self._observe_headers(raw.headers)
+            return raw.parse()
+
+    def _observe_headers(self, headers: Any) -> None:
+        """Feed the x-ratelimit-* headers into the token buckets"""
+        for kind, bucket in (("requests", self._request_bucket), ("tokens", self._token_bucket)):
+            limit = _header_number(headers, f"x-ratelimit-limit-{kind}")
+            remaining = _header_number(headers, f"x-ratelimit-remaining-{kind}")
+            reset = parse_reset_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+            bucket.observe(limit, remaining, reset)
+
+    def _retry_delay(self, error: Exception, attempt: int) -> float:
+        """Retry-After when the server sent one, otherwise full-jitter exponential backoff"""
+        response = getattr(error, "response", None)
+        if response is not None:
+            retry_after_ms = _header_number(response.headers, "retry-after-ms")
+            if retry_after_ms is not None:
+                retry_after = retry_after_ms / 1000
+            else:
+                retry_after = _header_number(response.headers, "retry-after")
+            if retry_after is not None and 0 < retry_after <= self.max_delay:
+                return retry_after + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    @staticmethod
+    def _estimate_tokens(kwargs: Dict[str, Any]) -> float:
+        """Rough prompt + completion token cost of a call for the token bucket"""
+        messages = kwargs.get("messages")
+        if not messages:
+            return 1
+        characters = sum(len(str(m.get("content", ""))) for m in messages if isinstance(m, dict))
+        return characters // 3 + (kwargs.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+    @staticmethod
+    def _coalesce_key(resource: Any, method: str, kwargs: Dict[str, Any]) -> str:
+        payload = json.dumps(
+            [type(resource).__name__, method, kwargs],
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _header_number(headers: Any, name: str) -> Optional[float]:
+    value = headers.get(name)
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+_gateway: Optional[LLMGateway] = None
+
+
+def get_llm_gateway() -> LLMGateway:
+    """Process-wide gateway built from settings"""
+    global _gateway
+    if _gateway is None:
+        settings = get_settings()
+        _gateway = LLMGateway(
+            max_concurrency=settings.llm_max_concurrency,
+            max_retries=settings.llm_max_retries,
+            base_delay=settings.llm_retry_base_delay,
+            max_delay=settings.llm_retry_max_delay
+        )
+    return _gateway
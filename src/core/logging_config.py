@@ -0,0 +1,157 @@
+"""
+Application logging
+
+Modules log through ``logging.getLogger(__name__)``. ``configure_logging``
+routes every record of the process through one bounded queue to a writer
+thread, so a request never waits on stdout; records that do not fit in the
+queue are dropped and counted instead of blocking the event loop. Messages
+use lazy ``%`` formatting and are rendered on the writer thread.
+
+- levels: ``LOG_LEVEL`` for everything, ``LOG_LEVELS`` overrides per module
+  (``src.companies.service=DEBUG,src.ai_conversation=WARNING``)
+- sampling: only ``LOG_DEBUG_SAMPLE_RATE`` of the DEBUG records (per-item
+  lines of the hot paths) are kept when DEBUG is enabled
+- format: the usual one-line text, or JSON lines (``LOG_FORMAT=json``) with
+  the endpoint and turn id of the LLM telemetry turn the record belongs to
+"""
+
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, Dict, Any
+
+from .config import get_settings
+from .metrics import metrics
+from .telemetry import current_turn
+
+
+TEXT_FORMAT = "%(asctime)s %(levelname)-7s %(name)s: %(message)s"
+
+# Attributes every LogRecord has; anything else was passed with ``extra=``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "turn_id", "endpoint"}
+
+_listener: Optional[QueueListener] = None
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a share of the DEBUG records; other levels always pass
+
+    Example:
+        >>> handler.addFilter(SamplingFilter(0.1))
+    """
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = min(max(rate, 0.0), 1.0)
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+class TurnContextFilter(logging.Filter):
+    """Tag records with the telemetry turn of the task that logged them (read before the record leaves the task)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        turn = current_turn()
+        record.turn_id = turn["turn_id"] if turn else None
+        record.endpoint = turn["endpoint"] if turn else None
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Queue handler that drops records when the queue is full
+
+    The message is not rendered here: the listener thread formats it. Only
+    the traceback is rendered in the caller, while it still exists.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.increment("logging.dropped")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "endpoint", None):
+            entry["endpoint"] = record.endpoint
+            entry["turn_id"] = record.turn_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """
+    Per-module levels from ``LOG_LEVELS``
+
+    Example:
+        >>> parse_levels("src.companies.service=DEBUG, src.ai_conversation=warning")
+        {'src.companies.service': 'DEBUG', 'src.ai_conversation': 'WARNING'}
+    """
+    levels = {}
+    for item in (spec or "").split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def configure_logging() -> None:
+    """Install the queue handler on the root logger and start the writer thread (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+    settings = get_settings()
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if settings.log_format == "json" else logging.Formatter(TEXT_FORMAT))
+
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=settings.log_queue_size))
+    queue_handler.addFilter(SamplingFilter(settings.log_debug_sample_rate))
+    queue_handler.addFilter(TurnContextFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(settings.log_level)
+    for name, level in parse_levels(settings.log_levels).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Flush the queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
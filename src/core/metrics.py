@@ -0,0 +1,63 @@
+"""
+In-process metrics registry for Ayala Foundation Backend
+
+Lightweight named counters shared by the services so that hit rates and
+call counts can be reported through the API without an external backend.
+"""
+
+import threading
+from typing import Dict, Optional
+
+
+class MetricsRegistry:
+    """Thread-safe registry of named numeric counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, float] = {}
+
+    def increment(self, name: str, value: float = 1) -> None:
+        """
+        Add ``value`` to the counter ``name`` (created on first use)
+
+        Example:
+            >>> metrics.increment("intent.fast_path.hits")
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def get(self, name: str) -> float:
+        """Current value of a counter, 0 if it was never incremented"""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def ratio(self, numerator: str, *denominator: str) -> Optional[float]:
+        """
+        ``numerator / sum(denominator)`` rounded to 4 digits
+
+        Returns:
+            The ratio, or None while the denominator is still zero
+        """
+        with self._lock:
+            total = sum(self._counters.get(name, 0) for name in denominator)
+            if not total:
+                return None
+            return round(self._counters.get(numerator, 0) / total, 4)
+
+    def snapshot(self, prefix: Optional[str] = None) -> Dict[str, float]:
+        """Copy of all counters, optionally limited to names starting with ``prefix``"""
+        with self._lock:
+            return {
+                name: value
+                for name, value in sorted(self._counters.items())
+                if prefix is None or name.startswith(prefix)
+            }
+
+    def reset(self) -> None:
+        """Drop all counters"""
+        with self._lock:
+            self._counters.clear()
+
+
+# Global metrics instance
+metrics = MetricsRegistry()
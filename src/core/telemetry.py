@@ -0,0 +1,351 @@
+"""
+Per-turn LLM latency and token accounting
+
+Every OpenAI call made through the LLM gateway is timed and its ``usage`` is
+captured. Calls are attributed to the endpoint, user and turn set with
+``llm_telemetry.turn(...)`` by the chat endpoints (context variables, so concurrent
+requests do not mix), and aggregated in-process into:
+
+- latency histograms per endpoint and operation (e.g. ``intent_parse``)
+- turn latency histograms per endpoint, with the share taken by each operation
+- token totals per endpoint and operation, and token histograms per turn
+- the most recent turns with their per-call breakdown
+
+Call and turn records can also be appended to a JSONL file for offline
+analysis (``LLM_TELEMETRY_PATH``); writes happen on a background thread.
+The snapshot served over HTTP carries pseudonymous user and conversation ids.
+"""
+
+import logging
+import contextvars
+import hashlib
+import hmac
+import json
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, Iterator
+
+from .config import get_settings
+
+
+logger = logging.getLogger(__name__)
+
+
+# Upper bounds of the latency buckets in milliseconds (last bucket is open)
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2000, 5000, 10000, 30000, 60000)
+
+# Upper bounds of the token buckets of a turn
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with count, sum, min and max
+
+    Example:
+        >>> histogram = Histogram(LATENCY_BUCKETS_MS)
+        >>> histogram.observe(420.0)
+        >>> histogram.summary()["p50"]
+        500
+    """
+
+    def __init__(self, bounds: tuple):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float) -> None:
+        index = len(self.bounds)
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the ``q``-th percentile (max for the open bucket)"""
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "sum": round(self.total, 1),
+            "mean": round(self.total / self.count, 1) if self.count else None,
+            "min": round(self.min, 1) if self.min is not None else None,
+            "max": round(self.max, 1) if self.max is not None else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": {
+                (f"le_{bound}" if i < len(self.bounds) else "inf"): count
+                for i, (bound, count) in enumerate(zip(self.bounds + (None,), self.counts))
+            },
+        }
+
+
+# Turn the current task belongs to (set by LLMTelemetry.turn)
+_current_turn: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("llm_turn", default=None)
+
+
+class LLMTelemetry:
+    """Thread-safe aggregation of LLM call and turn records"""
+
+    def __init__(self, enabled: bool = True, path: Optional[str] = None, recent_turns: int = 200):
+        self.enabled = enabled
+        self.path = path
+        self._lock = threading.Lock()
+        self._recent_turns: deque = deque(maxlen=recent_turns)
+        self._writer_queue: Optional[queue.Queue] = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Drop all aggregates"""
+        with self._lock:
+            self._call_latency: Dict[str, Dict[str, Histogram]] = {}
+            self._turn_latency: Dict[str, Histogram] = {}
+            self._turn_tokens: Dict[str, Histogram] = {}
+            self._operation_ms: Dict[str, Dict[str, float]] = {}
+            self._tokens: Dict[str, Dict[str, Dict[str, int]]] = {}
+            self._errors: Dict[str, Dict[str, int]] = {}
+            self._recent_turns.clear()
+
+    @contextmanager
+    def turn(self, endpoint: str, user_id: Optional[str] = None, conversation_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Attribute the LLM calls made inside the block to one conversation turn
+
+        Example:
+            >>> with llm_telemetry.turn("/funds/chat", user_id=str(current_user.id)):
+            ...     response_data = await ai_service.handle_conversation_turn(...)
+        """
+        turn = {
+            "turn_id": uuid.uuid4().hex[:16],
+            "endpoint": endpoint,
+            "user_id": user_id,
+            "conversation_id": conversation_id,
+            "started_at": time.perf_counter(),
+            "calls": [],
+        }
+        token = _current_turn.set(turn)
+        try:
+            yield turn
+        finally:
+            try:
+                _current_turn.reset(token)
+            except ValueError:
+                # Closed from another context (e.g. a streaming response whose client went away)
+                _current_turn.set(None)
+            if self.enabled:
+                self._finish_turn(turn)
+
+    def record_call(
+        self,
+        operation: str,
+        duration_ms: Optional[float],
+        usage: Any = None,
+        model: Optional[str] = None,
+        status: str = "ok"
+    ) -> None:
+        """
+        Record one OpenAI call of the current turn
+
+        Args:
+            operation: Call label, e.g. ``intent_parse`` or ``AsyncRuns.create``
+            duration_ms: Wall time including retries and pacing; None for
+                token-only records (e.g. the usage of a finished assistant run)
+            usage: SDK ``usage`` object or dict with prompt/completion/total tokens
+            model: Model name when known
+            status: ``ok``, ``error`` or ``coalesced``
+        """
+        if not self.enabled:
+            return
+        turn = _current_turn.get()
+        endpoint = turn["endpoint"] if turn else "background"
+        tokens = _usage_tokens(usage)
+        call = {
+            "operation": operation,
+            "model": model,
+            "status": status,
+            "duration_ms": round(duration_ms, 1) if duration_ms is not None else None,
+            **tokens,
+        }
+
+        with self._lock:
+            if duration_ms is not None:
+                self._call_latency.setdefault(endpoint, {}).setdefault(operation, Histogram(LATENCY_BUCKETS_MS)).observe(duration_ms)
+            totals = self._tokens.setdefault(endpoint, {}).setdefault(
+                operation, {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+            )
+            for key, value in tokens.items():
+                totals[key] += value
+            if status == "error":
+                errors = self._errors.setdefault(endpoint, {})
+                errors[operation] = errors.get(operation, 0) + 1
+            if turn is not None:
+                turn["calls"].append(call)
+
+        self._persist({
+            "type": "call",
+            "endpoint": endpoint,
+            "turn_id": turn["turn_id"] if turn else None,
+            "user_id": turn["user_id"] if turn else None,
+            **call,
+        })
+
+    def _finish_turn(self, turn: Dict[str, Any]) -> None:
+        turn_ms = (time.perf_counter() - turn["started_at"]) * 1000
+        calls = turn["calls"]
+        by_operation: Dict[str, float] = {}
+        for call in calls:
+            if call["duration_ms"] is not None:
+                by_operation[call["operation"]] = by_operation.get(call["operation"], 0.0) + call["duration_ms"]
+        total_tokens = sum(call["total_tokens"] for call in calls)
+        record = {
+            "turn_id": turn["turn_id"],
+            "endpoint": turn["endpoint"],
+            "user_id": turn["user_id"],
+            "conversation_id": turn["conversation_id"],
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+            "turn_ms": round(turn_ms, 1),
+            "llm_calls": len(calls),
+            "llm_ms_by_operation": {name: round(value, 1) for name, value in by_operation.items()},
+            "prompt_tokens": sum(call["prompt_tokens"] for call in calls),
+            "completion_tokens": sum(call["completion_tokens"] for call in calls),
+            "total_tokens": total_tokens,
+        }
+
+        endpoint = turn["endpoint"]
+        with self._lock:
+            self._turn_latency.setdefault(endpoint, Histogram(LATENCY_BUCKETS_MS)).observe(turn_ms)
+            self._turn_tokens.setdefault(endpoint, Histogram(TOKEN_BUCKETS)).observe(total_tokens)
+            operation_ms = self._operation_ms.setdefault(endpoint, {})
+            for name, value in by_operation.items():
+                operation_ms[name] = operation_ms.get(name, 0.0) + value
+            self._recent_turns.append(record)
+
+        self._persist({"type": "turn", **record})
+
+    def snapshot(self, recent: int = 20) -> Dict[str, Any]:
+        """
+        Aggregates per endpoint plus the most recent turns
+
+        ``latency_share`` is each operation's share of the summed turn wall time
+        of the endpoint (calls running in parallel can add up to more than 1).
+        """
+        with self._lock:
+            endpoints = {}
+            for endpoint in sorted(set(self._call_latency) | set(self._turn_latency) | set(self._tokens)):
+                turn_latency = self._turn_latency.get(endpoint)
+                turn_total_ms = turn_latency.total if turn_latency else 0.0
+                endpoints[endpoint] = {
+                    "turn_latency_ms": turn_latency.summary() if turn_latency else None,
+                    "turn_tokens": self._turn_tokens[endpoint].summary() if endpoint in self._turn_tokens else None,
+                    "call_latency_ms": {
+                        operation: histogram.summary()
+                        for operation, histogram in sorted(self._call_latency.get(endpoint, {}).items())
+                    },
+                    "latency_share": {
+                        operation: round(value / turn_total_ms, 4)
+                        for operation, value in sorted(self._operation_ms.get(endpoint, {}).items())
+                    } if turn_total_ms else {},
+                    "tokens": {operation: dict(totals) for operation, totals in sorted(self._tokens.get(endpoint, {}).items())},
+                    "errors": dict(self._errors.get(endpoint, {})),
+                }
+            recent_turns = list(self._recent_turns)[-recent:] if recent > 0 else []
+        recent_turns = [
+            {
+                **turn,
+                "user_id": pseudonymize(turn["user_id"]),
+                "conversation_id": pseudonymize(turn["conversation_id"]),
+            }
+            for turn in recent_turns
+        ]
+        return {
+            "enabled": self.enabled,
+            "persist_path": self.path,
+            "endpoints": endpoints,
+            "recent_turns": recent_turns,
+        }
+
+    def _persist(self, record: Dict[str, Any]) -> None:
+        """Queue a record for the JSONL file, starting the writer thread on first use"""
+        if not self.path:
+            return
+        if self._writer_queue is None:
+            with self._lock:
+                if self._writer_queue is None:
+                    self._writer_queue = queue.Queue(maxsize=10000)
+                    threading.Thread(target=self._write_loop, name="llm-telemetry-writer", daemon=True).start()
+        try:
+            self._writer_queue.put_nowait(record)
+        except queue.Full:
+            # Analysis data is best effort; never slow down a request for it
+            pass
+
+    def _write_loop(self) -> None:
+        while True:
+            records = [self._writer_queue.get()]
+            while not self._writer_queue.empty() and len(records) < 500:
+                records.append(self._writer_queue.get_nowait())
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    for record in records:
+                        f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            except OSError as e:
+                logger.warning("⚠️ [TELEMETRY] Could not write %s: %s", self.path, e)
+
+
+def _usage_tokens(usage: Any) -> Dict[str, int]:
+    """prompt/completion/total token counts of an SDK usage object or dict"""
+    tokens = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+    if usage is None:
+        return tokens
+    for key in tokens:
+        value = usage.get(key) if isinstance(usage, dict) else getattr(usage, key, None)
+        tokens[key] = int(value or 0)
+    if not tokens["total_tokens"]:
+        tokens["total_tokens"] = tokens["prompt_tokens"] + tokens["completion_tokens"]
+    return tokens
+
+
+def pseudonymize(value: Optional[str]) -> Optional[str]:
+    """Stable keyed hash of an id, so turns of one user can be grouped without exposing the id"""
+    if value is None:
+        return None
+    key = get_settings().secret_key.encode("utf-8")
+    return hmac.new(key, str(value).encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+
+
+def current_turn() -> Optional[Dict[str, Any]]:
+    """Turn the current task is attributed to, if any"""
+    return _current_turn.get()
+
+
+_settings = get_settings()
+
+# Global telemetry instance
+llm_telemetry = LLMTelemetry(
+    enabled=_settings.llm_telemetry_enabled,
+    path=_settings.llm_telemetry_path or None,
+    recent_turns=_settings.llm_telemetry_recent_turns
+)
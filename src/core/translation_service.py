@@ -3,12 +3,138 @@ Translation service for city names
 
 Maps English city names to their Russian equivalents used in the database.
 Provides functionality to translate user input before database searches.
+
+Misspelled and transliterated names ("Chimkent", "Almati", "Нурсултан") are
+resolved through a SymSpell delete index built once over the Latin
+transliteration of every known place name, so a fuzzy lookup is a few dict
+hits plus edit distance checks on a handful of candidates.
 """
 
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Set, Tuple
+from functools import lru_cache
 import re
 
 
+# Cyrillic (Russian + Kazakh) to Latin transliteration table
+CYRILLIC_TO_LATIN: Dict[str, str] = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e",
+    "ж": "zh", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
+    "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "kh", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "shch",
+    "ъ": "", "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+    # Kazakh-specific letters
+    "ә": "a", "ғ": "g", "қ": "k", "ң": "n", "ө": "o", "ұ": "u", "ү": "u",
+    "һ": "h", "і": "i",
+}
+
+_NON_NAME_CHARS = re.compile(r"[^a-z0-9 ]+")
+_MULTIPLE_SPACES = re.compile(r"\s+")
+
+
+def transliterate_to_latin(text: str) -> str:
+    """
+    Transliterate Cyrillic characters to Latin, leaving other characters as-is
+
+    Args:
+        text: Text in Cyrillic, Latin or mixed script
+
+    Returns:
+        Lowercase Latin transliteration
+    """
+    return "".join(CYRILLIC_TO_LATIN.get(char, char) for char in text.lower())
+
+
+def normalize_place_name(name: str) -> str:
+    """
+    Build the comparison key used by the fuzzy index
+
+    Transliterates to Latin, drops hyphens and punctuation and collapses
+    whitespace, so "Нур-Султан", "nur-sultan" and "Nursultan" share one key.
+    """
+    latin = transliterate_to_latin(name.strip()).replace("-", "")
+    latin = _NON_NAME_CHARS.sub(" ", latin)
+    return _MULTIPLE_SPACES.sub(" ", latin).strip()
+
+
+def levenshtein_distance(first: str, second: str) -> int:
+    """Classic edit distance (insertions, deletions, substitutions)"""
+    if first == second:
+        return 0
+    if len(first) < len(second):
+        first, second = second, first
+    if not second:
+        return len(first)
+
+    previous_row = list(range(len(second) + 1))
+    for i, first_char in enumerate(first, start=1):
+        current_row = [i]
+        for j, second_char in enumerate(second, start=1):
+            current_row.append(min(
+                previous_row[j] + 1,
+                current_row[j - 1] + 1,
+                previous_row[j - 1] + (first_char != second_char),
+            ))
+        previous_row = current_row
+    return previous_row[-1]
+
+
+class SymSpellIndex:
+    """
+    Symmetric-delete (SymSpell) index over normalized place names
+
+    Every term is stored under all strings obtained by deleting up to
+    ``max_distance`` characters. A lookup generates the same deletes for the
+    query, so candidates come from plain dict hits and only those few
+    candidates are verified with a full edit distance computation.
+    """
+
+    def __init__(self, max_distance: int = 2):
+        self.max_distance = max_distance
+        self._deletes: Dict[str, Set[str]] = {}
+        self.size = 0
+
+    @staticmethod
+    def _generate_deletes(term: str, max_distance: int) -> Set[str]:
+        """All variants of ``term`` with up to ``max_distance`` characters removed"""
+        variants = {term}
+        frontier = {term}
+        for _ in range(max_distance):
+            next_frontier = set()
+            for variant in frontier:
+                for i in range(len(variant)):
+                    next_frontier.add(variant[:i] + variant[i + 1:])
+            variants |= next_frontier
+            frontier = next_frontier
+        return variants
+
+    def add(self, term: str) -> None:
+        """Insert a term with all of its deletes"""
+        for variant in self._generate_deletes(term, self.max_distance):
+            self._deletes.setdefault(variant, set()).add(term)
+        self.size += 1
+
+    def search(self, term: str, max_distance: int) -> List[Tuple[int, str]]:
+        """
+        Find all terms within ``max_distance`` edits of ``term``
+
+        Returns:
+            List of (distance, term) tuples sorted by distance, then term
+        """
+        max_distance = min(max_distance, self.max_distance)
+        candidates: Set[str] = set()
+        for variant in self._generate_deletes(term, max_distance):
+            candidates |= self._deletes.get(variant, set())
+
+        matches = []
+        for candidate in candidates:
+            if abs(len(candidate) - len(term)) > max_distance:
+                continue
+            distance = levenshtein_distance(term, candidate)
+            if distance <= max_distance:
+                matches.append((distance, candidate))
+        return sorted(matches)
+
+
 class CityTranslationService:
     """Service for translating city names from English to Russian"""
     
@@ -17,10 +143,12 @@ class CityTranslationService:
     CITY_TRANSLATIONS: Dict[str, str] = {
         # Major cities
         "almaty": "Алматы",
+        "alma-ata": "Алматы",
         "astana": "Астана", 
         "nur-sultan": "Нур-Султан",
         "nursultan": "Нур-Султан",
         "shymkent": "Шымкент",
+        "chimkent": "Шымкент",
         "aktobe": "Актобе",
         "taraz": "Тараз",
         "pavlodar": "Павлодар", 
@@ -30,6 +158,7 @@ class CityTranslationService:
         "atyrau": "Атырау",
         "kostanay": "Костанай",
         "petropavl": "Петропавл",
+        "petropavlovsk": "Петропавловск",
         "karaganda": "Караганда",
         "aktau": "Актау",
         "kyzylorda": "Кызылорда",
@@ -62,6 +191,8 @@ class CityTranslationService:
         "kyzylorda oblast": "Кызылординская область",
         "mangystau region": "Мангыстауская область",
         "mangystau oblast": "Мангыстауская область",
+        "mangistau region": "Мангистауская область",
+        "mangistau oblast": "Мангистауская область",
         "north kazakhstan": "Северо-Казахстанская область",
         "north kazakhstan region": "Северо-Казахстанская область",
         "pavlodar region": "Павлодарская область",
@@ -114,6 +245,73 @@ class CityTranslationService:
         "kazalinsk": "Казалинск",
         "aralsk": "Аральск",
     }
+
+    # Lazily built fuzzy index: normalized key -> canonical Russian name
+    _fuzzy_index: Optional[SymSpellIndex] = None
+    _fuzzy_names: Dict[str, str] = {}
+
+    @classmethod
+    def _get_fuzzy_index(cls) -> SymSpellIndex:
+        """Build the delete index over every English key and Russian name once"""
+        if cls._fuzzy_index is None:
+            names: Dict[str, str] = {}
+            # Russian names first so that they win over English aliases that
+            # happen to transliterate to the same key
+            for russian_name in cls.CITY_TRANSLATIONS.values():
+                names.setdefault(normalize_place_name(russian_name), russian_name)
+            for english_name, russian_name in cls.CITY_TRANSLATIONS.items():
+                names.setdefault(normalize_place_name(english_name), russian_name)
+
+            index = SymSpellIndex(max_distance=2)
+            for key in names:
+                index.add(key)
+
+            cls._fuzzy_names = names
+            cls._fuzzy_index = index
+        return cls._fuzzy_index
+
+    @staticmethod
+    def _max_edit_distance(key: str) -> int:
+        """Allowed typos grow with name length; short names must match exactly"""
+        length = len(key.replace(" ", ""))
+        if length <= 4:
+            return 0
+        if length <= 7:
+            return 1
+        return 2
+
+    @classmethod
+    def resolve_location(cls, location: str) -> Optional[str]:
+        """
+        Resolve a (possibly misspelled or transliterated) place name
+
+        Matches Latin and Cyrillic spellings against all known places with a
+        length-dependent edit distance tolerance.
+
+        Args:
+            location: Place name as typed by the user
+
+        Returns:
+            Canonical Russian name, or None when nothing is close enough
+
+        Example:
+            >>> CityTranslationService.resolve_location("Chimkent")
+            'Шымкент'
+        """
+        match = cls.match_location(location)
+        return match[0] if match else None
+
+    @classmethod
+    def match_location(cls, location: str) -> Optional[Tuple[str, int]]:
+        """
+        Same as resolve_location, but also reports how far the match was
+
+        Returns:
+            (canonical Russian name, edit distance) or None
+        """
+        if not location or not location.strip():
+            return None
+        return _resolve_location_cached(cls, normalize_place_name(location))
     
     @classmethod
     def translate_city_name(cls, city_name: str) -> str:
@@ -135,6 +333,11 @@ class CityTranslationService:
         # Direct translation lookup
         if normalized_name in cls.CITY_TRANSLATIONS:
             return cls.CITY_TRANSLATIONS[normalized_name]
+
+        # Transliteration-aware fuzzy lookup ("Almati", "Нурсултан", "Chimkent")
+        resolved_name = cls.resolve_location(normalized_name)
+        if resolved_name:
+            return resolved_name
             
         # Try partial matches for compound names or regions
         for english_name, russian_name in cls.CITY_TRANSLATIONS.items():
@@ -183,6 +386,9 @@ class CityTranslationService:
             russian_name: Russian city name
         """
         cls.CITY_TRANSLATIONS[english_name.lower().strip()] = russian_name
+        # Rebuild the fuzzy index on next lookup
+        cls._fuzzy_index = None
+        _resolve_location_cached.cache_clear()
     
     @classmethod 
     def get_supported_cities(cls) -> List[str]:
@@ -192,4 +398,21 @@ class CityTranslationService:
         Returns:
             List of English city names that have translations
         """
-        return list(cls.CITY_TRANSLATIONS.keys()) 
\ No newline at end of file
+        return list(cls.CITY_TRANSLATIONS.keys()) 
+
+
+@lru_cache(maxsize=2048)
+def _resolve_location_cached(service: type, key: str) -> Optional[Tuple[str, int]]:
+    """Memoized fuzzy index lookup for a normalized place name"""
+    if not key:
+        return None
+
+    index = service._get_fuzzy_index()
+    if key in service._fuzzy_names:
+        return service._fuzzy_names[key], 0
+
+    matches = index.search(key, service._max_edit_distance(key))
+    if not matches:
+        return None
+    distance, term = matches[0]
+    return service._fuzzy_names[term], distance
@@ -0,0 +1,242 @@
+"""
+Append-only storage of fund conversations
+
+Each turn appends its new messages to ``conversation_messages`` instead of
+rewriting the whole history in ``FundProfile.conversation_state``; the
+history is loaded as the last N messages with one range query on the
+``(user_id, seq)`` index. Histories still stored in the legacy JSON blob are
+moved into the table the first time they are loaded.
+
+A reset marks the messages cleared rather than deleting them, so ``seq``
+stays monotonic per user: a WebSocket client resuming with a ``seq`` from
+before the reset is not mistaken for one that missed the new messages.
+"""
+
+import logging
+from typing import Optional, Dict, Any, List, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..core.config import get_settings
+from .models import FundProfile, ConversationMessage
+
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationStore:
+    """
+    Load, append and clear conversation messages of a user
+
+    Example:
+        >>> history = conversation_store.load_history(db, user.id, fund_profile)
+        >>> conversation_store.append(db, user.id, fund_profile.id, [
+        ...     {"role": "user", "content": "дай еще"},
+        ...     {"role": "assistant", "content": "Вот еще 10 компаний..."}
+        ... ])
+    """
+
+    def __init__(self, load_limit: int = 50, max_append_attempts: int = 3):
+        self.load_limit = load_limit
+        self.max_append_attempts = max_append_attempts
+
+    def load_history(
+        self,
+        db: Session,
+        user_id,
+        fund_profile: Optional[FundProfile] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Last ``limit`` messages of the user's conversation in order
+
+        Older messages stay in the table; the LLM only ever sees a window of
+        recent turns (see HistoryCompactor), so they are not loaded.
+        """
+        messages = self.load_messages(db, user_id, fund_profile, limit=limit)
+        return [{"role": m["role"], "content": m["content"]} for m in messages]
+
+    def load_messages(
+        self,
+        db: Session,
+        user_id,
+        fund_profile: Optional[FundProfile] = None,
+        after_seq: Optional[int] = None,
+        limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Last ``limit`` messages with their ``seq``, optionally only those after ``after_seq``
+
+        Used by the WebSocket channel to resume a client from its last seen message.
+        """
+        limit = limit or self.load_limit
+        query = (
+            db.query(ConversationMessage.seq, ConversationMessage.role, ConversationMessage.content)
+            .filter(ConversationMessage.user_id == user_id, ConversationMessage.cleared_at.is_(None))
+        )
+        if after_seq is not None:
+            query = query.filter(ConversationMessage.seq > after_seq)
+        rows = query.order_by(ConversationMessage.seq.desc()).limit(limit).all()
+        if not rows and after_seq is None and fund_profile is not None and (fund_profile.conversation_state or {}).get("history"):
+            first_seq, legacy_history = self._backfill_legacy_history(db, user_id, fund_profile)
+            return [
+                {"seq": seq, **message} for seq, message in enumerate(legacy_history, start=first_seq)
+            ][-limit:]
+        return [{"seq": row.seq, "role": row.role, "content": row.content} for row in reversed(rows)]
+
+    def append(self, db: Session, user_id, fund_profile_id, messages: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Append the messages of a turn and commit
+
+        Concurrent turns of the same user race for the same ``seq``; the loser
+        hits the unique index and retries after the winner's rows.
+
+        Returns:
+            The appended messages with their assigned ``seq``
+        """
+        messages = [m for m in messages if m.get("role") and m.get("content")]
+        if not messages:
+            return []
+        for attempt in range(1, self.max_append_attempts + 1):
+            next_seq = self._next_seq(db, user_id)
+            for offset, message in enumerate(messages):
+                db.add(ConversationMessage(
+                    user_id=user_id,
+                    fund_profile_id=fund_profile_id,
+                    seq=next_seq + offset,
+                    role=message["role"],
+                    content=message["content"]
+                ))
+            try:
+                db.commit()
+                return [
+                    {"seq": next_seq + offset, "role": message["role"], "content": message["content"]}
+                    for offset, message in enumerate(messages)
+                ]
+            except IntegrityError:
+                db.rollback()
+                if attempt == self.max_append_attempts:
+                    raise
+                logger.info("🔁 [CONVERSATION_STORE] Concurrent append for user %s, retrying (%s)", user_id, attempt)
+
+    def version(self, db: Session, user_id) -> int:
+        """
+        Version of the user's history for the delta protocol: the id of its newest message, 0 when empty
+
+        Message ids only grow and are never reused, so the version changes on
+        every append and after a reset, and one indexed lookup is enough.
+        """
+        last_id = (
+            db.query(ConversationMessage.id)
+            .filter(ConversationMessage.user_id == user_id, ConversationMessage.cleared_at.is_(None))
+            .order_by(ConversationMessage.seq.desc())
+            .limit(1)
+            .scalar()
+        )
+        return last_id or 0
+
+    def messages_after(self, db: Session, user_id, version: int, limit: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """
+        Messages newer than ``version`` (a message id) in order, with their ``id`` and ``seq``
+
+        Brings a client copy at ``version`` up to date, including messages other
+        devices added meanwhile. Returns None when a delta cannot do that: the
+        version is not a live message of the user (reset since, or unknown id)
+        or more than ``limit`` messages are missing.
+        """
+        limit = limit or self.load_limit
+        if version:
+            known = (
+                db.query(ConversationMessage.id)
+                .filter(
+                    ConversationMessage.id == version,
+                    ConversationMessage.user_id == user_id,
+                    ConversationMessage.cleared_at.is_(None)
+                )
+                .first()
+            )
+            if known is None:
+                return None
+        rows = (
+            self._live_messages(db, user_id)
+            .filter(ConversationMessage.id > version)
+            .order_by(ConversationMessage.seq)
+            .limit(limit + 1)
+            .all()
+        )
+        if len(rows) > limit:
+            return None
+        return [self._to_dict(row) for row in rows]
+
+    def history_window(self, db: Session, user_id, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], bool]:
+        """
+        Last ``limit`` messages in order with their ``id`` and ``seq``, and whether older ones were left out
+        """
+        limit = limit or self.load_limit
+        rows = self._live_messages(db, user_id).order_by(ConversationMessage.seq.desc()).limit(limit + 1).all()
+        truncated = len(rows) > limit
+        return [self._to_dict(row) for row in reversed(rows[:limit])], truncated
+
+    def clear(self, db: Session, user_id) -> int:
+        """Mark the user's conversation messages cleared (caller commits); returns the number cleared"""
+        return (
+            db.query(ConversationMessage)
+            .filter(ConversationMessage.user_id == user_id, ConversationMessage.cleared_at.is_(None))
+            .update({ConversationMessage.cleared_at: func.now()}, synchronize_session=False)
+        )
+
+    @staticmethod
+    def _live_messages(db: Session, user_id):
+        return db.query(
+            ConversationMessage.id, ConversationMessage.seq, ConversationMessage.role, ConversationMessage.content
+        ).filter(ConversationMessage.user_id == user_id, ConversationMessage.cleared_at.is_(None))
+
+    @staticmethod
+    def _to_dict(row) -> Dict[str, Any]:
+        return {"id": row.id, "seq": row.seq, "role": row.role, "content": row.content}
+
+    @staticmethod
+    def _next_seq(db: Session, user_id) -> int:
+        # Cleared messages count too, so seq continues after a reset
+        last_seq = db.query(func.max(ConversationMessage.seq)).filter(ConversationMessage.user_id == user_id).scalar()
+        return 0 if last_seq is None else last_seq + 1
+
+    def _backfill_legacy_history(self, db: Session, user_id, fund_profile: FundProfile) -> Tuple[int, List[Dict[str, str]]]:
+        """Move a history stored in the JSON blob into conversation_messages; returns (first seq, messages)"""
+        state = dict(fund_profile.conversation_state or {})
+        legacy_history = [
+            {"role": m.get("role"), "content": m.get("content")}
+            for m in state.pop("history", [])
+            if isinstance(m, dict) and m.get("role") and m.get("content")
+        ]
+        first_seq = self._next_seq(db, user_id)
+        for seq, message in enumerate(legacy_history, start=first_seq):
+            db.add(ConversationMessage(
+                user_id=user_id,
+                fund_profile_id=fund_profile.id,
+                seq=seq,
+                role=message["role"],
+                content=message["content"]
+            ))
+        fund_profile.conversation_state = state
+        try:
+            db.commit()
+            logger.info(
+                "📦 [CONVERSATION_STORE] Moved %s legacy messages of user %s to conversation_messages",
+                len(legacy_history), user_id
+            )
+        except IntegrityError:
+            # Another request backfilled (or appended) first
+            db.rollback()
+        return first_seq, legacy_history
+
+
+def build_conversation_store() -> ConversationStore:
+    """Conversation store configured from settings"""
+    return ConversationStore(load_limit=get_settings().conversation_history_load_limit)
+
+
+# Global conversation store instance
+conversation_store = build_conversation_store()
@@ -4,7 +4,7 @@ SQLAlchemy models for fund profiles and conversation state
 Defines the database schema for charity fund profiles and AI conversation state.
 """
 
-from sqlalchemy import Column, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, String, Text, DateTime, ForeignKey, JSON, Integer, BigInteger, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -71,7 +71,8 @@ class FundProfile(Base):
     fund_description = Column(Text)
     fund_email = Column(String(255))
     
-    # AI conversation state
+    # AI conversation state (last intent/location/keywords and search state);
+    # the messages themselves live in conversation_messages
     conversation_state = Column(JSON, default=dict)
     
     # Timestamps
@@ -82,4 +83,42 @@ class FundProfile(Base):
     user = relationship("User", back_populates="fund_profile")
     
     def __repr__(self):
-        return f"<FundProfile(id={self.id}, fund_name='{self.fund_name}', user_id={self.user_id})>" 
\ No newline at end of file
+        return f"<FundProfile(id={self.id}, fund_name='{self.fund_name}', user_id={self.user_id})>" 
+
+
+class ConversationMessage(Base):
+    """
+    One message of a user's AI conversation
+    
+    Append-only: a turn adds its user message and the assistant reply, and the
+    history is loaded as the last N rows through the (user_id, seq) index.
+    A reset marks the rows cleared instead of deleting them, so ``seq`` keeps
+    growing across resets and a client resuming from an old ``seq`` is not
+    served messages of the new conversation as "missed".
+    """
+    
+    __tablename__ = "conversation_messages"
+    __table_args__ = (
+        Index("ix_conversation_messages_user_seq", "user_id", "seq", unique=True),
+    )
+    
+    # Primary key (SQLite only autoincrements INTEGER keys)
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    
+    # Owner; messages outlive a deleted fund profile until the conversation is reset
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    fund_profile_id = Column(UUID(as_uuid=True))
+    
+    # Position in the user's conversations, 0-based and monotonic per user (never reused after a reset)
+    seq = Column(Integer, nullable=False)
+    
+    role = Column(String(20), nullable=False)
+    content = Column(Text, nullable=False)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set when the conversation was reset; cleared messages are never loaded
+    cleared_at = Column(DateTime(timezone=True))
+    
+    def __repr__(self):
+        return f"<ConversationMessage(user_id={self.user_id}, seq={self.seq}, role='{self.role}')>"
@@ -4,20 +4,34 @@ API Router for fund profile endpoints
 Provides endpoints for charity fund profile management.
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import logging
+from fastapi import APIRouter, Depends, HTTPException, status, WebSocket, WebSocketDisconnect, Header, Response
 from sqlalchemy.orm import Session
 from typing import Optional
+import asyncio
+import json
 
 from .models import FundProfile
+from .conversation_store import conversation_store
 from .schemas import FundProfileCreate, FundProfileResponse
 # Import correct models from ai_conversation
 from ..ai_conversation.models import ChatRequest, ChatResponse
-from ..auth.router import get_current_user
+from ..auth.router import get_current_user, user_from_token
+from ..auth.principal_cache import principal_cache
 from ..auth.models import User
-from ..core.database import get_db
+from ..core.database import get_db, SessionLocal
 from src.ai_conversation.service import ai_service
+from src.ai_conversation.streaming import sse_response, session_scoped, llm_turn_scoped, ERROR_MESSAGE
+from ..core.telemetry import llm_telemetry
+from ..core.idempotency import idempotent, IDEMPOTENCY_HEADER, REPLAYED_HEADER
 
 
+logger = logging.getLogger(__name__)
+
+
+# Seconds a new WebSocket connection has to send its auth frame
+WS_AUTH_TIMEOUT_SECONDS = 10
+
 # Create router
 router = APIRouter(
     prefix="/funds",
@@ -29,94 +43,394 @@ router = APIRouter(
 )
 
 
-@router.post("/chat", response_model=ChatResponse)
-async def handle_chat(
-    request: ChatRequest, 
-    db: Session = Depends(get_db), 
-    current_user: User = Depends(get_current_user)
-):
+def _get_fund_profile(db: Session, user_id) -> Optional[FundProfile]:
     """
-    Handle stateful AI conversation with history tracking and database persistence.
-    This endpoint manages conversation state per user and maintains history in the database.
+    Fund profile of a user
+    
+    When get_current_user already knows the profile id, this is a primary key
+    lookup that the identity map usually answers without a query.
     """
-    print(f"Request made by user: {current_user.email}")
+    fund_profile_id = principal_cache.fund_profile_id(user_id)
+    if fund_profile_id is not None:
+        fund_profile = db.get(FundProfile, fund_profile_id)
+        if fund_profile is not None:
+            return fund_profile
+    return db.query(FundProfile).filter(FundProfile.user_id == user_id).first()
 
-    if not request.user_input.strip():
-        raise HTTPException(status_code=400, detail="User input cannot be empty")
+
+def _load_conversation(db: Session, user_id, request: ChatRequest):
+    """
+    Fund profile, conversation history and active search state of a user
     
+    Request history takes precedence over the history stored in the database,
+    except in the delta history protocol (``request.history_version`` set), where
+    the stored history is authoritative.
+    """
     # Get or create fund profile for conversation state persistence
-    fund_profile = db.query(FundProfile).filter(
-        FundProfile.user_id == current_user.id
-    ).first()
+    fund_profile = _get_fund_profile(db, user_id)
     
-    # Load conversation history from database if available
-    conversation_history = []
+    search_state = None
     if fund_profile and fund_profile.conversation_state:
-        conversation_history = fund_profile.conversation_state.get('history', [])
-        print(f"📚 Loaded {len(conversation_history)} messages from database")
+        search_state = fund_profile.conversation_state.get('search_state')
     
     # Merge with history from request (request history takes precedence)
-    if request.history:
-        print(f"📝 Using {len(request.history)} messages from request")
+    if request.history and request.history_version is None:
+        logger.info("📝 Using %s messages from request", len(request.history))
         conversation_history = request.history
+        if fund_profile and (fund_profile.conversation_state or {}).get('history'):
+            # Move the legacy JSON history into conversation_messages before the state is rewritten
+            conversation_store.load_history(db, user_id, fund_profile)
     else:
-        print(f"📝 Using {len(conversation_history)} messages from database")
-    
-    # Handle the conversation
-    response_data = await ai_service.handle_conversation_turn(
-        user_input=request.user_input,
-        history=conversation_history,
-        db=db,
-        conversation_id=str(fund_profile.id) if fund_profile else None
-    )
+        # Load the recent conversation history from database if available
+        conversation_history = conversation_store.load_history(db, user_id, fund_profile)
+        logger.info("📚 Loaded %s messages from database", len(conversation_history))
+    
+    return fund_profile, conversation_history, search_state
+
+
+def _save_conversation(
+    db: Session,
+    fund_profile: Optional[FundProfile],
+    user_id,
+    full_name: str,
+    email: str,
+    response_data: dict,
+    history_length: int
+) -> list:
+    """
+    Persist a finished turn, creating the fund profile if needed
+    
+    Only the messages the turn added (after the first ``history_length`` items
+    of updated_history) are appended to conversation_messages; the JSON state
+    keeps the small per-conversation fields. Returns the appended messages with their seq.
+    """
+    conversation_state = {
+        'last_intent': response_data.get('intent'),
+        'last_location': response_data.get('location_detected'),
+        'last_activity_keywords': response_data.get('activity_keywords'),
+        'search_state': response_data.get('search_state')
+    }
     
-    # Save updated conversation history to database
     if fund_profile:
         # Update the conversation state in the database
-        updated_history = response_data.get('updated_history', [])
-        fund_profile.conversation_state = {
-            'history': updated_history,
-            'last_intent': response_data.get('intent'),
-            'last_location': response_data.get('location_detected'),
-            'last_activity_keywords': response_data.get('activity_keywords')
-        }
-        db.commit()
-        print(f"💾 Saved {len(updated_history)} messages to database")
+        fund_profile.conversation_state = conversation_state
     else:
         # Create fund profile if it doesn't exist
-        new_profile = FundProfile(
-            user_id=current_user.id,
-            fund_name=f"{current_user.full_name}'s Fund",
+        fund_profile = FundProfile(
+            user_id=user_id,
+            fund_name=f"{full_name}'s Fund",
             fund_description="Auto-created fund profile",
-            fund_email=current_user.email,
-            conversation_state={
-                'history': response_data.get('updated_history', []),
-                'last_intent': response_data.get('intent'),
-                'last_location': response_data.get('location_detected'),
-                'last_activity_keywords': response_data.get('activity_keywords')
-            }
+            fund_email=email,
+            conversation_state=conversation_state
         )
-        db.add(new_profile)
-        db.commit()
-        print(f"✨ Created new fund profile with conversation state")
+        db.add(fund_profile)
+        logger.info("✨ Created new fund profile with conversation state")
+    db.commit()
+    principal_cache.set_fund_profile_id(user_id, fund_profile.id)
+    
+    updated_history = response_data.get('updated_history', [])
+    if len(updated_history) >= history_length:
+        new_messages = updated_history[history_length:]
+    else:
+        # History was rewritten during the turn; the last user/assistant pair is what the turn added
+        new_messages = updated_history[-2:]
+    appended = conversation_store.append(db, user_id, fund_profile.id, new_messages)
+    logger.info("💾 Appended %s messages to the conversation", len(appended))
+    return appended
+
+
+def _apply_history_protocol(
+    db: Session,
+    user_id,
+    request: ChatRequest,
+    response_data: dict,
+    appended: list
+) -> None:
+    """
+    Add the history version to a saved turn's response and, for the delta protocol, shrink the history
     
+    A client copy at ``history_version`` gets every stored message newer than
+    it (``history_mode="delta"``), including messages another device added
+    while this turn ran. A copy that a delta cannot patch (reset since,
+    unknown version, too far behind) gets the last CONVERSATION_HISTORY_LOAD_LIMIT
+    messages (``history_mode="full"``, ``history_truncated`` when older ones exist).
+    The returned version is the newest message actually sent, never past it.
+    """
+    if request.history_version is None:
+        response_data['history_version'] = conversation_store.version(db, user_id)
+        return
+    
+    delta = conversation_store.messages_after(db, user_id, request.history_version)
+    if delta is not None:
+        response_data['history_mode'] = 'delta'
+        response_data['history_delta'] = [{'role': m['role'], 'content': m['content']} for m in delta]
+        response_data['updated_history'] = []
+        response_data['history_version'] = delta[-1]['id'] if delta else request.history_version
+        return
+    
+    logger.info("🔄 History version %s cannot be patched, sending full history", request.history_version)
+    window, truncated = conversation_store.history_window(db, user_id)
+    response_data['history_mode'] = 'full'
+    response_data['updated_history'] = [{'role': m['role'], 'content': m['content']} for m in window]
+    response_data['history_delta'] = [{'role': m['role'], 'content': m['content']} for m in appended]
+    response_data['history_truncated'] = truncated
+    response_data['history_version'] = window[-1]['id'] if window else 0
+
+
+@router.post("/chat", response_model=ChatResponse)
+async def handle_chat(
+    request: ChatRequest, 
+    response: Response,
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER)
+):
+    """
+    Handle stateful AI conversation with history tracking and database persistence.
+    This endpoint manages conversation state per user and maintains history in the database.
+    
+    A retry sent with the same Idempotency-Key waits for or replays the
+    original response instead of running (and saving) the turn again. The turn
+    outlives a disconnected client for that retry, so it runs on its own DB
+    session rather than the request-scoped one.
+    """
+    logger.debug("Request made by user: %s", current_user.email)
+
+    if not request.user_input.strip():
+        raise HTTPException(status_code=400, detail="User input cannot be empty")
+    
+    user_id, full_name, email = current_user.id, current_user.full_name, current_user.email
+    
+    async def run_turn() -> dict:
+        db = SessionLocal()
+        try:
+            return await _chat_turn(db, request, user_id, full_name, email)
+        finally:
+            db.close()
+    
+    response_data, replayed = await idempotent(
+        f"/funds/chat:{user_id}", idempotency_key, request.model_dump(mode="json"), run_turn
+    )
+    if replayed:
+        response.headers[REPLAYED_HEADER] = "true"
     return ChatResponse(**response_data)
 
 
+async def _chat_turn(db: Session, request: ChatRequest, user_id, full_name: str, email: str) -> dict:
+    """One /chat turn, saved, as a ChatResponse dict"""
+    with llm_telemetry.turn("/funds/chat", user_id=str(user_id)):
+        fund_profile, conversation_history, search_state = _load_conversation(db, user_id, request)
+        
+        # Handle the conversation
+        response_data = await ai_service.handle_conversation_turn(
+            user_input=request.user_input,
+            history=conversation_history,
+            db=db,
+            conversation_id=str(fund_profile.id) if fund_profile else None,
+            search_state=search_state
+        )
+        
+        # Save updated conversation history to database
+        appended = _save_conversation(
+            db, fund_profile, user_id, full_name, email, response_data,
+            history_length=len(conversation_history)
+        )
+        _apply_history_protocol(db, user_id, request, response_data, appended)
+    return ChatResponse(**response_data).model_dump(mode="json")
+
+
+@router.post("/chat/stream")
+async def handle_chat_stream(
+    request: ChatRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Streaming (SSE) variant of /chat.
+    
+    Events: preliminary -> companies (batches) -> final (message, metadata, history_delta).
+    The conversation state is saved before the final event is sent.
+    """
+    logger.debug("Streaming request made by user: %s", current_user.email)
+
+    if not request.user_input.strip():
+        raise HTTPException(status_code=400, detail="User input cannot be empty")
+    
+    # Read the user before the response starts; the request session may be closed by then
+    user_id, full_name, email = current_user.id, current_user.full_name, current_user.email
+    
+    async def turn_events(db: Session):
+        fund_profile, conversation_history, search_state = _load_conversation(db, user_id, request)
+        async for event in ai_service.stream_conversation_turn(
+            user_input=request.user_input,
+            history=conversation_history,
+            db=db,
+            conversation_id=str(fund_profile.id) if fund_profile else None,
+            search_state=search_state
+        ):
+            if event["event"] == "final":
+                appended = _save_conversation(
+                    db, fund_profile, user_id, full_name, email, event["data"],
+                    history_length=len(conversation_history)
+                )
+                _apply_history_protocol(db, user_id, request, event["data"], appended)
+            yield event
+    
+    # The final event carries the delta relative to the history the client sent
+    events = llm_turn_scoped(session_scoped(turn_events), "/funds/chat/stream", user_id=str(user_id))
+    return sse_response(events, history_length=len(request.history or []))
+
+
+@router.websocket("/chat/ws")
+async def chat_websocket(websocket: WebSocket):
+    """
+    WebSocket variant of /chat with the conversation state held server-side.
+    
+    The client authenticates once and sends only its new messages; the server
+    keeps the history and search state and sends only the turn's events and
+    new messages, each message with its sequence number.
+    
+    Frames (JSON):
+    - client: {"type": "auth", "token": "<JWT>", "last_seq": 41}  first frame; omit last_seq on first connect
+    - server: {"type": "ready", "last_seq": 43, "messages": [...], "truncated": false}
+      messages after last_seq (resume), or the recent history window
+    - client: {"type": "message", "content": "дай еще"}
+    - server: {"type": "preliminary" | "companies", "data": ...} as in /chat/stream, then
+      {"type": "final", "data": {...metadata, "messages": [{"seq", "role", "content"}, ...]}}
+    - client: {"type": "ping"} -> server: {"type": "pong"}
+    
+    A turn interrupted by a disconnect still completes and is saved, so its
+    reply is delivered when the client resumes with its last seq.
+    """
+    await websocket.accept()
+    
+    try:
+        auth = await asyncio.wait_for(websocket.receive_json(), timeout=WS_AUTH_TIMEOUT_SECONDS)
+    except WebSocketDisconnect:
+        return
+    except (asyncio.TimeoutError, ValueError):
+        auth = {}
+    if not isinstance(auth, dict):
+        auth = {}
+    
+    db = SessionLocal()
+    try:
+        user = user_from_token(str(auth.get("token") or ""), db) if auth.get("type") == "auth" else None
+        if user is None:
+            try:
+                await websocket.send_json({"type": "error", "message": "Could not validate credentials"})
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            except (WebSocketDisconnect, RuntimeError):
+                pass
+            return
+        user_id, full_name, email = user.id, user.full_name, user.email
+        
+        fund_profile = _get_fund_profile(db, user_id)
+        search_state = (fund_profile.conversation_state or {}).get('search_state') if fund_profile else None
+        window = conversation_store.load_messages(db, user_id, fund_profile)
+        
+        last_seq = auth.get("last_seq")
+        if isinstance(last_seq, int):
+            missed = conversation_store.load_messages(db, user_id, after_seq=last_seq)
+            truncated = bool(missed) and missed[0]["seq"] > last_seq + 1
+        else:
+            missed, truncated = window, False
+    finally:
+        db.close()
+    
+    logger.info("🔌 WebSocket chat connected: %s (resume after seq %s, %s messages to replay)", email, last_seq, len(missed))
+    history = [{"role": m["role"], "content": m["content"]} for m in window]
+    connected = True
+    
+    async def send(frame: dict) -> None:
+        nonlocal connected
+        if not connected:
+            return
+        try:
+            await websocket.send_text(json.dumps(frame, ensure_ascii=False, default=str))
+        except (WebSocketDisconnect, RuntimeError):
+            # Keep running the turn so it is saved; the client resumes by seq
+            connected = False
+    
+    await send({
+        "type": "ready",
+        "last_seq": window[-1]["seq"] if window else None,
+        "messages": missed,
+        "truncated": truncated
+    })
+    
+    while connected:
+        try:
+            frame = await websocket.receive_json()
+        except WebSocketDisconnect:
+            break
+        except ValueError:
+            await send({"type": "error", "message": "Invalid JSON frame"})
+            continue
+        
+        kind = frame.get("type") if isinstance(frame, dict) else None
+        if kind == "ping":
+            await send({"type": "pong"})
+            continue
+        user_input = str(frame.get("content") or "").strip() if kind == "message" else ""
+        if not user_input or len(user_input) > 1000:
+            await send({"type": "error", "message": "Expected {\"type\": \"message\", \"content\": \"...\"} with 1-1000 characters"})
+            continue
+        
+        db = SessionLocal()
+        try:
+            fund_profile = _get_fund_profile(db, user_id)
+            with llm_telemetry.turn("/funds/chat/ws", user_id=str(user_id)):
+                async for event in ai_service.stream_conversation_turn(
+                    user_input=user_input,
+                    history=list(history),
+                    db=db,
+                    conversation_id=str(fund_profile.id) if fund_profile else None,
+                    search_state=search_state
+                ):
+                    if event["event"] != "final":
+                        await send({"type": event["event"], "data": event["data"]})
+                        continue
+                    
+                    data = event["data"]
+                    appended = _save_conversation(
+                        db, fund_profile, user_id, full_name, email, data,
+                        history_length=len(history)
+                    )
+                    search_state = data.get('search_state')
+                    history.extend({"role": m["role"], "content": m["content"]} for m in appended)
+                    del history[:-conversation_store.load_limit]
+                    
+                    final_data = {
+                        key: value for key, value in data.items()
+                        if key not in ("updated_history", "companies_data")
+                    }
+                    final_data["messages"] = appended
+                    await send({"type": "final", "data": final_data})
+        except Exception as e:
+            logger.error("❌ WebSocket chat turn failed for %s: %s", email, e)
+            await send({"type": "error", "message": ERROR_MESSAGE})
+        finally:
+            db.close()
+    
+    logger.info("🔌 WebSocket chat disconnected: %s", email)
+
+
 @router.post("/chat/reset")
 async def reset_conversation(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Reset/clear conversation history for the current user"""
-    fund_profile = db.query(FundProfile).filter(
-        FundProfile.user_id == current_user.id
-    ).first()
+    fund_profile = _get_fund_profile(db, current_user.id)
     
+    cleared = conversation_store.clear(db, current_user.id)
     if fund_profile:
-        fund_profile.conversation_state = {'history': []}
+        fund_profile.conversation_state = {}
+        if ai_service.prefetch_buffer is not None:
+            ai_service.prefetch_buffer.invalidate(str(fund_profile.id))
+    
+    if fund_profile or cleared:
         db.commit()
-        print(f"🔄 Reset conversation history for user: {current_user.email}")
+        logger.info("🔄 Reset conversation history for user: %s (%s messages cleared)", current_user.email, cleared)
         return {"message": "Conversation history reset successfully"}
     else:
         return {"message": "No conversation history found to reset"}
@@ -130,9 +444,7 @@ async def create_fund_profile(
 ):
     """Create or update fund profile"""
     # Check if profile already exists
-    existing_profile = db.query(FundProfile).filter(
-        FundProfile.user_id == current_user.id
-    ).first()
+    existing_profile = _get_fund_profile(db, current_user.id)
     
     if existing_profile:
         # Update existing profile
@@ -153,6 +465,7 @@ async def create_fund_profile(
         db.add(profile)
         db.commit()
         db.refresh(profile)
+        principal_cache.set_fund_profile_id(current_user.id, profile.id)
     
     return FundProfileResponse(
         id=str(profile.id),
@@ -170,9 +483,7 @@ async def get_fund_profile(
     db: Session = Depends(get_db)
 ):
     """Get current user's fund profile"""
-    profile = db.query(FundProfile).filter(
-        FundProfile.user_id == current_user.id
-    ).first()
+    profile = _get_fund_profile(db, current_user.id)
     
     if not profile:
         raise HTTPException(
@@ -196,9 +507,7 @@ async def delete_fund_profile(
     db: Session = Depends(get_db)
 ):
     """Delete current user's fund profile"""
-    profile = db.query(FundProfile).filter(
-        FundProfile.user_id == current_user.id
-    ).first()
+    profile = _get_fund_profile(db, current_user.id)
     
     if not profile:
         raise HTTPException(
@@ -208,5 +517,6 @@ async def delete_fund_profile(
     
     db.delete(profile)
     db.commit()
+    principal_cache.set_fund_profile_id(current_user.id, None)
     
     return {"message": "Fund profile deleted successfully"} 
\ No newline at end of file
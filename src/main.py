@@ -5,6 +5,7 @@ Main FastAPI application entry point for the Ayala Foundation backend.
 This service helps charity funds discover companies and sponsorship opportunities.
 """
 
+import logging
 import os
 from typing import List
 from contextlib import asynccontextmanager
@@ -19,6 +20,13 @@ from .auth.router import router as auth_router
 from .funds.router import router as funds_router
 from .core.config import get_settings
 from .core.database import init_database
+from .core.logging_config import configure_logging, shutdown_logging
+from .auth.passwords import password_hasher
+from .auth.last_login import last_login_writer
+from .companies.enrichment import enrichment_pipeline
+
+
+logger = logging.getLogger(__name__)
 
 # Load environment variables
 load_dotenv()
@@ -26,15 +34,30 @@ load_dotenv()
 # Get settings
 settings = get_settings()
 
+# Route all logging through the non-blocking queue handler
+configure_logging()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan"""
-    print("✅ Ayala Foundation Backend API starting up")
+    logger.info("✅ Ayala Foundation Backend API starting up")
     # Initialize database tables
     init_database()
-    print("✅ Database initialized")
+    logger.info("✅ Database initialized")
+    # Batched write-behind of users.last_login
+    last_login_writer.start()
+    # Create or look up the shared OpenAI assistant once instead of per conversation
+    try:
+        from .ai_conversation.assistant_creator import charity_assistant
+        await charity_assistant.ensure_assistant(verify=True)
+    except Exception as e:
+        logger.warning("⚠️ Could not prepare the OpenAI assistant at startup, will retry on first use: %s", e)
     yield
-    print("✅ Ayala Foundation Backend API shutting down")
+    logger.info("✅ Ayala Foundation Backend API shutting down")
+    await last_login_writer.stop()
+    await enrichment_pipeline.close()
+    password_hasher.shutdown()
+    shutdown_logging()
 
 # Create FastAPI app
 app = FastAPI(
@@ -0,0 +1,46 @@
+"""
+Test configuration
+
+Settings are read when ``src`` is first imported, so the environment is set
+here, before any test module imports it: a throwaway SQLite database and
+cache files under a temporary directory, and a dummy OpenAI key (tests
+never reach OpenAI).
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+_TMP_DIR = tempfile.mkdtemp(prefix="ayala-tests-")
+
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DIR}/test.sqlite3"
+os.environ["SECRET_KEY"] = "test-secret-key"
+os.environ["OPENAI_API_KEY"] = "test-key"
+os.environ["INTENT_CACHE_PATH"] = f"{_TMP_DIR}/intent_cache.sqlite3"
+os.environ["IDEMPOTENCY_PATH"] = f"{_TMP_DIR}/idempotency.sqlite3"
+os.environ["LLM_TELEMETRY_PATH"] = ""
+os.environ["DEBUG"] = "false"
+
+
+@pytest.fixture(scope="session")
+def database():
+    """Tables of every model in the test database"""
+    from src.core.database import init_database
+    init_database()
+
+
+@pytest.fixture
+def db(database):
+    from src.core.database import SessionLocal
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,72 @@
+"""Tests for the shared assistant registry"""
+
+import asyncio
+
+import httpx
+import openai
+import pytest
+from fastapi import HTTPException
+
+from src.ai_conversation import router as ai_router
+from src.ai_conversation.assistant_creator import CharityFundAssistant
+from src.ai_conversation.db_models import AssistantRecord
+
+
+def not_found() -> openai.NotFoundError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/threads/thread_1/runs")
+    return openai.NotFoundError("No assistant found", response=httpx.Response(404, request=request), body=None)
+
+
+def test_registered_assistant_cannot_be_deleted(db):
+    db.add(AssistantRecord(config_hash="registry-test", assistant_id="asst_shared"))
+    db.commit()
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(ai_router.cleanup_assistant("asst_shared"))
+
+    assert error.value.status_code == 409
+    assert db.query(AssistantRecord).filter(AssistantRecord.assistant_id == "asst_shared").count() == 1
+
+
+def test_run_retries_with_the_current_assistant_when_deleted():
+    assistant = CharityFundAssistant()
+    used_ids = []
+
+    async def fake_run(assistant_id, *args):
+        used_ids.append(assistant_id)
+        if assistant_id == "asst_deleted":
+            raise not_found()
+        return "completed", "run_1", [{"message_id": "msg_1", "role": "assistant", "content": "ok"}]
+
+    async def fake_ensure(verify=False):
+        assert verify
+        return "asst_new"
+
+    assistant._run = fake_run
+    assistant.ensure_assistant = fake_ensure
+
+    response = asyncio.run(assistant.run_assistant_with_tools("asst_deleted", "thread_1", db=None))
+
+    assert used_ids == ["asst_deleted", "asst_new"]
+    assert response["status"] == "completed"
+    assert response["assistant_id"] == "asst_new"
+
+
+def test_run_not_found_for_the_current_assistant_is_not_retried():
+    assistant = CharityFundAssistant()
+    used_ids = []
+
+    async def fake_run(assistant_id, *args):
+        used_ids.append(assistant_id)
+        raise not_found()
+
+    async def fake_ensure(verify=False):
+        return "asst_current"
+
+    assistant._run = fake_run
+    assistant.ensure_assistant = fake_ensure
+
+    response = asyncio.run(assistant.run_assistant_with_tools("asst_current", "thread_missing", db=None))
+
+    assert used_ids == ["asst_current"]
+    assert response["status"] == "error"
@@ -0,0 +1,89 @@
+"""Tests for driving assistant runs"""
+
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from src.ai_conversation.assistant_creator import CharityFundAssistant, RunTimer
+
+
+def bad_request(message: str, param=None) -> openai.BadRequestError:
+    request = httpx.Request("POST", "https://api.openai.com/v1/threads/thread_1/runs")
+    body = {"message": message, "param": param, "type": "invalid_request_error"}
+    return openai.BadRequestError(message, response=httpx.Response(400, request=request), body=body)
+
+
+def text_message(message_id: str, role: str, text: str):
+    return SimpleNamespace(id=message_id, role=role, content=[SimpleNamespace(text=SimpleNamespace(value=text))])
+
+
+class FakeGateway:
+    """Answers gateway calls by method name and records their arguments"""
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = []
+
+    async def call(self, target, method, **kwargs):
+        self.calls.append((method, kwargs))
+        answer = self.answers[method]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+def make_assistant(answers, streaming=True) -> CharityFundAssistant:
+    assistant = CharityFundAssistant()
+    assistant.llm_gateway = FakeGateway(answers)
+    assistant.settings = SimpleNamespace(
+        assistant_run_streaming=streaming,
+        assistant_poll_initial_ms=1,
+        assistant_poll_max_ms=1,
+        assistant_poll_backoff=1.0,
+    )
+    return assistant
+
+
+def test_polling_returns_every_assistant_message_of_the_run():
+    assistant = make_assistant({
+        "create": SimpleNamespace(id="run_1", status="completed", usage=None),
+        "list": SimpleNamespace(data=[
+            text_message("msg_1", "assistant", "Ищу компании"),
+            text_message("msg_2", "assistant", "Нашёл три компании"),
+        ]),
+    }, streaming=False)
+
+    status, run_id, replies = asyncio.run(assistant._run("asst_1", "thread_1", "", [], RunTimer()))
+
+    assert (status, run_id) == ("completed", "run_1")
+    assert [reply["content"] for reply in replies] == ["Ищу компании", "Нашёл три компании"]
+    list_kwargs = dict(assistant.llm_gateway.calls)["list"]
+    assert list_kwargs["run_id"] == "run_1" and list_kwargs["order"] == "asc"
+
+
+def test_unsupported_stream_parameter_falls_back_to_polling():
+    assistant = make_assistant({
+        "create": bad_request("Unrecognized request argument supplied: stream", param="stream"),
+        "list": SimpleNamespace(data=[]),
+    })
+
+    with pytest.raises(openai.BadRequestError):
+        # Polling calls runs.create again, which the fake still rejects
+        asyncio.run(assistant._run("asst_1", "thread_1", "", [], RunTimer()))
+
+    assert [method for method, _ in assistant.llm_gateway.calls] == ["create", "create"]
+    assert "stream" not in assistant.llm_gateway.calls[1][1]
+
+
+def test_other_bad_requests_are_not_retried_by_polling():
+    assistant = make_assistant({
+        "create": bad_request("Thread thread_1 already has an active run run_0."),
+    })
+
+    with pytest.raises(openai.BadRequestError):
+        asyncio.run(assistant._run("asst_1", "thread_1", "", [], RunTimer()))
+
+    assert [method for method, _ in assistant.llm_gateway.calls] == ["create"]
@@ -0,0 +1,206 @@
+"""Tests for the /funds/chat/ws WebSocket channel"""
+
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from src.ai_conversation.streaming import ERROR_MESSAGE
+from src.auth.models import User
+from src.auth.router import create_access_token
+from src.funds import router as funds_router
+from src.funds.conversation_store import conversation_store
+from src.main import app
+
+
+WS_PATH = "/api/v1/funds/chat/ws"
+
+
+@pytest.fixture
+def client(database):
+    # No context manager: the lifespan (database, OpenAI assistant) is not needed
+    return TestClient(app)
+
+
+@pytest.fixture
+def user(db):
+    user = User(email=f"ws-{uuid.uuid4().hex}@example.com", hashed_password="x", full_name="Тест", is_active=True)
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def token(user):
+    return create_access_token({"sub": user.email})
+
+
+@pytest.fixture
+def turns(monkeypatch):
+    """Stubbed conversation turns: record each turn's session and history, answer "Ответ: <input>" """
+    class Turns:
+        calls = []
+        error = None
+
+    async def fake_stream(user_input, history, db, conversation_id=None, search_state=None, stream_batches=True):
+        Turns.calls.append({"db": db, "history": history, "search_state": search_state})
+        if Turns.error is not None:
+            raise Turns.error
+        yield {"event": "preliminary", "data": {"message": "Ищу компании..."}}
+        yield {"event": "final", "data": {
+            "message": f"Ответ: {user_input}",
+            "intent": "find_companies",
+            "search_state": {"turn": len(Turns.calls)},
+            "updated_history": history + [
+                {"role": "user", "content": user_input},
+                {"role": "assistant", "content": f"Ответ: {user_input}"},
+            ],
+            "companies_data": [],
+        }}
+
+    monkeypatch.setattr(funds_router.ai_service, "stream_conversation_turn", fake_stream)
+    return Turns
+
+
+def turn(text):
+    return [{"role": "user", "content": text}, {"role": "assistant", "content": f"Ответ: {text}"}]
+
+
+def send_message(websocket, content):
+    websocket.send_json({"type": "message", "content": content})
+    frames = [websocket.receive_json()]
+    while frames[-1]["type"] not in ("final", "error"):
+        frames.append(websocket.receive_json())
+    return frames
+
+
+@pytest.mark.parametrize("auth", [
+    {"type": "auth", "token": "not-a-jwt"},
+    {"type": "auth"},
+    {"type": "message", "content": "Привет"},
+    ["auth"],
+])
+def test_connection_without_valid_auth_frame_is_closed(client, auth):
+    with client.websocket_connect(WS_PATH) as websocket:
+        websocket.send_json(auth)
+        assert websocket.receive_json() == {"type": "error", "message": "Could not validate credentials"}
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+
+    assert closed.value.code == 1008
+
+
+def test_turns_send_events_and_only_the_new_messages(client, token, user, db, turns):
+    with client.websocket_connect(WS_PATH) as websocket:
+        websocket.send_json({"type": "auth", "token": token})
+        assert websocket.receive_json() == {"type": "ready", "last_seq": None, "messages": [], "truncated": False}
+
+        first = send_message(websocket, "IT компании в Алматы")
+        second = send_message(websocket, "дай еще")
+
+        websocket.send_json({"type": "ping"})
+        assert websocket.receive_json() == {"type": "pong"}
+
+    assert [frame["type"] for frame in first] == ["preliminary", "final"]
+    assert first[1]["data"]["messages"] == [
+        {"seq": 0, "role": "user", "content": "IT компании в Алматы"},
+        {"seq": 1, "role": "assistant", "content": "Ответ: IT компании в Алматы"},
+    ]
+    assert "updated_history" not in first[1]["data"]
+    assert [m["seq"] for m in second[1]["data"]["messages"]] == [2, 3]
+    # The server holds the history and search state between turns
+    assert turns.calls[1]["history"] == turn("IT компании в Алматы")
+    assert turns.calls[1]["search_state"] == {"turn": 1}
+    stored = conversation_store.load_messages(db, user.id)
+    assert [{"role": m["role"], "content": m["content"]} for m in stored] == turn("IT компании в Алматы") + turn("дай еще")
+
+
+def test_resume_replays_the_messages_after_last_seq(client, token, user, db):
+    conversation_store.append(db, user.id, None, turn("IT компании") + turn("дай еще"))
+
+    with client.websocket_connect(WS_PATH) as websocket:
+        websocket.send_json({"type": "auth", "token": token, "last_seq": 1})
+        ready = websocket.receive_json()
+
+    assert ready["last_seq"] == 3
+    assert ready["messages"] == [
+        {"seq": 2, "role": "user", "content": "дай еще"},
+        {"seq": 3, "role": "assistant", "content": "Ответ: дай еще"},
+    ]
+    assert ready["truncated"] is False
+
+
+def test_resume_across_a_reset_is_flagged_truncated(client, token, user, db):
+    conversation_store.append(db, user.id, None, turn("старый поиск"))
+    conversation_store.clear(db, user.id)
+    db.commit()
+    conversation_store.append(db, user.id, None, turn("новый поиск"))
+
+    with client.websocket_connect(WS_PATH) as websocket:
+        websocket.send_json({"type": "auth", "token": token, "last_seq": 0})
+        ready = websocket.receive_json()
+
+    # seq keeps growing across the reset, so the client sees the gap
+    assert [m["seq"] for m in ready["messages"]] == [2, 3]
+    assert ready["truncated"] is True
+
+
+def test_each_turn_runs_on_its_own_session(client, token, turns, monkeypatch):
+    sessions = []
+    real_session_local = funds_router.SessionLocal
+
+    def tracked_session():
+        session = real_session_local()
+        session.closed = False
+        close = session.close
+
+        def tracked_close():
+            session.closed = True
+            close()
+
+        session.close = tracked_close
+        sessions.append(session)
+        return session
+
+    monkeypatch.setattr(funds_router, "SessionLocal", tracked_session)
+
+    with client.websocket_connect(WS_PATH) as websocket:
+        websocket.send_json({"type": "auth", "token": token})
+        websocket.receive_json()
+        send_message(websocket, "IT компании")
+        send_message(websocket, "дай еще")
+
+    turn_sessions = [call["db"] for call in turns.calls]
+    # One session for authentication, then one per turn
+    assert len(sessions) == 3
+    assert turn_sessions == sessions[1:]
+    assert all(session.closed for session in sessions)
+
+
+def test_failed_turn_reports_an_error_and_keeps_the_connection(client, token, turns):
+    turns.error = RuntimeError("OpenAI is down")
+
+    with client.websocket_connect(WS_PATH) as websocket:
+        websocket.send_json({"type": "auth", "token": token})
+        websocket.receive_json()
+
+        assert send_message(websocket, "IT компании") == [{"type": "error", "message": ERROR_MESSAGE}]
+        websocket.send_json({"type": "ping"})
+        assert websocket.receive_json() == {"type": "pong"}
+
+
+@pytest.mark.parametrize("frame", [
+    {"type": "message", "content": "   "},
+    {"type": "message", "content": "а" * 1001},
+    {"type": "unknown"},
+])
+def test_invalid_frames_are_rejected(client, token, turns, frame):
+    with client.websocket_connect(WS_PATH) as websocket:
+        websocket.send_json({"type": "auth", "token": token})
+        websocket.receive_json()
+        websocket.send_json(frame)
+
+        assert websocket.receive_json()["type"] == "error"
+
+    assert turns.calls == []
@@ -0,0 +1,79 @@
+"""Tests for the append-only conversation store"""
+
+import uuid
+
+from src.funds.conversation_store import ConversationStore
+
+
+def turn(text):
+    return [{"role": "user", "content": text}, {"role": "assistant", "content": f"Ответ: {text}"}]
+
+
+def test_seq_keeps_growing_after_a_reset(db):
+    store = ConversationStore()
+    user_id = uuid.uuid4()
+    store.append(db, user_id, None, turn("IT компании в Алматы"))
+
+    assert store.clear(db, user_id) == 2
+    db.commit()
+    appended = store.append(db, user_id, None, turn("строительные компании"))
+
+    assert [message["seq"] for message in appended] == [2, 3]
+    assert store.load_history(db, user_id) == turn("строительные компании")
+    # A client that saw the old conversation only gets the new messages
+    assert [message["seq"] for message in store.load_messages(db, user_id, after_seq=1)] == [2, 3]
+
+
+def test_version_is_empty_after_a_reset(db):
+    store = ConversationStore()
+    user_id = uuid.uuid4()
+    store.append(db, user_id, None, turn("дай еще"))
+    assert store.version(db, user_id) > 0
+
+    store.clear(db, user_id)
+    db.commit()
+
+    assert store.version(db, user_id) == 0
+    assert store.load_history(db, user_id) == []
+
+
+def test_messages_after_includes_other_devices_and_rejects_cleared_versions(db):
+    store = ConversationStore()
+    user_id = uuid.uuid4()
+    store.append(db, user_id, None, turn("дай еще"))
+    version = store.version(db, user_id)
+    store.append(db, user_id, None, turn("с другого устройства"))
+
+    delta = store.messages_after(db, user_id, version)
+
+    assert [m["content"] for m in delta] == [m["content"] for m in turn("с другого устройства")]
+    assert store.messages_after(db, user_id, delta[-1]["id"]) == []
+    # Another user's message id is not a version of this conversation
+    assert store.messages_after(db, uuid.uuid4(), version) is None
+
+    store.clear(db, user_id)
+    db.commit()
+    assert store.messages_after(db, user_id, version) is None
+
+
+def test_messages_after_gives_up_when_too_far_behind(db):
+    store = ConversationStore(load_limit=3)
+    user_id = uuid.uuid4()
+    store.append(db, user_id, None, turn("первый"))
+    store.append(db, user_id, None, turn("второй"))
+
+    assert store.messages_after(db, user_id, 0) is None
+    assert len(store.messages_after(db, user_id, 0, limit=4)) == 4
+
+
+def test_history_window_reports_truncation(db):
+    store = ConversationStore(load_limit=3)
+    user_id = uuid.uuid4()
+    store.append(db, user_id, None, turn("первый"))
+    store.append(db, user_id, None, turn("второй"))
+
+    window, truncated = store.history_window(db, user_id)
+
+    assert truncated
+    assert [m["seq"] for m in window] == [1, 2, 3]
+    assert store.history_window(db, user_id, limit=4)[1] is False
@@ -0,0 +1,22 @@
+"""Tests for startup index creation"""
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from src.core import database
+
+
+def test_case_duplicate_emails_are_reported(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path}/users.sqlite3")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, email TEXT)"))
+        connection.execute(text(
+            "INSERT INTO users (email) VALUES ('fund@example.com'), ('Fund@Example.com'), ('other@example.com')"
+        ))
+    monkeypatch.setattr(database, "engine", engine)
+
+    with pytest.raises(RuntimeError) as error:
+        database._ensure_indexes()
+
+    assert "fund@example.com (2 accounts)" in str(error.value)
+    assert "other@example.com" not in str(error.value)
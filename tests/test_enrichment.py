@@ -0,0 +1,86 @@
+"""Tests for the company enrichment pipeline"""
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from src.companies.enrichment import DEFAULT_FIELDS, EnrichmentPipeline, StubContactsProvider
+from src.companies.models import CompanyEnrichment
+
+
+class CountingStubProvider(StubContactsProvider):
+    """Stub provider that records the companies it was asked for"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.fetched = []
+
+    async def fetch(self, company):
+        self.fetched.append(company["id"])
+        return await super().fetch(company)
+
+
+def make_companies(count=2):
+    return [{"id": str(uuid.uuid4()), "bin": f"{n:012d}", "name": f"ТОО {n}"} for n in range(count)]
+
+
+def enrich(pipeline, companies):
+    return asyncio.run(pipeline.enrich([dict(company) for company in companies]))
+
+
+def test_miss_fetches_and_hit_is_served_from_the_cache(database):
+    provider = CountingStubProvider(latency_seconds=0, miss_every=0)
+    provider.cache_ttl_seconds = 3600
+    pipeline = EnrichmentPipeline([provider])
+    companies = make_companies()
+
+    first = enrich(pipeline, companies)
+    second = enrich(pipeline, companies)
+
+    assert sorted(provider.fetched) == sorted(company["id"] for company in companies)
+    assert all(company["website"].startswith("https://company-") for company in first)
+    assert [company["contacts"] for company in second] == [company["contacts"] for company in first]
+
+
+def test_not_found_is_cached(database):
+    provider = CountingStubProvider(latency_seconds=0, miss_every=1)
+    provider.cache_ttl_seconds = 3600
+    pipeline = EnrichmentPipeline([provider])
+    companies = make_companies(1)
+
+    enrich(pipeline, companies)
+    result = enrich(pipeline, companies)
+
+    assert len(provider.fetched) == 1
+    assert result[0]["website"] == DEFAULT_FIELDS["website"]
+
+
+def test_expired_entries_are_fetched_again(db):
+    provider = CountingStubProvider(latency_seconds=0, miss_every=0)
+    provider.cache_ttl_seconds = 60
+    pipeline = EnrichmentPipeline([provider])
+    companies = make_companies(1)
+
+    enrich(pipeline, companies)
+    db.query(CompanyEnrichment).filter(
+        CompanyEnrichment.company_id == uuid.UUID(companies[0]["id"])
+    ).update({"fetched_at": datetime.now(timezone.utc) - timedelta(seconds=120)})
+    db.commit()
+    enrich(pipeline, companies)
+
+    assert provider.fetched == [companies[0]["id"]] * 2
+
+
+def test_timed_out_companies_keep_defaults_and_are_not_cached(database):
+    provider = CountingStubProvider(latency_seconds=0.5, miss_every=0, timeout_seconds=0.01)
+    provider.cache_ttl_seconds = 3600
+    pipeline = EnrichmentPipeline([provider])
+    companies = make_companies(1)
+
+    result = enrich(pipeline, companies)
+    enrich(pipeline, companies)
+
+    assert result[0]["website"] == DEFAULT_FIELDS["website"]
+    assert result[0]["contacts"] == DEFAULT_FIELDS["contacts"]
+    # Retried on the next request instead of being served as "not found"
+    assert len(provider.fetched) == 2
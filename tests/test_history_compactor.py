@@ -0,0 +1,106 @@
+"""Tests for the history compactor"""
+
+import asyncio
+
+from src.ai_conversation.history_compactor import HistoryCompactor
+from src.ai_conversation.intent_cache import IntentParseCache
+from src.core.metrics import metrics
+
+
+def conversation(turns):
+    history = []
+    for turn in range(turns):
+        history.append({"role": "user", "content": f"Найди компании, запрос {turn}"})
+        history.append({"role": "assistant", "content": f"Ответ {turn}"})
+    return history
+
+
+def counting_compactor(**kwargs):
+    compactor = HistoryCompactor(client=None, **kwargs)
+    compactor.summarized = []
+
+    async def fake_summarize(previous_summary, messages):
+        compactor.summarized.append(len(messages))
+        return f"{previous_summary}+{len(messages)}"
+
+    compactor._summarize = fake_summarize
+    return compactor
+
+
+def test_short_history_is_kept_verbatim():
+    compactor = counting_compactor(keep_last_turns=6)
+    history = conversation(3) + [{"role": "user", "content": "еще"}]
+
+    messages, stats = asyncio.run(compactor.compact(history))
+
+    assert messages == history
+    assert stats["summarized_messages"] == 0
+    assert compactor.summarized == []
+
+
+def test_older_turns_are_folded_in_chunks():
+    compactor = counting_compactor(keep_last_turns=2, summary_chunk_turns=3)
+
+    folded = []
+    for turns in range(1, 12):
+        history = conversation(turns - 1) + [{"role": "user", "content": "еще"}]
+        _, stats = asyncio.run(compactor.compact(history))
+        folded.append(stats["summarized_messages"] // 2)
+
+    # The folded prefix grows by whole chunks of 3 turns once 2 are kept verbatim
+    assert folded == [0, 0, 0, 0, 3, 3, 3, 6, 6, 6, 9]
+    # One summary call per chunk, each over the new chunk only
+    assert compactor.summarized == [6, 6, 6]
+
+
+def test_summaries_are_shared_between_workers(tmp_path):
+    shared = IntentParseCache(path=str(tmp_path / "cache.sqlite3"))
+    first = counting_compactor(keep_last_turns=2, summary_chunk_turns=2, shared_cache=shared)
+    # Another worker: own memory, same cache file
+    second = counting_compactor(
+        keep_last_turns=2, summary_chunk_turns=2, shared_cache=IntentParseCache(path=str(tmp_path / "cache.sqlite3"))
+    )
+    history = conversation(4) + [{"role": "user", "content": "еще"}]
+
+    first_messages, _ = asyncio.run(first.compact(history))
+    second_messages, stats = asyncio.run(second.compact(history))
+
+    assert first.summarized == [4]
+    assert second.summarized == []
+    assert stats["summary_cache_hit"] is True
+    assert second_messages == first_messages
+
+
+def test_summary_cache_is_kept_apart_from_intent_parses(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    intent_cache = IntentParseCache(path=path)
+    summary_cache = IntentParseCache(
+        path=path, table="history_summary_cache", metric_prefix="history.summary_cache"
+    )
+    compactor = counting_compactor(keep_last_turns=2, summary_chunk_turns=2, shared_cache=summary_cache)
+    history = conversation(4) + [{"role": "user", "content": "еще"}]
+    intent_before = metrics.snapshot("intent.cache")
+    summary_misses = metrics.get("history.summary_cache.misses")
+
+    asyncio.run(compactor.compact(history))
+
+    assert metrics.snapshot("intent.cache") == intent_before
+    assert metrics.get("history.summary_cache.misses") > summary_misses
+    # Same file, separate table: the intent parses never see the summaries
+    summary_keys = list(summary_cache._memory)
+    assert summary_keys
+    assert asyncio.run(intent_cache.get(summary_keys[0])) is None
+
+
+def test_budget_drops_oldest_messages_but_keeps_summary_and_current_message():
+    compactor = counting_compactor(keep_last_turns=20, token_budget=60, max_assistant_chars=10)
+    history = [
+        {"role": "user" if index % 2 == 0 else "assistant", "content": "слово " * 40}
+        for index in range(10)
+    ] + [{"role": "user", "content": "текущий запрос"}]
+
+    messages, stats = asyncio.run(compactor.compact(history))
+
+    assert messages[-1]["content"] == "текущий запрос"
+    assert len(messages) < len(history)
+    assert stats["tokens"] <= 60 or len(messages) == 1
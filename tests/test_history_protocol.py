@@ -0,0 +1,47 @@
+"""Tests for the delta history protocol of /funds/chat"""
+
+import uuid
+
+from src.ai_conversation.models import ChatRequest
+from src.funds.conversation_store import conversation_store
+from src.funds.router import _apply_history_protocol
+
+
+def turn(text):
+    return [{"role": "user", "content": text}, {"role": "assistant", "content": f"Ответ: {text}"}]
+
+
+def test_delta_includes_messages_another_device_added_during_the_turn(db):
+    user_id = uuid.uuid4()
+    conversation_store.append(db, user_id, None, turn("IT компании"))
+    client_version = conversation_store.version(db, user_id)
+    # While this turn's LLM call runs, another device finishes a turn
+    conversation_store.append(db, user_id, None, turn("с телефона"))
+    appended = conversation_store.append(db, user_id, None, turn("дай еще"))
+
+    response = {"updated_history": ["..."]}
+    _apply_history_protocol(db, user_id, ChatRequest(user_input="дай еще", history_version=client_version), response, appended)
+
+    assert response["history_mode"] == "delta"
+    assert response["history_delta"] == turn("с телефона") + turn("дай еще")
+    assert response["updated_history"] == []
+    assert response["history_version"] == conversation_store.version(db, user_id)
+
+
+def test_reset_conversation_falls_back_to_a_full_history_with_the_cap_exposed(db, monkeypatch):
+    monkeypatch.setattr(conversation_store, "load_limit", 2)
+    user_id = uuid.uuid4()
+    conversation_store.append(db, user_id, None, turn("старый поиск"))
+    client_version = conversation_store.version(db, user_id)
+    conversation_store.clear(db, user_id)
+    db.commit()
+    conversation_store.append(db, user_id, None, turn("первый"))
+    appended = conversation_store.append(db, user_id, None, turn("второй"))
+
+    response = {}
+    _apply_history_protocol(db, user_id, ChatRequest(user_input="второй", history_version=client_version), response, appended)
+
+    assert response["history_mode"] == "full"
+    assert response["updated_history"] == turn("второй")
+    assert response["history_truncated"] is True
+    assert response["history_version"] == conversation_store.version(db, user_id)
@@ -0,0 +1,189 @@
+"""Tests for Idempotency-Key handling"""
+
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from src.core import idempotency
+from src.core.idempotency import IdempotencyStore, idempotent, request_fingerprint
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = IdempotencyStore(path=str(tmp_path / "idempotency.sqlite3"), ttl_seconds=60, wait_seconds=0.3)
+    monkeypatch.setattr(idempotency, "_store", store)
+    return store
+
+
+def test_retry_replays_the_stored_response(store):
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"message": "ok", "turn": len(calls)}
+
+    async def scenario():
+        first = await idempotent("/funds/chat:1", "key-1", {"text": "hi"}, compute)
+        second = await idempotent("/funds/chat:1", "key-1", {"text": "hi"}, compute)
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert first == ({"message": "ok", "turn": 1}, False)
+    assert second == ({"message": "ok", "turn": 1}, True)
+    assert len(calls) == 1
+
+
+def test_retry_on_another_worker_replays_from_the_shared_store(store):
+    other_worker = IdempotencyStore(path=store.path, ttl_seconds=60, wait_seconds=0.3)
+
+    async def compute():
+        return {"message": "ok"}
+
+    async def never():
+        raise AssertionError("computed twice")
+
+    asyncio.run(store.run("/funds/chat:1", "key-2", "fp", compute))
+
+    assert asyncio.run(other_worker.run("/funds/chat:1", "key-2", "fp", never)) == ({"message": "ok"}, True)
+
+
+def test_reused_key_with_a_different_body_is_422(store):
+    async def compute():
+        return {"message": "ok"}
+
+    async def scenario():
+        await idempotent("/funds/chat:1", "key-3", {"text": "hi"}, compute)
+        await idempotent("/funds/chat:1", "key-3", {"text": "bye"}, compute)
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(scenario())
+
+    assert error.value.status_code == 422
+
+
+def test_original_still_running_on_another_worker_is_409(store):
+    other_worker = IdempotencyStore(path=store.path, ttl_seconds=60, wait_seconds=0.3)
+    payload = {"text": "hi"}
+
+    async def slow():
+        await asyncio.sleep(1)
+        return {"message": "late"}
+
+    async def scenario():
+        original = asyncio.create_task(
+            other_worker.run("/funds/chat:1", "key-4", request_fingerprint(payload), slow)
+        )
+        await asyncio.sleep(0.05)
+        try:
+            with pytest.raises(HTTPException) as error:
+                await idempotent("/funds/chat:1", "key-4", payload, slow)
+        finally:
+            original.cancel()
+        return error.value
+
+    assert asyncio.run(scenario()).status_code == 409
+
+
+def test_claim_of_a_turn_longer_than_the_wait_is_kept(store):
+    other_worker = IdempotencyStore(path=store.path, ttl_seconds=60, wait_seconds=0.2)
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.8)
+        return {"message": "ok"}
+
+    async def scenario():
+        original = asyncio.create_task(store.run("/funds/chat:1", "key-5", "fp", slow))
+        # Past the claim's initial expiry
+        await asyncio.sleep(0.5)
+        with pytest.raises(idempotency.IdempotencyInProgress):
+            await other_worker.run("/funds/chat:1", "key-5", "fp", slow)
+        await original
+        return await other_worker.run("/funds/chat:1", "key-5", "fp", slow)
+
+    assert asyncio.run(scenario()) == ({"message": "ok"}, True)
+    assert len(calls) == 1
+
+
+@pytest.fixture
+def hybrid_client(store, database, monkeypatch):
+    """TestClient whose /ai/chat-hybrid turns count calls and record their sessions"""
+    from fastapi.testclient import TestClient
+
+    from src.ai_conversation import router as ai_router
+    from src.main import app
+
+    turns = []
+
+    async def fake_turn(request, db):
+        turns.append(db)
+        return {"message": f"ответ {len(turns)}"}
+
+    monkeypatch.setattr(ai_router, "_chat_hybrid_turn", fake_turn)
+    client = TestClient(app)
+    client.turns = turns
+    return client
+
+
+def bearer(db, email):
+    from src.auth.models import User
+    from src.auth.router import create_access_token
+
+    db.add(User(email=email, hashed_password="x", full_name="Тест", is_active=True))
+    db.commit()
+    return {"Authorization": f"Bearer {create_access_token({'sub': email})}"}
+
+
+def hybrid(client, key, headers=None):
+    return client.post(
+        "/api/v1/ai/chat-hybrid",
+        json={"user_input": "IT компании в Алматы"},
+        headers={"Idempotency-Key": key, **(headers or {})}
+    )
+
+
+def test_hybrid_keys_are_not_shared_between_users(hybrid_client, db):
+    alice, bob = bearer(db, "alice@example.com"), bearer(db, "bob@example.com")
+
+    first = hybrid(hybrid_client, "1", alice)
+    retry = hybrid(hybrid_client, "1", alice)
+    other = hybrid(hybrid_client, "1", bob)
+
+    assert retry.json()["message"] == first.json()["message"]
+    assert retry.headers.get("Idempotent-Replayed") == "true"
+    assert other.json()["message"] != first.json()["message"]
+    assert "Idempotent-Replayed" not in other.headers
+    assert len(hybrid_client.turns) == 2
+
+
+def test_hybrid_key_of_an_anonymous_caller_is_ignored(hybrid_client):
+    hybrid(hybrid_client, "1")
+    second = hybrid(hybrid_client, "1")
+
+    assert "Idempotent-Replayed" not in second.headers
+    assert len(hybrid_client.turns) == 2
+
+
+def test_hybrid_turn_runs_on_its_own_session(hybrid_client, monkeypatch):
+    from src.ai_conversation import router as ai_router
+    from src.core.database import SessionLocal
+
+    opened, closed = [], []
+
+    def tracked_session():
+        session = SessionLocal()
+        opened.append(session)
+        original_close = session.close
+        session.close = lambda: (closed.append(session), original_close())
+        return session
+
+    monkeypatch.setattr(ai_router, "SessionLocal", tracked_session)
+
+    hybrid(hybrid_client, "session")
+
+    # Not the request-scoped session, which get_db closes when the client goes away
+    assert hybrid_client.turns == opened
+    assert closed == opened
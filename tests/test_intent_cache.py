@@ -0,0 +1,151 @@
+"""Tests for the two-level intent parse cache"""
+
+import asyncio
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from src.ai_conversation import intent_cache as intent_cache_module
+from src.ai_conversation.intent_cache import IntentParseCache
+from src.core.metrics import metrics
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.time() for the cache module"""
+    now = SimpleNamespace(value=1_000_000.0)
+    monkeypatch.setattr(intent_cache_module, "time", SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+def counters():
+    return {
+        name: metrics.get(f"intent.cache.{name}")
+        for name in ("memory_hits", "disk_hits", "misses")
+    }
+
+
+def delta(before):
+    return {name: value - before[name] for name, value in counters().items()}
+
+
+def disk_keys(path):
+    with sqlite3.connect(path) as connection:
+        return {row[0] for row in connection.execute("SELECT key FROM intent_cache")}
+
+
+def test_same_window_with_different_spacing_shares_a_key():
+    first = IntentParseCache.make_key(
+        [{"role": "user", "content": "Найди  компании в Алматы"}], model="gpt-4o", prompt="p"
+    )
+    second = IntentParseCache.make_key(
+        [{"role": "user", "content": " найди компании в алматы "}], model="gpt-4o", prompt="p"
+    )
+    other_prompt = IntentParseCache.make_key(
+        [{"role": "user", "content": "Найди компании в Алматы"}], model="gpt-4o", prompt="q"
+    )
+
+    assert first == second
+    assert first != other_prompt
+
+
+def test_memory_hits_and_misses_are_counted():
+    cache = IntentParseCache(path=None)
+    before = counters()
+
+    assert asyncio.run(cache.get("key")) is None
+    asyncio.run(cache.set("key", {"intent": "search"}))
+    assert asyncio.run(cache.get("key")) == {"intent": "search"}
+
+    assert delta(before) == {"memory_hits": 1, "disk_hits": 0, "misses": 1}
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = IntentParseCache(path=str(tmp_path / "cache.sqlite3"), ttl_seconds=60)
+    asyncio.run(cache.set("key", {"intent": "search"}))
+
+    clock.value += 59
+    assert asyncio.run(cache.get("key")) == {"intent": "search"}
+
+    clock.value += 2
+    before = counters()
+    # Expired in memory and on disk
+    assert asyncio.run(cache.get("key")) is None
+    assert "key" not in cache._memory
+    assert delta(before) == {"memory_hits": 0, "disk_hits": 0, "misses": 1}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = IntentParseCache(path=None, max_entries=2)
+    asyncio.run(cache.set("a", {"n": 1}))
+    asyncio.run(cache.set("b", {"n": 2}))
+    # Reading "a" makes "b" the least recently used
+    asyncio.run(cache.get("a"))
+    asyncio.run(cache.set("c", {"n": 3}))
+
+    assert list(cache._memory) == ["a", "c"]
+    assert asyncio.run(cache.get("b")) is None
+
+
+def test_other_workers_read_through_the_disk_layer(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    writer = IntentParseCache(path=path)
+    reader = IntentParseCache(path=path)
+    asyncio.run(writer.set("key", {"intent": "search", "city": "Алматы"}))
+    before = counters()
+
+    assert asyncio.run(reader.get("key")) == {"intent": "search", "city": "Алматы"}
+    # Promoted to the reader's memory layer
+    assert asyncio.run(reader.get("key")) == {"intent": "search", "city": "Алматы"}
+
+    assert delta(before) == {"memory_hits": 1, "disk_hits": 1, "misses": 0}
+
+
+def test_cached_values_are_copies():
+    cache = IntentParseCache(path=None)
+    value = {"intent": "search"}
+    asyncio.run(cache.set("key", value))
+    value["intent"] = "changed"
+
+    cached = asyncio.run(cache.get("key"))
+    cached["intent"] = "changed again"
+
+    assert asyncio.run(cache.get("key")) == {"intent": "search"}
+
+
+def test_disk_table_is_pruned_every_interval_writes(tmp_path, clock):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = IntentParseCache(path=path, ttl_seconds=60, max_disk_entries=5)
+    asyncio.run(cache.set("stale", {"n": 0}))
+    clock.value += 120
+
+    for n in range(1, IntentParseCache.PRUNE_INTERVAL - 1):
+        clock.value += 1
+        asyncio.run(cache.set(f"key-{n}", {"n": n}))
+    # Nothing pruned before the interval is reached
+    assert len(disk_keys(path)) == IntentParseCache.PRUNE_INTERVAL - 1
+
+    clock.value += 1
+    asyncio.run(cache.set("last", {"n": 100}))
+
+    # Expired rows dropped, then only the max_disk_entries freshest kept
+    assert disk_keys(path) == {"last"} | {
+        f"key-{n}" for n in range(IntentParseCache.PRUNE_INTERVAL - 5, IntentParseCache.PRUNE_INTERVAL - 1)
+    }
+
+
+def test_unusable_path_falls_back_to_memory_only(tmp_path):
+    blocker = tmp_path / "file"
+    blocker.write_text("not a directory")
+
+    cache = IntentParseCache(path=str(blocker / "cache.sqlite3"))
+    asyncio.run(cache.set("key", {"intent": "search"}))
+
+    assert cache.path is None
+    assert asyncio.run(cache.get("key")) == {"intent": "search"}
+
+
+def test_invalid_table_name_is_rejected():
+    with pytest.raises(ValueError):
+        IntentParseCache(path=None, table="intent_cache; DROP TABLE users")
@@ -0,0 +1,118 @@
+"""Tests for the rule-based intent parser"""
+
+import asyncio
+
+from src.ai_conversation import service
+from src.ai_conversation.intent_parser import RuleBasedIntentParser
+from src.ai_conversation.search_state import SearchState
+
+
+parser = RuleBasedIntentParser()
+
+
+def user(content):
+    return {"role": "user", "content": content}
+
+
+def assistant(content="Вот компании..."):
+    return {"role": "assistant", "content": content}
+
+
+def test_new_search():
+    result = parser.parse([user("Найди 15 IT компаний в Алматы")])
+
+    assert result["intent"] == "find_companies"
+    assert result["location"] == "Алматы"
+    assert result["activity_keywords"] == ["IT"]
+    assert result["quantity"] == 15
+    assert result["page_number"] == 1
+    assert result["confidence"] >= 0.8
+    assert "offset" not in result
+
+
+def test_english_search_with_transliterated_city():
+    result = parser.parse([user("Find 20 construction companies in Astana")])
+
+    assert result["location"] == "Астана"
+    assert result["activity_keywords"] == ["строительство"]
+    assert result["quantity"] == 20
+
+
+def test_unknown_qualifiers_lower_confidence():
+    result = parser.parse([user("Найди кондитерских компаний без долгов в Алматы")])
+
+    assert result is None or result["confidence"] < 0.8
+
+
+def test_unsupported_message_is_not_parsed():
+    assert parser.parse([user("Привет, как дела?")]) is None
+    assert parser.parse([]) is None
+    assert parser.parse([assistant()]) is None
+
+
+def test_continuation_from_history_sums_previous_page_sizes():
+    history = [
+        user("Найди 10 IT компаний в Алматы"), assistant(),
+        user("дай еще"), assistant(),
+        user("дай еще 5"),
+    ]
+
+    result = parser.parse(history)
+
+    assert result["location"] == "Алматы"
+    assert result["activity_keywords"] == ["IT"]
+    assert result["quantity"] == 5
+    assert result["page_number"] == 3
+    # Two pages of 10 were served before
+    assert result["offset"] == 20
+
+
+def test_continuation_after_smaller_page():
+    history = [
+        user("Найди 10 компаний в Алматы"), assistant(),
+        user("дай еще 5"), assistant(),
+        user("дай еще 10"),
+    ]
+
+    assert parser.parse(history)["offset"] == 15
+
+
+def test_continuation_uses_search_state_cursor():
+    state = SearchState()
+    state.record_page("Алматы", ["IT"], page_size=10, offset=0, returned=10)
+    state.record_page("Алматы", ["IT"], page_size=10, offset=10, returned=10)
+
+    result = parser.parse([user("дай еще 5")], search_state=state)
+
+    assert result["location"] == "Алматы"
+    assert result["quantity"] == 5
+    assert result["page_number"] == 3
+    assert result["offset"] == 20
+
+
+def test_continuation_in_another_city_is_a_new_search():
+    history = [user("Найди 10 компаний в Алматы"), assistant(), user("еще 10 в Астане")]
+
+    result = parser.parse(history)
+
+    assert result["location"] == "Астана"
+    assert result["page_number"] == 1
+    assert "offset" not in result
+    assert result["confidence"] <= 0.7
+
+
+def test_continuation_without_a_base_search():
+    assert parser.parse([user("Привет"), assistant(), user("дай еще")]) is None
+
+
+def test_fast_path_uses_the_parse_made_by_the_caller(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("the rule parser must run once per turn, in the caller")
+
+    history = [user("Найди 10 IT компаний в Алматы")]
+    local_parse = parser.parse(history)
+    monkeypatch.setattr(service.intent_parser, "parse", fail)
+
+    result = asyncio.run(service.ai_service._parse_user_intent_with_history(history, local_parse=local_parse))
+
+    assert result is local_parse
@@ -0,0 +1,57 @@
+"""Tests for the internal metrics and telemetry endpoints"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.core.config import get_settings
+from src.core.telemetry import LLMTelemetry
+from src.main import app
+
+
+@pytest.fixture
+def client():
+    # No context manager: the lifespan (database, OpenAI assistant) is not needed
+    return TestClient(app)
+
+
+@pytest.fixture
+def internal_token(monkeypatch):
+    monkeypatch.setattr(get_settings(), "internal_api_token", "internal-secret")
+    return "internal-secret"
+
+
+@pytest.mark.parametrize("method, path", [
+    ("GET", "/api/v1/ai/chat/metrics"),
+    ("GET", "/api/v1/ai/chat/telemetry"),
+    ("DELETE", "/api/v1/ai/chat/telemetry"),
+])
+def test_internal_endpoints_are_hidden_without_a_configured_token(client, monkeypatch, method, path):
+    monkeypatch.setattr(get_settings(), "internal_api_token", "")
+
+    assert client.request(method, path).status_code == 404
+
+
+@pytest.mark.parametrize("method, path", [
+    ("GET", "/api/v1/ai/chat/metrics"),
+    ("GET", "/api/v1/ai/chat/telemetry"),
+    ("DELETE", "/api/v1/ai/chat/telemetry"),
+])
+def test_internal_endpoints_require_the_token(client, internal_token, method, path):
+    assert client.request(method, path).status_code == 403
+    assert client.request(method, path, headers={"X-Internal-Token": "wrong"}).status_code == 403
+    assert client.request(method, path, headers={"X-Internal-Token": internal_token}).status_code == 200
+
+
+def test_telemetry_snapshot_pseudonymizes_ids():
+    telemetry = LLMTelemetry()
+    with telemetry.turn("/funds/chat", user_id="user-42", conversation_id="fund-7"):
+        pass
+
+    turn = telemetry.snapshot()["recent_turns"][0]
+
+    assert turn["user_id"] not in (None, "user-42")
+    assert turn["conversation_id"] not in (None, "fund-7")
+    # Stable, so the turns of one user can still be grouped
+    with telemetry.turn("/funds/chat", user_id="user-42"):
+        pass
+    assert telemetry.snapshot()["recent_turns"][1]["user_id"] == turn["user_id"]
@@ -0,0 +1,38 @@
+"""Tests for the write-behind last_login writer"""
+
+import asyncio
+import threading
+import time
+
+from src.auth.last_login import LastLoginWriter
+
+
+def test_login_burst_runs_one_early_flush_at_a_time(monkeypatch):
+    writer = LastLoginWriter(flush_seconds=60, max_pending=2)
+    running = 0
+    max_running = 0
+    written = []
+    lock = threading.Lock()
+
+    def slow_write(rows):
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.05)
+        with lock:
+            running -= 1
+        written.extend(row["id"] for row in rows)
+
+    monkeypatch.setattr(writer, "_write", slow_write)
+
+    async def burst():
+        for user_id in range(20):
+            writer.record(user_id)
+            await asyncio.sleep(0.005)
+        await writer.stop()
+
+    asyncio.run(burst())
+
+    assert max_running == 1
+    assert sorted(written) == list(range(20))
@@ -0,0 +1,282 @@
+"""Tests for the shared OpenAI gateway"""
+
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from src.core.llm_gateway import LLMGateway, parse_reset_duration
+from src.core.metrics import metrics
+
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def api_error(error_class, status_code, headers=None):
+    response = httpx.Response(status_code, headers=headers or {}, request=REQUEST)
+    return error_class("error", response=response, body=None)
+
+
+class RawResponse:
+    def __init__(self, headers, parsed):
+        self.headers = headers
+        self._parsed = parsed
+
+    def parse(self):
+        return self._parsed
+
+
+class FakeCompletions:
+    """
+    Stand-in for ``client.chat.completions``
+
+    ``outcomes`` are returned (or raised) one per call; the last one repeats.
+    Calls wait for ``release`` when it is given.
+    """
+
+    def __init__(self, outcomes, headers=None, release=None):
+        self.outcomes = list(outcomes)
+        self.headers = headers or {}
+        self.release = release
+        self.calls = 0
+        self.with_raw_response = SimpleNamespace(create=self._create_raw)
+
+    async def _create_raw(self, **kwargs):
+        self.calls += 1
+        if self.release is not None:
+            await self.release.wait()
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return RawResponse(self.headers, outcome)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record retry delays instead of sleeping"""
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    return delays
+
+
+def completion(text="ok"):
+    return SimpleNamespace(text=text, usage=None)
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("6m0s", 360.0),
+    ("20ms", 0.02),
+    ("1h2m3s", 3723.0),
+    ("1.5s", 1.5),
+    ("17", 17.0),
+    ("", None),
+    (None, None),
+    ("soon", None),
+])
+def test_parse_reset_duration(value, seconds):
+    assert parse_reset_duration(value) == seconds
+
+
+def test_retryable_errors_are_retried_with_backoff(sleeps):
+    gateway = LLMGateway(max_retries=3, base_delay=0.5, max_delay=20.0)
+    resource = FakeCompletions([
+        api_error(openai.InternalServerError, 500),
+        openai.APIConnectionError(request=REQUEST),
+        completion(),
+    ])
+    retries = metrics.get("llm.retries")
+
+    response = asyncio.run(gateway.call(resource, "create", model="gpt-4o"))
+
+    assert response.text == "ok"
+    assert resource.calls == 3
+    assert metrics.get("llm.retries") - retries == 2
+    # Full jitter: uniform(0, base_delay * 2 ** attempt)
+    assert len(sleeps) == 2
+    assert 0 <= sleeps[0] <= 0.5
+    assert 0 <= sleeps[1] <= 1.0
+
+
+def test_retry_after_header_is_honoured(sleeps):
+    gateway = LLMGateway(max_retries=1, base_delay=0.5, max_delay=20.0)
+    resource = FakeCompletions([
+        api_error(openai.RateLimitError, 429, {"retry-after": "3"}),
+        completion(),
+    ])
+    rate_limited = metrics.get("llm.rate_limited")
+
+    asyncio.run(gateway.call(resource, "create", model="gpt-4o"))
+
+    assert 3 <= sleeps[0] <= 3.5
+    assert metrics.get("llm.rate_limited") - rate_limited == 1
+
+
+def test_retry_after_ms_takes_precedence(sleeps):
+    gateway = LLMGateway(max_retries=1, base_delay=0.5)
+    resource = FakeCompletions([
+        api_error(openai.RateLimitError, 429, {"retry-after-ms": "250", "retry-after": "9"}),
+        completion(),
+    ])
+
+    asyncio.run(gateway.call(resource, "create", model="gpt-4o"))
+
+    assert 0.25 <= sleeps[0] <= 0.75
+
+
+def test_gives_up_after_max_retries(sleeps):
+    gateway = LLMGateway(max_retries=2)
+    resource = FakeCompletions([api_error(openai.RateLimitError, 429)])
+    errors = metrics.get("llm.errors")
+
+    with pytest.raises(openai.RateLimitError):
+        asyncio.run(gateway.call(resource, "create", model="gpt-4o"))
+
+    assert resource.calls == 3
+    assert len(sleeps) == 2
+    assert metrics.get("llm.errors") - errors == 1
+
+
+def test_client_errors_are_not_retried(sleeps):
+    gateway = LLMGateway(max_retries=3)
+    resource = FakeCompletions([api_error(openai.BadRequestError, 400)])
+
+    with pytest.raises(openai.BadRequestError):
+        asyncio.run(gateway.call(resource, "create", model="gpt-4o"))
+
+    assert resource.calls == 1
+    assert sleeps == []
+
+
+def test_rate_limit_headers_sync_the_buckets():
+    gateway = LLMGateway()
+    resource = FakeCompletions([completion()], headers={
+        "x-ratelimit-limit-requests": "100",
+        "x-ratelimit-remaining-requests": "40",
+        "x-ratelimit-reset-requests": "30s",
+        "x-ratelimit-limit-tokens": "10000",
+        "x-ratelimit-remaining-tokens": "9000",
+        "x-ratelimit-reset-tokens": "6m0s",
+    })
+
+    asyncio.run(gateway.call(resource, "create", model="gpt-4o"))
+
+    requests_bucket = gateway._request_bucket
+    assert requests_bucket.capacity == 100
+    assert requests_bucket.tokens == pytest.approx(40, abs=0.5)
+    # (limit - remaining) / reset, at least limit per minute
+    assert requests_bucket.rate == pytest.approx(2.0)
+    assert gateway._token_bucket.capacity == 10000
+    assert gateway._token_bucket.rate == pytest.approx(10000 / 60)
+
+
+def test_later_headers_never_raise_the_local_count():
+    gateway = LLMGateway()
+    resource = FakeCompletions([completion()], headers={
+        "x-ratelimit-limit-requests": "100",
+        "x-ratelimit-remaining-requests": "10",
+    })
+    asyncio.run(gateway.call(resource, "create", model="gpt-4o"))
+
+    # The server count lags behind requests still in flight
+    resource.headers = {"x-ratelimit-limit-requests": "100", "x-ratelimit-remaining-requests": "90"}
+    asyncio.run(gateway.call(resource, "create", model="gpt-4o"))
+
+    assert gateway._request_bucket.tokens < 20
+
+
+def test_buckets_are_unlimited_without_headers():
+    gateway = LLMGateway()
+    resource = FakeCompletions([completion()])
+
+    asyncio.run(gateway.call(resource, "create", model="gpt-4o"))
+
+    assert gateway._request_bucket.capacity is None
+    assert gateway._token_bucket.capacity is None
+
+
+def test_identical_coalesced_calls_share_one_request():
+    async def scenario():
+        gateway = LLMGateway()
+        release = asyncio.Event()
+        resource = FakeCompletions([completion("shared")], release=release)
+        coalesced = metrics.get("llm.coalesced")
+
+        calls = [
+            asyncio.ensure_future(gateway.call(resource, "create", coalesce=True, model="gpt-4o", temperature=0))
+            for _ in range(3)
+        ]
+        await asyncio.sleep(0)
+        release.set()
+        responses = await asyncio.gather(*calls)
+
+        assert resource.calls == 1
+        assert [r.text for r in responses] == ["shared"] * 3
+        assert metrics.get("llm.coalesced") - coalesced == 2
+        assert gateway._inflight == {}
+
+    asyncio.run(scenario())
+
+
+def test_different_arguments_are_not_coalesced():
+    async def scenario():
+        gateway = LLMGateway()
+        resource = FakeCompletions([completion()])
+
+        await asyncio.gather(
+            gateway.call(resource, "create", coalesce=True, model="gpt-4o", temperature=0),
+            gateway.call(resource, "create", coalesce=True, model="gpt-4o-mini", temperature=0),
+        )
+
+        assert resource.calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_leader_does_not_cancel_the_shared_request():
+    async def scenario():
+        gateway = LLMGateway()
+        release = asyncio.Event()
+        resource = FakeCompletions([completion("shared")], release=release)
+
+        leader = asyncio.ensure_future(gateway.call(resource, "create", coalesce=True, model="gpt-4o"))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(gateway.call(resource, "create", coalesce=True, model="gpt-4o"))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert (await follower).text == "shared"
+        assert leader.cancelled()
+        assert resource.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_concurrency_is_limited():
+    async def scenario():
+        gateway = LLMGateway(max_concurrency=2)
+        release = asyncio.Event()
+        resource = FakeCompletions([completion()], release=release)
+
+        calls = [
+            asyncio.ensure_future(gateway.call(resource, "create", model="gpt-4o", n=n))
+            for n in range(5)
+        ]
+        for _ in range(5):
+            await asyncio.sleep(0)
+        started = resource.calls
+        release.set()
+        await asyncio.gather(*calls)
+
+        assert started == 2
+        assert resource.calls == 5
+
+    asyncio.run(scenario())
@@ -0,0 +1,126 @@
+"""Tests for the queued, sampled and JSON logging setup"""
+
+import json
+import logging
+import queue
+import sys
+
+import pytest
+
+from src.core import logging_config
+from src.core.logging_config import (
+    JsonFormatter, NonBlockingQueueHandler, SamplingFilter, TurnContextFilter, parse_levels
+)
+from src.core.metrics import metrics
+from src.core.telemetry import llm_telemetry
+
+
+def make_record(level=logging.INFO, msg="Found %s companies", args=(3,), exc_info=None, **extra):
+    return logging.getLogger("src.test").makeRecord(
+        "src.test", level, __file__, 1, msg, args, exc_info, extra=extra or None
+    )
+
+
+@pytest.mark.parametrize("rate, level, kept", [
+    (0.0, logging.DEBUG, False),
+    (0.0, logging.INFO, True),
+    (0.0, logging.ERROR, True),
+    (1.0, logging.DEBUG, True),
+    # Out of range rates are clamped
+    (-1.0, logging.DEBUG, False),
+    (5.0, logging.DEBUG, True),
+])
+def test_sampling_filter_only_samples_debug_records(rate, level, kept):
+    assert SamplingFilter(rate).filter(make_record(level=level)) is kept
+
+
+def test_sampling_filter_keeps_the_configured_share(monkeypatch):
+    sampling = SamplingFilter(0.25)
+    draws = iter([0.1, 0.3, 0.24, 0.9])
+    monkeypatch.setattr(logging_config.random, "random", lambda: next(draws))
+
+    assert [sampling.filter(make_record(level=logging.DEBUG)) for _ in range(4)] == [True, False, True, False]
+
+
+@pytest.mark.parametrize("spec, levels", [
+    ("src.companies.service=DEBUG, src.ai_conversation=warning", {
+        "src.companies.service": "DEBUG", "src.ai_conversation": "WARNING"
+    }),
+    ("src.auth=info,", {"src.auth": "INFO"}),
+    ("src.auth, =DEBUG, src.funds=", {}),
+    ("", {}),
+    (None, {}),
+])
+def test_parse_levels(spec, levels):
+    assert parse_levels(spec) == levels
+
+
+def test_json_formatter_renders_message_and_extra_fields():
+    record = make_record(company_count=3, city="Алматы")
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "src.test"
+    assert entry["message"] == "Found 3 companies"
+    assert entry["company_count"] == 3
+    assert entry["city"] == "Алматы"
+    assert entry["ts"].endswith("+00:00")
+    assert "endpoint" not in entry and "turn_id" not in entry
+    # Standard LogRecord attributes are not repeated
+    assert "args" not in entry and "lineno" not in entry
+
+
+def test_json_formatter_adds_the_turn_context():
+    with llm_telemetry.turn("/funds/chat", user_id="user-1") as turn:
+        record = make_record()
+        TurnContextFilter().filter(record)
+    outside = make_record()
+    TurnContextFilter().filter(outside)
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["endpoint"] == "/funds/chat"
+    assert entry["turn_id"] == turn["turn_id"]
+    assert outside.turn_id is None and outside.endpoint is None
+    assert "endpoint" not in json.loads(JsonFormatter().format(outside))
+
+
+def test_json_formatter_includes_the_traceback():
+    try:
+        raise ValueError("broken")
+    except ValueError:
+        record = make_record(level=logging.ERROR, msg="Turn failed", args=(), exc_info=sys.exc_info())
+    handler = NonBlockingQueueHandler(queue.Queue())
+    handler.prepare(record)
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert "ValueError: broken" in entry["exc"]
+
+
+def test_queue_handler_defers_rendering_to_the_writer():
+    records = queue.Queue()
+    handler = NonBlockingQueueHandler(records)
+    try:
+        raise ValueError("broken")
+    except ValueError:
+        handler.handle(make_record(level=logging.ERROR, exc_info=sys.exc_info()))
+
+    record = records.get_nowait()
+    # Lazy %-formatting survives until the writer thread renders the message
+    assert (record.msg, record.args) == ("Found %s companies", (3,))
+    assert record.exc_info is None
+    assert "ValueError: broken" in record.exc_text
+
+
+def test_queue_handler_drops_records_when_the_queue_is_full():
+    records = queue.Queue(maxsize=2)
+    handler = NonBlockingQueueHandler(records)
+    dropped = metrics.get("logging.dropped")
+
+    for n in range(5):
+        handler.handle(make_record(msg="record %s", args=(n,)))
+
+    assert metrics.get("logging.dropped") - dropped == 3
+    assert [records.get_nowait().getMessage() for _ in range(2)] == ["record 0", "record 1"]
@@ -0,0 +1,41 @@
+"""Tests for the off-loop password hasher"""
+
+import asyncio
+
+from src.auth.passwords import PasswordHasher
+
+
+def test_hash_and_verify():
+    hasher = PasswordHasher(rounds=4, max_workers=1)
+    try:
+        hashed = asyncio.run(hasher.hash("secret"))
+        assert asyncio.run(hasher.verify_and_update("secret", hashed)) == (True, None)
+        assert asyncio.run(hasher.verify_and_update("wrong", hashed)) == (False, None)
+    finally:
+        hasher.shutdown()
+
+
+def test_changed_cost_rehashes_on_verify():
+    old_hasher = PasswordHasher(rounds=4, max_workers=1)
+    new_hasher = PasswordHasher(rounds=5, max_workers=1)
+    try:
+        hashed = old_hasher.hash_sync("secret")
+
+        valid, new_hash = asyncio.run(new_hasher.verify_and_update("secret", hashed))
+
+        assert valid
+        assert new_hash is not None and new_hash.startswith("$2b$05$")
+        # The new hash is current and still verifies
+        assert asyncio.run(new_hasher.verify_and_update("secret", new_hash)) == (True, None)
+    finally:
+        old_hasher.shutdown()
+        new_hasher.shutdown()
+
+
+def test_unknown_hash_format_is_invalid():
+    hasher = PasswordHasher(rounds=4, max_workers=1)
+    try:
+        assert asyncio.run(hasher.verify_and_update("secret", "not-a-hash")) == (False, None)
+        assert asyncio.run(hasher.verify_and_update("secret", "")) == (False, None)
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,218 @@
+"""Tests for the next-page prefetch buffer"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.ai_conversation import prefetch as prefetch_module
+from src.ai_conversation.prefetch import PrefetchBuffer
+from src.companies.service import CompanyService
+from src.core.metrics import metrics
+
+
+PAGE = [{"id": str(n), "name": f"Компания {n}"} for n in range(20)]
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    """Record prefetch searches; each waits for ``release`` and returns PAGE[:limit]"""
+    class Searches:
+        calls = []
+        release = None
+        error = None
+
+    async def fake_search(location=None, activity_keywords=None, limit=10, offset=0):
+        Searches.calls.append({"location": location, "limit": limit, "offset": offset})
+        if Searches.release is not None:
+            await Searches.release.wait()
+        if Searches.error is not None:
+            raise Searches.error
+        return PAGE[:limit]
+
+    monkeypatch.setattr(CompanyService, "search_companies_isolated", staticmethod(fake_search))
+    return Searches
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable time.monotonic() for the prefetch module"""
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(prefetch_module, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def counters():
+    return {
+        name: metrics.get(f"prefetch.{name}")
+        for name in ("scheduled", "hits", "misses", "expired", "errors", "evicted")
+    }
+
+
+def delta(before):
+    return {name: value - before[name] for name, value in counters().items() if value != before[name]}
+
+
+def test_prefetched_page_is_served_once(searches):
+    async def scenario():
+        buffer = PrefetchBuffer()
+        before = counters()
+        buffer.schedule("conv-1", "snap-1", "Алматы", ["IT"], limit=10, offset=10)
+        first = await buffer.take("conv-1", "snap-1", limit=10, offset=10)
+        second = await buffer.take("conv-1", "snap-1", limit=10, offset=10)
+        return first, second, delta(before)
+
+    first, second, changes = asyncio.run(scenario())
+
+    assert first == PAGE[:10]
+    assert second is None
+    assert searches.calls == [{"location": "Алматы", "limit": 10, "offset": 10}]
+    assert changes == {"scheduled": 1, "hits": 1, "misses": 1}
+
+
+def test_larger_prefetch_serves_a_smaller_request(searches):
+    async def scenario():
+        buffer = PrefetchBuffer()
+        buffer.schedule("conv-1", "snap-1", "Алматы", None, limit=20, offset=10)
+        return await buffer.take("conv-1", "snap-1", limit=5, offset=10)
+
+    assert asyncio.run(scenario()) == PAGE[:5]
+
+
+@pytest.mark.parametrize("snapshot_id, limit, offset", [
+    # The search state moved on (new search or reset)
+    ("snap-2", 10, 10),
+    # Another page of the same result set
+    ("snap-1", 10, 20),
+    # More than was prefetched
+    ("snap-1", 15, 10),
+])
+def test_mismatched_request_is_a_miss_and_drops_the_entry(searches, snapshot_id, limit, offset):
+    async def scenario():
+        searches.release = asyncio.Event()
+        buffer = PrefetchBuffer()
+        before = counters()
+        buffer.schedule("conv-1", "snap-1", "Алматы", None, limit=10, offset=10)
+        task = buffer._entries["conv-1"]["task"]
+        companies = await buffer.take("conv-1", snapshot_id, limit=limit, offset=offset)
+        await asyncio.sleep(0)
+        return companies, task, buffer, delta(before)
+
+    companies, task, buffer, changes = asyncio.run(scenario())
+
+    assert companies is None
+    assert task.cancelled()
+    assert buffer._entries == {}
+    assert changes == {"scheduled": 1, "misses": 1}
+
+
+def test_expired_entry_is_not_served(searches, clock):
+    async def scenario():
+        buffer = PrefetchBuffer(ttl_seconds=120)
+        before = counters()
+        buffer.schedule("conv-1", "snap-1", "Алматы", None, limit=10, offset=10)
+        clock.value += 121
+        return await buffer.take("conv-1", "snap-1", limit=10, offset=10), delta(before)
+
+    companies, changes = asyncio.run(scenario())
+
+    assert companies is None
+    assert changes == {"scheduled": 1, "expired": 1}
+
+
+def test_entry_is_served_until_it_expires(searches, clock):
+    async def scenario():
+        buffer = PrefetchBuffer(ttl_seconds=120)
+        buffer.schedule("conv-1", "snap-1", "Алматы", None, limit=10, offset=10)
+        clock.value += 119
+        return await buffer.take("conv-1", "snap-1", limit=10, offset=10)
+
+    assert asyncio.run(scenario()) == PAGE[:10]
+
+
+def test_oldest_conversation_is_evicted(searches):
+    async def scenario():
+        searches.release = asyncio.Event()
+        buffer = PrefetchBuffer(max_conversations=2)
+        before = counters()
+        for conversation_id in ("conv-1", "conv-2", "conv-3"):
+            buffer.schedule(conversation_id, "snap-1", "Алматы", None, limit=10, offset=10)
+        entries = list(buffer._entries)
+        searches.release.set()
+        evicted = await buffer.take("conv-1", "snap-1", limit=10, offset=10)
+        kept = await buffer.take("conv-3", "snap-1", limit=10, offset=10)
+        return entries, evicted, kept, delta(before)
+
+    entries, evicted, kept, changes = asyncio.run(scenario())
+
+    assert entries == ["conv-2", "conv-3"]
+    assert evicted is None
+    assert kept == PAGE[:10]
+    assert changes == {"scheduled": 3, "evicted": 1, "misses": 1, "hits": 1}
+
+
+def test_rescheduling_replaces_the_previous_page(searches):
+    async def scenario():
+        searches.release = asyncio.Event()
+        buffer = PrefetchBuffer()
+        buffer.schedule("conv-1", "snap-1", "Алматы", None, limit=10, offset=10)
+        previous = buffer._entries["conv-1"]["task"]
+        buffer.schedule("conv-1", "snap-1", "Алматы", None, limit=10, offset=20)
+        searches.release.set()
+        companies = await buffer.take("conv-1", "snap-1", limit=10, offset=20)
+        return previous, companies
+
+    previous, companies = asyncio.run(scenario())
+
+    assert previous.cancelled()
+    assert companies == PAGE[:10]
+
+
+def test_prefetch_in_flight_is_awaited(searches):
+    async def scenario():
+        searches.release = asyncio.Event()
+        buffer = PrefetchBuffer()
+        buffer.schedule("conv-1", "snap-1", "Алматы", None, limit=10, offset=10)
+        take = asyncio.ensure_future(buffer.take("conv-1", "snap-1", limit=10, offset=10))
+        await asyncio.sleep(0)
+        in_flight = not take.done()
+        searches.release.set()
+        return in_flight, await take
+
+    in_flight, companies = asyncio.run(scenario())
+
+    assert in_flight
+    assert companies == PAGE[:10]
+    assert len(searches.calls) == 1
+
+
+def test_failed_prefetch_is_a_miss(searches):
+    searches.error = RuntimeError("database is down")
+
+    async def scenario():
+        buffer = PrefetchBuffer()
+        before = counters()
+        buffer.schedule("conv-1", "snap-1", "Алматы", None, limit=10, offset=10)
+        return await buffer.take("conv-1", "snap-1", limit=10, offset=10), delta(before)
+
+    companies, changes = asyncio.run(scenario())
+
+    assert companies is None
+    assert changes == {"scheduled": 1, "errors": 1}
+
+
+def test_invalidate_drops_the_page(searches):
+    async def scenario():
+        searches.release = asyncio.Event()
+        buffer = PrefetchBuffer()
+        buffer.schedule("conv-1", "snap-1", "Алматы", None, limit=10, offset=10)
+        task = buffer._entries["conv-1"]["task"]
+        buffer.invalidate("conv-1")
+        buffer.invalidate("conv-unknown")
+        await asyncio.sleep(0)
+        return task, await buffer.take("conv-1", "snap-1", limit=10, offset=10)
+
+    task, companies = asyncio.run(scenario())
+
+    assert task.cancelled()
+    assert companies is None
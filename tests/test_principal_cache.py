@@ -0,0 +1,102 @@
+"""Tests for the cache of authenticated principals"""
+
+import uuid
+
+from src.auth import principal_cache as principal_cache_module
+from src.auth.models import User
+from src.auth.principal_cache import PrincipalCache
+from src.core.database import SessionLocal
+
+
+def is_cached(cache, token):
+    """Cache lookup on its own session, apart from the one changing the user"""
+    session = SessionLocal()
+    try:
+        return cache.get(token, session) is not None
+    finally:
+        session.close()
+
+
+def make_user(email):
+    return User(id=uuid.uuid4(), email=email, hashed_password="x", full_name="Тест", is_active=True, is_verified=True)
+
+
+def test_cached_token_returns_the_user_without_its_password(db):
+    cache = PrincipalCache(ttl_seconds=60)
+    user = make_user("cached@example.com")
+    cache.set("token-1", user, fund_profile_id="fund-1")
+
+    cached = cache.get("token-1", db)
+
+    assert cached.id == user.id and cached.email == user.email
+    assert cache.fund_profile_id(user.id) == "fund-1"
+
+
+def test_invalidate_user_drops_every_token_of_the_user_only(db):
+    cache = PrincipalCache(ttl_seconds=60)
+    user = make_user("reset@example.com")
+    other = make_user("other@example.com")
+    cache.set("token-a", user, fund_profile_id="fund-1")
+    cache.set("token-b", user)
+    cache.set("token-c", other)
+
+    assert cache.invalidate_user(user.id) == 2
+
+    assert cache.get("token-a", db) is None
+    assert cache.get("token-b", db) is None
+    assert cache.fund_profile_id(user.id) is None
+    assert cache.get("token-c", db).id == other.id
+
+
+def test_entries_do_not_outlive_the_token(db):
+    cache = PrincipalCache(ttl_seconds=60)
+    cache.set("token-expired", make_user("expired@example.com"), token_expires_at=0)
+
+    assert cache.get("token-expired", db) is None
+
+
+def test_committed_deactivation_drops_the_cached_tokens(db, monkeypatch):
+    cache = PrincipalCache(ttl_seconds=60)
+    monkeypatch.setattr(principal_cache_module, "principal_cache", cache)
+    user = make_user("deactivated@example.com")
+    db.add(user)
+    db.commit()
+    cache.set("token-d", user)
+
+    user.is_active = False
+    db.flush()
+    # Not dropped before the commit: a rollback keeps the user active
+    assert is_cached(cache, "token-d")
+    db.commit()
+
+    assert not is_cached(cache, "token-d")
+
+
+def test_rolled_back_change_keeps_the_cached_tokens(db, monkeypatch):
+    cache = PrincipalCache(ttl_seconds=60)
+    monkeypatch.setattr(principal_cache_module, "principal_cache", cache)
+    user = make_user("rollback@example.com")
+    db.add(user)
+    db.commit()
+    cache.set("token-r", user)
+
+    user.hashed_password = "changed"
+    db.flush()
+    db.rollback()
+    db.commit()
+
+    assert is_cached(cache, "token-r")
+
+
+def test_unrelated_changes_keep_the_cached_tokens(db, monkeypatch):
+    cache = PrincipalCache(ttl_seconds=60)
+    monkeypatch.setattr(principal_cache_module, "principal_cache", cache)
+    user = make_user("renamed@example.com")
+    db.add(user)
+    db.commit()
+    cache.set("token-n", user)
+
+    user.full_name = "Новое имя"
+    db.commit()
+
+    assert is_cached(cache, "token-n")
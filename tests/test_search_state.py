@@ -0,0 +1,62 @@
+"""Tests for the per-conversation search state"""
+
+from src.ai_conversation.search_state import SearchState
+
+
+def test_record_page_advances_the_cursor():
+    state = SearchState()
+
+    state.record_page("Алматы", ["IT"], page_size=10, offset=0, returned=10)
+    state.record_page("Алматы", ["IT"], page_size=5, offset=10, returned=5)
+
+    assert state.cursor == 15
+    assert state.page_number == 2
+    assert state.page_size == 5
+    assert not state.exhausted
+
+
+def test_short_page_marks_the_search_exhausted():
+    state = SearchState()
+
+    state.record_page("Алматы", None, page_size=10, offset=0, returned=3)
+
+    assert state.exhausted
+    assert state.cursor == 3
+
+
+def test_changed_filters_start_over():
+    state = SearchState()
+    state.record_page("Алматы", ["IT"], page_size=10, offset=0, returned=10)
+
+    state.record_page("Астана", ["IT"], page_size=10, offset=0, returned=10)
+
+    assert state.location == "Астана"
+    assert state.page_number == 1
+    assert state.cursor == 10
+
+
+def test_matches_ignores_keyword_order():
+    state = SearchState()
+    state.record_page("Алматы", ["IT", "банк"], page_size=10, offset=0, returned=10)
+
+    assert state.matches("Алматы", ["банк", "IT"])
+    assert not state.matches("Алматы", ["IT"])
+    assert not state.matches("Астана", ["IT", "банк"])
+
+
+def test_round_trip_through_dict():
+    state = SearchState()
+    state.record_page("Алматы", ["IT"], page_size=10, offset=0, returned=10)
+
+    restored = SearchState.from_dict(state.to_dict())
+
+    assert restored == state
+
+
+def test_from_dict_rejects_empty_or_invalid_data():
+    assert SearchState.from_dict(None) is None
+    assert SearchState.from_dict({}) is None
+    assert SearchState.from_dict({"location": "Алматы", "cursor": "not a number"}) is None
+    # Older states without a snapshot id get one computed
+    restored = SearchState.from_dict({"location": "Алматы", "cursor": 10})
+    assert restored.matches("Алматы", None)
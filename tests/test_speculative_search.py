@@ -0,0 +1,205 @@
+"""Tests for the speculative DB search started while the LLM parses the intent"""
+
+import asyncio
+import time
+
+import pytest
+
+from src.ai_conversation.service import OpenAIService
+from src.companies.service import CompanyService
+from src.core.config import get_settings
+from src.core.metrics import metrics
+
+
+COMPANIES = [{"id": "1", "name": "ТОО Алма"}]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "speculative_search_enabled", True)
+    monkeypatch.setattr(settings, "speculative_search_min_confidence", 0.4)
+    monkeypatch.setattr(settings, "intent_fast_path_enabled", True)
+    monkeypatch.setattr(settings, "intent_fast_path_min_confidence", 0.8)
+    return OpenAIService()
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    """Record speculative searches; each waits for ``release`` and returns COMPANIES"""
+    calls = []
+
+    class Searches:
+        release = None
+        error = None
+
+    async def fake_search(**kwargs):
+        calls.append(kwargs)
+        if Searches.release is not None:
+            await Searches.release.wait()
+        if Searches.error is not None:
+            raise Searches.error
+        return COMPANIES
+
+    monkeypatch.setattr(CompanyService, "search_companies_isolated", staticmethod(fake_search))
+    Searches.calls = calls
+    return Searches
+
+
+def guess(confidence=0.6, **overrides):
+    parse = {
+        "intent": "find_companies",
+        "location": "Алматы",
+        "activity_keywords": ["IT", "Строительство"],
+        "quantity": 10,
+        "page_number": 1,
+        "confidence": confidence,
+    }
+    parse.update(overrides)
+    return parse
+
+
+def counters():
+    return {
+        name: metrics.get(f"search.speculative.{name}")
+        for name in ("started", "hits", "misses", "errors", "cancelled", "saved_ms")
+    }
+
+
+def delta(before):
+    return {name: value - before[name] for name, value in counters().items()}
+
+
+@pytest.mark.parametrize("local_parse", [
+    None,
+    guess(intent="general_question"),
+    guess(location=None),
+    # The fast path answers on its own, there is no LLM latency to hide
+    guess(confidence=0.9),
+    guess(confidence=0.3),
+])
+def test_speculation_is_not_started_without_a_usable_guess(service, searches, local_parse):
+    async def scenario():
+        return service._start_speculative_search(local_parse, None)
+
+    assert asyncio.run(scenario()) is None
+    assert searches.calls == []
+
+
+def test_speculation_is_not_started_when_disabled(service, searches, monkeypatch):
+    monkeypatch.setattr(service.settings, "speculative_search_enabled", False)
+
+    async def scenario():
+        return service._start_speculative_search(guess(), None)
+
+    assert asyncio.run(scenario()) is None
+
+
+def test_results_are_kept_when_the_llm_agrees(service, searches):
+    async def scenario():
+        before = counters()
+        speculation = service._start_speculative_search(guess(), None)
+        assert speculation is not None
+        await speculation["task"]
+
+        # Same query after normalization: Latin city name, keyword case and order
+        companies = await service._resolve_speculative_search(
+            speculation, "Almaty", ["строительство", "it"], 10, 0, time.perf_counter()
+        )
+        return companies, delta(before)
+
+    companies, changes = asyncio.run(scenario())
+
+    assert companies == COMPANIES
+    assert searches.calls == [{
+        "location": "Алматы", "activity_keywords": ["IT", "Строительство"], "limit": 10, "offset": 0
+    }]
+    assert changes["started"] == 1
+    assert changes["hits"] == 1
+    assert changes["misses"] == 0
+    assert changes["cancelled"] == 0
+    assert changes["saved_ms"] >= 0
+
+
+@pytest.mark.parametrize("location, keywords, limit, offset", [
+    ("Астана", ["IT", "Строительство"], 10, 0),
+    ("Алматы", ["IT"], 10, 0),
+    ("Алматы", ["IT", "Строительство"], 20, 0),
+    ("Алматы", ["IT", "Строительство"], 10, 10),
+])
+def test_search_is_cancelled_when_the_llm_disagrees(service, searches, location, keywords, limit, offset):
+    async def scenario():
+        searches.release = asyncio.Event()
+        before = counters()
+        speculation = service._start_speculative_search(guess(), None)
+        await asyncio.sleep(0)
+
+        companies = await service._resolve_speculative_search(
+            speculation, location, keywords, limit, offset, time.perf_counter()
+        )
+        await asyncio.sleep(0)
+        return companies, speculation["task"], delta(before)
+
+    companies, task, changes = asyncio.run(scenario())
+
+    assert companies is None
+    assert task.cancelled()
+    assert changes["misses"] == 1
+    assert changes["cancelled"] == 1
+    assert changes["hits"] == 0
+
+
+def test_failed_speculation_falls_back_to_the_regular_search(service, searches):
+    searches.error = RuntimeError("database is down")
+
+    async def scenario():
+        before = counters()
+        speculation = service._start_speculative_search(guess(), None)
+        companies = await service._resolve_speculative_search(
+            speculation, "Алматы", ["IT", "Строительство"], 10, 0, time.perf_counter()
+        )
+        return companies, delta(before)
+
+    companies, changes = asyncio.run(scenario())
+
+    assert companies is None
+    assert changes["errors"] == 1
+    assert changes["hits"] == 0
+
+
+def test_saved_time_is_bounded_by_the_parse(service, searches):
+    async def scenario():
+        searches.release = asyncio.Event()
+        before = counters()
+        speculation = service._start_speculative_search(guess(), None)
+        # The parse finishes before the search does
+        parse_finished_at = time.perf_counter()
+        await asyncio.sleep(0.05)
+        searches.release.set()
+        await service._resolve_speculative_search(
+            speculation, "Алматы", ["IT", "Строительство"], 10, 0, parse_finished_at
+        )
+        return speculation, parse_finished_at, delta(before)
+
+    speculation, parse_finished_at, changes = asyncio.run(scenario())
+
+    assert changes["saved_ms"] == pytest.approx((parse_finished_at - speculation["started_at"]) * 1000)
+    assert changes["saved_ms"] < 50
+
+
+def test_cancelling_a_finished_search_is_not_counted(service, searches):
+    searches.error = RuntimeError("database is down")
+
+    async def scenario():
+        before = counters()
+        speculation = service._start_speculative_search(guess(), None)
+        await asyncio.sleep(0)
+        # The LLM chose not to search
+        service._cancel_speculative_search(speculation)
+        service._cancel_speculative_search(None)
+        return speculation["task"], delta(before)
+
+    task, changes = asyncio.run(scenario())
+
+    assert task.done() and not task.cancelled()
+    assert changes["cancelled"] == 0
@@ -0,0 +1,73 @@
+"""Tests for incremental company events"""
+
+import asyncio
+
+from src.ai_conversation.function_calling import to_company_data
+from src.ai_conversation.models import CompanyData
+from src.ai_conversation.service import ai_service
+from src.ai_conversation.streaming import engine_turn_events
+from src.ai_conversation.tool_executor import ToolExecutor
+
+
+def test_enrichment_batches_run_concurrently_and_yield_as_completed(monkeypatch):
+    running = 0
+    max_running = 0
+
+    async def fake_enrich(companies):
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        # Later batches finish first
+        await asyncio.sleep(0.01 * (10 - companies[0]["n"]))
+        running -= 1
+        return [dict(company, enriched=True) for company in companies]
+
+    monkeypatch.setattr(ai_service, "_enrich_companies_with_web_search", fake_enrich)
+    companies = [{"n": n} for n in range(6)]
+
+    async def collect():
+        return [item async for item in ai_service._enrich_in_batches(companies, 2)]
+
+    results = asyncio.run(collect())
+
+    assert max_running == 3
+    assert [start for start, _ in results] == [4, 2, 0]
+    assert all(company["enriched"] for _, batch in results for company in batch)
+
+
+def test_engine_companies_are_emitted_before_the_turn_finishes(monkeypatch):
+    async def fake_execute_one(self, call):
+        return "{}", [{"id": 7, "name": "ТОО Пример", "location": "Алматы"}]
+
+    monkeypatch.setattr(ToolExecutor, "_execute_one", fake_execute_one)
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def run_turn():
+            await ToolExecutor().execute([{"id": "call_1", "name": "search_companies", "arguments": "{}"}])
+            # The model is still writing its answer
+            await release.wait()
+            return {"message": "done", "companies_data": []}
+
+        events = []
+        async for event in engine_turn_events(run_turn):
+            events.append(event)
+            if event["event"] == "companies":
+                release.set()
+        return events
+
+    events = asyncio.run(scenario())
+
+    assert [event["event"] for event in events] == ["companies", "final"]
+    company = events[0]["data"]["companies"][0]
+    assert company["id"] == "7" and company["locality"] == "Алматы"
+    assert events[0]["data"]["offset"] == 0
+    assert events[1]["data"]["message"] == "done"
+
+
+def test_company_without_id_keeps_a_null_id():
+    company = to_company_data({"name": "ТОО Без ID", "location": "Астана"})
+
+    assert company["id"] is None
+    assert CompanyData(**company).id is None
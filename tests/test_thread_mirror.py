@@ -0,0 +1,197 @@
+"""Tests for the local mirror of assistant threads"""
+
+import asyncio
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from src.ai_conversation import assistant_creator
+from src.ai_conversation.assistant_creator import CharityFundAssistant
+from src.ai_conversation.thread_mirror import ThreadMirror, message_hash, missing_messages
+
+
+def text_message(message_id: str, role: str, text: str):
+    return SimpleNamespace(id=message_id, role=role, content=[SimpleNamespace(text=SimpleNamespace(value=text))])
+
+
+class ThreadsGateway:
+    """
+    Stand-in for the gateway around ``client.beta.threads.messages``
+
+    ``list`` serves ``pages`` in order; ``create`` hands out message ids.
+    """
+
+    def __init__(self, pages=()):
+        self.pages = list(pages)
+        self.calls = []
+
+    async def call(self, target, method, **kwargs):
+        self.calls.append((method, kwargs))
+        if method == "list":
+            data, has_more = self.pages.pop(0)
+            return SimpleNamespace(data=data, has_more=has_more)
+        if method == "create":
+            return SimpleNamespace(id=f"msg_created_{len(self.calls)}")
+        raise AssertionError(f"unexpected call {method}")
+
+
+@pytest.fixture
+def mirror(database, monkeypatch):
+    mirror = ThreadMirror()
+    monkeypatch.setattr(assistant_creator, "thread_mirror", mirror)
+    return mirror
+
+
+@pytest.fixture
+def thread_id():
+    return f"thread_{uuid.uuid4().hex}"
+
+
+def make_assistant(pages=()) -> CharityFundAssistant:
+    assistant = CharityFundAssistant()
+    assistant.llm_gateway = ThreadsGateway(pages)
+    return assistant
+
+
+def message(role, content, message_id=None):
+    return {"role": role, "content": content, "message_id": message_id}
+
+
+def test_missing_messages_are_matched_by_hash_with_multiplicity():
+    mirrored = [
+        {"hash": message_hash("user", "Найди IT компании в Алматы")},
+        {"hash": message_hash("assistant", "Нашёл 10 компаний")},
+        {"hash": message_hash("user", "дай еще")},
+    ]
+    history = [
+        {"role": "user", "content": "Найди IT компании в Алматы"},
+        {"role": "assistant", "content": "Нашёл 10 компаний"},
+        {"role": "user", "content": "дай еще"},
+        {"role": "assistant", "content": "Еще 10 компаний"},
+        # A repeated message counts once per occurrence
+        {"role": "user", "content": "дай еще"},
+        # Same text with another role is a different message
+        {"role": "assistant", "content": "Найди IT компании в Алматы"},
+        {"role": "user", "content": ""},
+    ]
+
+    assert missing_messages(mirrored, history) == [
+        {"role": "assistant", "content": "Еще 10 компаний"},
+        {"role": "user", "content": "дай еще"},
+        {"role": "assistant", "content": "Найди IT компании в Алматы"},
+    ]
+
+
+def test_unmirrored_thread_is_a_miss(mirror, thread_id):
+    assert mirror.load(thread_id) is None
+    assert mirror.last_message_id(thread_id) is None
+    # Nothing to keep in sync
+    assert mirror.append(thread_id, [message("user", "Привет", "msg_1")]) is False
+
+
+def test_appended_messages_are_loaded_in_order(mirror, thread_id):
+    mirror.register(thread_id)
+    assert mirror.load(thread_id) == []
+
+    mirror.append(thread_id, [message("user", "Привет", "msg_1"), message("assistant", "Здравствуйте", "msg_2")])
+    mirror.append(thread_id, [message("user", "Найди компании")])
+
+    loaded = mirror.load(thread_id)
+    assert [(m["role"], m["content"], m["message_id"]) for m in loaded] == [
+        ("user", "Привет", "msg_1"),
+        ("assistant", "Здравствуйте", "msg_2"),
+        ("user", "Найди компании", None),
+    ]
+    assert loaded[0]["hash"] == message_hash("user", "Привет")
+    # Messages without an id keep the last known one
+    assert mirror.last_message_id(thread_id) == "msg_2"
+
+
+def test_replace_and_invalidate(mirror, thread_id):
+    mirror.register(thread_id)
+    mirror.append(thread_id, [message("user", "Старое", "msg_1")])
+
+    mirror.replace(thread_id, [message("user", "Новое", "msg_5")])
+    assert [m["content"] for m in mirror.load(thread_id)] == ["Новое"]
+    assert mirror.last_message_id(thread_id) == "msg_5"
+
+    mirror.invalidate(thread_id)
+    assert mirror.load(thread_id) is None
+
+
+def test_fetch_follows_pagination(mirror, thread_id):
+    assistant = make_assistant(pages=[
+        ([text_message("msg_1", "user", "Привет"), text_message("msg_2", "assistant", "Здравствуйте")], True),
+        ([text_message("msg_3", "user", "Найди компании")], False),
+    ])
+
+    messages = asyncio.run(assistant._fetch_thread_messages(thread_id))
+
+    assert [m["message_id"] for m in messages] == ["msg_1", "msg_2", "msg_3"]
+    params = [kwargs for _, kwargs in assistant.llm_gateway.calls]
+    assert [p.get("after") for p in params] == [None, "msg_2"]
+    assert all(p["order"] == "asc" and p["thread_id"] == thread_id for p in params)
+
+
+def test_fetch_stops_on_an_empty_page(mirror, thread_id):
+    assistant = make_assistant(pages=[([], True)])
+
+    assert asyncio.run(assistant._fetch_thread_messages(thread_id, after="msg_9")) == []
+    assert assistant.llm_gateway.calls[0][1]["after"] == "msg_9"
+
+
+def test_unmirrored_thread_is_downloaded_once(mirror, thread_id):
+    assistant = make_assistant(pages=[
+        ([text_message("msg_1", "user", "Привет"), text_message("msg_2", "assistant", "Здравствуйте")], False),
+    ])
+
+    first = asyncio.run(assistant.get_conversation_history(thread_id))
+    second = asyncio.run(assistant.get_conversation_history(thread_id))
+
+    assert first == second == [
+        {"role": "user", "content": "Привет"},
+        {"role": "assistant", "content": "Здравствуйте"},
+    ]
+    assert [method for method, _ in assistant.llm_gateway.calls] == ["list"]
+
+
+def test_sync_sends_only_the_missing_messages(mirror, thread_id):
+    mirror.register(thread_id)
+    mirror.append(thread_id, [message("user", "Привет", "msg_1"), message("assistant", "Здравствуйте", "msg_2")])
+    assistant = make_assistant()
+
+    asyncio.run(assistant.sync_history_with_thread(thread_id, [
+        {"role": "user", "content": "Привет"},
+        {"role": "assistant", "content": "Здравствуйте"},
+        {"role": "user", "content": "Найди компании"},
+    ]))
+
+    calls = assistant.llm_gateway.calls
+    assert [(method, kwargs["content"]) for method, kwargs in calls] == [("create", "Найди компании")]
+    assert [m["content"] for m in mirror.load(thread_id)] == ["Привет", "Здравствуйте", "Найди компании"]
+    assert mirror.last_message_id(thread_id) == "msg_created_1"
+
+
+def test_uncaptured_run_reply_is_fetched_after_the_last_synced_id(mirror, thread_id):
+    mirror.register(thread_id)
+    mirror.append(thread_id, [message("user", "Найди компании", "msg_1")])
+    assistant = make_assistant(pages=[([text_message("msg_2", "assistant", "Нашёл 3 компании")], False)])
+
+    asyncio.run(assistant.record_run_reply(thread_id, {"status": "failed"}))
+
+    assert assistant.llm_gateway.calls[0][1]["after"] == "msg_1"
+    assert [m["content"] for m in mirror.load(thread_id)] == ["Найди компании", "Нашёл 3 компании"]
+
+
+def test_captured_run_reply_is_appended_without_fetching(mirror, thread_id):
+    mirror.register(thread_id)
+    assistant = make_assistant()
+
+    asyncio.run(assistant.record_run_reply(thread_id, {
+        "status": "completed",
+        "reply_messages": [message("assistant", "Готово", "msg_7")],
+    }))
+
+    assert assistant.llm_gateway.calls == []
+    assert mirror.last_message_id(thread_id) == "msg_7"
@@ -0,0 +1,135 @@
+"""Tests for the concurrent execution of assistant tool calls"""
+
+import asyncio
+import json
+
+import pytest
+
+from src.ai_conversation.tool_executor import ToolExecutor, companies_listener
+from src.companies.service import CompanyService
+from src.core.metrics import metrics
+
+
+def company(company_id, name="ТОО Алма"):
+    return {"id": company_id, "Company": name, "BIN": "123456789012", "Locality": "Алматы", "KATO": "75", "KRP": "105"}
+
+
+@pytest.fixture
+def services(monkeypatch):
+    """
+    Stubbed *_isolated CompanyService calls
+
+    Each call sleeps ``delays[key]`` seconds (key: location or company id) and
+    raises ``errors[key]`` when set; the number of calls running at once is tracked.
+    """
+    class Services:
+        delays = {}
+        errors = {}
+        running = 0
+        max_running = 0
+        calls = []
+
+    async def run(key, result):
+        Services.calls.append(key)
+        Services.running += 1
+        Services.max_running = max(Services.max_running, Services.running)
+        try:
+            await asyncio.sleep(Services.delays.get(key, 0.01))
+            if key in Services.errors:
+                raise Services.errors[key]
+            return result
+        finally:
+            Services.running -= 1
+
+    async def search_companies_isolated(location=None, activity_keywords=None, limit=10, offset=0):
+        return await run(location, [company(f"{location}-{offset + n}") for n in range(min(limit, 2))])
+
+    async def get_company_by_id_isolated(company_id):
+        return await run(company_id, None if company_id == "missing" else company(company_id))
+
+    monkeypatch.setattr(CompanyService, "search_companies_isolated", staticmethod(search_companies_isolated))
+    monkeypatch.setattr(CompanyService, "get_company_by_id_isolated", staticmethod(get_company_by_id_isolated))
+    return Services
+
+
+def call(call_id, name, **arguments):
+    return {"id": call_id, "name": name, "arguments": json.dumps(arguments, ensure_ascii=False)}
+
+
+def test_calls_run_concurrently_and_keep_their_order(services):
+    services.delays = {"Алматы": 0.05, "Астана": 0.01, "c-1": 0.03}
+    executor = ToolExecutor(timeout_seconds=5)
+
+    outputs, companies = asyncio.run(executor.execute([
+        call("call_1", "search_companies", location="Алматы"),
+        call("call_2", "search_companies", location="Астана", page=2, limit=5),
+        call("call_3", "get_company_details", company_id="c-1"),
+    ]))
+
+    assert services.max_running == 3
+    assert [output["tool_call_id"] for output in outputs] == ["call_1", "call_2", "call_3"]
+    first, second, third = (json.loads(output["output"]) for output in outputs)
+    assert [c["id"] for c in first["companies"]] == ["Алматы-0", "Алматы-1"]
+    assert (second["page"], second["limit"], second["companies"][0]["id"]) == (2, 5, "Астана-5")
+    assert (third["id"], third["kato"], third["krp"]) == ("c-1", "75", "105")
+    assert [c["id"] for c in companies] == ["Алматы-0", "Алматы-1", "Астана-5", "Астана-6", "c-1"]
+
+
+def test_slow_call_times_out_without_failing_the_step(services):
+    services.delays = {"Алматы": 1.0}
+    executor = ToolExecutor(timeout_seconds=0.05)
+    timeouts = metrics.get("tools.timeouts")
+
+    outputs, companies = asyncio.run(executor.execute([
+        call("call_1", "search_companies", location="Алматы"),
+        call("call_2", "get_company_details", company_id="c-1"),
+    ]))
+
+    assert outputs[0] == {
+        "tool_call_id": "call_1",
+        "output": "search_companies timed out. Please try a narrower request.",
+    }
+    assert json.loads(outputs[1]["output"])["id"] == "c-1"
+    assert [c["id"] for c in companies] == ["c-1"]
+    assert metrics.get("tools.timeouts") - timeouts == 1
+
+
+def test_errors_become_outputs_in_call_order(services):
+    services.errors = {"Алматы": RuntimeError("database is down"), "c-2": RuntimeError("no connection")}
+    executor = ToolExecutor(timeout_seconds=5)
+    errors = metrics.get("tools.errors")
+
+    outputs, companies = asyncio.run(executor.execute([
+        call("call_1", "search_companies", location="Алматы"),
+        call("call_2", "get_company_details", company_id="missing"),
+        {"id": "call_3", "name": "search_companies", "arguments": "{not json"},
+        call("call_4", "send_email", to="fund@example.kz"),
+        call("call_5", "get_company_details", company_id="c-2"),
+        call("call_6", "search_companies", location="Астана"),
+    ]))
+
+    assert [output["tool_call_id"] for output in outputs] == [f"call_{n}" for n in range(1, 7)]
+    assert outputs[0]["output"].startswith("Error searching companies: database is down")
+    assert outputs[1]["output"] == "Company not found. Please check the company ID and try again."
+    assert outputs[2]["output"].startswith("Invalid arguments for search_companies")
+    assert outputs[3]["output"] == "Unknown function: send_email"
+    assert outputs[4]["output"].startswith("Error getting company details: no connection")
+    assert json.loads(outputs[5]["output"])["total_found"] == 2
+    assert [c["id"] for c in companies] == ["Астана-0", "Астана-1"]
+    assert metrics.get("tools.errors") - errors == 2
+
+
+def test_listener_receives_the_companies_of_each_step(services):
+    executor = ToolExecutor(timeout_seconds=5)
+    received = []
+
+    async def scenario():
+        with companies_listener(received.append):
+            await executor.execute([call("call_1", "search_companies", location="Алматы")])
+            # A step without companies is not reported
+            await executor.execute([call("call_2", "get_company_details", company_id="missing")])
+        await executor.execute([call("call_3", "search_companies", location="Астана")])
+
+    asyncio.run(scenario())
+
+    assert [[c["id"] for c in step] for step in received] == [["Алматы-0", "Алматы-1"]]
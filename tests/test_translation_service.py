@@ -0,0 +1,66 @@
+"""Tests for the fuzzy city name resolution"""
+
+import pytest
+
+from src.core.translation_service import CityTranslationService, SymSpellIndex, normalize_place_name
+
+
+@pytest.mark.parametrize("location, expected, distance", [
+    ("Chimkent", "Шымкент", 0),
+    ("Almati", "Алматы", 1),
+    ("Нурсултан", "Нур-Султан", 0),
+    ("nur-sultan", "Нур-Султан", 0),
+    ("Karagandy", "Караганда", 1),
+    ("Шымкент", "Шымкент", 0),
+])
+def test_known_places_are_resolved(location, expected, distance):
+    assert CityTranslationService.match_location(location) == (expected, distance)
+    assert CityTranslationService.resolve_location(location) == expected
+
+
+@pytest.mark.parametrize("location", ["Париж", "Xyzzyville", "qwerty", "", "   "])
+def test_unknown_places_are_not_resolved(location):
+    assert CityTranslationService.resolve_location(location) is None
+
+
+@pytest.mark.parametrize("city_name, expected", [
+    ("almaty", "Алматы"),
+    ("Chimkent", "Шымкент"),
+    ("Almati", "Алматы"),
+    ("Нурсултан", "Нур-Султан"),
+    ("Париж", "Париж"),
+    ("", ""),
+])
+def test_translate_city_name(city_name, expected):
+    assert CityTranslationService.translate_city_name(city_name) == expected
+
+
+def test_index_search_sorts_by_distance_then_term():
+    index = SymSpellIndex(max_distance=2)
+    for term in ["abcf", "abce", "abcd", "abxy"]:
+        index.add(term)
+
+    assert index.search("abcx", 1) == [(1, "abcd"), (1, "abce"), (1, "abcf")]
+    assert index.search("abcx", 2) == [(1, "abcd"), (1, "abce"), (1, "abcf"), (2, "abxy")]
+    assert index.search("abcd", 0) == [(0, "abcd")]
+    # The query distance never exceeds the one the index was built for
+    assert index.search("ab", 5) == [(2, "abcd"), (2, "abce"), (2, "abcf"), (2, "abxy")]
+
+
+def test_equally_close_places_resolve_alphabetically():
+    class TiedService(CityTranslationService):
+        CITY_TRANSLATIONS = {"karatun": "Каратун", "karaton": "Каратон"}
+        _fuzzy_index = None
+        _fuzzy_names = {}
+
+    # "karatan" is one edit away from both; the alphabetically first key wins
+    assert TiedService.match_location("karatan") == ("Каратон", 1)
+
+
+@pytest.mark.parametrize("name, key", [
+    ("Нур-Султан", "nursultan"),
+    ("  Nur  Sultan ", "nur sultan"),
+    ("Өскемен", "oskemen"),
+])
+def test_normalize_place_name(name, key):
+    assert normalize_place_name(name) == key